@@ -1,16 +1,20 @@
 """
 API dependencies for authentication and authorization.
 """
+from collections.abc import Awaitable, Callable
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import decode_token
-from app.db.session import get_db
+from app.core.principal_cache import principal_cache
+from app.core.security import get_token_subject
+from app.core.tenancy import Tenant
+from app.db.session import get_db, get_primary_read_db
 from app.models.user import User, UserRole
+from app.services.entitlements import entitlements
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
@@ -19,13 +23,19 @@ security = HTTPBearer()
 async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     db: Annotated[AsyncSession, Depends(get_db)],
+    read_db: Annotated[AsyncSession, Depends(get_primary_read_db)],
 ) -> User:
     """
     Dependency to get current authenticated user from JWT token.
 
+    The user row is served from the principal cache when possible, or read
+    in autocommit mode, and attached to the request session without a query,
+    so read-only handlers never open a transaction on ``db``.
+
     Args:
         credentials: HTTP Bearer token credentials
         db: Database session
+        read_db: Autocommit session for the cache miss lookup
 
     Returns:
         Current authenticated user
@@ -33,17 +43,8 @@ async def get_current_user(
     Raises:
         HTTPException: If token is invalid or user not found
     """
-    token = credentials.credentials
-    payload = decode_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    user_id: int = int(payload.get("sub"))  # type: ignore
+    # Verified tokens are cached until they expire, so this is usually a lookup
+    user_id = get_token_subject(credentials.credentials)
     if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,15 +52,23 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Fetch user from database
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    snapshot = await principal_cache.get(user_id)
+    if snapshot is not None:
+        user = await db.merge(principal_cache.to_user(snapshot), load=False)
+    else:
+        # Fetch user from database
+        result = await read_db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
 
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+
+        await principal_cache.set(user)
+        if user not in db:
+            user = await db.merge(user, load=False)
 
     if not user.is_active:
         raise HTTPException(
@@ -134,3 +143,47 @@ async def require_instructor(
             detail="Not enough permissions",
         )
     return current_user
+
+
+def require_feature(feature: str) -> Callable[..., Awaitable[User]]:
+    """
+    Require a tariff feature of the user's organization (e.g. ``"analytics"``).
+
+    Served from the entitlement cache; admins are always allowed.
+    """
+
+    async def dependency(
+        current_user: Annotated[User, Depends(get_current_active_user)],
+        read_db: Annotated[AsyncSession, Depends(get_primary_read_db)],
+    ) -> User:
+        if current_user.role == UserRole.ADMIN:
+            return current_user
+        organization_id = current_user.organization_id
+        allowed = organization_id is not None and (
+            await entitlements.get(read_db, organization_id)
+        ).has(feature)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Your plan does not include {feature}",
+            )
+        return current_user
+
+    return dependency
+
+
+def get_current_tenant(request: Request) -> Tenant | None:
+    """The organization the request is served for, resolved by ``TenantMiddleware``."""
+    return getattr(request.state, "tenant", None)
+
+
+def require_tenant(
+    tenant: Annotated[Tenant | None, Depends(get_current_tenant)],
+) -> Tenant:
+    """Require the request to be served for a known, active organization."""
+    if tenant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found",
+        )
+    return tenant
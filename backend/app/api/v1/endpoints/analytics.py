@@ -0,0 +1,104 @@
+"""
+Exam analytics endpoints: read-only views of the precomputed summaries.
+"""
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.db.session import get_read_db
+from app.models.analytics import (
+    CategoryStatistics,
+    OrganizationExamStatistics,
+    QuestionStatistics,
+)
+from app.models.organization import Organization
+from app.models.question import Question
+from app.models.user import User, UserRole
+from app.schemas.analytics import (
+    CategoryStatisticsResponse,
+    OrganizationExamStatisticsResponse,
+    QuestionStatisticsResponse,
+)
+from app.services.entitlements import entitlements
+
+router = APIRouter()
+
+_QUESTION_ORDER = {
+    "hardest": QuestionStatistics.p_value.asc(),
+    "easiest": QuestionStatistics.p_value.desc(),
+    "least_discriminating": QuestionStatistics.discrimination.asc().nulls_last(),
+}
+
+
+@router.get("/questions", response_model=list[QuestionStatisticsResponse])
+async def list_question_statistics(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    _: Annotated[User, Depends(deps.require_admin)],
+    category_id: int | None = None,
+    order: Literal["hardest", "easiest", "least_discriminating"] = "hardest",
+    min_attempts: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+) -> list[QuestionStatistics]:
+    """
+    List item statistics of questions, e.g. the hardest ones of a category.
+
+    Admin only.
+    """
+    query = select(QuestionStatistics).where(QuestionStatistics.attempts >= min_attempts)
+    if category_id is not None:
+        query = query.join(Question, Question.id == QuestionStatistics.question_id).where(
+            Question.category_id == category_id
+        )
+    query = query.order_by(_QUESTION_ORDER[order], QuestionStatistics.question_id).limit(limit)
+    return list((await db.execute(query)).scalars().all())
+
+
+@router.get("/categories", response_model=list[CategoryStatisticsResponse])
+async def list_category_statistics(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    _: Annotated[User, Depends(deps.require_admin)],
+) -> list[CategoryStatistics]:
+    """
+    List accuracy and pass rate of every question category.
+
+    Admin only.
+    """
+    result = await db.execute(select(CategoryStatistics).order_by(CategoryStatistics.category_id))
+    return list(result.scalars().all())
+
+
+@router.get(
+    "/organizations/{organization_id}", response_model=OrganizationExamStatisticsResponse
+)
+async def get_organization_statistics(
+    organization_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[User, Depends(deps.require_business_owner)],
+) -> OrganizationExamStatistics:
+    """
+    Get the exam score distribution of an organization's students.
+
+    Business owners see their own organization if its tariff includes
+    analytics; admins see any.
+    """
+    if current_user.role != UserRole.ADMIN:
+        owner_id = await db.scalar(
+            select(Organization.owner_id).where(Organization.id == organization_id)
+        )
+        if owner_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions",
+            )
+        (await entitlements.get(db, organization_id)).require("analytics")
+
+    statistics = await db.get(OrganizationExamStatistics, organization_id)
+    if statistics is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No exam statistics for this organization",
+        )
+    return statistics
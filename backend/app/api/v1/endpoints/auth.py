@@ -1,6 +1,7 @@
 """
-Authentication endpoints: login, register, refresh token.
+Authentication endpoints: login, register, refresh token, logout.
 """
+import logging
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -8,14 +9,45 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.core.security import create_access_token, create_refresh_token, get_password_hash, verify_password
+from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.core.security import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_password_hash_async,
+    new_token_id,
+    verify_password_async,
+)
+from app.core.token_store import Rotation, refresh_token_store
 from app.db.session import get_db
 from app.models.user import User
-from app.schemas.auth import LoginRequest, LoginResponse, RegisterRequest, TokenResponse
+from app.schemas.auth import (
+    LoginRequest,
+    LoginResponse,
+    RefreshRequest,
+    RefreshResponse,
+    RegisterRequest,
+)
 from app.schemas.user import UserResponse
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+REFRESH_TOKEN_TTL_SECONDS = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+
+def _refresh_claims(refresh_token: str) -> tuple[int, str, str] | None:
+    """Return (user ID, family, jti) of a valid refresh token."""
+    payload = decode_token(refresh_token)
+    if payload is None or payload.get("type") != "refresh":
+        return None
+    try:
+        return int(payload["sub"]), payload["fam"], payload["jti"]
+    except (KeyError, TypeError, ValueError):
+        return None
+
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
@@ -40,7 +72,7 @@ async def register(
     # Create new user
     user = User(
         email=data.email,
-        password_hash=get_password_hash(data.password),
+        password_hash=await get_password_hash_async(data.password),
         full_name=data.full_name,
         phone=data.phone,
         role=data.role,
@@ -67,7 +99,7 @@ async def login(
     result = await db.execute(select(User).where(User.email == data.email))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(data.password, user.password_hash):
+    if not user or not await verify_password_async(data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -80,9 +112,11 @@ async def login(
             detail="Inactive user",
         )
 
-    # Create tokens
+    # Create tokens; each login starts a new refresh token family
+    family, jti = new_token_id(), new_token_id()
+    await refresh_token_store.start_family(user.id, family, jti, REFRESH_TOKEN_TTL_SECONDS)
     access_token = create_access_token(subject=user.id)
-    refresh_token = create_refresh_token(subject=user.id)
+    refresh_token = create_refresh_token(subject=user.id, family=family, jti=jti)
 
     return LoginResponse(
         access_token=access_token,
@@ -92,45 +126,84 @@ async def login(
     )
 
 
-@router.post("/refresh", response_model=TokenResponse)
+@router.post("/refresh", response_model=RefreshResponse)
 async def refresh_token(
-    refresh_token: str,
+    data: RefreshRequest,
     db: Annotated[AsyncSession, Depends(get_db)],
-) -> TokenResponse:
+) -> RefreshResponse:
     """
     Refresh access token using refresh token.
-    """
-    from app.core.security import decode_token
 
-    payload = decode_token(refresh_token)
-
-    if payload is None or payload.get("type") != "refresh":
+    The refresh token is single use: a new one is returned, and presenting
+    an already used token revokes the whole login session.
+    """
+    claims = _refresh_claims(data.refresh_token)
+    if claims is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
         )
-
-    user_id = int(payload.get("sub"))  # type: ignore
+    user_id, family, jti = claims
 
     # Verify user still exists and is active
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-
-    if not user or not user.is_active:
+    snapshot = await principal_cache.get(user_id)
+    if snapshot is not None:
+        is_active = snapshot["is_active"]
+    else:
+        user = await db.get(User, user_id)
+        if user is not None:
+            await principal_cache.set(user)
+        is_active = user is not None and user.is_active
+
+    if not is_active:
+        await refresh_token_store.revoke_family(user_id, family)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user",
         )
 
-    # Create new access token
-    access_token = create_access_token(subject=user.id)
+    new_jti = new_token_id()
+    rotation = await refresh_token_store.rotate(
+        user_id, family, jti, new_jti, REFRESH_TOKEN_TTL_SECONDS
+    )
+    if rotation is Rotation.REUSED:
+        logger.warning("Refresh token reuse for user %s; revoked family %s", user_id, family)
+    if rotation is not Rotation.ROTATED:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+        )
 
-    return TokenResponse(
-        access_token=access_token,
+    return RefreshResponse(
+        access_token=create_access_token(subject=user_id),
+        refresh_token=create_refresh_token(subject=user_id, family=family, jti=new_jti),
         token_type="bearer",
     )
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(data: RefreshRequest) -> None:
+    """
+    Log out the session the refresh token belongs to.
+    """
+    claims = _refresh_claims(data.refresh_token)
+    if claims is not None:
+        user_id, family, _ = claims
+        await refresh_token_store.revoke_family(user_id, family)
+
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_all(
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> None:
+    """
+    Log out all sessions of the current user.
+
+    Outstanding access tokens stay valid until they expire.
+    """
+    await refresh_token_store.revoke_all(current_user.id)
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
     current_user: Annotated[User, Depends(deps.get_current_active_user)],
@@ -0,0 +1,331 @@
+"""
+Booking endpoints: availability generation, free slot and instructor search,
+reservation, cancellation, completion and rating.
+"""
+from datetime import datetime, timezone
+from typing import Annotated, Any
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.db.session import get_db, get_primary_read_db, get_read_db
+from app.models.booking import Booking, BookingSlot, BookingType
+from app.models.organization import Organization
+from app.models.user import User, UserLevel, UserRole
+from app.schemas.booking import (
+    AvailabilityGenerate,
+    AvailabilityResult,
+    BookingCreate,
+    BookingFirstAvailable,
+    BookingRate,
+    BookingResponse,
+    BookingSlotResponse,
+    InstructorSearchResult,
+)
+from app.services.availability import WeeklyRule, create_recurring_slots, expand_rules
+from app.services.booking_engine import (
+    BookingError,
+    BookingNotCancellable,
+    SlotUnavailable,
+    cancel_booking,
+    complete_booking,
+    find_free_slots,
+    rate_booking,
+    reserve_first_available,
+    reserve_slot,
+)
+from app.services.instructor_ranking import instructor_ranking
+
+router = APIRouter()
+
+INSTRUCTOR_ROLES = (UserRole.INSTRUCTOR, UserRole.TEACHER, UserRole.MENTOR)
+
+
+async def _check_can_manage_slots(db: AsyncSession, user: User, instructor_ids: list[int]) -> None:
+    """
+    Allow instructors to manage their own slots, business owners those of
+    their organization's instructors, and admins anyone's.
+    """
+    result = await db.execute(
+        select(User.id, User.role, Organization.owner_id)
+        .outerjoin(Organization, Organization.id == User.organization_id)
+        .where(User.id.in_(instructor_ids))
+    )
+    rows = result.all()
+    if len(rows) != len(instructor_ids) or any(role not in INSTRUCTOR_ROLES for _, role, _ in rows):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Instructor not found",
+        )
+    if user.role == UserRole.ADMIN:
+        return
+    if all(user_id == user.id or owner_id == user.id for user_id, _, owner_id in rows):
+        return
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Not enough permissions",
+    )
+
+
+def _slot_taken(exc: SlotUnavailable) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+
+@router.post(
+    "/availability", response_model=AvailabilityResult, status_code=status.HTTP_201_CREATED
+)
+async def generate_availability(
+    data: AvailabilityGenerate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> AvailabilityResult:
+    """
+    Create slots from weekly availability rules over a date range.
+
+    Public holidays and excluded dates are skipped, as are slots overlapping
+    existing ones, so the same request can be repeated safely.
+    """
+    instructor_ids = sorted(set(data.instructor_ids or [current_user.id]))
+    await _check_can_manage_slots(db, current_user, instructor_ids)
+
+    slots = expand_rules(
+        [
+            WeeklyRule(
+                rule.weekdays,
+                rule.start,
+                rule.end,
+                rule.slot_minutes,
+                rule.break_minutes,
+                rule.price_amount,
+            )
+            for rule in data.rules
+        ],
+        data.date_from,
+        data.date_to,
+        ZoneInfo(data.timezone),
+        data.excluded_dates,
+        data.skip_public_holidays,
+    )
+    requested, created = await create_recurring_slots(db, instructor_ids, slots)
+    return AvailabilityResult(requested=requested, created=created, skipped=requested - created)
+
+
+@router.get("/slots", response_model=list[BookingSlotResponse])
+async def list_free_slots(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    _: Annotated[User, Depends(deps.get_current_active_user)],
+    start: datetime,
+    end: datetime,
+    instructor_ids: Annotated[list[int], Query(min_length=1, max_length=100)],
+    per_instructor: int | None = Query(None, ge=1, le=100),
+) -> list[BookingSlot]:
+    """
+    List free future slots of the instructors starting between start and end.
+
+    Served from the read replica; a slot shown here may be taken by the time
+    it is booked, which the booking endpoints report with 409 Conflict.
+    """
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="end must be after start",
+        )
+    return await find_free_slots(db, instructor_ids, start, end, per_instructor)
+
+
+@router.get("/instructors", response_model=list[InstructorSearchResult])
+async def search_instructors(
+    _: Annotated[User, Depends(deps.get_current_active_user)],
+    booking_type: BookingType = BookingType.PRACTICAL,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    organization_id: int | None = None,
+    works_privately: bool | None = None,
+    levels: Annotated[list[UserLevel] | None, Query()] = None,
+    min_rating: float | None = Query(None, ge=0, le=5),
+    min_free_slots: int = Query(1, ge=0, le=100),
+    limit: int = Query(10, ge=1, le=50),
+) -> list[dict[str, Any]]:
+    """
+    Search the best ranked instructors with free slots between start and end.
+
+    Instructors are ranked by rating, completion rate and level. The window
+    defaults to the next ``INSTRUCTOR_RANKING_HORIZON_DAYS`` and is cut to
+    it. Served from an in-memory ranking table; a slot counted here may be
+    taken by the time it is booked.
+    """
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="end must be after start",
+        )
+    matches = await instructor_ranking.search(
+        booking_type,
+        start,
+        end,
+        organization_id=organization_id,
+        works_privately=works_privately,
+        levels=levels,
+        min_rating=min_rating,
+        min_free_slots=min_free_slots,
+        limit=limit,
+    )
+    return [
+        {
+            "id": match.instructor.id,
+            "full_name": match.instructor.full_name,
+            "avatar_url": match.instructor.avatar_url,
+            "role": match.instructor.role,
+            "organization_id": match.instructor.organization_id,
+            "work_privately": match.instructor.work_privately,
+            "level": match.instructor.level,
+            "rating": match.instructor.rating,
+            "total_sessions": match.instructor.total_sessions,
+            "completion_rate": match.instructor.completion_rate,
+            "score": match.instructor.score,
+            "free_slots": match.free_slots,
+            "next_free_slot": (
+                datetime.fromtimestamp(match.next_free, timezone.utc) if match.free_slots else None
+            ),
+        }
+        for match in matches
+    ]
+
+
+@router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
+async def create_booking(
+    data: BookingCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> Booking:
+    """
+    Book a slot.
+
+    Returns 409 Conflict if the slot is already taken.
+    """
+    try:
+        return await reserve_slot(
+            db, data.slot_id, current_user.id, data.booking_type, data.student_notes
+        )
+    except SlotUnavailable as exc:
+        raise _slot_taken(exc)
+
+
+@router.post(
+    "/first-available", response_model=BookingResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_first_available_booking(
+    data: BookingFirstAvailable,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> Booking:
+    """
+    Book the earliest free slot of any of the instructors in a time window.
+
+    Returns 409 Conflict if no slot is left.
+    """
+    try:
+        return await reserve_first_available(
+            db,
+            data.instructor_ids,
+            data.start,
+            data.end,
+            current_user.id,
+            data.booking_type,
+            data.student_notes,
+        )
+    except SlotUnavailable as exc:
+        raise _slot_taken(exc)
+
+
+@router.get("", response_model=list[BookingResponse])
+async def list_my_bookings(
+    db: Annotated[AsyncSession, Depends(get_primary_read_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+    limit: int = Query(50, ge=1, le=200),
+) -> list[Booking]:
+    """
+    List the current user's bookings, as student or instructor, latest first.
+    """
+    result = await db.execute(
+        select(Booking)
+        .where(
+            or_(Booking.student_id == current_user.id, Booking.instructor_id == current_user.id)
+        )
+        .order_by(Booking.scheduled_start.desc())
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+@router.post("/{booking_id}/cancel", response_model=BookingResponse)
+async def cancel_my_booking(
+    booking_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> Booking:
+    """
+    Cancel a pending or confirmed booking, freeing its slot.
+
+    Either the student or the instructor may cancel.
+    """
+    booking = await db.get(Booking, booking_id, with_for_update=True)
+    if booking is None or current_user.id not in (booking.student_id, booking.instructor_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Booking not found",
+        )
+
+    try:
+        return await cancel_booking(db, booking)
+    except BookingNotCancellable as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+
+async def _get_booking_for(db: AsyncSession, booking_id: int, user_id: int, party: str) -> Booking:
+    """Lock a booking whose ``party`` (``student_id`` or ``instructor_id``) is the user."""
+    booking = await db.get(Booking, booking_id, with_for_update=True)
+    if booking is None or getattr(booking, party) != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Booking not found",
+        )
+    return booking
+
+
+@router.post("/{booking_id}/complete", response_model=BookingResponse)
+async def complete_my_booking(
+    booking_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> Booking:
+    """
+    Mark a started booking as completed (instructor only).
+    """
+    booking = await _get_booking_for(db, booking_id, current_user.id, "instructor_id")
+    try:
+        return await complete_booking(db, booking)
+    except BookingError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+
+@router.post("/{booking_id}/rate", response_model=BookingResponse)
+async def rate_my_booking(
+    booking_id: int,
+    data: BookingRate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> Booking:
+    """
+    Rate a completed booking from 1 to 5 stars (student only).
+
+    Rating again replaces the earlier rating.
+    """
+    booking = await _get_booking_for(db, booking_id, current_user.id, "student_id")
+    try:
+        return await rate_booking(db, booking, data.stars)
+    except BookingError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
@@ -0,0 +1,395 @@
+"""
+Exam endpoints: list exams, start, answer, resume and finish exam sessions,
+and the student's progress.
+"""
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.config import settings
+from app.db.session import get_db, get_read_db
+from app.models.exam import Exam, ExamSession
+from app.models.progress import StudentCategoryProgress, StudentProgress, StudentQuestionMiss
+from app.models.user import User
+from app.schemas.exam import (
+    ExamAnswerResult,
+    ExamAnswerSubmit,
+    ExamPosition,
+    ExamProgressResponse,
+    ExamResponse,
+    ExamSessionCreate,
+    ExamSessionResponse,
+)
+from app.schemas.progress import (
+    CategoryProgressResponse,
+    MissedQuestionResponse,
+    StudentProgressResponse,
+)
+from app.services.exam_engine import (
+    ExamEngineError,
+    QuestionNotInSession,
+    SessionExpired,
+    SessionNotActive,
+    SessionState,
+    exam_engine,
+)
+from app.services.question_bank import question_bank
+from app.services.question_renderer import (
+    DEFAULT_LOCALE,
+    Locale,
+    gzip_etag,
+    question_renderer,
+)
+from app.utils.http import accepts_gzip, etag_matches
+
+router = APIRouter()
+
+
+def _json_object(*columns: Any) -> Any:
+    """``json_build_object`` keyed by column name."""
+    return func.json_build_object(*(item for column in columns for item in (column.key, column)))
+
+
+async def _get_owned_state(db: AsyncSession, session_id: int, user: User) -> SessionState:
+    """Load the in-progress session state, checking that it belongs to the user."""
+    try:
+        state = await exam_engine.get_state(db, session_id, user.id)
+    except SessionExpired:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam time is over",
+        )
+    except SessionNotActive:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam session is not in progress",
+        )
+
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam session not found",
+        )
+    return state
+
+
+@router.get("", response_model=list[ExamResponse])
+async def list_exams(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    _: Annotated[User, Depends(deps.get_current_active_user)],
+) -> list[Exam]:
+    """
+    List active exams.
+    """
+    result = await db.execute(select(Exam).where(Exam.is_active.is_(True)).order_by(Exam.id))
+    return list(result.scalars().all())
+
+
+@router.get("/progress", response_model=StudentProgressResponse)
+async def get_my_progress(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> StudentProgressResponse:
+    """
+    Get the current user's exam progress: finished sessions, best score,
+    accuracy per question category (weakest first) and most-missed questions.
+
+    Served from aggregates maintained as sessions finish, in one query.
+    """
+    categories = (
+        select(
+            func.json_agg(
+                _json_object(
+                    StudentCategoryProgress.category_id,
+                    StudentCategoryProgress.sessions,
+                    StudentCategoryProgress.questions,
+                    StudentCategoryProgress.answered,
+                    StudentCategoryProgress.correct,
+                )
+            )
+        )
+        .where(StudentCategoryProgress.student_id == current_user.id)
+        .scalar_subquery()
+    )
+    missed = (
+        select(
+            StudentQuestionMiss.question_id,
+            StudentQuestionMiss.category_id,
+            StudentQuestionMiss.misses,
+            StudentQuestionMiss.last_missed_at,
+        )
+        .where(StudentQuestionMiss.student_id == current_user.id)
+        .order_by(StudentQuestionMiss.misses.desc(), StudentQuestionMiss.question_id)
+        .limit(settings.STUDENT_PROGRESS_MISSED_QUESTIONS)
+        .subquery()
+    )
+    most_missed = select(
+        func.json_agg(
+            aggregate_order_by(
+                _json_object(*missed.c), missed.c.misses.desc(), missed.c.question_id
+            )
+        )
+    ).scalar_subquery()
+    result = await db.execute(
+        select(StudentProgress, categories, most_missed).where(
+            StudentProgress.student_id == current_user.id
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return StudentProgressResponse()
+
+    progress, category_rows, missed_rows = row
+    # Accuracy as computed by the model
+    categories = sorted(
+        (StudentCategoryProgress(**fields) for fields in category_rows or ()),
+        key=lambda category: (category.accuracy, category.category_id),
+    )
+    return StudentProgressResponse(
+        sessions=progress.sessions,
+        passed_sessions=progress.passed_sessions,
+        best_score=progress.best_score,
+        last_score=progress.last_score,
+        last_finished_at=progress.last_finished_at,
+        categories=[CategoryProgressResponse.model_validate(category) for category in categories],
+        most_missed=[MissedQuestionResponse.model_validate(miss) for miss in missed_rows or ()],
+    )
+
+
+@router.post(
+    "/sessions",
+    response_model=ExamSessionResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def start_exam_session(
+    data: ExamSessionCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> ExamSession:
+    """
+    Start a new exam session.
+
+    Selects the questions and starts the server-side timer.
+    """
+    exam = await db.get(Exam, data.exam_id)
+    if exam is None or not exam.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam not found",
+        )
+
+    try:
+        return await exam_engine.start(db, exam, current_user.id)
+    except ExamEngineError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+        )
+
+
+@router.get("/sessions/{session_id}", response_model=ExamSessionResponse)
+async def get_exam_session(
+    session_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> ExamSessionResponse:
+    """
+    Get an exam session with its current progress.
+    """
+    session = await db.get(ExamSession, session_id)
+    if session is None or session.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam session not found",
+        )
+
+    response = ExamSessionResponse.model_validate(session)
+    try:
+        state = await exam_engine.get_state(db, session_id, current_user.id)
+    except SessionNotActive:
+        return response
+
+    if state is None:
+        return response
+
+    # Live progress is held in memory until the session is finished
+    return response.model_copy(
+        update={
+            "correct_answers": state.correct,
+            "total_answered": state.total_answered,
+            "time_remaining_seconds": state.time_remaining(),
+            "current_question_index": state.current_index,
+        }
+    )
+
+
+@router.get(
+    "/sessions/{session_id}/questions",
+    response_class=Response,
+    responses={
+        200: {"content": {"application/json": {}}},
+        304: {"description": "Questions not modified"},
+    },
+)
+async def get_exam_session_questions(
+    session_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+    lang: Locale = DEFAULT_LOCALE,
+    if_none_match: Annotated[str | None, Header()] = None,
+    accept_encoding: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Get the questions of an exam session in the requested language.
+
+    Served from pre-rendered payloads with a strong ETag; send it back in
+    If-None-Match to get 304 Not Modified.
+    """
+    session = await db.get(ExamSession, session_id)
+    if session is None or session.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam session not found",
+        )
+
+    snapshot = await question_bank.get()
+    question_ids = session.selected_question_ids or []
+    use_gzip = accepts_gzip(accept_encoding)
+
+    etag = question_renderer.etag(snapshot.version, lang, question_ids)
+    if use_gzip:
+        etag = gzip_etag(etag)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    payload = await question_renderer.render(snapshot, lang, question_ids)
+    if use_gzip:
+        # GZipMiddleware passes already-encoded responses through untouched
+        headers["Content-Encoding"] = "gzip"
+        return Response(payload.gzipped(), media_type="application/json", headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
+
+
+@router.post("/sessions/{session_id}/answers", response_model=ExamAnswerResult)
+async def submit_answer(
+    session_id: int,
+    data: ExamAnswerSubmit,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> ExamAnswerResult:
+    """
+    Submit (or change) the answer to a question.
+
+    Answers are scored immediately, checkpointed, and persisted in batches.
+    Answers after the session's deadline are rejected.
+    """
+    state = await _get_owned_state(db, session_id, current_user)
+
+    try:
+        is_correct = await exam_engine.record_answer(
+            state, data.question_id, data.selected_option_id, data.current_question_index
+        )
+    except QuestionNotInSession:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question is not part of this exam session",
+        )
+    except SessionExpired:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam time is over",
+        )
+    except SessionNotActive:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam session is not in progress",
+        )
+
+    return ExamAnswerResult(
+        question_id=data.question_id,
+        selected_option_id=data.selected_option_id,
+        is_correct=is_correct,
+        total_answered=state.total_answered,
+        time_remaining_seconds=state.time_remaining(),
+    )
+
+
+def _progress(state: SessionState) -> ExamProgressResponse:
+    return ExamProgressResponse(
+        session_id=state.session_id,
+        answers=state.answers,
+        current_question_index=state.current_index,
+        total_answered=state.total_answered,
+        time_remaining_seconds=state.time_remaining(),
+    )
+
+
+@router.get("/sessions/{session_id}/progress", response_model=ExamProgressResponse)
+async def get_exam_session_progress(
+    session_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> ExamProgressResponse:
+    """
+    Get the answers and current question of an in-progress session, to
+    resume it on any device.
+    """
+    return _progress(await _get_owned_state(db, session_id, current_user))
+
+
+@router.put("/sessions/{session_id}/position", response_model=ExamProgressResponse)
+async def set_exam_session_position(
+    session_id: int,
+    data: ExamPosition,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> ExamProgressResponse:
+    """
+    Record the question the student is on.
+    """
+    state = await _get_owned_state(db, session_id, current_user)
+
+    try:
+        await exam_engine.set_position(state, data.current_question_index)
+    except QuestionNotInSession:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question index is out of range",
+        )
+    except SessionExpired:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam time is over",
+        )
+    except SessionNotActive:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam session is not in progress",
+        )
+
+    return _progress(state)
+
+
+@router.post("/sessions/{session_id}/finish", response_model=ExamSessionResponse)
+async def finish_exam_session(
+    session_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> ExamSession:
+    """
+    Finish an exam session and get the result.
+    """
+    state = await _get_owned_state(db, session_id, current_user)
+
+    try:
+        return await exam_engine.finish(db, state)
+    except SessionNotActive:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Exam session is not in progress",
+        )
@@ -0,0 +1,111 @@
+"""
+Media endpoints: image upload and serving.
+"""
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.config import settings
+from app.db.session import get_db
+from app.models.user import User
+from app.schemas.media import ImageUploadResponse
+from app.services.entitlements import EntitlementError, entitlements, record_usage
+from app.services.media import UnsupportedImage, UploadTooLarge, image_store
+
+router = APIRouter()
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _image_url(digest: str, size: int | str) -> str:
+    return f"{settings.API_V1_STR}/media/images/{digest}/{size}.webp"
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds {settings.MAX_UPLOAD_SIZE} bytes",
+    )
+
+
+@router.post(
+    "/images", response_model=ImageUploadResponse, status_code=status.HTTP_201_CREATED
+)
+async def upload_image(
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+) -> dict[str, Any]:
+    """
+    Upload an image (question image, avatar or logo) as the raw request body.
+
+    The body is streamed to storage and may not exceed ``MAX_UPLOAD_SIZE``.
+    Returns the URLs of the WebP renditions to store in ``image_url``,
+    ``avatar_url`` or ``logo_url``. Uploading an image that is already
+    stored returns it with 200 OK.
+
+    New images count toward the organization's ``max_storage_mb`` limit:
+    the declared Content-Length is checked before the upload is read, and
+    the stored size once it is rendered, which also covers chunked uploads.
+    A refused image is removed from storage.
+    """
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > settings.MAX_UPLOAD_SIZE:
+        raise _too_large()
+
+    organization_id = current_user.organization_id
+    if organization_id is not None and declared.isdigit():
+        (await entitlements.get(db, organization_id)).check("max_storage_mb", int(declared))
+
+    try:
+        image = await image_store.save(request.stream())
+    except UploadTooLarge:
+        raise _too_large()
+    except UnsupportedImage:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported image format",
+        )
+
+    if not image.created:
+        response.status_code = status.HTTP_200_OK
+    elif organization_id is not None:
+        try:
+            (await entitlements.get(db, organization_id)).check(
+                "max_storage_mb", image.stored_bytes
+            )
+            await record_usage(db, organization_id, storage_bytes=image.stored_bytes)
+        except EntitlementError:
+            # Otherwise the next upload of the same bytes would be deduplicated for free
+            await image_store.discard(image.digest)
+            raise
+
+    return {
+        "id": image.digest,
+        "width": image.width,
+        "height": image.height,
+        "urls": {size: _image_url(image.digest, size) for size in image.variants},
+        "created": image.created,
+    }
+
+
+@router.get("/images/{digest}/{size}.webp", response_class=FileResponse)
+async def get_image(digest: str, size: int) -> FileResponse:
+    """
+    Get an image rendition.
+
+    Public and immutable: a URL always names the same bytes.
+    """
+    path = image_store.variant_path(digest, size)
+    if path is None or not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found",
+        )
+    return FileResponse(
+        path, media_type="image/webp", headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
@@ -0,0 +1,29 @@
+"""
+Organization endpoints.
+"""
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Response
+
+from app.api import deps
+from app.core.config import settings
+from app.core.tenancy import Tenant
+from app.schemas.organization import OrganizationBranding
+
+router = APIRouter()
+
+
+@router.get("/current", response_model=OrganizationBranding)
+async def get_current_organization(
+    tenant: Annotated[Tenant, Depends(deps.require_tenant)],
+    response: Response,
+) -> Tenant:
+    """
+    Get the branding of the organization the request is served for.
+
+    Public; resolved from the Host or ``TENANT_HEADER`` header and served
+    from the tenant directory without a database query.
+    """
+    response.headers["Cache-Control"] = "public, max-age=60"
+    response.headers["Vary"] = f"Host, {settings.TENANT_HEADER}"
+    return tenant
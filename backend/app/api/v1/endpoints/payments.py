@@ -0,0 +1,106 @@
+"""
+Payment gateway callbacks (Payme, Click).
+
+Callbacks are authenticated by the gateway's credentials, not a user token,
+and always answer 200 with the gateway's own error codes. Each one commits
+before answering and must finish within ``PAYMENT_WEBHOOK_TIMEOUT_SECONDS``.
+Past that, the work is rolled back and the gateway gets a retryable error;
+this is safe because the handlers are idempotent. Subscription changes are
+left to the payment event worker, which is woken after each commit.
+"""
+import asyncio
+from collections.abc import Awaitable
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import get_db
+from app.services.payment_events import payment_events
+from app.services.payment_gateways import (
+    CLICK_UPDATE_FAILED,
+    PAYME_PARSE_ERROR,
+    PAYME_SYSTEM_ERROR,
+    click_complete,
+    click_prepare,
+    click_response,
+    handle_payme,
+    payme_error,
+)
+
+router = APIRouter()
+
+
+async def _answer(
+    db: AsyncSession, call: Awaitable[dict[str, Any]], timeout_response: dict[str, Any]
+) -> dict[str, Any]:
+    """Run a gateway handler and commit within the latency budget."""
+    try:
+        async with asyncio.timeout(settings.PAYMENT_WEBHOOK_TIMEOUT_SECONDS):
+            response = await call
+            await db.commit()
+    except TimeoutError:
+        await db.rollback()
+        return timeout_response
+    payment_events.wake()
+    return response
+
+
+async def _form(request: Request) -> dict[str, str]:
+    form = await request.form()
+    return {name: value for name, value in form.items() if isinstance(value, str)}
+
+
+@router.post("/payme")
+async def payme_callback(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> dict[str, Any]:
+    """
+    Payme Merchant API (JSON-RPC 2.0).
+
+    Authenticated with ``Basic`` auth using the merchant key.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return payme_error(None, PAYME_PARSE_ERROR)
+    request_id = payload.get("id") if isinstance(payload, dict) else None
+    return await _answer(
+        db,
+        handle_payme(db, payload, request.headers.get("Authorization")),
+        payme_error(request_id, PAYME_SYSTEM_ERROR),
+    )
+
+
+@router.post("/click/prepare")
+async def click_prepare_callback(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> dict[str, Any]:
+    """
+    Click SHOP API: Prepare (action 0).
+
+    Authenticated with the request's ``sign_string``.
+    """
+    form = await _form(request)
+    return await _answer(
+        db, click_prepare(db, form), click_response(form, CLICK_UPDATE_FAILED)
+    )
+
+
+@router.post("/click/complete")
+async def click_complete_callback(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> dict[str, Any]:
+    """
+    Click SHOP API: Complete (action 1).
+
+    Authenticated with the request's ``sign_string``.
+    """
+    form = await _form(request)
+    return await _answer(
+        db, click_complete(db, form), click_response(form, CLICK_UPDATE_FAILED)
+    )
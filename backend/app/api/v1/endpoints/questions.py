@@ -0,0 +1,42 @@
+"""
+Question endpoints: question bank snapshot management.
+"""
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app.models.user import User
+from app.schemas.question import QuestionBankInfo
+from app.services.question_bank import QuestionBankSnapshot, question_bank
+
+router = APIRouter()
+
+
+def _bank_info(snapshot: QuestionBankSnapshot) -> QuestionBankInfo:
+    return QuestionBankInfo.model_validate(snapshot.stats())
+
+
+@router.get("/bank", response_model=QuestionBankInfo)
+async def get_question_bank(
+    _: Annotated[User, Depends(deps.require_admin)],
+) -> QuestionBankInfo:
+    """
+    Get the version and size of the in-memory question bank.
+
+    Admin only.
+    """
+    return _bank_info(await question_bank.get())
+
+
+@router.post("/bank/reload", response_model=QuestionBankInfo)
+async def reload_question_bank(
+    _: Annotated[User, Depends(deps.require_admin)],
+) -> QuestionBankInfo:
+    """
+    Reload the question bank snapshot from the database.
+
+    Admin only. Edits made through the API are picked up automatically;
+    use this after bulk imports made directly in the database.
+    """
+    return _bank_info(await question_bank.load())
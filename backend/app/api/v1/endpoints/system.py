@@ -0,0 +1,57 @@
+"""
+System endpoints: runtime metrics for operators.
+"""
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app.core.principal_cache import principal_cache
+from app.core.rate_limit import rate_limiter
+from app.core.security import password_hasher, token_verifier
+from app.core.tenancy import tenant_directory
+from app.core.token_store import refresh_token_store
+from app.db.session import db_pool_stats
+from app.models.user import User
+from app.services.entitlements import entitlements
+from app.services.exam_checkpoints import exam_checkpoints
+from app.services.exam_engine import exam_engine
+from app.services.instructor_ranking import instructor_ranking
+from app.services.media import image_store
+from app.services.notifications import notifications
+from app.services.payment_events import payment_events
+from app.services.question_bank import question_bank
+from app.services.question_renderer import question_renderer
+from app.services.user_listing import user_counts
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics(
+    _: Annotated[User, Depends(deps.require_admin)],
+) -> dict[str, Any]:
+    """
+    Get runtime metrics of in-process services.
+
+    Admin only.
+    """
+    return {
+        "db_pool": db_pool_stats(),
+        "password_hasher": password_hasher.stats(),
+        "principal_cache": principal_cache.stats(),
+        "token_verifier": token_verifier.stats(),
+        "refresh_tokens": refresh_token_store.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "tenants": tenant_directory.stats(),
+        "entitlements": entitlements.stats(),
+        "user_counts": user_counts.stats(),
+        "exam_engine": exam_engine.stats(),
+        "exam_checkpoints": exam_checkpoints.stats(),
+        "payment_events": payment_events.stats(),
+        "notifications": notifications.stats(),
+        "image_store": image_store.stats(),
+        "instructor_ranking": instructor_ranking.stats(),
+        "question_bank": question_bank.stats(),
+        "question_renderer": question_renderer.stats(),
+    }
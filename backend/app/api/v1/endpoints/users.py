@@ -0,0 +1,71 @@
+"""
+User management endpoints.
+"""
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.db.session import get_read_db
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.schemas.user import UserListResponse
+from app.services.user_listing import list_users, user_counts
+
+router = APIRouter()
+
+
+@router.get("", response_model=UserListResponse)
+async def list_organization_users(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[User, Depends(deps.require_business_owner)],
+    organization_id: int | None = None,
+    role: UserRole | None = None,
+    is_active: bool | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+) -> dict[str, Any]:
+    """
+    List users, ordered by organization, role and ID.
+
+    Keyset paginated: pass the returned ``next_cursor`` as ``cursor`` to get
+    the next page. ``total`` is only returned with the first page.
+
+    Business owners list their own organization (the default); admins list
+    any organization, or all users without ``organization_id``.
+    """
+    if current_user.role != UserRole.ADMIN:
+        owned_id = await db.scalar(
+            select(Organization.id).where(
+                Organization.owner_id == current_user.id,
+                Organization.deleted_at.is_(None),
+            )
+        )
+        if owned_id is None or organization_id not in (None, owned_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions",
+            )
+        organization_id = owned_id
+
+    try:
+        items, next_cursor = await list_users(
+            db, organization_id, role, is_active, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    total, total_is_estimate = None, False
+    if cursor is None:
+        total, total_is_estimate = await user_counts.get(db, organization_id, role, is_active)
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+    }
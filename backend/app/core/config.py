@@ -40,6 +40,13 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    JWT_BACKEND: Literal["jose", "pyjwt"] = "jose"  # "pyjwt" needs the fast-jwt extra
+    TOKEN_CACHE_MAX_SIZE: int = 10000  # Verified tokens kept until they expire
+    REFRESH_TOKEN_STORE: Literal["redis", "memory"] = "redis"  # "memory": single process only
+
+    # Password hashing (bcrypt runs on a bounded worker pool off the event loop)
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 256
 
     # Database
     POSTGRES_SERVER: str
@@ -65,10 +72,83 @@ class Settings(BaseSettings):
             path=f"{data.get('POSTGRES_DB') or ''}",
         ).unicode_string()
 
+    # Read replica for read-only endpoints (defaults to the primary)
+    SQLALCHEMY_READ_DATABASE_URI: PostgresDsn | None = None
+
+    # Connection pools (per process; the replica pool uses the DB_READ_* sizes)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Reconnect connections older than this (-1 = never)
+    DB_POOL_PRE_PING: bool = True
+    DB_READ_POOL_SIZE: int = 10
+    DB_READ_MAX_OVERFLOW: int = 20
+    DB_READ_RETRY_SECONDS: float = 10.0  # Use the primary this long after a replica error
+    DB_ECHO: bool = False  # Log every SQL statement
+
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+
+    # Principal cache (authenticated users resolved from JWT)
+    # Without Redis, also how long other workers may serve a changed principal
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 5
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    PRINCIPAL_CACHE_REDIS_ENABLED: bool = False
+    PRINCIPAL_CACHE_REDIS_TTL_SECONDS: int = 300
+    PRINCIPAL_CACHE_REDIS_RETRY_SECONDS: int = 5  # Before resubscribing to invalidations
+
+    # Exam engine
+    EXAM_ANSWER_FLUSH_INTERVAL_SECONDS: float = 2.0
+    EXAM_ANSWER_FLUSH_BATCH_SIZE: int = 1000
+    EXAM_EXCLUDE_RECENT_SESSIONS: int = 3  # Avoid questions from the last N sessions (0 = off)
+    EXAM_DEADLINE_GRACE_SECONDS: int = 5  # Accepted lateness of answers in flight
+    EXAM_EXPIRY_BATCH_SIZE: int = 500  # Sessions expired per UPDATE
+    EXAM_ORPHAN_EXPIRY_DELAY_SECONDS: int = 60  # Overdue time before any worker expires a session
+    EXAM_ORPHAN_SWEEP_INTERVAL_SECONDS: int = 30
+    EXAM_CLOSED_SESSION_CACHE_SIZE: int = 100000  # Recently closed sessions, to reject late answers
+    EXAM_CLOSED_SESSION_CACHE_TTL_SECONDS: int = 3600
+    EXAM_CHECKPOINT_STORE: Literal["redis", "memory"] = "redis"  # "memory": no crash recovery
+    EXAM_CHECKPOINT_RECOVERY_DELAY_SECONDS: int = 30  # Unflushed time before any worker replays
+    EXAM_CHECKPOINT_RETENTION_SECONDS: int = 3600  # Kept this long after the deadline
+    EXAM_CHECKPOINT_RETRY_SECONDS: float = 5.0  # Skip the store this long after an error
+
+    # Student progress
+    STUDENT_PROGRESS_BACKFILL_CHUNK_SIZE: int = 5000  # Students rebuilt per transaction
+    STUDENT_PROGRESS_MISSED_QUESTIONS: int = 10  # Most-missed questions listed
+
+    # Question bank snapshot
+    QUESTION_BANK_REFRESH_SECONDS: float = 60.0
+    QUESTION_BANK_RELOAD_DELAY_SECONDS: float = 0.5
+    RENDERED_PAYLOAD_CACHE_SIZE: int = 2048
+
+    # Tenant resolution (Host/custom domain or slug header -> organization)
+    TENANT_BASE_DOMAIN: str | None = None  # Hosts "<slug>.<domain>" resolve by slug
+    TENANT_HEADER: str = "X-Tenant"  # Slug header for clients on the shared domain
+    TENANT_REFRESH_SECONDS: float = 60.0  # Reload check; delay for organizations added elsewhere
+
+    # Tariff entitlements (features, limits and usage per organization)
+    ENTITLEMENT_CACHE_TTL_SECONDS: int = 60
+    ENTITLEMENT_CACHE_MAX_SIZE: int = 10000
+
+    # User listings
+    USER_COUNT_CACHE_TTL_SECONDS: int = 60  # Listing totals are cached this long
+    USER_COUNT_CACHE_MAX_SIZE: int = 10000
+    USER_COUNT_ESTIMATE_THRESHOLD: int = 100000  # Unfiltered totals above this use planner estimates
+
+    # Bookings
+    BOOKING_TIMEZONE: str = "Asia/Tashkent"  # Wall-clock time of availability rules
+    BOOKING_AVAILABILITY_MAX_DAYS: int = 186  # Longest range generated per request
+
+    # Instructor ranking
+    INSTRUCTOR_RANKING_HORIZON_DAYS: int = 14  # Free slots tracked ahead; longest search window
+    INSTRUCTOR_RANKING_REFRESH_SECONDS: int = 300  # Full reload (other processes, horizon)
+    RATING_RECONCILE_CHUNK_SIZE: int = 10000  # Users locked per reconciliation transaction
+
+    # Exam analytics
+    ANALYTICS_CHUNK_SIZE: int = 50000  # Answers fetched per round trip
 
     # First Superuser
     FIRST_SUPERUSER_EMAIL: EmailStr
@@ -93,19 +173,61 @@ class Settings(BaseSettings):
     WHATSAPP_API_URL: str | None = None
     WHATSAPP_API_TOKEN: str | None = None
 
+    # Notifications (queued in process, sent in batches per provider)
+    NOTIFICATION_CHANNELS: list[str] = ["sms", "email"]  # Used for user notifications, if configured
+    NOTIFICATION_QUEUE_SIZE: int = 10000  # Per channel; messages beyond it are dropped
+    NOTIFICATION_BATCH_WINDOW_SECONDS: float = 0.2  # Wait this long to fill a batch
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 2.0  # Doubled on each retry, with jitter
+    NOTIFICATION_RETRY_MAX_SECONDS: float = 300.0
+    NOTIFICATION_HTTP_TIMEOUT_SECONDS: float = 10.0
+    NOTIFICATION_HTTP_MAX_CONNECTIONS: int = 10  # Per provider
+    NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS: float = 5.0  # Time to send queued messages on shutdown
+    SMS_BATCH_SIZE: int = 100
+    SMS_RATE_PER_SECOND: float = 10.0  # 0 = unlimited
+    WHATSAPP_BATCH_SIZE: int = 20
+    WHATSAPP_RATE_PER_SECOND: float = 20.0
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_RATE_PER_SECOND: float = 5.0
+
     # Payment Gateways
     PAYMENT_PAYME_MERCHANT_ID: str | None = None
     PAYMENT_PAYME_SECRET_KEY: str | None = None
     PAYMENT_CLICK_MERCHANT_ID: str | None = None
     PAYMENT_CLICK_SECRET_KEY: str | None = None
+    PAYMENT_WEBHOOK_TIMEOUT_SECONDS: float = 2.0  # Answer gateways with a retryable error past this
+    PAYMENT_EVENTS_POLL_SECONDS: float = 5.0  # Pending payment events are also picked up this often
+    PAYMENT_EVENTS_BATCH_SIZE: int = 100
+    PAYMENT_EVENTS_MAX_ATTEMPTS: int = 10  # Failing events are left for an operator after this
 
     # File Storage
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
     ALLOWED_IMAGE_EXTENSIONS: list[str] = [".jpg", ".jpeg", ".png", ".webp"]
+    IMAGE_VARIANT_SIZES: list[int] = [256, 768, 1600]  # Longest edge of the WebP renditions
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_MAX_PIXELS: int = 40_000_000  # Larger images are rejected (decompression bombs)
+    IMAGE_PROCESS_WORKERS: int = 2  # Processes rendering uploads
 
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_ENABLED: bool = True
+    RATE_LIMIT_REDIS_RETRY_SECONDS: float = 5.0  # Use local buckets this long after a Redis error
+    RATE_LIMIT_IP_MULTIPLIER: int = 10  # Budget of the users behind one IP, x the route's
+    RATE_LIMIT_ROUTE_CACHE_SIZE: int = 10000  # Route templates by (method, path)
+    # Per-route overrides, keyed by "METHOD /path/template" (0 = unlimited)
+    RATE_LIMIT_ROUTE_LIMITS: dict[str, int] = {
+        "POST /api/v1/auth/login": 10,
+        "POST /api/v1/auth/register": 5,
+        "POST /api/v1/auth/refresh": 30,
+        "POST /api/v1/exams/sessions/{session_id}/answers": 300,
+        "POST /api/v1/payments/payme": 0,  # Gateways retry from a few addresses
+        "POST /api/v1/payments/click/prepare": 0,
+        "POST /api/v1/payments/click/complete": 0,
+        "GET /api/v1/media/images/{digest}/{size}.webp": 0,  # Content-addressed, cached
+        "GET /health": 0,
+    }
 
 
 settings = Settings()  # type: ignore
@@ -0,0 +1,321 @@
+"""
+Cache of authenticated principals (users resolved from access tokens).
+
+Two tiers:
+- an in-process TTL/LRU cache (always on)
+- an optional shared Redis tier (PRINCIPAL_CACHE_REDIS_ENABLED)
+
+Entries are column snapshots of the User row, not ORM instances, so they can
+be shared safely across sessions and serialized to Redis. The password hash
+is never cached; handlers that need it must load the user row explicitly.
+
+Changes to ``is_active``, ``role`` or ``organization_id`` invalidate the entry
+immediately and again after the transaction commits: attribute changes on
+loaded users through ORM events, and bulk ``update(User)``/``delete(User)``
+statements executed on a session by selecting the affected IDs before the
+statement runs. Core statements on a bare connection bypass both and must
+call ``principal_cache.invalidate``.
+
+Invalidations reach other processes only through Redis: with the Redis tier
+enabled, each one is published on ``principal:invalidations`` and every
+process subscribed with ``start_listener`` drops its local entry (and its
+whole local tier when it resubscribes after losing the connection).
+Without Redis, other workers keep serving a changed principal until its
+local entry expires, so PRINCIPAL_CACHE_TTL_SECONDS bounds how long a
+deactivated user or a revoked role stays effective there.
+"""
+import asyncio
+import enum
+import json
+import logging
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, Enum, event, inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session, make_transient_to_detached, object_session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Columns that define the principal's permissions; changing any of them
+# must drop the cached entry
+INVALIDATING_ATTRIBUTES = ("is_active", "role", "organization_id")
+
+_EXCLUDED_COLUMNS = frozenset({"password_hash"})
+_SESSION_INFO_KEY = "principal_cache_invalidations"
+INVALIDATION_CHANNEL = "principal:invalidations"
+
+Snapshot = dict[str, Any]
+
+
+class PrincipalCache:
+    """Two-tier cache of user snapshots keyed by user ID."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        redis_enabled: bool,
+        redis_ttl: int,
+    ) -> None:
+        self._local: TTLCache[int, Snapshot] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._redis_enabled = redis_enabled
+        self._redis_ttl = redis_ttl
+        self._columns = [
+            column
+            for column in inspect(User).columns
+            if column.key not in _EXCLUDED_COLUMNS
+        ]
+        self._pending: set[asyncio.Task[Any]] = set()
+        self._listener: asyncio.Task[None] | None = None
+
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+    def snapshot(self, user: User) -> Snapshot:
+        """Capture the cacheable columns of a loaded user."""
+        return {column.key: getattr(user, column.key) for column in self._columns}
+
+    def to_user(self, snapshot: Snapshot) -> User:
+        """
+        Build a detached User from a snapshot.
+
+        The instance has an identity key and no pending changes, so it can be
+        attached with ``session.merge(user, load=False)`` without a query.
+        """
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return user
+
+    def _encode(self, snapshot: Snapshot) -> str:
+        def default(value: Any) -> Any:
+            if isinstance(value, datetime):
+                return value.isoformat()
+            if isinstance(value, enum.Enum):
+                return value.value
+            raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+        return json.dumps(snapshot, default=default, separators=(",", ":"))
+
+    def _decode(self, raw: str) -> Snapshot:
+        data = json.loads(raw)
+        for column in self._columns:
+            value = data.get(column.key)
+            if value is None:
+                continue
+            if isinstance(column.type, Enum) and column.type.enum_class is not None:
+                data[column.key] = column.type.enum_class(value)
+            elif isinstance(column.type, DateTime):
+                data[column.key] = datetime.fromisoformat(value)
+        return data
+
+    async def get(self, user_id: int) -> Snapshot | None:
+        """Look up a snapshot in the local tier, then in Redis."""
+        snapshot = self._local.get(user_id)
+        if snapshot is not None or not self._redis_enabled:
+            return snapshot
+
+        try:
+            raw = await get_redis().get(self._redis_key(user_id))
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("Principal cache Redis lookup failed", exc_info=True)
+            return None
+
+        if raw is None:
+            self.redis_misses += 1
+            return None
+
+        self.redis_hits += 1
+        snapshot = self._decode(raw)
+        self._local.set(user_id, snapshot)
+        return snapshot
+
+    async def set(self, user: User) -> None:
+        """Cache a freshly loaded user in both tiers."""
+        snapshot = self.snapshot(user)
+        self._local.set(user.id, snapshot)
+        if not self._redis_enabled:
+            return
+
+        try:
+            await get_redis().set(
+                self._redis_key(user.id),
+                self._encode(snapshot),
+                ex=self._redis_ttl,
+            )
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("Principal cache Redis write failed", exc_info=True)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Drop a user from both tiers and from other processes' local tiers.
+
+        Safe to call from synchronous code (e.g. ORM events); the Redis delete
+        and publish are scheduled on the running event loop.
+        """
+        self.invalidations += 1
+        self._local.pop(user_id)
+        if not self._redis_enabled:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._delete_remote(user_id))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _delete_remote(self, user_id: int) -> None:
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.delete(self._redis_key(user_id))
+                pipe.publish(INVALIDATION_CHANNEL, user_id)
+                await pipe.execute()
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("Principal cache Redis invalidation failed", exc_info=True)
+
+    async def _run_listener(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations published while unsubscribed were missed
+                self._local.clear()
+                async for message in pubsub.listen():
+                    self.remote_invalidations += 1
+                    self._local.pop(int(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.redis_errors += 1
+                logger.warning("Principal cache invalidation channel lost", exc_info=True)
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(settings.PRINCIPAL_CACHE_REDIS_RETRY_SECONDS)
+
+    def start_listener(self) -> None:
+        """
+        Subscribe to invalidations from other processes (called on
+        application startup); a no-op without the Redis tier.
+        """
+        if self._redis_enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._run_listener())
+
+    async def stop_listener(self) -> None:
+        """Unsubscribe from invalidations."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def clear(self) -> None:
+        """Drop all local entries."""
+        self._local.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters for both tiers."""
+        return {
+            "local": self._local.stats(),
+            "redis": {
+                "enabled": self._redis_enabled,
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "errors": self.redis_errors,
+            },
+            "invalidations": self.invalidations,
+            "remote_invalidations": self.remote_invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    redis_enabled=settings.PRINCIPAL_CACHE_REDIS_ENABLED,
+    redis_ttl=settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+)
+
+
+def _on_principal_attribute_set(target: User, value: Any, oldvalue: Any, initiator: Any) -> None:
+    """Invalidate a cached principal when a permission-relevant column changes."""
+    state = inspect(target)
+    if not (state.persistent or state.detached) or value == oldvalue:
+        return
+
+    principal_cache.invalidate(target.id)
+
+    # Invalidate again after commit so a concurrent request cannot re-cache
+    # the pre-commit row for the full TTL
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).add(target.id)
+
+
+for _attribute in INVALIDATING_ATTRIBUTES:
+    event.listen(getattr(User, _attribute), "set", _on_principal_attribute_set)
+
+
+def _invalidating_bulk_statement(orm_execute_state: ORMExecuteState) -> bool:
+    if orm_execute_state.is_delete:
+        return True
+    statement = orm_execute_state.statement
+    keys = [*(statement._values or ()), *(key for key, _ in statement._ordered_values or ())]
+    parameters = orm_execute_state.parameters
+    for row in parameters if isinstance(parameters, list) else [parameters or {}]:
+        keys.extend(row)
+    return any(getattr(key, "key", key) in INVALIDATING_ATTRIBUTES for key in keys)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_bulk_principal_change(orm_execute_state: ORMExecuteState) -> None:
+    """Invalidate the principals a bulk UPDATE or DELETE of users may change."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not User:
+        return
+    if not _invalidating_bulk_statement(orm_execute_state):
+        return
+
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, list):
+        # Bulk UPDATE by primary key
+        user_ids = {row["id"] for row in parameters}
+    else:
+        # Selected before the statement runs, as it may change the criteria
+        query = select(User.id)
+        if orm_execute_state.statement.whereclause is not None:
+            query = query.where(orm_execute_state.statement.whereclause)
+        user_ids = set(orm_execute_state.session.scalars(query, parameters or None))
+
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+    orm_execute_state.session.info.setdefault(_SESSION_INFO_KEY, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session: Session) -> None:
+    for user_id in session.info.pop(_SESSION_INFO_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_invalidations(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
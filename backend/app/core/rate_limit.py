@@ -0,0 +1,280 @@
+"""
+Request rate limiting.
+
+Each request is counted per route, the matched path template (e.g.
+``POST /api/v1/auth/login``), against every identity it carries: the client
+IP always, and the user as well when it is authenticated. The budget is
+``RATE_LIMIT_PER_MINUTE`` unless ``RATE_LIMIT_ROUTE_LIMITS`` overrides it for
+the route. Anonymous requests from an IP share the route's budget.
+Authenticated users get the route's budget each, and the users behind one IP
+share ``RATE_LIMIT_IP_MULTIPLIER`` times as much, so a school's network is not
+throttled as one client while tokens rotated from one address still hit a
+cap.
+
+Counters live in Redis so limits hold across workers: a Lua script keeps a
+sliding-window counter per key (the current fixed window plus the previous
+one, weighted by how much of it still overlaps the sliding window) and, in
+one atomic round trip, checks all of a request's keys and increments them
+only if every one is under its limit. While Redis is unreachable each
+process falls back to in-memory token buckets with the same budgets.
+
+Run uvicorn with ``--proxy-headers`` behind a reverse proxy so the client
+address is the real one.
+"""
+import logging
+import math
+import time
+from typing import Any
+
+from redis.asyncio.client import Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.core.security import get_token_subject
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+
+# KEYS: counter hashes; ARGV: window (ms), then one limit per key.
+# Returns {1, remaining} when allowed, {0, retry after (ms)} when limited.
+SLIDING_WINDOW_SCRIPT = """
+local window = tonumber(ARGV[1])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local current = math.floor(now / window)
+local elapsed = now - current * window
+local remaining = math.huge
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i + 1])
+    local counts = redis.call("HMGET", key, current, current - 1)
+    local count = tonumber(counts[1]) or 0
+    local previous = tonumber(counts[2]) or 0
+    local weighted = previous * (window - elapsed) / window + count
+    if weighted + 1 > limit then
+        local key_wait = window - elapsed
+        if count < limit and previous > 0 then
+            key_wait = window - elapsed - (limit - 1 - count) * window / previous
+        end
+        wait = math.max(wait, key_wait)
+    else
+        remaining = math.min(remaining, limit - weighted - 1)
+    end
+end
+if wait > 0 then
+    return {0, math.max(1, math.ceil(wait))}
+end
+for _, key in ipairs(KEYS) do
+    redis.call("HINCRBY", key, current, 1)
+    redis.call("HDEL", key, current - 2)
+    redis.call("PEXPIRE", key, window * 2)
+end
+return {1, math.floor(remaining)}
+"""
+
+_KEY_PREFIX = "ratelimit:"
+
+
+class RateLimiter:
+    """
+    Sliding-window rate limiter on Redis with an in-process fallback.
+
+    Args:
+        default_limit: Requests per minute for routes without an override
+        route_limits: Requests per minute by ``"METHOD /path/template"``; 0 disables
+        use_redis: Whether to share counters through Redis
+        ip_multiplier: Budget of the users behind one IP, relative to the route's
+    """
+
+    def __init__(
+        self,
+        default_limit: int,
+        route_limits: dict[str, int],
+        use_redis: bool = True,
+        ip_multiplier: int = 1,
+    ) -> None:
+        self.default_limit = default_limit
+        self.route_limits = route_limits
+        self.use_redis = use_redis
+        self.ip_multiplier = ip_multiplier
+        self._script: AsyncScript | None = None
+        self._redis_down_until = 0.0
+        # Token buckets ([tokens, last refill]) used while Redis is unavailable
+        self._buckets: TTLCache[str, list[float]] = TTLCache(
+            maxsize=100_000, ttl=WINDOW_SECONDS * 2
+        )
+        self.allowed = 0
+        self.limited = 0
+        self.redis_errors = 0
+
+    def limit_for(self, route: str) -> int:
+        """Requests per minute allowed on ``route``."""
+        return self.route_limits.get(route, self.default_limit)
+
+    def limits_for(self, route: str, ip: str, user_id: int | None) -> dict[str, int]:
+        """Counter keys and limits of a request to ``route``."""
+        limit = self.limit_for(route)
+        if user_id is None:
+            return {f"{route}|ip:{ip}": limit}
+        return {
+            f"{route}|users-ip:{ip}": limit * self.ip_multiplier,
+            f"{route}|user:{user_id}": limit,
+        }
+
+    async def hit(self, limits: dict[str, int]) -> tuple[bool, float]:
+        """
+        Count a request against every key of ``limits`` (key -> limit).
+
+        The request is counted only if it is allowed on all keys.
+
+        Returns:
+            Whether the request is allowed, and if not, seconds until it would be
+        """
+        if self.use_redis and time.monotonic() >= self._redis_down_until:
+            try:
+                allowed, retry_after = await self._hit_redis(limits)
+            except (RedisError, OSError) as exc:
+                self.redis_errors += 1
+                self._redis_down_until = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+                logger.warning("Rate limiter falling back to local buckets: %s", exc)
+                allowed, retry_after = self._hit_local(limits)
+        else:
+            allowed, retry_after = self._hit_local(limits)
+
+        if allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return allowed, retry_after
+
+    async def _hit_redis(self, limits: dict[str, int]) -> tuple[bool, float]:
+        if self._script is None:
+            redis: Redis = get_redis()
+            self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+        allowed, value = await self._script(
+            keys=[_KEY_PREFIX + key for key in limits],
+            args=[WINDOW_SECONDS * 1000, *limits.values()],
+        )
+        return bool(allowed), 0.0 if allowed else value / 1000
+
+    def _hit_local(self, limits: dict[str, int]) -> tuple[bool, float]:
+        now = time.monotonic()
+        buckets = []
+        retry_after = 0.0
+        for key, limit in limits.items():
+            rate = limit / WINDOW_SECONDS
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(limit), now]
+                self._buckets.set(key, bucket)
+            else:
+                bucket[0] = min(float(limit), bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                retry_after = max(retry_after, (1 - bucket[0]) / rate)
+            buckets.append(bucket)
+
+        if retry_after:
+            return False, retry_after
+        for bucket in buckets:
+            bucket[0] -= 1
+        return True, 0.0
+
+    def reset(self) -> None:
+        """Forget local buckets and the Redis failure state."""
+        self._buckets.clear()
+        self._script = None
+        self._redis_down_until = 0.0
+
+    def stats(self) -> dict[str, Any]:
+        """Return counters and the active backend."""
+        redis_active = self.use_redis and time.monotonic() >= self._redis_down_until
+        return {
+            "backend": "redis" if redis_active else "local",
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "redis_errors": self.redis_errors,
+            "local_buckets": len(self._buckets),
+        }
+
+
+rate_limiter = RateLimiter(
+    settings.RATE_LIMIT_PER_MINUTE,
+    settings.RATE_LIMIT_ROUTE_LIMITS,
+    use_redis=settings.RATE_LIMIT_REDIS_ENABLED,
+    ip_multiplier=settings.RATE_LIMIT_IP_MULTIPLIER,
+)
+
+
+def _route_template(scope: Scope) -> str:
+    """``"METHOD /path/template"`` of the route that will handle the request."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return f"{scope['method']} {route.path}"
+    return f"{scope['method']} *"
+
+
+def _identities(scope: Scope) -> tuple[str, int | None]:
+    """The client IP, and the authenticated user ID if there is one."""
+    client = scope.get("client")
+    ip = client[0] if client else "unknown"
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return ip, get_token_subject(token.strip())
+            break
+    return ip, None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering ``429 Too Many Requests`` over the limit."""
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = rate_limiter) -> None:
+        self.app = app
+        self.limiter = limiter
+        # Route templates by (method, path); routing runs after this middleware
+        self._routes: TTLCache[tuple[str, str], str] = TTLCache(
+            maxsize=settings.RATE_LIMIT_ROUTE_CACHE_SIZE, ttl=math.inf
+        )
+
+    def _route(self, scope: Scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            route = _route_template(scope)
+            self._routes.set(key, route)
+        return route
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        limit = self.limiter.limit_for(route)
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = await self.limiter.hit(
+            self.limiter.limits_for(route, *_identities(scope))
+        )
+        if not allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,36 @@
+"""
+Shared async Redis client.
+"""
+from redis.asyncio import Redis
+
+from app.core.config import settings
+
+_redis: Redis | None = None
+
+
+def get_redis() -> Redis:
+    """
+    Get the process-wide Redis client.
+
+    The client is created lazily; connections are opened on first command
+    and pooled by redis-py.
+    """
+    global _redis
+    if _redis is None:
+        _redis = Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _redis
+
+
+async def close_redis() -> None:
+    """Close the Redis connection pool (called on application shutdown)."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
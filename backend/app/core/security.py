@@ -1,14 +1,23 @@
 """
 Security utilities for JWT tokens and password hashing.
 """
+import asyncio
+import hashlib
+import logging
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, Protocol, TypeVar
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,6 +33,243 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasher:
+    """
+    Async password hashing service backed by a bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so a small thread pool keeps the
+    event loop free without the pickling overhead of a process pool. At most
+    ``max_workers`` hashes run at once; further calls wait in the pool queue
+    until ``max_pending`` is reached, after which ``PasswordHasherBusy`` is
+    raised so callers can shed load instead of queueing unboundedly.
+    """
+
+    def __init__(
+        self,
+        context: CryptContext,
+        max_workers: int,
+        max_pending: int,
+    ) -> None:
+        self._context = context
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+
+        # Metrics (only mutated from the event loop thread, except `_running`
+        # which is guarded by the GIL for simple integer updates)
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._max_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="password-hasher",
+            )
+        return self._executor
+
+    async def _submit(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._pending >= self._max_pending:
+            self._rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        enqueued_at = time.perf_counter()
+        timings: list[float] = []
+
+        def run() -> T:
+            started_at = time.perf_counter()
+            self._running += 1
+            try:
+                return fn(*args)
+            finally:
+                self._running -= 1
+                timings.append(started_at - enqueued_at)
+                timings.append(time.perf_counter() - started_at)
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), run)
+        finally:
+            self._pending -= 1
+            if timings:
+                wait, elapsed = timings
+                self._completed += 1
+                self._total_wait += wait
+                self._total_run += elapsed
+                self._max_wait = max(self._max_wait, wait)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a plain password against a hash without blocking the event loop."""
+        return await self._submit(self._context.verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        return await self._submit(self._context.hash, password)
+
+    def stats(self) -> dict[str, Any]:
+        """Return pool and queue-depth metrics."""
+        completed = self._completed or 1
+        return {
+            "max_workers": self._max_workers,
+            "max_pending": self._max_pending,
+            "in_flight": self._pending,
+            "running": self._running,
+            "queue_depth": max(self._pending - self._running, 0),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(self._total_wait / completed * 1000, 3),
+            "max_wait_ms": round(self._max_wait * 1000, 3),
+            "avg_run_ms": round(self._total_run / completed * 1000, 3),
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker pool (called on application shutdown)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool (use from async request handlers)."""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash on the hashing pool (use from async request handlers)."""
+    return await password_hasher.hash(password)
+
+
+class JWTBackend(Protocol):
+    """Encodes and verifies signed JWTs."""
+
+    name: str
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        ...
+
+    def decode(self, token: str) -> dict[str, Any] | None:
+        """Return the verified claims, or None if the token is invalid or expired."""
+        ...
+
+
+class JoseBackend:
+    """JWT backend using python-jose (default)."""
+
+    name = "jose"
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+    def decode(self, token: str) -> dict[str, Any] | None:
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+
+
+class PyJWTBackend:
+    """JWT backend using PyJWT (compare throughput with ``benchmarks.bench_jwt``)."""
+
+    name = "pyjwt"
+
+    def __init__(self) -> None:
+        import jwt as pyjwt
+
+        self._jwt = pyjwt
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        return self._jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+    def decode(self, token: str) -> dict[str, Any] | None:
+        try:
+            return self._jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except self._jwt.InvalidTokenError:
+            return None
+
+
+def get_jwt_backend(name: str) -> JWTBackend:
+    """Return the named JWT backend, falling back to python-jose if PyJWT is missing."""
+    if name == "pyjwt":
+        try:
+            return PyJWTBackend()
+        except ImportError:
+            logger.warning("JWT_BACKEND=pyjwt but PyJWT is not installed; using python-jose")
+    return JoseBackend()
+
+
+class TokenVerifier:
+    """
+    JWT verification with a cache of already verified tokens.
+
+    Entries are keyed by a digest of the token (raw tokens are not kept) and
+    live until the token expires, so a cache hit never accepts an expired
+    token. Invalid tokens are not cached.
+    """
+
+    def __init__(self, backend: JWTBackend, maxsize: int) -> None:
+        self.backend = backend
+        self._cache: TTLCache[bytes, dict[str, Any]] = TTLCache(
+            maxsize=maxsize, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        )
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        """Sign ``claims``."""
+        return self.backend.encode(claims)
+
+    def decode(self, token: str) -> dict[str, Any] | None:
+        """Return the verified (read-only) claims, or None if the token is invalid."""
+        key = self._key(token)
+        payload = self._cache.get(key)
+        if payload is not None:
+            return payload
+
+        payload = self.backend.decode(token)
+        if payload is None:
+            return None
+
+        expires_at = payload.get("exp")
+        if isinstance(expires_at, (int, float)):
+            self._cache.set(key, payload, ttl=expires_at - time.time())
+        return payload
+
+    def clear(self) -> None:
+        """Drop all cached tokens."""
+        self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return the backend name and cache statistics."""
+        return {"backend": self.backend.name, **self._cache.stats()}
+
+
+token_verifier = TokenVerifier(
+    get_jwt_backend(settings.JWT_BACKEND), maxsize=settings.TOKEN_CACHE_MAX_SIZE
+)
+
+
 def create_access_token(subject: str | int, expires_delta: timedelta | None = None) -> str:
     """
     Create JWT access token.
@@ -42,25 +288,38 @@ def create_access_token(subject: str | int, expires_delta: timedelta | None = No
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    return token_verifier.encode(to_encode)
+
+
+def new_token_id() -> str:
+    """Generate a random token or token family identifier."""
+    return secrets.token_urlsafe(16)
 
 
-def create_refresh_token(subject: str | int) -> str:
+def create_refresh_token(
+    subject: str | int, family: str | None = None, jti: str | None = None
+) -> str:
     """
     Create JWT refresh token with longer expiration.
 
     Args:
         subject: User identifier (usually user ID)
+        family: Token family (one per login), see ``app.core.token_store``
+        jti: Unique token ID
 
     Returns:
         Encoded JWT refresh token
     """
     expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    to_encode = {
+        "exp": expire,
+        "sub": str(subject),
+        "type": "refresh",
+        "fam": family or new_token_id(),
+        "jti": jti or new_token_id(),
+    }
+    return token_verifier.encode(to_encode)
 
 
 def decode_token(token: str) -> dict[str, Any] | None:
@@ -71,10 +330,28 @@ def decode_token(token: str) -> dict[str, Any] | None:
         token: JWT token string
 
     Returns:
-        Decoded token payload or None if invalid
+        Decoded token payload (do not modify it; it is shared through the
+        verified-token cache) or None if invalid
     """
+    return token_verifier.decode(token)
+
+
+def get_token_subject(token: str, token_type: str = "access") -> int | None:
+    """
+    Verify a token and return its user ID.
+
+    Args:
+        token: JWT token string
+        token_type: Expected token type; tokens issued before types were
+            added count as access tokens
+
+    Returns:
+        User ID, or None if the token is invalid or of another type
+    """
+    payload = token_verifier.decode(token)
+    if payload is None or payload.get("type", "access") != token_type:
+        return None
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
+        return int(payload["sub"])
+    except (KeyError, TypeError, ValueError):
         return None
@@ -0,0 +1,288 @@
+"""
+Tenant resolution: maps each request to the organization it is served for.
+
+A request names its organization, in order of precedence, by:
+- the ``TENANT_HEADER`` header, holding the organization's slug
+  (API clients and the SPA on the shared domain);
+- a Host equal to the organization's ``custom_domain`` (white-label sites);
+- a Host ``<slug>.<TENANT_BASE_DOMAIN>``.
+
+``TenantMiddleware`` resolves it against ``TenantDirectory``, an in-memory
+table of the active organizations, and stores the ``Tenant`` (or None) as
+``request.state.tenant``. The table carries the branding columns too, so
+serving a tenant's name, logo and theme color needs no query either.
+
+The table is loaded at startup. Organization changes committed through the
+ORM are applied to it in place after commit; a periodic fingerprint check
+(row count and latest ``updated_at``) reloads it when other processes or
+bulk UPDATEs changed organizations. Once the table is loaded a name missing
+from it is unknown, without a query, so random hosts and slugs cost nothing;
+an organization created by another process resolves after the next
+refresh, within ``TENANT_REFRESH_SECONDS``.
+"""
+import asyncio
+import logging
+from typing import Any
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.organization import Organization
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "tenant_changes"
+
+
+class Tenant:
+    """Immutable snapshot of an active organization and its branding."""
+
+    __slots__ = ("id", "slug", "name", "custom_domain", "logo_url", "theme_color")
+
+    def __init__(self, **values: Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+    def __repr__(self) -> str:
+        return f"<Tenant(id={self.id}, slug={self.slug})>"
+
+
+def normalize_host(host: str) -> str:
+    """Lowercase a host name and drop the port and any trailing dot."""
+    host = host.strip().lower()
+    if host.startswith("["):  # IPv6 literal
+        return host.partition("]")[0] + "]"
+    return host.partition(":")[0].rstrip(".")
+
+
+def _tenant_columns() -> tuple[Any, ...]:
+    return tuple(getattr(Organization, name) for name in Tenant.__slots__)
+
+
+def _is_listed(organization: Any) -> bool:
+    return bool(organization.is_active) and organization.deleted_at is None
+
+
+def _fingerprint_statement() -> Any:
+    return select(func.count(Organization.id), func.max(Organization.updated_at))
+
+
+def _version(count: int, last_updated: Any) -> str:
+    stamp = int(last_updated.timestamp() * 1000) if last_updated is not None else 0
+    return f"{count}-{stamp}"
+
+
+class TenantDirectory:
+    """In-memory table of active organizations by ID, slug and custom domain."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self.session_factory = session_factory
+        self._by_id: dict[int, Tenant] = {}
+        self._by_slug: dict[str, Tenant] = {}
+        self._by_domain: dict[str, Tenant] = {}
+        self._version: str | None = None
+        self._load_lock = asyncio.Lock()
+        self._refresher: asyncio.Task[None] | None = None
+        self.reloads = 0
+        self.misses = 0
+        self.updates = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    def _index(self, tenants: list[Tenant]) -> None:
+        self._by_id = {tenant.id: tenant for tenant in tenants}
+        self._by_slug = {tenant.slug: tenant for tenant in tenants}
+        self._by_domain = {
+            normalize_host(tenant.custom_domain): tenant
+            for tenant in tenants
+            if tenant.custom_domain
+        }
+
+    async def load(self) -> None:
+        """Load the table from the database and swap it in."""
+        async with self._load_lock:
+            async with self.session_factory() as db:
+                count, last_updated = (await db.execute(_fingerprint_statement())).one()
+                result = await db.execute(
+                    select(*_tenant_columns()).where(
+                        Organization.is_active.is_(True),
+                        Organization.deleted_at.is_(None),
+                    )
+                )
+                tenants = [Tenant(**row) for row in result.mappings()]
+
+            self._index(tenants)
+            self._version = _version(count, last_updated)
+            self.reloads += 1
+            logger.info("Loaded tenant directory %s (%d organizations)", self._version, len(tenants))
+
+    async def refresh_if_changed(self) -> bool:
+        """Reload if the table fingerprint differs from the loaded version."""
+        async with self.session_factory() as db:
+            count, last_updated = (await db.execute(_fingerprint_statement())).one()
+        if self._version == _version(count, last_updated):
+            return False
+
+        await self.load()
+        return True
+
+    def get(self, organization_id: int) -> Tenant | None:
+        """Return an active organization by ID."""
+        return self._by_id.get(organization_id)
+
+    async def resolve(self, host: str | None, slug: str | None = None) -> Tenant | None:
+        """
+        Resolve a request's Host header and tenant header to an organization.
+
+        A dictionary lookup once the table is loaded; names not in the table
+        are unknown.
+        """
+        if not self.loaded:
+            await self.load()
+
+        if slug:
+            return self._miss(self._by_slug.get(slug.strip().lower()))
+
+        if not host:
+            return None
+        host = normalize_host(host)
+        tenant = self._by_domain.get(host)
+        if tenant is not None:
+            return tenant
+
+        base = settings.TENANT_BASE_DOMAIN
+        if base and host.endswith("." + base):
+            subdomain = host[: -len(base) - 1]
+            if "." not in subdomain:
+                return self._miss(self._by_slug.get(subdomain))
+            return None
+        if base and host == base:
+            return None
+        return self._miss(None)
+
+    def _miss(self, tenant: Tenant | None) -> Tenant | None:
+        if tenant is None:
+            self.misses += 1
+        return tenant
+
+    def _put(self, organization_id: int, tenant: Tenant | None) -> None:
+        """Replace (or remove, when ``tenant`` is None) one organization's entry."""
+        previous = self._by_id.pop(organization_id, None)
+        if previous is not None:
+            self._by_slug.pop(previous.slug, None)
+            if previous.custom_domain:
+                self._by_domain.pop(normalize_host(previous.custom_domain), None)
+        if tenant is None:
+            return
+
+        self._by_id[tenant.id] = tenant
+        self._by_slug[tenant.slug] = tenant
+        if tenant.custom_domain:
+            self._by_domain[normalize_host(tenant.custom_domain)] = tenant
+
+    def apply(self, changes: dict[int, Tenant | None]) -> None:
+        """Apply committed organization changes (None removes the organization)."""
+        for organization_id, tenant in changes.items():
+            self._put(organization_id, tenant)
+        self.updates += len(changes)
+
+    async def _run_refresher(self) -> None:
+        while True:
+            await asyncio.sleep(settings.TENANT_REFRESH_SECONDS)
+            try:
+                await self.refresh_if_changed()
+            except Exception:
+                logger.exception("Failed to refresh tenant directory")
+
+    def start_refresher(self) -> None:
+        """Start the periodic fingerprint check (called on application startup)."""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._run_refresher())
+
+    async def stop_refresher(self) -> None:
+        """Stop the periodic fingerprint check."""
+        if self._refresher is not None and not self._refresher.done():
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+        self._refresher = None
+
+    def clear(self) -> None:
+        """Drop the table; the next ``resolve`` reloads it."""
+        self._index([])
+        self._version = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return table size and counters."""
+        return {
+            "loaded": self.loaded,
+            "version": self._version,
+            "organizations": len(self._by_id),
+            "custom_domains": len(self._by_domain),
+            "reloads": self.reloads,
+            "updates": self.updates,
+            "misses": self.misses,
+        }
+
+
+tenant_directory = TenantDirectory(AsyncSessionLocal)
+
+
+class TenantMiddleware:
+    """ASGI middleware setting ``request.state.tenant``."""
+
+    def __init__(self, app: ASGIApp, directory: TenantDirectory = tenant_directory) -> None:
+        self.app = app
+        self.directory = directory
+        self._header = settings.TENANT_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        host = slug = None
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value.decode("latin-1")
+            elif name == self._header:
+                slug = value.decode("latin-1")
+
+        scope.setdefault("state", {})["tenant"] = await self.directory.resolve(host, slug)
+        await self.app(scope, receive, send)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_organization_changes(session: Session, flush_context: Any) -> None:
+    changes: dict[int, Tenant | None] | None = None
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(instance, Organization):
+            continue
+        if changes is None:
+            changes = session.info.setdefault(_SESSION_INFO_KEY, {})
+        listed = instance not in session.deleted and _is_listed(instance)
+        changes[instance.id] = (
+            Tenant(**{name: getattr(instance, name) for name in Tenant.__slots__})
+            if listed
+            else None
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_organizations(session: Session) -> None:
+    changes = session.info.pop(_SESSION_INFO_KEY, None)
+    if changes and tenant_directory.loaded:
+        tenant_directory.apply(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_organization_changes(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
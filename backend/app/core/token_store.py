@@ -0,0 +1,163 @@
+"""
+Refresh token rotation state.
+
+Every login starts a token *family*; each refresh token carries its family
+(``fam``) and a unique ``jti``. Refreshing rotates the family to a new jti,
+so each refresh token is usable exactly once. Presenting an already rotated
+token means it was copied, so the whole family is revoked (reuse detection).
+
+Redis layout (keys share a ``{user_id}`` hash tag so scripts stay on one
+cluster slot), all expiring with the newest refresh token they describe:
+- ``auth:{user_id}:families`` - set of the user's active family IDs
+- ``auth:{user_id}:family:<fam>`` - the family's current jti
+
+Checking a token is one SISMEMBER plus one GET inside a script; logging out
+every session of a user is a single DEL of the families set.
+"""
+import enum
+import time
+from typing import Any
+
+from redis.commands.core import AsyncScript
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+
+class Rotation(str, enum.Enum):
+    """Outcome of presenting a refresh token."""
+
+    ROTATED = "rotated"
+    REVOKED = "revoked"  # Family logged out or expired
+    REUSED = "reused"  # Token was already rotated; the family is now revoked
+
+
+# KEYS: families set, family key; ARGV: family, presented jti, new jti, ttl (ms)
+ROTATE_SCRIPT = """
+if redis.call("SISMEMBER", KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+if redis.call("GET", KEYS[2]) ~= ARGV[2] then
+    redis.call("SREM", KEYS[1], ARGV[1])
+    redis.call("DEL", KEYS[2])
+    return -1
+end
+redis.call("SET", KEYS[2], ARGV[3], "PX", ARGV[4])
+redis.call("PEXPIRE", KEYS[1], ARGV[4])
+return 1
+"""
+
+_ROTATION_RESULTS = {1: Rotation.ROTATED, 0: Rotation.REVOKED, -1: Rotation.REUSED}
+
+
+def _families_key(user_id: int) -> str:
+    return f"auth:{{{user_id}}}:families"
+
+
+def _family_key(user_id: int, family: str) -> str:
+    return f"auth:{{{user_id}}}:family:{family}"
+
+
+class RefreshTokenStore:
+    """
+    Refresh token families, in Redis or (``use_redis=False``) in process.
+
+    The in-process mode has the same semantics but per-process state; it is
+    meant for development and tests.
+    """
+
+    def __init__(self, use_redis: bool = True) -> None:
+        self.use_redis = use_redis
+        self._rotate_script: AsyncScript | None = None
+        # In-process mode: user_id -> family -> (current jti, expires at)
+        self._families: dict[int, dict[str, tuple[str, float]]] = {}
+        self.rotations = 0
+        self.reuse_detected = 0
+
+    def _local_families(self, user_id: int) -> dict[str, tuple[str, float]]:
+        now = time.monotonic()
+        families = self._families.setdefault(user_id, {})
+        for family in [f for f, (_, expires_at) in families.items() if expires_at <= now]:
+            del families[family]
+        return families
+
+    async def start_family(self, user_id: int, family: str, jti: str, ttl: int) -> None:
+        """Register a new family (a login) whose current token is ``jti``."""
+        if not self.use_redis:
+            self._local_families(user_id)[family] = (jti, time.monotonic() + ttl)
+            return
+
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.set(_family_key(user_id, family), jti, ex=ttl)
+            pipe.sadd(_families_key(user_id), family)
+            pipe.expire(_families_key(user_id), ttl)
+            await pipe.execute()
+
+    async def rotate(
+        self, user_id: int, family: str, jti: str, new_jti: str, ttl: int
+    ) -> Rotation:
+        """Replace the family's current token ``jti`` with ``new_jti``."""
+        if self.use_redis:
+            if self._rotate_script is None:
+                self._rotate_script = get_redis().register_script(ROTATE_SCRIPT)
+            result = await self._rotate_script(
+                keys=[_families_key(user_id), _family_key(user_id, family)],
+                args=[family, jti, new_jti, ttl * 1000],
+            )
+            outcome = _ROTATION_RESULTS[int(result)]
+        else:
+            families = self._local_families(user_id)
+            entry = families.get(family)
+            if entry is None:
+                outcome = Rotation.REVOKED
+            elif entry[0] != jti:
+                del families[family]
+                outcome = Rotation.REUSED
+            else:
+                families[family] = (new_jti, time.monotonic() + ttl)
+                outcome = Rotation.ROTATED
+
+        if outcome is Rotation.ROTATED:
+            self.rotations += 1
+        elif outcome is Rotation.REUSED:
+            self.reuse_detected += 1
+        return outcome
+
+    async def revoke_family(self, user_id: int, family: str) -> None:
+        """Log out one session."""
+        if not self.use_redis:
+            self._local_families(user_id).pop(family, None)
+            return
+
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.srem(_families_key(user_id), family)
+            pipe.delete(_family_key(user_id, family))
+            await pipe.execute()
+
+    async def revoke_all(self, user_id: int) -> None:
+        """
+        Log out every session of the user.
+
+        Orphaned per-family keys are harmless (rotation checks set membership
+        first) and expire on their own.
+        """
+        if not self.use_redis:
+            self._families.pop(user_id, None)
+            return
+
+        await get_redis().delete(_families_key(user_id))
+
+    def clear(self) -> None:
+        """Forget in-process families."""
+        self._families.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return rotation counters."""
+        return {
+            "backend": "redis" if self.use_redis else "memory",
+            "rotations": self.rotations,
+            "reuse_detected": self.reuse_detected,
+        }
+
+
+refresh_token_store = RefreshTokenStore(use_redis=settings.REFRESH_TOKEN_STORE == "redis")
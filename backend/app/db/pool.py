@@ -0,0 +1,118 @@
+"""
+Connection pool instrumentation.
+
+``InstrumentedPool`` times every checkout (the wait for a free connection,
+or for a new one to be opened) and counts pool timeouts, overall and per
+route. The route label comes from a context variable set by the session
+dependencies; work outside requests (background flushers, jobs) is labelled
+``background``.
+"""
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+db_route: ContextVar[str] = ContextVar("db_route", default="background")
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class CheckoutStats:
+    """Checkout counters and wait time histogram."""
+
+    __slots__ = ("checkouts", "timeouts", "wait_total", "wait_max", "buckets")
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record(self, wait: float, timed_out: bool) -> None:
+        if timed_out:
+            self.timeouts += 1
+            return
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.buckets[bisect.bisect_left(WAIT_BUCKETS, wait)] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the ``q`` quantile (None if unbounded)."""
+        if not self.checkouts:
+            return 0.0
+        rank = q * self.checkouts
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_mean_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "wait_p99_ms_upper_bound": (
+                None if (p99 := self.quantile(0.99)) is None else p99 * 1000
+            ),
+        }
+
+
+class PoolMetrics:
+    """Checkout statistics of one pool, overall and per route."""
+
+    def __init__(self) -> None:
+        self.total = CheckoutStats()
+        self.routes: dict[str, CheckoutStats] = {}
+
+    def record(self, wait: float, timed_out: bool) -> None:
+        self.total.record(wait, timed_out)
+        route = db_route.get()
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = CheckoutStats()
+        stats.record(wait, timed_out)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Async queue pool that records checkout waits and timeouts."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started, timed_out=False)
+        return entry
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = super().recreate()
+        pool.metrics = self.metrics  # type: ignore[attr-defined]
+        return pool  # type: ignore[return-value]
+
+    def stats(self) -> dict[str, Any]:
+        """Return live pool state and checkout statistics."""
+        return {
+            "size": self.size(),
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": self.overflow(),
+            **self.metrics.total.as_dict(),
+            "routes": {
+                route: stats.as_dict() for route, stats in sorted(self.metrics.routes.items())
+            },
+        }
@@ -1,48 +1,223 @@
 """
 Database session configuration using async SQLAlchemy.
+
+Two engines are configured: ``engine`` for the primary and ``read_engine``
+for the read replica (``SQLALCHEMY_READ_DATABASE_URI``; the primary when it
+is not set). Sessions connect lazily: no connection is checked out and no
+transaction begins until the first statement, so a handler that never
+touches its session costs no round trip.
+
+Session dependencies:
+- ``get_db``: read-write transaction on the primary, committed after the
+  handler if one was begun
+- ``get_read_db``: autocommit reads on the replica (no BEGIN/COMMIT); for
+  endpoints that tolerate replica lag
+- ``get_primary_read_db``: autocommit reads on the primary; for reads that
+  must see the latest committed data
+- ``get_snapshot_db``: one ``REPEATABLE READ READ ONLY`` transaction on the
+  replica, for handlers that need several queries to agree
+
+Read sessions reject flushes and fall back to the primary while the replica
+is unreachable.
 """
+import logging
+import time
 from collections.abc import AsyncGenerator
+from typing import Any
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Request
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.db.pool import InstrumentedPool, db_route
+
+logger = logging.getLogger(__name__)
+
+_READ_ONLY_KEY = "read_only"
 
+# Execution options of read sessions
+AUTOCOMMIT = {"isolation_level": "AUTOCOMMIT"}
+READ_ONLY_SNAPSHOT = {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
 
-# Create async engine
-engine = create_async_engine(
-    str(settings.SQLALCHEMY_DATABASE_URI),
-    echo=settings.ENVIRONMENT == "development",
-    future=True,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+
+def _create_engine(url: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+
+
+def _sessionmaker(bind: AsyncEngine, read_only: bool = False) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+        info={_READ_ONLY_KEY: True} if read_only else {},
+    )
+
+
+# Create async engines
+engine = _create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI), settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+)
+read_engine = (
+    _create_engine(
+        str(settings.SQLALCHEMY_READ_DATABASE_URI),
+        settings.DB_READ_POOL_SIZE,
+        settings.DB_READ_MAX_OVERFLOW,
+    )
+    if settings.SQLALCHEMY_READ_DATABASE_URI
+    else engine
 )
 
-# Create async session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
+# Create async session factories (read factories share the engines' pools)
+AsyncSessionLocal = _sessionmaker(engine)
+ReadSessionLocal = _sessionmaker(read_engine.execution_options(**AUTOCOMMIT), read_only=True)
+PrimaryReadSessionLocal = _sessionmaker(engine.execution_options(**AUTOCOMMIT), read_only=True)
+SnapshotSessionLocal = _sessionmaker(
+    read_engine.execution_options(**READ_ONLY_SNAPSHOT), read_only=True
 )
+PrimarySnapshotSessionLocal = _sessionmaker(
+    engine.execution_options(**READ_ONLY_SNAPSHOT), read_only=True
+)
+
+# Monotonic time until which read sessions go to the primary
+_replica_down_until = 0.0
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_read_only_flush(session: Session, flush_context: Any, instances: Any) -> None:
+    if session.info.get(_READ_ONLY_KEY) and (session.new or session.dirty or session.deleted):
+        raise exc.InvalidRequestError("Cannot flush changes from a read-only session")
+
+
+def _set_route(request: Request) -> None:
+    """Attribute pool checkouts made while serving ``request`` to its route."""
+    route = request.scope.get("route")
+    db_route.set(f"{request.method} {route.path if route else '*'}")
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for getting async database session.
 
+    The transaction begins with the first statement and is committed after
+    the handler; if the handler never used the session nothing is sent.
+
     Usage:
         @router.get("/")
         async def route(db: AsyncSession = Depends(get_db)):
             ...
     """
+    _set_route(request)
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            if session.in_transaction():
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
         finally:
             await session.close()
+
+
+async def _open_read_session(
+    replica_factory: async_sessionmaker[AsyncSession] = ReadSessionLocal,
+    primary_factory: async_sessionmaker[AsyncSession] = PrimaryReadSessionLocal,
+) -> AsyncSession:
+    """
+    Open a session on the replica, or on the primary if the replica fails.
+
+    The replica connection is acquired eagerly (and pre-pinged) so that a
+    dead replica is detected here rather than in the middle of the handler.
+    """
+    global _replica_down_until
+
+    if read_engine is engine or time.monotonic() < _replica_down_until:
+        return primary_factory()
+
+    session = replica_factory()
+    try:
+        await session.connection()
+    except exc.TimeoutError:
+        # Replica pool exhausted: serve this request from the primary
+        await session.close()
+        return primary_factory()
+    except (exc.DBAPIError, OSError) as error:
+        await session.close()
+        _replica_down_until = time.monotonic() + settings.DB_READ_RETRY_SECONDS
+        logger.warning("Read replica unavailable, using the primary: %s", error)
+        return primary_factory()
+    return session
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for read-only endpoints: autocommit reads on the read replica.
+
+    Each statement runs on its own, so there is no BEGIN or COMMIT round trip
+    and nothing to commit after the handler.
+    """
+    _set_route(request)
+    session = await _open_read_session()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_primary_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for autocommit reads on the primary.
+
+    Use it instead of ``get_read_db`` when replica lag is not acceptable,
+    e.g. for authorization decisions.
+    """
+    _set_route(request)
+    async with PrimaryReadSessionLocal() as session:
+        yield session
+
+
+async def get_snapshot_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for handlers whose queries must see one consistent snapshot.
+
+    Runs a ``REPEATABLE READ READ ONLY`` transaction on the read replica;
+    the database rejects any write attempted through it.
+    """
+    _set_route(request)
+    session = await _open_read_session(SnapshotSessionLocal, PrimarySnapshotSessionLocal)
+    try:
+        yield session
+        if session.in_transaction():
+            await session.commit()
+    finally:
+        await session.close()
+
+
+def db_pool_stats() -> dict[str, Any]:
+    """Return live state and checkout statistics of the connection pools."""
+    stats = {"primary": engine.pool.stats()}  # type: ignore[attr-defined]
+    if read_engine is not engine:
+        stats["replica"] = {
+            **read_engine.pool.stats(),  # type: ignore[attr-defined]
+            "down": time.monotonic() < _replica_down_until,
+        }
+    return stats
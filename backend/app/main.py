@@ -4,13 +4,26 @@ FastAPI application entry point.
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
 
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.redis import close_redis
+from app.core.security import PasswordHasherBusy, password_hasher
+from app.core.tenancy import TenantMiddleware, tenant_directory
+from app.services.entitlements import EntitlementError
+from app.services.exam_engine import exam_engine
+from app.services.instructor_ranking import instructor_ranking
+from app.services.media import image_store
+from app.services.notifications import notifications
+from app.services.payment_events import payment_events
+from app.services.question_bank import question_bank
 
 
 @asynccontextmanager
@@ -25,11 +38,33 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     print(f"🚀 Starting {settings.PROJECT_NAME} v{settings.VERSION}")
     print(f"📍 Environment: {settings.ENVIRONMENT}")
     print(f"🔗 API docs: http://localhost:8000/docs")
+    await question_bank.load()
+    question_bank.start_refresher()
+    await tenant_directory.load()
+    tenant_directory.start_refresher()
+    await instructor_ranking.load()
+    instructor_ranking.start_refresher()
+    exam_engine.start_flusher()
+    exam_engine.start_sweeper()
+    payment_events.start_worker()
+    notifications.start()
+    principal_cache.start_listener()
 
     yield
 
     # Shutdown
     print(f"👋 Shutting down {settings.PROJECT_NAME}")
+    await exam_engine.stop_sweeper()
+    await exam_engine.stop_flusher()
+    await payment_events.stop_worker()
+    await notifications.stop()
+    await principal_cache.stop_listener()
+    await question_bank.stop_refresher()
+    await tenant_directory.stop_refresher()
+    await instructor_ranking.stop_refresher()
+    password_hasher.shutdown()
+    image_store.shutdown()
+    await close_redis()
 
 
 # Create FastAPI app
@@ -43,6 +78,12 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Tenant resolution (request.state.tenant), served from the in-memory directory
+app.add_middleware(TenantMiddleware)
+
+# Rate limiting (so 429 responses still get CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -83,6 +124,32 @@ async def root() -> dict[str, str]:
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy) -> JSONResponse:
+    """Shed load when the password hashing pool is saturated."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(EntitlementError)
+async def entitlement_error_handler(request: Request, exc: EntitlementError) -> JSONResponse:
+    """Reject requests beyond what the organization's tariff allows."""
+    return JSONResponse(status_code=403, content={"detail": str(exc)})
+
+
+@app.exception_handler(RedisError)
+async def redis_error_handler(request: Request, exc: RedisError) -> JSONResponse:
+    """Fail closed, but retryably, when Redis-backed state is unavailable."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc: Exception) -> JSONResponse:
@@ -4,16 +4,27 @@ Import all models here for Alembic auto-generation.
 """
 from app.db.base import Base  # noqa: F401
 from app.models.user import User  # noqa: F401
-from app.models.organization import Organization  # noqa: F401
+from app.models.organization import Organization, OrganizationUsage  # noqa: F401
 from app.models.question import Question, QuestionCategory  # noqa: F401
 from app.models.exam import Exam, ExamSession, ExamAnswer  # noqa: F401
 from app.models.booking import Booking, BookingSlot  # noqa: F401
-from app.models.payment import Payment, Subscription, Tariff  # noqa: F401
+from app.models.payment import Payment, PaymentEvent, Subscription, Tariff  # noqa: F401
+from app.models.analytics import (  # noqa: F401
+    CategoryStatistics,
+    OrganizationExamStatistics,
+    QuestionStatistics,
+)
+from app.models.progress import (  # noqa: F401
+    StudentCategoryProgress,
+    StudentProgress,
+    StudentQuestionMiss,
+)
 
 __all__ = [
     "Base",
     "User",
     "Organization",
+    "OrganizationUsage",
     "Question",
     "QuestionCategory",
     "Exam",
@@ -22,6 +33,13 @@ __all__ = [
     "Booking",
     "BookingSlot",
     "Payment",
+    "PaymentEvent",
     "Subscription",
     "Tariff",
+    "QuestionStatistics",
+    "CategoryStatistics",
+    "OrganizationExamStatistics",
+    "StudentProgress",
+    "StudentCategoryProgress",
+    "StudentQuestionMiss",
 ]
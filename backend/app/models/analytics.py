@@ -0,0 +1,99 @@
+"""
+Exam analytics summary models.
+
+Rows are rebuilt wholesale by ``app.services.exam_analytics``; nothing else
+writes to these tables.
+"""
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Float, ForeignKey, Integer, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class QuestionStatistics(Base):
+    """
+    Per-question item statistics from completed exam sessions.
+
+    p_value is the share of correct answers (higher is easier);
+    discrimination is the p-value of the top 27% of sessions by score minus
+    that of the bottom 27%.
+    """
+
+    __tablename__ = "question_statistics"
+
+    question_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("questions.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    correct: Mapped[int] = mapped_column(Integer, nullable=False)
+    p_value: Mapped[float] = mapped_column(Float, nullable=False)
+    discrimination: Mapped[float | None] = mapped_column(Float)
+    suggested_difficulty: Mapped[int] = mapped_column(Integer, nullable=False)  # 1-5 scale
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<QuestionStatistics(question_id={self.question_id}, p_value={self.p_value})>"
+
+
+class CategoryStatistics(Base):
+    """
+    Per-category accuracy and pass rate.
+
+    A session passes a category when its accuracy on that category's
+    questions reaches the exam's passing score.
+    """
+
+    __tablename__ = "category_statistics"
+
+    category_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("question_categories.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    correct: Mapped[int] = mapped_column(Integer, nullable=False)
+    accuracy: Mapped[float] = mapped_column(Float, nullable=False)
+    sessions: Mapped[int] = mapped_column(Integer, nullable=False)
+    passed_sessions: Mapped[int] = mapped_column(Integer, nullable=False)
+    pass_rate: Mapped[float] = mapped_column(Float, nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<CategoryStatistics(category_id={self.category_id}, pass_rate={self.pass_rate})>"
+
+
+class OrganizationExamStatistics(Base):
+    """Score distribution of completed exam sessions of an organization's students."""
+
+    __tablename__ = "organization_exam_statistics"
+
+    organization_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("organizations.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    sessions: Mapped[int] = mapped_column(Integer, nullable=False)
+    mean_score: Mapped[float] = mapped_column(Float, nullable=False)
+    p25_score: Mapped[float] = mapped_column(Float, nullable=False)
+    median_score: Mapped[float] = mapped_column(Float, nullable=False)
+    p75_score: Mapped[float] = mapped_column(Float, nullable=False)
+    pass_rate: Mapped[float] = mapped_column(Float, nullable=False)
+    # Session counts per 10-point score bucket: [0-10), [10-20), ..., [90-100]
+    histogram: Mapped[list] = mapped_column(JSON, nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<OrganizationExamStatistics(organization_id={self.organization_id}, "
+            f"mean_score={self.mean_score})>"
+        )
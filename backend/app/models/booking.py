@@ -5,7 +5,7 @@ import enum
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import DateTime, Enum, ForeignKey, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base, TimestampMixin
@@ -24,6 +24,14 @@ class BookingStatus(str, enum.Enum):
     NO_SHOW = "no_show"  # Student didn't show up
 
 
+# Statuses that hold their slot; a slot has at most one such booking
+ACTIVE_BOOKING_STATUSES = (
+    BookingStatus.PENDING,
+    BookingStatus.CONFIRMED,
+    BookingStatus.COMPLETED,
+)
+
+
 class BookingType(str, enum.Enum):
     """Type of booking session."""
 
@@ -36,10 +44,17 @@ class BookingSlot(Base, TimestampMixin):
     """
     Available time slots for instructors/teachers.
 
-    Instructors define their availability using these slots.
+    Instructors define their availability using these slots. A slot is
+    reserved by flipping ``is_available`` in the same transaction that
+    creates its booking (see ``app.services.booking_engine``).
     """
 
     __tablename__ = "booking_slots"
+    __table_args__ = (
+        # Free slot search (instructor_id = ANY(...) AND start_time in a range)
+        # and deduplication of generated availability
+        UniqueConstraint("instructor_id", "start_time", name="uq_booking_slots_instructor_start"),
+    )
 
     # Primary Key
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -49,7 +64,6 @@ class BookingSlot(Base, TimestampMixin):
         Integer,
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
 
     # Time Slot
@@ -62,6 +76,7 @@ class BookingSlot(Base, TimestampMixin):
 
     # Availability
     is_available: Mapped[bool] = mapped_column(default=True, nullable=False)
+    price_amount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # In som
 
     # Relationships
     instructor: Mapped["User"] = relationship("User")
@@ -165,3 +180,12 @@ class Booking(Base, TimestampMixin):
 
     def __repr__(self) -> str:
         return f"<Booking(id={self.id}, student_id={self.student_id}, instructor_id={self.instructor_id}, status={self.status})>"
+
+
+# Backstop against double booking, whatever code path creates the booking
+Index(
+    "uq_bookings_active_slot",
+    Booking.slot_id,
+    unique=True,
+    postgresql_where=Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+)
@@ -4,7 +4,17 @@ Exam, ExamSession, and ExamAnswer models.
 import enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, DateTime, Enum, Float, ForeignKey, Integer, String, JSON
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    JSON,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base, TimestampMixin
@@ -45,6 +55,12 @@ class Exam(Base, TimestampMixin):
     duration_minutes: Mapped[int] = mapped_column(Integer, default=40, nullable=False)
     passing_score: Mapped[float] = mapped_column(Float, default=70.0, nullable=False)  # Percentage
 
+    # Question Selection (optional; default is proportional to the question bank)
+    # Example: {"3": 5, "7": 2} -> 5 questions from category 3, 2 from category 7
+    category_quotas: Mapped[dict | None] = mapped_column(JSON)
+    # Example: {"easy": 0.5, "medium": 0.3, "hard": 0.2}
+    difficulty_mix: Mapped[dict | None] = mapped_column(JSON)
+
     # Status
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
@@ -99,6 +115,9 @@ class ExamSession(Base, TimestampMixin):
     completed_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True))
     time_remaining_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
 
+    # Progress
+    current_question_index: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
     # Results
     score: Mapped[float | None] = mapped_column(Float)  # Percentage
     correct_answers: Mapped[int] = mapped_column(Integer, default=0)
@@ -121,9 +140,14 @@ class ExamSession(Base, TimestampMixin):
 class ExamAnswer(Base, TimestampMixin):
     """
     Individual answer within an exam session.
+
+    One row per (session, question); changing an answer updates the row.
     """
 
     __tablename__ = "exam_answers"
+    __table_args__ = (
+        UniqueConstraint("session_id", "question_id", name="uq_exam_answers_session_question"),
+    )
 
     # Primary Key
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
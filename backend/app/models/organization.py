@@ -3,7 +3,7 @@ Organization model for multi-tenancy (driving schools).
 """
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base, SoftDeleteMixin, TimestampMixin
@@ -42,7 +42,14 @@ class Organization(Base, TimestampMixin, SoftDeleteMixin):
     # Owner
     owner_id: Mapped[int] = mapped_column(
         Integer,
-        ForeignKey("users.id", ondelete="CASCADE"),
+        # users.organization_id points back here; use_alter breaks the cycle
+        # so the tables can be created and dropped in dependency order
+        ForeignKey(
+            "users.id",
+            ondelete="CASCADE",
+            use_alter=True,
+            name="fk_organizations_owner_id_users",
+        ),
         nullable=False,
         index=True,
     )
@@ -78,3 +85,32 @@ class Organization(Base, TimestampMixin, SoftDeleteMixin):
 
     def __repr__(self) -> str:
         return f"<Organization(id={self.id}, name={self.name})>"
+
+
+class OrganizationUsage(Base):
+    """
+    Running usage counters of an organization, checked against tariff limits.
+
+    Maintained incrementally by the entitlement service as members join,
+    leave or change role, and as files are stored.
+    """
+
+    __tablename__ = "organization_usage"
+
+    organization_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("organizations.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    # Active members by role group
+    teachers: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    students: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    storage_bytes: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return (
+            f"<OrganizationUsage(org_id={self.organization_id}, teachers={self.teachers}, "
+            f"students={self.students})>"
+        )
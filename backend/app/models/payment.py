@@ -5,7 +5,18 @@ import enum
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base, TimestampMixin
@@ -36,6 +47,13 @@ class PaymentMethod(str, enum.Enum):
     BANK_TRANSFER = "bank_transfer"
 
 
+class PaymentEventType(str, enum.Enum):
+    """Payment event type enumeration."""
+
+    PAID = "paid"
+    REFUNDED = "refunded"
+
+
 class SubscriptionStatus(str, enum.Enum):
     """Subscription status enumeration."""
 
@@ -212,3 +230,50 @@ class Payment(Base, TimestampMixin):
 
     def __repr__(self) -> str:
         return f"<Payment(id={self.id}, user_id={self.user_id}, amount={self.amount}, status={self.status})>"
+
+
+class PaymentEvent(Base, TimestampMixin):
+    """
+    Outbox of work to do after a payment changes state.
+
+    Written in the same transaction as the payment, so gateway callbacks can
+    be acknowledged immediately; subscription changes and notifications are
+    applied later by the payment event worker.
+    """
+
+    __tablename__ = "payment_events"
+    __table_args__ = (UniqueConstraint("payment_id", "event_type"),)
+
+    # Primary Key
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # Foreign Keys
+    payment_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("payments.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    event_type: Mapped[PaymentEventType] = mapped_column(
+        Enum(PaymentEventType, native_enum=False),
+        nullable=False,
+    )
+
+    # Processing
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[str | None] = mapped_column(Text)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    # Relationships
+    payment: Mapped["Payment"] = relationship("Payment")
+
+    def __repr__(self) -> str:
+        return f"<PaymentEvent(id={self.id}, payment_id={self.payment_id}, type={self.event_type})>"
+
+
+# The worker only ever scans unprocessed events
+Index(
+    "ix_payment_events_pending",
+    PaymentEvent.id,
+    postgresql_where=PaymentEvent.processed_at.is_(None),
+)
@@ -0,0 +1,102 @@
+"""
+Student exam progress aggregates.
+
+Maintained by ``app.services.student_progress`` when exam sessions are
+finished or expired, and rebuilt from history by its backfill command.
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class StudentProgress(Base):
+    """Finished exam sessions of a student."""
+
+    __tablename__ = "student_progress"
+
+    student_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    sessions: Mapped[int] = mapped_column(Integer, nullable=False)
+    passed_sessions: Mapped[int] = mapped_column(Integer, nullable=False)
+    best_score: Mapped[float] = mapped_column(Float, nullable=False)
+    last_score: Mapped[float] = mapped_column(Float, nullable=False)
+    last_finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<StudentProgress(student_id={self.student_id}, sessions={self.sessions})>"
+
+
+class StudentCategoryProgress(Base):
+    """
+    A student's results on one question category.
+
+    Unanswered questions count as not correct, as in the exam score.
+    """
+
+    __tablename__ = "student_category_progress"
+
+    student_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    category_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("question_categories.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    sessions: Mapped[int] = mapped_column(Integer, nullable=False)
+    questions: Mapped[int] = mapped_column(Integer, nullable=False)  # Questions presented
+    answered: Mapped[int] = mapped_column(Integer, nullable=False)
+    correct: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    @property
+    def accuracy(self) -> float:
+        return round(self.correct / self.questions * 100, 2) if self.questions else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"<StudentCategoryProgress(student_id={self.student_id}, "
+            f"category_id={self.category_id})>"
+        )
+
+
+class StudentQuestionMiss(Base):
+    """How often a student answered a question wrongly."""
+
+    __tablename__ = "student_question_misses"
+    __table_args__ = (
+        # Most-missed questions of a student
+        Index("ix_student_question_misses_student_misses", "student_id", "misses"),
+    )
+
+    student_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    question_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("questions.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    category_id: Mapped[int | None] = mapped_column(Integer)
+    misses: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_missed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<StudentQuestionMiss(student_id={self.student_id}, "
+            f"question_id={self.question_id}, misses={self.misses})>"
+        )
@@ -47,7 +47,8 @@ class Question(Base, TimestampMixin, SoftDeleteMixin):
     Question model for driving theory exams.
 
     Supports multi-language (Uzbek Latin, Cyrillic, Russian, Karakalpak).
-    Text stored in Latin, Cyrillic converted on-the-fly.
+    Text stored in Latin; Cyrillic is rendered once per question bank version
+    (see app.services.question_renderer).
     """
 
     __tablename__ = "questions"
@@ -5,7 +5,7 @@ Supports: Student, Teacher, Instructor, Business Owner, Mentor, Admin.
 import enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Enum, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base, SoftDeleteMixin, TimestampMixin
@@ -50,7 +50,9 @@ class User(Base, TimestampMixin, SoftDeleteMixin):
         is_verified: Whether user has verified their email/phone
         organization_id: Foreign key to organization (for teachers/instructors)
         level: Performance level (for instructors/mentors)
-        rating: Average rating (0-5 stars)
+        rating: Average rating (0-5 stars), rating_sum / rating_count
+        rating_sum: Sum of the stars given by students
+        rating_count: Number of ratings given by students
         total_sessions: Total number of sessions completed
         bio: User biography/description
         avatar_url: Profile picture URL
@@ -92,6 +94,8 @@ class User(Base, TimestampMixin, SoftDeleteMixin):
     # Performance Metrics (for instructors/mentors)
     level: Mapped[UserLevel | None] = mapped_column(Enum(UserLevel, native_enum=False))
     rating: Mapped[float] = mapped_column(default=0.0, nullable=False)
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     total_sessions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
     # Work Mode (teachers/instructors can work privately + in organization)
@@ -127,3 +131,13 @@ class User(Base, TimestampMixin, SoftDeleteMixin):
 
     def __repr__(self) -> str:
         return f"<User(id={self.id}, email={self.email}, role={self.role})>"
+
+
+# Keyset pagination of user listings, ordered by (organization_id, role, id)
+Index(
+    "ix_users_org_role_id",
+    User.organization_id,
+    User.role,
+    User.id,
+    postgresql_where=User.deleted_at.is_(None),
+)
@@ -1,8 +1,22 @@
 """
 Pydantic schemas for request/response validation.
 """
-from app.schemas.user import UserResponse, UserCreate, UserUpdate, UserListResponse
-from app.schemas.auth import RegisterRequest, LoginRequest, LoginResponse, TokenResponse
+from app.schemas.user import (
+    UserResponse,
+    UserCreate,
+    UserUpdate,
+    UserListItem,
+    UserListResponse,
+)
+from app.schemas.organization import OrganizationBranding
+from app.schemas.auth import (
+    RegisterRequest,
+    LoginRequest,
+    LoginResponse,
+    RefreshRequest,
+    RefreshResponse,
+    TokenResponse,
+)
 from app.schemas.exam import (
     ExamResponse,
     ExamCreate,
@@ -10,16 +24,46 @@ from app.schemas.exam import (
     ExamSessionCreate,
     ExamSessionResponse,
     ExamAnswerSubmit,
+    ExamAnswerResult,
+    ExamPosition,
+    ExamProgressResponse,
+)
+from app.schemas.booking import (
+    AvailabilityRule,
+    AvailabilityGenerate,
+    AvailabilityResult,
+    BookingSlotResponse,
+    InstructorSearchResult,
+    BookingCreate,
+    BookingFirstAvailable,
+    BookingRate,
+    BookingResponse,
+)
+from app.schemas.question import QuestionBankInfo
+from app.schemas.media import ImageUploadResponse
+from app.schemas.analytics import (
+    QuestionStatisticsResponse,
+    CategoryStatisticsResponse,
+    OrganizationExamStatisticsResponse,
+)
+from app.schemas.progress import (
+    CategoryProgressResponse,
+    MissedQuestionResponse,
+    StudentProgressResponse,
 )
 
 __all__ = [
     "UserResponse",
     "UserCreate",
     "UserUpdate",
+    "UserListItem",
     "UserListResponse",
+    "OrganizationBranding",
     "RegisterRequest",
     "LoginRequest",
     "LoginResponse",
+    "RefreshRequest",
+    "RefreshResponse",
     "TokenResponse",
     "ExamResponse",
     "ExamCreate",
@@ -27,4 +71,24 @@ __all__ = [
     "ExamSessionCreate",
     "ExamSessionResponse",
     "ExamAnswerSubmit",
+    "ExamAnswerResult",
+    "ExamPosition",
+    "ExamProgressResponse",
+    "AvailabilityRule",
+    "AvailabilityGenerate",
+    "AvailabilityResult",
+    "BookingSlotResponse",
+    "InstructorSearchResult",
+    "BookingCreate",
+    "BookingFirstAvailable",
+    "BookingRate",
+    "BookingResponse",
+    "QuestionBankInfo",
+    "ImageUploadResponse",
+    "QuestionStatisticsResponse",
+    "CategoryStatisticsResponse",
+    "OrganizationExamStatisticsResponse",
+    "CategoryProgressResponse",
+    "MissedQuestionResponse",
+    "StudentProgressResponse",
 ]
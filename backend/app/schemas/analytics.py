@@ -0,0 +1,51 @@
+"""
+Pydantic schemas for exam analytics summaries.
+"""
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class QuestionStatisticsResponse(BaseModel):
+    """Schema for per-question item statistics."""
+
+    question_id: int
+    attempts: int
+    correct: int
+    p_value: float
+    discrimination: float | None
+    suggested_difficulty: int
+    computed_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class CategoryStatisticsResponse(BaseModel):
+    """Schema for per-category accuracy and pass rate."""
+
+    category_id: int
+    attempts: int
+    correct: int
+    accuracy: float
+    sessions: int
+    passed_sessions: int
+    pass_rate: float
+    computed_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class OrganizationExamStatisticsResponse(BaseModel):
+    """Schema for an organization's exam score distribution."""
+
+    organization_id: int
+    sessions: int
+    mean_score: float
+    p25_score: float
+    median_score: float
+    p75_score: float
+    pass_rate: float
+    histogram: list[int]
+    computed_at: datetime
+
+    model_config = {"from_attributes": True}
@@ -24,6 +24,12 @@ class LoginRequest(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    """Schema for refresh and logout requests."""
+
+    refresh_token: str
+
+
 class TokenResponse(BaseModel):
     """Schema for token response."""
 
@@ -31,6 +37,12 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
 
 
+class RefreshResponse(TokenResponse):
+    """Schema for refresh response (the refresh token is rotated on every use)."""
+
+    refresh_token: str
+
+
 class LoginResponse(TokenResponse):
     """Schema for login response with user info."""
 
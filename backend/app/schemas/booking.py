@@ -0,0 +1,165 @@
+"""
+Pydantic schemas for Booking models.
+"""
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from app.core.config import settings
+from app.models.booking import BookingStatus, BookingType
+from app.models.user import UserLevel, UserRole
+
+
+class BookingSlotResponse(BaseModel):
+    """Schema for a booking slot."""
+
+    id: int
+    instructor_id: int
+    start_time: datetime
+    end_time: datetime
+    is_available: bool
+    price_amount: int
+
+    model_config = {"from_attributes": True}
+
+
+class InstructorSearchResult(BaseModel):
+    """Schema for a ranked instructor and their free slots in the searched window."""
+
+    id: int
+    full_name: str
+    avatar_url: str | None
+    role: UserRole
+    organization_id: int | None
+    work_privately: bool
+    level: UserLevel | None
+    rating: float
+    total_sessions: int
+    completion_rate: float
+    score: float
+    free_slots: int
+    next_free_slot: datetime | None
+
+
+class AvailabilityRule(BaseModel):
+    """Schema for a weekly availability rule, in the school's local time."""
+
+    weekdays: list[int] = Field(..., min_length=1, max_length=7)  # 0 = Monday
+    start: time
+    end: time
+    slot_minutes: int = Field(..., ge=15, le=480)
+    break_minutes: int = Field(0, ge=0, le=240)
+    price_amount: int = Field(0, ge=0)  # In som
+
+    @field_validator("weekdays")
+    @classmethod
+    def check_weekdays(cls, v: list[int]) -> list[int]:
+        if any(day < 0 or day > 6 for day in v):
+            raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+        return v
+
+    @model_validator(mode="after")
+    def check_hours(self) -> "AvailabilityRule":
+        if self.end <= self.start:
+            raise ValueError("end must be after start")
+        return self
+
+
+class AvailabilityGenerate(BaseModel):
+    """Schema for generating slots from weekly rules over a date range."""
+
+    instructor_ids: list[int] | None = Field(None, min_length=1, max_length=500)  # Default: self
+    date_from: date
+    date_to: date
+    rules: list[AvailabilityRule] = Field(..., min_length=1, max_length=20)
+    excluded_dates: list[date] = Field([], max_length=366)
+    skip_public_holidays: bool = True
+    timezone: str = settings.BOOKING_TIMEZONE
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, v: str) -> str:
+        try:
+            ZoneInfo(v)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {v}")
+        return v
+
+    @model_validator(mode="after")
+    def check_range(self) -> "AvailabilityGenerate":
+        days = (self.date_to - self.date_from).days
+        if days < 0:
+            raise ValueError("date_to must not be before date_from")
+        if days >= settings.BOOKING_AVAILABILITY_MAX_DAYS:
+            raise ValueError(
+                f"At most {settings.BOOKING_AVAILABILITY_MAX_DAYS} days can be generated at once"
+            )
+        for i, rule in enumerate(self.rules):
+            for other in self.rules[i + 1 :]:
+                if (
+                    set(rule.weekdays) & set(other.weekdays)
+                    and rule.start < other.end
+                    and other.start < rule.end
+                ):
+                    raise ValueError("rules overlap")
+        return self
+
+
+class AvailabilityResult(BaseModel):
+    """Schema for the outcome of generating slots."""
+
+    requested: int
+    created: int
+    skipped: int  # Clashing with existing slots
+
+
+class BookingCreate(BaseModel):
+    """Schema for booking a specific slot."""
+
+    slot_id: int
+    booking_type: BookingType
+    student_notes: str | None = Field(None, max_length=2000)
+
+
+class BookingFirstAvailable(BaseModel):
+    """Schema for booking the earliest free slot of any of the instructors."""
+
+    instructor_ids: list[int] = Field(..., min_length=1, max_length=100)
+    start: datetime
+    end: datetime
+    booking_type: BookingType
+    student_notes: str | None = Field(None, max_length=2000)
+
+    @model_validator(mode="after")
+    def check_window(self) -> "BookingFirstAvailable":
+        if self.end <= self.start:
+            raise ValueError("end must be after start")
+        return self
+
+
+class BookingRate(BaseModel):
+    """Schema for a student's rating of a completed booking."""
+
+    stars: int = Field(..., ge=1, le=5)
+
+
+class BookingResponse(BaseModel):
+    """Schema for booking response."""
+
+    id: int
+    student_id: int
+    instructor_id: int
+    slot_id: int | None
+    booking_type: BookingType
+    status: BookingStatus
+    scheduled_start: datetime
+    scheduled_end: datetime
+    meeting_location: str | None
+    google_meet_url: str | None
+    price_amount: int
+    student_notes: str | None
+    student_rating: int | None
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
@@ -2,6 +2,7 @@
 Pydantic schemas for Exam models.
 """
 from datetime import datetime
+from typing import Literal
 
 from pydantic import BaseModel, Field
 
@@ -16,12 +17,17 @@ class ExamBase(BaseModel):
     description: str | None = None
 
 
+DifficultyBand = Literal["easy", "medium", "hard"]
+
+
 class ExamCreate(ExamBase):
     """Schema for creating an exam."""
 
     total_questions: int = Field(20, ge=1, le=100)
     duration_minutes: int = Field(40, ge=1, le=240)
     passing_score: float = Field(70.0, ge=0.0, le=100.0)
+    category_quotas: dict[int, int] | None = None
+    difficulty_mix: dict[DifficultyBand, float] | None = None
 
 
 class ExamUpdate(BaseModel):
@@ -33,6 +39,8 @@ class ExamUpdate(BaseModel):
     total_questions: int | None = Field(None, ge=1, le=100)
     duration_minutes: int | None = Field(None, ge=1, le=240)
     passing_score: float | None = Field(None, ge=0.0, le=100.0)
+    category_quotas: dict[int, int] | None = None
+    difficulty_mix: dict[DifficultyBand, float] | None = None
     is_active: bool | None = None
 
 
@@ -43,6 +51,8 @@ class ExamResponse(ExamBase):
     total_questions: int
     duration_minutes: int
     passing_score: float
+    category_quotas: dict[int, int] | None
+    difficulty_mix: dict[DifficultyBand, float] | None
     is_active: bool
     created_at: datetime
     updated_at: datetime
@@ -61,6 +71,33 @@ class ExamAnswerSubmit(BaseModel):
 
     question_id: int
     selected_option_id: str
+    current_question_index: int | None = Field(None, ge=0)  # Question the student is on
+
+
+class ExamPosition(BaseModel):
+    """Schema for moving to another question without answering."""
+
+    current_question_index: int = Field(..., ge=0)
+
+
+class ExamProgressResponse(BaseModel):
+    """Schema for the progress of an in-progress session, to resume it."""
+
+    session_id: int
+    answers: dict[int, str]  # Question ID -> selected option ID
+    current_question_index: int
+    total_answered: int
+    time_remaining_seconds: int
+
+
+class ExamAnswerResult(BaseModel):
+    """Schema for the result of submitting an answer."""
+
+    question_id: int
+    selected_option_id: str
+    is_correct: bool
+    total_answered: int
+    time_remaining_seconds: int
 
 
 class ExamSessionResponse(BaseModel):
@@ -74,6 +111,7 @@ class ExamSessionResponse(BaseModel):
     started_at: datetime
     completed_at: datetime | None
     time_remaining_seconds: int
+    current_question_index: int
     score: float | None
     correct_answers: int
     total_answered: int
@@ -0,0 +1,14 @@
+"""
+Pydantic schemas for uploaded media.
+"""
+from pydantic import BaseModel
+
+
+class ImageUploadResponse(BaseModel):
+    """Schema for a stored image and the URLs of its WebP renditions."""
+
+    id: str  # SHA-256 of the uploaded bytes
+    width: int
+    height: int
+    urls: dict[str, str]  # Longest edge -> URL
+    created: bool  # False when the same image was already stored
@@ -0,0 +1,16 @@
+"""
+Pydantic schemas for Organization model.
+"""
+from pydantic import BaseModel
+
+
+class OrganizationBranding(BaseModel):
+    """Schema for an organization's public white-label branding."""
+
+    id: int
+    slug: str
+    name: str
+    logo_url: str | None
+    theme_color: str | None
+
+    model_config = {"from_attributes": True}
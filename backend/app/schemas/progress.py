@@ -0,0 +1,42 @@
+"""
+Pydantic schemas for student exam progress.
+"""
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class CategoryProgressResponse(BaseModel):
+    """Schema for a student's results on one question category."""
+
+    category_id: int
+    sessions: int
+    questions: int
+    answered: int
+    correct: int
+    accuracy: float  # Percentage of presented questions answered correctly
+
+    model_config = {"from_attributes": True}
+
+
+class MissedQuestionResponse(BaseModel):
+    """Schema for a question the student often answers wrongly."""
+
+    question_id: int
+    category_id: int | None
+    misses: int
+    last_missed_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class StudentProgressResponse(BaseModel):
+    """Schema for a student's exam progress."""
+
+    sessions: int = 0
+    passed_sessions: int = 0
+    best_score: float | None = None
+    last_score: float | None = None
+    last_finished_at: datetime | None = None
+    categories: list[CategoryProgressResponse] = []  # Weakest first
+    most_missed: list[MissedQuestionResponse] = []
@@ -0,0 +1,17 @@
+"""
+Pydantic schemas for Question models.
+"""
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class QuestionBankInfo(BaseModel):
+    """Schema for the in-memory question bank snapshot."""
+
+    version: str
+    loaded_at: datetime
+    total_records: int
+    eligible: int
+    categories: dict[str, int]
+    difficulties: dict[str, int]
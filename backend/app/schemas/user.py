@@ -52,11 +52,27 @@ class UserResponse(UserBase):
     model_config = {"from_attributes": True}
 
 
+class UserListItem(BaseModel):
+    """Schema for a user in listings (a projection of the listed columns)."""
+
+    id: int
+    full_name: str
+    email: EmailStr
+    phone: str | None
+    role: UserRole
+    is_active: bool
+    organization_id: int | None
+    level: UserLevel | None
+    rating: float
+    avatar_url: str | None
+
+    model_config = {"from_attributes": True}
+
+
 class UserListResponse(BaseModel):
-    """Schema for paginated user list."""
+    """Schema for a page of users (keyset pagination)."""
 
-    items: list[UserResponse]
-    total: int
-    page: int
-    size: int
-    pages: int
+    items: list[UserListItem]
+    next_cursor: str | None  # Pass as ``cursor`` to get the next page; None on the last page
+    total: int | None  # First page only; cached, so it may lag recent changes
+    total_is_estimate: bool = False
@@ -0,0 +1,153 @@
+"""
+Recurring instructor availability.
+
+Weekly rules ("Mon-Fri 09:00-18:00, 90-minute slots") are expanded lazily,
+day by day, into slots in the school's timezone. Rows are inserted in
+batches; each batch is a single ``INSERT ... SELECT FROM unnest(...)``
+statement taking the columns as arrays, so a quarter of slots for a whole
+school costs a handful of round trips. Slots that coincide with or overlap
+an existing slot of the instructor are skipped, and the unique
+``(instructor_id, start_time)`` constraint keeps concurrent runs from
+inserting duplicates.
+"""
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import islice
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import DateTime, Insert, Integer, bindparam, exists, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.booking import BookingSlot
+from app.services.instructor_ranking import reload_after_commit
+
+INSERT_BATCH_SIZE = 10_000
+MAX_SLOT_LENGTH = timedelta(days=1)
+
+# Fixed-date public holidays of Uzbekistan (month, day); movable ones such as
+# Ramazon and Qurbon hayit are passed as excluded dates
+PUBLIC_HOLIDAYS = frozenset({(1, 1), (3, 8), (3, 21), (5, 9), (9, 1), (10, 1), (12, 8)})
+
+
+class WeeklyRule:
+    """Slots of ``slot_minutes`` from ``start`` to ``end`` on the given weekdays (0 = Monday)."""
+
+    __slots__ = ("weekdays", "start", "end", "slot", "step", "price_amount")
+
+    def __init__(
+        self,
+        weekdays: Iterable[int],
+        start: time,
+        end: time,
+        slot_minutes: int,
+        break_minutes: int = 0,
+        price_amount: int = 0,
+    ) -> None:
+        self.weekdays = frozenset(weekdays)
+        self.start = start
+        self.end = end
+        self.slot = timedelta(minutes=slot_minutes)
+        self.step = timedelta(minutes=slot_minutes + break_minutes)
+        self.price_amount = price_amount
+
+
+def expand_rules(
+    rules: Sequence[WeeklyRule],
+    date_from: date,
+    date_to: date,
+    tz: ZoneInfo,
+    excluded_dates: Iterable[date] = (),
+    skip_public_holidays: bool = True,
+) -> Iterator[tuple[datetime, datetime, int]]:
+    """
+    Yield ``(start, end, price)`` of every slot between the dates, inclusive.
+
+    Times are UTC; rules are applied in wall-clock time of ``tz``.
+    """
+    excluded = frozenset(excluded_dates)
+    by_weekday = [[rule for rule in rules if weekday in rule.weekdays] for weekday in range(7)]
+
+    day = date_from
+    while day <= date_to:
+        if day not in excluded and not (
+            skip_public_holidays and (day.month, day.day) in PUBLIC_HOLIDAYS
+        ):
+            for rule in by_weekday[day.weekday()]:
+                start = datetime.combine(day, rule.start, tz)
+                close = datetime.combine(day, rule.end, tz)
+                while start + rule.slot <= close:
+                    yield (
+                        start.astimezone(timezone.utc),
+                        (start + rule.slot).astimezone(timezone.utc),
+                        rule.price_amount,
+                    )
+                    start += rule.step
+        day += timedelta(days=1)
+
+
+def _insert_statement() -> Insert:
+    rows = func.unnest(
+        bindparam("instructor_ids", type_=ARRAY(Integer)),
+        bindparam("starts", type_=ARRAY(DateTime(timezone=True))),
+        bindparam("ends", type_=ARRAY(DateTime(timezone=True))),
+        bindparam("prices", type_=ARRAY(Integer)),
+    ).table_valued("instructor_id", "start_time", "end_time", "price_amount").render_derived("slot")
+    existing = aliased(BookingSlot)
+    overlapping = exists().where(
+        existing.instructor_id == rows.c.instructor_id,
+        existing.start_time < rows.c.end_time,
+        # Bounds the index range scan; no slot is longer than this
+        existing.start_time > rows.c.start_time - MAX_SLOT_LENGTH,
+        existing.end_time > rows.c.start_time,
+    )
+    return (
+        pg_insert(BookingSlot.__table__)
+        .from_select(
+            ["instructor_id", "start_time", "end_time", "price_amount", "is_available"],
+            select(
+                rows.c.instructor_id,
+                rows.c.start_time,
+                rows.c.end_time,
+                rows.c.price_amount,
+                true(),
+            ).where(~overlapping),
+        )
+        .on_conflict_do_nothing(index_elements=["instructor_id", "start_time"])
+    )
+
+
+async def create_recurring_slots(
+    db: AsyncSession,
+    instructor_ids: Sequence[int],
+    slots: Iterable[tuple[datetime, datetime, int]],
+    batch_size: int = INSERT_BATCH_SIZE,
+) -> tuple[int, int]:
+    """
+    Insert the slots for every instructor, skipping ones that clash.
+
+    Returns:
+        Slots requested and slots created
+    """
+    # One instructor's slots are few; the instructor x slot product is streamed
+    pattern = list(slots)
+    rows = ((i, *slot) for i in instructor_ids for slot in pattern)
+    statement = _insert_statement()
+    requested = created = 0
+    while batch := list(islice(rows, batch_size)):
+        ids, starts, ends, prices = zip(*batch)
+        result = await db.execute(
+            statement,
+            {
+                "instructor_ids": list(ids),
+                "starts": list(starts),
+                "ends": list(ends),
+                "prices": list(prices),
+            },
+        )
+        requested += len(batch)
+        created += result.rowcount
+    if created:
+        reload_after_commit(db, instructor_ids)
+    return requested, created
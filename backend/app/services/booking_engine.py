@@ -0,0 +1,245 @@
+"""
+Booking slot availability and reservation.
+
+Free slots of many instructors are found with one range query on the
+``(instructor_id, start_time)`` index.
+
+A slot is reserved by a single ``UPDATE ... SET is_available = false`` whose
+target row is picked with ``SELECT ... FOR UPDATE SKIP LOCKED``: when
+hundreds of students race for the same slot, one locks it and the others
+skip it at once instead of queueing behind the lock, so they get their
+answer (slot taken, or the next free slot in the window) without waiting
+for the winner to commit. The partial unique index on active bookings per
+slot makes double booking impossible even for code paths that bypass this
+module.
+
+Completing and rating bookings update the instructor's running aggregates
+(see ``app.services.instructor_ratings``).
+"""
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from sqlalchemy import Select, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.booking import Booking, BookingSlot, BookingStatus, BookingType
+from app.services.instructor_ratings import record_completed_session, record_rating
+from app.services.notifications import notify_after_commit
+
+
+class BookingError(Exception):
+    """Base error for booking operations."""
+
+
+class SlotUnavailable(BookingError):
+    """Raised when no requested slot can be reserved."""
+
+
+class BookingNotCancellable(BookingError):
+    """Raised when a booking is already over or cancelled."""
+
+
+class BookingNotCompletable(BookingError):
+    """Raised when a booking is not open or has not started yet."""
+
+
+class BookingNotRatable(BookingError):
+    """Raised when a booking is not completed."""
+
+
+def _free_slots(
+    instructor_ids: Sequence[int], start: datetime, end: datetime
+) -> Select[tuple[BookingSlot]]:
+    return select(BookingSlot).where(
+        BookingSlot.instructor_id.in_(instructor_ids),
+        BookingSlot.start_time >= max(start, datetime.now(timezone.utc)),
+        BookingSlot.start_time < end,
+        BookingSlot.is_available.is_(True),
+    )
+
+
+async def find_free_slots(
+    db: AsyncSession,
+    instructor_ids: Sequence[int],
+    start: datetime,
+    end: datetime,
+    per_instructor: int | None = None,
+) -> list[BookingSlot]:
+    """
+    Return future free slots of the instructors starting in ``[start, end)``.
+
+    Ordered by instructor, then start time. ``per_instructor`` keeps only the
+    earliest slots of each instructor, still in one query.
+    """
+    if not instructor_ids:
+        return []
+
+    query = _free_slots(instructor_ids, start, end)
+    if per_instructor is not None:
+        ranked = query.add_columns(
+            func.row_number()
+            .over(partition_by=BookingSlot.instructor_id, order_by=BookingSlot.start_time)
+            .label("rank")
+        ).subquery()
+        slot = aliased(BookingSlot, ranked)
+        query = select(slot).where(ranked.c.rank <= per_instructor)
+    else:
+        slot = BookingSlot
+
+    result = await db.execute(query.order_by(slot.instructor_id, slot.start_time))
+    return list(result.scalars().all())
+
+
+async def _reserve(
+    db: AsyncSession,
+    candidates: Select[tuple[int]],
+    student_id: int,
+    booking_type: BookingType,
+    student_notes: str | None,
+) -> Booking:
+    """Reserve the first unlocked candidate slot and create its booking."""
+    target = candidates.limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    row = (
+        await db.execute(
+            update(BookingSlot)
+            .where(BookingSlot.id == target)
+            .values(is_available=False)
+            .returning(
+                BookingSlot.id,
+                BookingSlot.instructor_id,
+                BookingSlot.start_time,
+                BookingSlot.end_time,
+                BookingSlot.price_amount,
+            )
+        )
+    ).one_or_none()
+    if row is None:
+        raise SlotUnavailable("Slot is no longer available")
+
+    booking = Booking(
+        student_id=student_id,
+        instructor_id=row.instructor_id,
+        slot_id=row.id,
+        booking_type=booking_type,
+        status=BookingStatus.PENDING,
+        scheduled_start=row.start_time,
+        scheduled_end=row.end_time,
+        price_amount=row.price_amount,
+        student_notes=student_notes,
+    )
+    db.add(booking)
+    try:
+        await db.flush()
+    except IntegrityError as exc:
+        # The transaction is aborted; the caller's session dependency rolls back
+        raise SlotUnavailable("Slot is already booked") from exc
+    notify_after_commit(
+        db, student_id, "booking_confirmed", start=row.start_time, booking_id=booking.id
+    )
+    return booking
+
+
+async def reserve_slot(
+    db: AsyncSession,
+    slot_id: int,
+    student_id: int,
+    booking_type: BookingType,
+    student_notes: str | None = None,
+) -> Booking:
+    """
+    Reserve one slot for the student.
+
+    Raises:
+        SlotUnavailable: The slot is taken, being taken, past or missing
+    """
+    candidates = select(BookingSlot.id).where(
+        BookingSlot.id == slot_id,
+        BookingSlot.is_available.is_(True),
+        BookingSlot.start_time > func.now(),
+    )
+    return await _reserve(db, candidates, student_id, booking_type, student_notes)
+
+
+async def reserve_first_available(
+    db: AsyncSession,
+    instructor_ids: Sequence[int],
+    start: datetime,
+    end: datetime,
+    student_id: int,
+    booking_type: BookingType,
+    student_notes: str | None = None,
+) -> Booking:
+    """
+    Reserve the earliest free slot of any of the instructors in ``[start, end)``.
+
+    Concurrent callers are handed different slots.
+
+    Raises:
+        SlotUnavailable: No free slot is left in the window
+    """
+    candidates = (
+        _free_slots(instructor_ids, start, end)
+        .with_only_columns(BookingSlot.id)
+        .order_by(BookingSlot.start_time, BookingSlot.id)
+    )
+    return await _reserve(db, candidates, student_id, booking_type, student_notes)
+
+
+async def cancel_booking(db: AsyncSession, booking: Booking) -> Booking:
+    """
+    Cancel a booking and free its slot if the slot is still in the future.
+
+    Raises:
+        BookingNotCancellable: The booking is not pending or confirmed
+    """
+    if booking.status not in (BookingStatus.PENDING, BookingStatus.CONFIRMED):
+        raise BookingNotCancellable(f"Booking is {booking.status.value}")
+
+    booking.status = BookingStatus.CANCELLED
+    if booking.slot_id is not None:
+        await db.execute(
+            update(BookingSlot)
+            .where(BookingSlot.id == booking.slot_id, BookingSlot.start_time > func.now())
+            .values(is_available=True)
+        )
+    await db.flush()
+    return booking
+
+
+async def complete_booking(db: AsyncSession, booking: Booking) -> Booking:
+    """
+    Mark a started booking as completed and count it for the instructor.
+
+    Raises:
+        BookingNotCompletable: The booking is not pending or confirmed, or has not started
+    """
+    if booking.status not in (BookingStatus.PENDING, BookingStatus.CONFIRMED):
+        raise BookingNotCompletable(f"Booking is {booking.status.value}")
+    if booking.scheduled_start > datetime.now(timezone.utc):
+        raise BookingNotCompletable("Booking has not started yet")
+
+    booking.status = BookingStatus.COMPLETED
+    await db.flush()
+    await record_completed_session(db, booking.instructor_id)
+    return booking
+
+
+async def rate_booking(db: AsyncSession, booking: Booking, stars: int) -> Booking:
+    """
+    Record the student's rating of a completed booking; rating it again
+    replaces the earlier rating in the instructor's average.
+
+    Raises:
+        BookingNotRatable: The booking is not completed
+    """
+    if booking.status != BookingStatus.COMPLETED:
+        raise BookingNotRatable("Only completed bookings can be rated")
+
+    previous = booking.student_rating
+    booking.student_rating = stars
+    await db.flush()
+    if stars != previous:
+        await record_rating(db, booking.instructor_id, stars, previous)
+    return booking
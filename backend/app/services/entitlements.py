@@ -0,0 +1,392 @@
+"""
+Tariff entitlements: the features and limits of an organization's tariff.
+
+Checks are served from an in-process TTL cache. Each entry holds, for one
+organization, the tariff's features and limits, the subscription state and
+the usage counters, loaded with one query on a miss. A feature gate or
+limit check is then a dictionary lookup.
+
+Usage counters live in ``organization_usage`` and are maintained
+incrementally. When a flush adds, removes or changes organization members
+through the ORM, one upsert per organization applies the deltas. That
+statement also returns the tariff's limits, so an addition that would exceed
+one fails the flush with ``LimitExceeded``, even if the cache is stale.
+
+After commit:
+- the deltas are applied to the cached entry;
+- subscription and tariff changes drop cached entries.
+Other processes see changes within ``ENTITLEMENT_CACHE_TTL_SECONDS``.
+
+Bulk Core UPDATEs of users bypass ORM events. Run ``recount_usage``
+(``python -m app.services.entitlements``) after them.
+
+A tariff's limits apply whenever the organization has a subscription.
+Its features also need the subscription to be active (or a trial) and
+unexpired. A limit missing from the tariff is unlimited.
+"""
+import time
+from collections import Counter
+from typing import Any
+
+from sqlalchemy import event, func, inspect, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstanceState, Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.organization import Organization, OrganizationUsage
+from app.models.payment import Subscription, SubscriptionStatus, Tariff
+from app.models.user import User, UserRole
+
+STAFF_ROLES = frozenset({UserRole.TEACHER, UserRole.INSTRUCTOR, UserRole.MENTOR})
+# Tariff limit -> usage counter and counter units per limit unit
+LIMITS = {
+    "max_teachers": ("teachers", 1),
+    "max_students": ("students", 1),
+    "max_storage_mb": ("storage_bytes", 1024 * 1024),
+}
+COUNTERS = ("teachers", "students", "storage_bytes")
+_LIMIT_OF_COUNTER = {counter: limit for limit, (counter, _) in LIMITS.items()}
+
+# User columns deciding whether and how a user counts towards a limit
+MEMBERSHIP_ATTRIBUTES = ("organization_id", "role", "is_active", "deleted_at")
+
+_USAGE_KEY = "entitlement_usage_deltas"
+_INVALIDATED_KEY = "entitlement_invalidations"
+_ALL = -1  # Marker in _INVALIDATED_KEY: a tariff changed, drop every entry
+
+
+class EntitlementError(Exception):
+    """Base class for requests the organization's tariff does not allow."""
+
+
+class FeatureNotAvailable(EntitlementError):
+    """Raised when the tariff (or a lapsed subscription) lacks a feature."""
+
+    def __init__(self, feature: str) -> None:
+        super().__init__(f"Your plan does not include {feature}")
+        self.feature = feature
+
+
+class LimitExceeded(EntitlementError):
+    """Raised when a change would take usage over a tariff limit."""
+
+    def __init__(self, limit: str, allowed: int) -> None:
+        super().__init__(f"Your plan allows {limit.removeprefix('max_')} up to {allowed}")
+        self.limit = limit
+        self.allowed = allowed
+
+
+class Entitlements:
+    """What an organization's tariff allows, and how much of it is used."""
+
+    __slots__ = ("organization_id", "features", "limits", "active_until", "usage")
+
+    def __init__(
+        self,
+        organization_id: int,
+        features: frozenset[str],
+        limits: dict[str, int],
+        active_until: float | None,
+        usage: dict[str, int],
+    ) -> None:
+        self.organization_id = organization_id
+        self.features = features
+        self.limits = limits
+        self.active_until = active_until  # Epoch seconds; None when not active
+        self.usage = usage
+
+    @property
+    def active(self) -> bool:
+        return self.active_until is not None and time.time() < self.active_until
+
+    def has(self, feature: str) -> bool:
+        """Whether the feature is included and the subscription is active."""
+        return feature in self.features and self.active
+
+    def remaining(self, limit: str) -> int | None:
+        """Counter units left under ``limit``; None if unlimited."""
+        allowed = self.limits.get(limit)
+        if allowed is None:
+            return None
+        counter, unit = LIMITS[limit]
+        return max(allowed * unit - self.usage.get(counter, 0), 0)
+
+    def allows(self, limit: str, amount: int = 1) -> bool:
+        """Whether ``amount`` more counter units fit under ``limit``."""
+        remaining = self.remaining(limit)
+        return remaining is None or amount <= remaining
+
+    def require(self, feature: str) -> None:
+        """Raise ``FeatureNotAvailable`` unless ``has(feature)``."""
+        if not self.has(feature):
+            raise FeatureNotAvailable(feature)
+
+    def check(self, limit: str, amount: int = 1) -> None:
+        """Raise ``LimitExceeded`` unless ``allows(limit, amount)``."""
+        if not self.allows(limit, amount):
+            raise LimitExceeded(limit, self.limits[limit])
+
+
+def _entitlements_statement(organization_id: int) -> Any:
+    return (
+        select(
+            Subscription.status,
+            Subscription.expires_at,
+            Tariff.features,
+            Tariff.limits,
+            *(getattr(OrganizationUsage, counter) for counter in COUNTERS),
+        )
+        .select_from(Organization)
+        .outerjoin(Subscription, Subscription.organization_id == Organization.id)
+        .outerjoin(Tariff, Tariff.id == Subscription.tariff_id)
+        .outerjoin(OrganizationUsage, OrganizationUsage.organization_id == Organization.id)
+        .where(Organization.id == organization_id)
+    )
+
+
+class EntitlementCache:
+    """TTL cache of ``Entitlements`` keyed by organization ID."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._local: TTLCache[int, Entitlements] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.loads = 0
+        self.invalidations = 0
+
+    async def get(self, db: AsyncSession, organization_id: int) -> Entitlements:
+        """Return the organization's entitlements, loading them on a miss."""
+        entitlements = self._local.get(organization_id)
+        if entitlements is not None:
+            return entitlements
+
+        row = (await db.execute(_entitlements_statement(organization_id))).one_or_none()
+        if row is None:
+            # No such organization: nothing is included
+            entitlements = Entitlements(
+                organization_id, frozenset(), {}, None, dict.fromkeys(COUNTERS, 0)
+            )
+        else:
+            active = row.status in (SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIAL)
+            entitlements = Entitlements(
+                organization_id,
+                frozenset(row.features or ()),
+                {
+                    name: int(value)
+                    for name, value in (row.limits or {}).items()
+                    if name in LIMITS and value is not None
+                },
+                row.expires_at.timestamp() if active else None,
+                {counter: getattr(row, counter) or 0 for counter in COUNTERS},
+            )
+        self.loads += 1
+        self._local.set(organization_id, entitlements)
+        return entitlements
+
+    def apply_usage(self, organization_id: int, counter: str, delta: int) -> None:
+        """Apply a committed counter change to the cached entry, if any."""
+        entitlements = self._local.get(organization_id)
+        if entitlements is not None:
+            entitlements.usage[counter] = max(entitlements.usage.get(counter, 0) + delta, 0)
+
+    def invalidate(self, organization_id: int) -> None:
+        """Drop an organization's entry."""
+        self.invalidations += 1
+        self._local.pop(organization_id)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._local.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache counters."""
+        return {
+            "local": self._local.stats(),
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+entitlements = EntitlementCache(
+    maxsize=settings.ENTITLEMENT_CACHE_MAX_SIZE,
+    ttl=settings.ENTITLEMENT_CACHE_TTL_SECONDS,
+)
+
+
+def _usage_statement(organization_id: int, changes: dict[str, int]) -> Any:
+    """
+    Upsert counter deltas, returning the new counters and the tariff's limits.
+    """
+    usage = OrganizationUsage.__table__
+    limits = (
+        select(Tariff.limits)
+        .join(Subscription, Subscription.tariff_id == Tariff.id)
+        .where(Subscription.organization_id == usage.c.organization_id)
+        .scalar_subquery()
+    )
+    return (
+        pg_insert(usage)
+        .values(
+            organization_id=organization_id,
+            **{counter: max(changes.get(counter, 0), 0) for counter in COUNTERS},
+        )
+        .on_conflict_do_update(
+            index_elements=[usage.c.organization_id],
+            set_={
+                counter: func.greatest(usage.c[counter] + delta, 0)
+                for counter, delta in changes.items()
+            },
+        )
+        .returning(*(usage.c[counter] for counter in changes), limits.label("limits"))
+    )
+
+
+def _check_limits(changes: dict[str, int], row: Any) -> None:
+    """Raise ``LimitExceeded`` if a counter that grew is now over its limit."""
+    limits = row.limits or {}
+    for counter, delta in changes.items():
+        limit = _LIMIT_OF_COUNTER[counter]
+        allowed = limits.get(limit)
+        if delta > 0 and allowed is not None and getattr(row, counter) > allowed * LIMITS[limit][1]:
+            raise LimitExceeded(limit, allowed)
+
+
+def _record_deltas(info: dict[str, Any], organization_id: int, changes: dict[str, int]) -> None:
+    pending: Counter[tuple[int, str]] = info.setdefault(_USAGE_KEY, Counter())
+    for counter, delta in changes.items():
+        pending[organization_id, counter] += delta
+
+
+async def record_usage(db: AsyncSession, organization_id: int, **changes: int) -> None:
+    """
+    Add to usage counters (e.g. ``storage_bytes=size``) in the current
+    transaction; raises ``LimitExceeded`` if a limit would be exceeded.
+    """
+    changes = {counter: delta for counter, delta in changes.items() if delta}
+    if not changes:
+        return
+    row = (await db.execute(_usage_statement(organization_id, changes))).one()
+    _check_limits(changes, row)
+    _record_deltas(db.info, organization_id, changes)
+
+
+async def recount_usage(db: AsyncSession) -> int:
+    """
+    Recompute member counters of every organization from ``users``.
+
+    Storage usage is kept. Returns the number of organizations counted.
+    """
+    usage = OrganizationUsage.__table__
+    counted = (
+        select(
+            Organization.id,
+            func.count(User.id).filter(User.role.in_(STAFF_ROLES)),
+            func.count(User.id).filter(User.role == UserRole.STUDENT),
+            literal_column("0"),
+        )
+        .select_from(Organization)
+        .outerjoin(
+            User,
+            (User.organization_id == Organization.id)
+            & User.is_active
+            & User.deleted_at.is_(None),
+        )
+        .group_by(Organization.id)
+    )
+    statement = pg_insert(usage).from_select(
+        ["organization_id", "teachers", "students", "storage_bytes"], counted
+    )
+    result = await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[usage.c.organization_id],
+            set_={
+                "teachers": statement.excluded.teachers,
+                "students": statement.excluded.students,
+            },
+        )
+    )
+    entitlements.clear()
+    return result.rowcount
+
+
+def _membership(state: InstanceState[User], committed: bool) -> tuple[int, str] | None:
+    """The (organization, counter) a user counts towards, before or after the flush."""
+    values = {}
+    for key in MEMBERSHIP_ATTRIBUTES:
+        attribute = state.attrs[key]
+        history = attribute.history
+        if committed and (history.deleted or history.unchanged):
+            values[key] = (history.deleted or history.unchanged)[0]
+        else:
+            values[key] = attribute.value
+
+    if values["organization_id"] is None or not values["is_active"] or values["deleted_at"]:
+        return None
+    if values["role"] == UserRole.STUDENT:
+        return values["organization_id"], "students"
+    if values["role"] in STAFF_ROLES:
+        return values["organization_id"], "teachers"
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _count_membership_changes(session: Session, flush_context: Any) -> None:
+    deltas: Counter[tuple[int, str]] = Counter()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, User):
+            state = inspect(instance)
+            before = None if instance in session.new else _membership(state, committed=True)
+            after = None if instance in session.deleted else _membership(state, committed=False)
+            if before != after:
+                if before is not None:
+                    deltas[before] -= 1
+                if after is not None:
+                    deltas[after] += 1
+        elif isinstance(instance, Subscription):
+            session.info.setdefault(_INVALIDATED_KEY, set()).add(instance.organization_id)
+        elif isinstance(instance, Tariff):
+            session.info.setdefault(_INVALIDATED_KEY, set()).add(_ALL)
+
+    by_organization: dict[int, dict[str, int]] = {}
+    for (organization_id, counter), delta in deltas.items():
+        if delta:
+            by_organization.setdefault(organization_id, {})[counter] = delta
+
+    # Sorted, so concurrent flushes lock usage rows in the same order
+    for organization_id, changes in sorted(by_organization.items()):
+        row = session.connection().execute(_usage_statement(organization_id, changes)).one()
+        _check_limits(changes, row)
+        _record_deltas(session.info, organization_id, changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_usage(session: Session) -> None:
+    for (organization_id, counter), delta in session.info.pop(_USAGE_KEY, Counter()).items():
+        entitlements.apply_usage(organization_id, counter, delta)
+    invalidated = session.info.pop(_INVALIDATED_KEY, set())
+    if _ALL in invalidated:
+        entitlements.clear()
+        return
+    for organization_id in invalidated:
+        entitlements.invalidate(organization_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_usage_changes(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_USAGE_KEY, None)
+    session.info.pop(_INVALIDATED_KEY, None)
+
+
+if __name__ == "__main__":
+    """Recount organization member counters."""
+    import asyncio
+
+    from app.db.session import AsyncSessionLocal
+
+    async def main() -> int:
+        async with AsyncSessionLocal() as db:
+            count = await recount_usage(db)
+            await db.commit()
+        return count
+
+    print(f"Recounted {asyncio.run(main())} organizations")
@@ -0,0 +1,411 @@
+"""
+Exam analytics job: question difficulty, discrimination and pass rates.
+
+``exam_answers`` is streamed in ``(session_id, question_id)`` order (the
+unique index) as plain column tuples and accumulated into NumPy arrays
+indexed by question and category. No ORM objects are loaded and memory is
+O(sessions + questions) however many answers there are, so the job scales
+to tens of millions of rows.
+
+Only completed sessions count. Computed per run:
+- per question: p-value (share correct) and the upper-lower 27%
+  discrimination index, ranking sessions by their final score
+- per category: answer accuracy and the share of sessions whose accuracy on
+  the category reaches the exam's passing score
+- per organization: count, mean, quartiles, pass rate and a 10-point
+  histogram of session scores of its students
+
+Answers are read from the replica, if configured; results replace the
+summary tables on the primary in one transaction. Run with
+``python -m app.services.exam_analytics`` (``make analytics``).
+"""
+import logging
+import math
+import time
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, SnapshotSessionLocal
+from app.models.analytics import (
+    CategoryStatistics,
+    OrganizationExamStatistics,
+    QuestionStatistics,
+)
+from app.models.exam import Exam, ExamAnswer, ExamSession, ExamStatus
+from app.models.question import Question
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Share of sessions in each of the upper and lower groups (Kelley's 27%)
+GROUP_FRACTION = 0.27
+HISTOGRAM_BINS = 10
+# p-value thresholds between suggested difficulty levels 5, 4, 3, 2, 1
+_DIFFICULTY_CUTS = np.array([0.2, 0.4, 0.6, 0.8])
+
+
+async def _stream_columns(
+    db: AsyncSession, statement: Select[Any], dtypes: Sequence[Any], chunk_size: int
+) -> AsyncIterator[tuple[np.ndarray, ...]]:
+    """Yield query results as one NumPy array per column, ``chunk_size`` rows at a time."""
+    result = await db.stream(statement.execution_options(yield_per=chunk_size))
+    async for rows in result.partitions():
+        columns = zip(*rows)
+        yield tuple(np.array(column, dtype=dtype) for column, dtype in zip(columns, dtypes))
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Positions of ``values`` in the sorted ``keys`` array, and which were found."""
+    if len(keys) == 0:
+        return np.zeros(len(values), dtype=np.intp), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+    return positions, keys[positions] == values
+
+
+def group_quantile(
+    sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float
+) -> np.ndarray:
+    """Linearly interpolated ``q`` quantile of each contiguous, sorted group."""
+    position = starts + (counts - 1) * q
+    low = np.floor(position).astype(np.intp)
+    high = np.ceil(position).astype(np.intp)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+class SessionTable:
+    """
+    Completed sessions sorted by ID, with their score, passing threshold and
+    discrimination group (1 = upper, -1 = lower, 0 = middle).
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        passing_scores: np.ndarray,
+        organization_ids: np.ndarray,
+    ) -> None:
+        self.ids = ids
+        self.scores = scores
+        self.passing_scores = passing_scores
+        self.organization_ids = organization_ids
+
+        self.groups = np.zeros(len(ids), dtype=np.int8)
+        group_size = math.ceil(len(ids) * GROUP_FRACTION)
+        if group_size:
+            by_score = np.argsort(scores, kind="stable")
+            self.groups[by_score[:group_size]] = -1
+            self.groups[by_score[-group_size:]] = 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class AnswerStatistics:
+    """
+    Accumulates answer chunks into per-question and per-category counters.
+
+    Chunks must arrive ordered by session ID; the last session of each chunk
+    is held back so per-session category accuracy is computed over all of
+    the session's answers.
+    """
+
+    def __init__(
+        self, sessions: SessionTable, question_ids: np.ndarray, question_categories: np.ndarray
+    ) -> None:
+        self.sessions = sessions
+        self.question_ids = question_ids
+        self.category_ids, self.question_category = np.unique(
+            question_categories, return_inverse=True
+        )
+
+        questions = len(question_ids)
+        categories = len(self.category_ids)
+        self.attempts = np.zeros(questions, dtype=np.int64)
+        self.correct = np.zeros(questions, dtype=np.int64)
+        self.upper_attempts = np.zeros(questions, dtype=np.int64)
+        self.upper_correct = np.zeros(questions, dtype=np.int64)
+        self.lower_attempts = np.zeros(questions, dtype=np.int64)
+        self.lower_correct = np.zeros(questions, dtype=np.int64)
+        self.category_attempts = np.zeros(categories, dtype=np.int64)
+        self.category_correct = np.zeros(categories, dtype=np.int64)
+        self.category_sessions = np.zeros(categories, dtype=np.int64)
+        self.category_passed = np.zeros(categories, dtype=np.int64)
+        self.answers = 0
+
+        self._carry: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    def add(self, session_ids: np.ndarray, question_ids: np.ndarray, correct: np.ndarray) -> None:
+        """Add a chunk of answers (ordered by session ID)."""
+        if self._carry is not None:
+            session_ids, question_ids, correct = (
+                np.concatenate((carried, new))
+                for carried, new in zip(self._carry, (session_ids, question_ids, correct))
+            )
+            self._carry = None
+        if len(session_ids) == 0:
+            return
+
+        cut = int(np.searchsorted(session_ids, session_ids[-1]))
+        self._carry = (session_ids[cut:], question_ids[cut:], correct[cut:])
+        self._process(session_ids[:cut], question_ids[:cut], correct[:cut])
+
+    def finish(self) -> None:
+        """Process the held-back last session."""
+        if self._carry is not None:
+            self._process(*self._carry)
+            self._carry = None
+
+    def _process(
+        self, session_ids: np.ndarray, question_ids: np.ndarray, correct: np.ndarray
+    ) -> None:
+        session_pos, in_sessions = _lookup(self.sessions.ids, session_ids)
+        question_pos, in_questions = _lookup(self.question_ids, question_ids)
+        keep = in_sessions & in_questions
+        session_pos = session_pos[keep]
+        question_pos = question_pos[keep]
+        correct = correct[keep].astype(np.int64)
+        if len(correct) == 0:
+            return
+        self.answers += len(correct)
+
+        questions = len(self.question_ids)
+        self.attempts += np.bincount(question_pos, minlength=questions)
+        self.correct += np.bincount(question_pos, weights=correct, minlength=questions).astype(
+            np.int64
+        )
+
+        groups = self.sessions.groups[session_pos]
+        for group, attempts, hits in (
+            (1, self.upper_attempts, self.upper_correct),
+            (-1, self.lower_attempts, self.lower_correct),
+        ):
+            in_group = groups == group
+            attempts += np.bincount(question_pos[in_group], minlength=questions)
+            hits += np.bincount(
+                question_pos[in_group], weights=correct[in_group], minlength=questions
+            ).astype(np.int64)
+
+        categories = len(self.category_ids)
+        category_pos = self.question_category[question_pos]
+        self.category_attempts += np.bincount(category_pos, minlength=categories)
+        self.category_correct += np.bincount(
+            category_pos, weights=correct, minlength=categories
+        ).astype(np.int64)
+
+        # Accuracy of each (session, category) pair against the exam's passing score
+        pair_keys, pair_index = np.unique(
+            session_pos.astype(np.int64) * categories + category_pos, return_inverse=True
+        )
+        pair_answers = np.bincount(pair_index)
+        pair_correct = np.bincount(pair_index, weights=correct)
+        pair_session = pair_keys // categories
+        pair_category = pair_keys % categories
+        passed = pair_correct * 100.0 / pair_answers >= self.sessions.passing_scores[pair_session]
+        self.category_sessions += np.bincount(pair_category, minlength=categories)
+        self.category_passed += np.bincount(
+            pair_category, weights=passed, minlength=categories
+        ).astype(np.int64)
+
+    def question_rows(self) -> list[dict[str, Any]]:
+        """Rows for ``question_statistics`` (questions with at least one attempt)."""
+        answered = self.attempts > 0
+        p_values = self.correct[answered] / self.attempts[answered]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            discrimination = (self.upper_correct / self.upper_attempts) - (
+                self.lower_correct / self.lower_attempts
+            )
+        discrimination = discrimination[answered]
+        difficulty = 5 - np.digitize(p_values, _DIFFICULTY_CUTS)
+
+        return [
+            {
+                "question_id": question_id,
+                "attempts": attempts,
+                "correct": correct,
+                "p_value": p_value,
+                "discrimination": None if math.isnan(index) else index,
+                "suggested_difficulty": level,
+            }
+            for question_id, attempts, correct, p_value, index, level in zip(
+                self.question_ids[answered].tolist(),
+                self.attempts[answered].tolist(),
+                self.correct[answered].tolist(),
+                p_values.tolist(),
+                discrimination.tolist(),
+                difficulty.tolist(),
+            )
+        ]
+
+    def category_rows(self) -> list[dict[str, Any]]:
+        """Rows for ``category_statistics`` (uncategorized questions are skipped)."""
+        present = (self.category_attempts > 0) & (self.category_ids > 0)
+        rows = []
+        for category_id, attempts, correct, sessions, passed in zip(
+            self.category_ids[present].tolist(),
+            self.category_attempts[present].tolist(),
+            self.category_correct[present].tolist(),
+            self.category_sessions[present].tolist(),
+            self.category_passed[present].tolist(),
+        ):
+            rows.append(
+                {
+                    "category_id": category_id,
+                    "attempts": attempts,
+                    "correct": correct,
+                    "accuracy": correct / attempts,
+                    "sessions": sessions,
+                    "passed_sessions": passed,
+                    "pass_rate": passed / sessions,
+                }
+            )
+        return rows
+
+
+def organization_rows(sessions: SessionTable) -> list[dict[str, Any]]:
+    """Rows for ``organization_exam_statistics`` (students without an organization are skipped)."""
+    member = sessions.organization_ids > 0
+    organizations = sessions.organization_ids[member]
+    scores = sessions.scores[member].astype(np.float64)
+    passed = (scores >= sessions.passing_scores[member]).astype(np.int64)
+    if len(scores) == 0:
+        return []
+
+    order = np.lexsort((scores, organizations))
+    organizations, scores, passed = organizations[order], scores[order], passed[order]
+    organization_ids, starts, counts = np.unique(
+        organizations, return_index=True, return_counts=True
+    )
+
+    buckets = np.clip((scores // (100 / HISTOGRAM_BINS)).astype(np.intp), 0, HISTOGRAM_BINS - 1)
+    positions = np.repeat(np.arange(len(organization_ids)), counts)
+    histograms = np.bincount(
+        positions * HISTOGRAM_BINS + buckets, minlength=len(organization_ids) * HISTOGRAM_BINS
+    ).reshape(-1, HISTOGRAM_BINS)
+
+    return [
+        {
+            "organization_id": organization_id,
+            "sessions": count,
+            "mean_score": mean,
+            "p25_score": p25,
+            "median_score": median,
+            "p75_score": p75,
+            "pass_rate": pass_rate,
+            "histogram": histogram,
+        }
+        for organization_id, count, mean, p25, median, p75, pass_rate, histogram in zip(
+            organization_ids.tolist(),
+            counts.tolist(),
+            (np.add.reduceat(scores, starts) / counts).tolist(),
+            group_quantile(scores, starts, counts, 0.25).tolist(),
+            group_quantile(scores, starts, counts, 0.5).tolist(),
+            group_quantile(scores, starts, counts, 0.75).tolist(),
+            (np.add.reduceat(passed, starts) / counts).tolist(),
+            histograms.tolist(),
+        )
+    ]
+
+
+async def _load_sessions(db: AsyncSession, chunk_size: int) -> SessionTable:
+    statement = (
+        select(
+            ExamSession.id,
+            ExamSession.score,
+            Exam.passing_score,
+            func.coalesce(User.organization_id, 0),
+        )
+        .join(Exam, Exam.id == ExamSession.exam_id)
+        .join(User, User.id == ExamSession.student_id)
+        .where(ExamSession.status == ExamStatus.COMPLETED, ExamSession.score.is_not(None))
+        .order_by(ExamSession.id)
+    )
+    dtypes = (np.int32, np.float32, np.float32, np.int32)
+    chunks = [chunk async for chunk in _stream_columns(db, statement, dtypes, chunk_size)]
+    if not chunks:
+        return SessionTable(*(np.array([], dtype=dtype) for dtype in dtypes))
+    return SessionTable(*(np.concatenate(column) for column in zip(*chunks)))
+
+
+async def compute_exam_analytics(
+    db: AsyncSession, chunk_size: int = settings.ANALYTICS_CHUNK_SIZE
+) -> tuple[AnswerStatistics, list[dict[str, Any]]]:
+    """Stream sessions and answers; return answer statistics and organization rows."""
+    sessions = await _load_sessions(db, chunk_size)
+
+    questions = (
+        await db.execute(
+            select(Question.id, func.coalesce(Question.category_id, 0)).order_by(Question.id)
+        )
+    ).all()
+    statistics = AnswerStatistics(
+        sessions,
+        np.array([row[0] for row in questions], dtype=np.int32),
+        np.array([row[1] for row in questions], dtype=np.int32),
+    )
+
+    answers = select(ExamAnswer.session_id, ExamAnswer.question_id, ExamAnswer.is_correct).order_by(
+        ExamAnswer.session_id, ExamAnswer.question_id
+    )
+    async for chunk in _stream_columns(db, answers, (np.int32, np.int32, np.bool_), chunk_size):
+        statistics.add(*chunk)
+    statistics.finish()
+
+    return statistics, organization_rows(sessions)
+
+
+async def run_exam_analytics(
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    chunk_size: int = settings.ANALYTICS_CHUNK_SIZE,
+    read_session_factory: async_sessionmaker[AsyncSession] = SnapshotSessionLocal,
+) -> dict[str, int]:
+    """
+    Recompute all exam analytics and replace the summary tables.
+
+    Sessions and answers are read in one read-only snapshot transaction from
+    ``read_session_factory`` (the read replica when one is configured), so
+    they agree even while exams finish; results are written through
+    ``session_factory``.
+    """
+    started = time.perf_counter()
+    async with read_session_factory() as db:
+        statistics, organizations = await compute_exam_analytics(db, chunk_size)
+
+    questions = statistics.question_rows()
+    categories = statistics.category_rows()
+    async with session_factory() as db:
+        for model, rows in (
+            (QuestionStatistics, questions),
+            (CategoryStatistics, categories),
+            (OrganizationExamStatistics, organizations),
+        ):
+            await db.execute(delete(model))
+            if rows:
+                await db.execute(insert(model), rows)
+        await db.commit()
+
+    summary = {
+        "sessions": len(statistics.sessions),
+        "answers": statistics.answers,
+        "questions": len(questions),
+        "categories": len(categories),
+        "organizations": len(organizations),
+    }
+    logger.info(
+        "Exam analytics computed in %.1fs: %s", time.perf_counter() - started, summary
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    """Run the exam analytics job."""
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_exam_analytics()))
@@ -0,0 +1,308 @@
+"""
+Exam progress checkpoints.
+
+Every answer is written through to a compact Redis hash per session before
+it is acknowledged, so progress survives a worker crash and any worker (so
+any device) resumes a session with one HGETALL instead of reading
+``exam_sessions`` and ``exam_answers``. Postgres still receives answers
+write-behind, in batches, from the exam engine's flusher.
+
+Redis layout:
+- ``exam:{<session_id>}`` - hash: ``meta`` (JSON: exam, student, question
+  IDs, answer key, passing score, deadline), ``index`` (current question
+  index), ``version`` (incremented by every write) and ``<question_id>`` ->
+  selected option ID for every answer; expires
+  ``EXAM_CHECKPOINT_RETENTION_SECONDS`` after the deadline
+- ``exam:dirty`` - sorted set of sessions with answers not yet in Postgres,
+  scored by the time of their latest answer
+
+The hash is the session's shared state: a worker holding the session in
+memory compares ``version`` with the one it last saw to pick up answers
+given through other workers. Writes never recreate a deleted hash, so a
+session closed (and its hash deleted) by one worker is not revived by
+another; ``record`` and ``version`` report it as ``MISSING`` instead.
+
+A flush removes a session from ``exam:dirty`` only if no answer arrived
+after the flushed ones were taken. Sessions that stay dirty longer than
+``EXAM_CHECKPOINT_RECOVERY_DELAY_SECONDS`` lost their worker before it
+flushed; any worker replays them from their hash (see
+``ExamEngine.recover``). Remaining time is not stored: it follows from the
+deadline.
+"""
+import json
+import time
+from typing import Any
+
+from redis.commands.core import AsyncScript
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+DIRTY_KEY = "exam:dirty"
+MISSING = -1  # Version of a checkpoint that does not exist
+
+# KEYS: session hash; ARGV: expire at, field, value, ...
+# Returns the new version, or -1 if the hash does not exist.
+RECORD_SCRIPT = """
+if redis.call("HEXISTS", KEYS[1], "meta") == 0 then
+    return -1
+end
+for i = 2, #ARGV, 2 do
+    redis.call("HSET", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("EXPIREAT", KEYS[1], ARGV[1])
+return redis.call("HINCRBY", KEYS[1], "version", 1)
+"""
+
+# KEYS: dirty set; ARGV: session ID, flushed-at time, ...
+MARK_FLUSHED_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    local score = redis.call("ZSCORE", KEYS[1], ARGV[i])
+    if score and tonumber(score) <= tonumber(ARGV[i + 1]) then
+        redis.call("ZREM", KEYS[1], ARGV[i])
+    end
+end
+return 0
+"""
+
+_META = "meta"
+_INDEX = "index"
+_VERSION = "version"
+
+
+def _key(session_id: int) -> str:
+    return f"exam:{{{session_id}}}"
+
+
+class Checkpoint:
+    """A session's checkpointed progress."""
+
+    __slots__ = ("session_id", "meta", "answers", "current_index", "version")
+
+    def __init__(
+        self,
+        session_id: int,
+        meta: dict[str, Any],
+        answers: dict[int, str],
+        current_index: int,
+        version: int = 0,
+    ) -> None:
+        self.session_id = session_id
+        self.meta = meta
+        self.answers = answers
+        self.current_index = current_index
+        self.version = version
+
+    @classmethod
+    def from_hash(cls, session_id: int, fields: dict[str, str]) -> "Checkpoint | None":
+        if _META not in fields:
+            return None
+        answers = {
+            int(field): option_id for field, option_id in fields.items() if field.isdigit()
+        }
+        return cls(
+            session_id,
+            json.loads(fields[_META]),
+            answers,
+            int(fields.get(_INDEX, 0)),
+            int(fields.get(_VERSION, 0)),
+        )
+
+
+class ExamCheckpointStore:
+    """
+    Session checkpoints, in Redis or (``use_redis=False``) in process.
+
+    The in-process mode has the same semantics but does not survive the
+    process; it is meant for development and tests.
+    """
+
+    def __init__(self, use_redis: bool = True) -> None:
+        self.use_redis = use_redis
+        self._mark_flushed_script: AsyncScript | None = None
+        self._record_script: AsyncScript | None = None
+        # In-process mode: session ID -> (hash, expires at), and the dirty set
+        self._hashes: dict[int, tuple[dict[str, str], float]] = {}
+        self._dirty: dict[int, float] = {}
+        self.writes = 0
+        self.loads = 0
+
+    async def create(
+        self,
+        session_id: int,
+        meta: dict[str, Any],
+        current_index: int = 0,
+        answers: dict[int, str] | None = None,
+    ) -> None:
+        """Checkpoint a new or rehydrated session; its version starts at 0."""
+        fields = {
+            _META: json.dumps(meta, separators=(",", ":")),
+            _INDEX: str(current_index),
+            _VERSION: "0",
+        }
+        for question_id, option_id in (answers or {}).items():
+            fields[str(question_id)] = option_id
+        expires_at = meta["deadline"] + settings.EXAM_CHECKPOINT_RETENTION_SECONDS
+        self.writes += 1
+        if not self.use_redis:
+            self._hashes[session_id] = (fields, expires_at)
+            return
+
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(_key(session_id), mapping=fields)
+            pipe.expireat(_key(session_id), int(expires_at))
+            await pipe.execute()
+
+    async def record(
+        self,
+        session_id: int,
+        deadline: float,
+        question_id: int | None = None,
+        option_id: str | None = None,
+        current_index: int | None = None,
+    ) -> int | None:
+        """
+        Checkpoint an answer and/or the current question index.
+
+        Returns the checkpoint's new version, ``MISSING`` if it does not
+        exist (nothing is written), or None if there was nothing to write.
+        """
+        fields: dict[str, str] = {}
+        if question_id is not None and option_id is not None:
+            fields[str(question_id)] = option_id
+        if current_index is not None:
+            fields[_INDEX] = str(current_index)
+        if not fields:
+            return None
+
+        answered = str(question_id) in fields
+        self.writes += 1
+        if not self.use_redis:
+            entry = self._live(session_id)
+            if entry is None:
+                return MISSING
+            entry[0].update(fields)
+            entry[0][_VERSION] = str(int(entry[0].get(_VERSION, 0)) + 1)
+            if answered:
+                self._dirty[session_id] = time.time()
+            return int(entry[0][_VERSION])
+
+        redis = get_redis()
+        if self._record_script is None:
+            self._record_script = redis.register_script(RECORD_SCRIPT)
+        expires_at = int(deadline + settings.EXAM_CHECKPOINT_RETENTION_SECONDS)
+        async with redis.pipeline(transaction=False) as pipe:
+            await self._record_script(
+                keys=[_key(session_id)],
+                args=[expires_at, *(item for pair in fields.items() for item in pair)],
+                client=pipe,
+            )
+            if answered:
+                pipe.zadd(DIRTY_KEY, {str(session_id): time.time()})
+            version, *_ = await pipe.execute()
+        return int(version)
+
+    async def version(self, session_id: int) -> int:
+        """The checkpoint's version, or ``MISSING``."""
+        if not self.use_redis:
+            entry = self._live(session_id)
+            return MISSING if entry is None else int(entry[0].get(_VERSION, 0))
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hexists(_key(session_id), _META)
+            pipe.hget(_key(session_id), _VERSION)
+            exists, version = await pipe.execute()
+        return int(version or 0) if exists else MISSING
+
+    def _live(self, session_id: int) -> tuple[dict[str, str], float] | None:
+        entry = self._hashes.get(session_id)
+        return entry if entry is not None and entry[1] > time.time() else None
+
+    async def load(self, session_ids: list[int]) -> dict[int, Checkpoint]:
+        """Load checkpoints by session ID; missing or expired ones are left out."""
+        self.loads += 1
+        if not self.use_redis:
+            hashes = {
+                session_id: dict(entry[0])
+                for session_id in session_ids
+                if (entry := self._live(session_id)) is not None
+            }
+        else:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for session_id in session_ids:
+                    pipe.hgetall(_key(session_id))
+                hashes = dict(zip(session_ids, await pipe.execute()))
+
+        checkpoints = {}
+        for session_id, fields in hashes.items():
+            checkpoint = Checkpoint.from_hash(session_id, fields)
+            if checkpoint is not None:
+                checkpoints[session_id] = checkpoint
+        return checkpoints
+
+    async def stale(self, dirty_before: float, limit: int) -> list[tuple[int, float]]:
+        """Sessions dirty since before ``dirty_before``, as ``(session ID, dirty at)``."""
+        if not self.use_redis:
+            entries = sorted(
+                (dirty_at, session_id)
+                for session_id, dirty_at in self._dirty.items()
+                if dirty_at < dirty_before
+            )
+            return [(session_id, dirty_at) for dirty_at, session_id in entries[:limit]]
+
+        entries = await get_redis().zrangebyscore(
+            DIRTY_KEY, "-inf", f"({dirty_before}", start=0, num=limit, withscores=True
+        )
+        return [(int(session_id), dirty_at) for session_id, dirty_at in entries]
+
+    async def mark_flushed(self, flushed: list[tuple[int, float]]) -> None:
+        """
+        Clear the dirty mark of sessions flushed as of the given times,
+        unless they were answered again since.
+        """
+        if not flushed:
+            return
+        if not self.use_redis:
+            for session_id, flushed_at in flushed:
+                if self._dirty.get(session_id, flushed_at + 1) <= flushed_at:
+                    del self._dirty[session_id]
+            return
+
+        if self._mark_flushed_script is None:
+            self._mark_flushed_script = get_redis().register_script(MARK_FLUSHED_SCRIPT)
+        await self._mark_flushed_script(
+            keys=[DIRTY_KEY],
+            args=[value for entry in flushed for value in entry],
+        )
+
+    async def delete(self, session_ids: list[int]) -> None:
+        """Drop the checkpoints of closed sessions."""
+        if not session_ids:
+            return
+        if not self.use_redis:
+            for session_id in session_ids:
+                self._hashes.pop(session_id, None)
+                self._dirty.pop(session_id, None)
+            return
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.delete(_key(session_id))
+            pipe.zrem(DIRTY_KEY, *[str(session_id) for session_id in session_ids])
+            await pipe.execute()
+
+    def clear(self) -> None:
+        """Forget in-process checkpoints."""
+        self._hashes.clear()
+        self._dirty.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return checkpoint counters."""
+        return {
+            "backend": "redis" if self.use_redis else "memory",
+            "writes": self.writes,
+            "loads": self.loads,
+        }
+
+
+exam_checkpoints = ExamCheckpointStore(use_redis=settings.EXAM_CHECKPOINT_STORE == "redis")
@@ -0,0 +1,1108 @@
+"""
+Server-side exam session engine.
+
+Active sessions are held in memory as compact ``SessionState`` records.
+Questions are drawn by the stratified sampler from the in-memory question
+bank snapshot, and answers are scored incrementally against its precomputed
+``question_id -> correct_option_id`` map and buffered; a background flusher
+writes the buffered answers of all sessions as multi-row
+``INSERT ... ON CONFLICT DO UPDATE`` statements into ``exam_answers``, so
+answering a question costs no database round trip.
+
+Every answer is also checkpointed to Redis before it is acknowledged
+(``app.services.exam_checkpoints``). Sessions missing from memory (worker
+restart, request routed to another worker, another device) are rehydrated
+from their checkpoint on first access, or from the database if there is
+none. A worker holding a session compares the checkpoint's version with
+its own on every access and merges answers given through other workers, so
+requests need not stick to one worker; a session whose checkpoint is gone
+is checked against the database and dropped if another worker closed it.
+The flusher writes session progress (score so far, current question,
+remaining time) to ``exam_sessions`` along with the answers, and replays
+checkpoints that a crashed worker left unflushed.
+
+Deadlines are server-authoritative: ``started_at + Exam.duration_minutes``,
+plus ``EXAM_DEADLINE_GRACE_SECONDS`` for answers in flight. Each worker
+keeps the deadlines of its in-memory sessions in a heap; one sweeper task
+sleeps until the earliest one and expires every overdue session in one
+``UPDATE ... FROM (VALUES ...)`` carrying the scores computed in memory.
+Sessions no worker holds (their worker stopped) are expired by a periodic
+``UPDATE`` that scores them from ``exam_answers``, once they are
+``EXAM_ORPHAN_EXPIRY_DELAY_SECONDS`` overdue so the owning worker goes
+first. Late answers are rejected from memory: by the state's deadline, or
+by a cache of recently closed sessions, without loading the session.
+
+Finishing or expiring sessions adds them to their students' progress
+aggregates (``app.services.student_progress``) in the same transaction.
+Final results are scored from the session's answers as merged from its
+checkpoint and from the rows already in ``exam_answers``, and all of them
+are written with the result. ``finish`` runs in the caller's transaction: the session is dropped from
+memory and its checkpoint deleted only once that transaction commits, and
+it is reopened with its final answers pending if it rolls back.
+"""
+import asyncio
+import heapq
+import inspect
+import logging
+import time
+from collections.abc import Awaitable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import (
+    Boolean,
+    Float,
+    Integer,
+    Numeric,
+    cast,
+    column,
+    event,
+    func,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.exam import Exam, ExamAnswer, ExamSession, ExamStatus
+from app.models.question import Question
+from app.services.exam_checkpoints import (
+    MISSING,
+    Checkpoint,
+    ExamCheckpointStore,
+    exam_checkpoints,
+)
+from app.services.notifications import notify_after_commit
+from app.services.question_bank import question_bank
+from app.services.question_sampler import question_sampler
+from app.services.student_progress import record_sessions
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "exam_engine_finished"
+
+
+class ExamEngineError(Exception):
+    """Base error for exam engine operations."""
+
+
+class SessionNotActive(ExamEngineError):
+    """Raised when a session is no longer in progress."""
+
+
+class SessionExpired(SessionNotActive):
+    """Raised when a session's time is over."""
+
+
+class QuestionNotInSession(ExamEngineError):
+    """Raised when an answer references a question outside the session."""
+
+
+class SessionState:
+    """In-memory state of one in-progress exam session."""
+
+    __slots__ = (
+        "session_id",
+        "exam_id",
+        "student_id",
+        "question_ids",
+        "answer_key",
+        "answers",
+        "pending",
+        "correct",
+        "passing_score",
+        "deadline",
+        "current_index",
+        "version",
+        "finished",
+    )
+
+    def __init__(
+        self,
+        session_id: int,
+        exam_id: int,
+        student_id: int,
+        question_ids: list[int],
+        answer_key: dict[int, str],
+        passing_score: float,
+        deadline: float,
+    ) -> None:
+        self.session_id = session_id
+        self.exam_id = exam_id
+        self.student_id = student_id
+        self.question_ids = question_ids
+        self.answer_key = answer_key
+        self.answers: dict[int, str] = {}
+        self.pending: dict[int, str] = {}
+        self.correct = 0
+        self.passing_score = passing_score
+        self.deadline = deadline
+        self.current_index = 0
+        self.version = 0  # Checkpoint version the state reflects
+        self.finished = False
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint: Checkpoint) -> "SessionState":
+        """Rebuild a state from its checkpoint; every answer is left pending."""
+        meta = checkpoint.meta
+        state = cls(
+            session_id=checkpoint.session_id,
+            exam_id=meta["exam"],
+            student_id=meta["student"],
+            question_ids=meta["questions"],
+            answer_key=dict(zip(meta["questions"], meta["key"])),
+            passing_score=meta["passing"],
+            deadline=meta["deadline"],
+        )
+        for question_id, option_id in checkpoint.answers.items():
+            state.record(question_id, option_id)
+        state.current_index = checkpoint.current_index
+        state.version = checkpoint.version
+        return state
+
+    def merge(self, checkpoint: Checkpoint) -> bool:
+        """
+        Take answers and position from a newer checkpoint of this session;
+        changed answers are left pending. Returns whether any answer changed.
+        """
+        changed = False
+        for question_id, option_id in checkpoint.answers.items():
+            if self.answers.get(question_id) != option_id:
+                self.record(question_id, option_id)
+                changed = True
+        self.current_index = checkpoint.current_index
+        self.version = checkpoint.version
+        return changed
+
+    def checkpoint_meta(self) -> dict[str, Any]:
+        """The session's fixed fields, as stored in its checkpoint."""
+        return {
+            "exam": self.exam_id,
+            "student": self.student_id,
+            "questions": self.question_ids,
+            "key": [self.answer_key.get(question_id) for question_id in self.question_ids],
+            "passing": self.passing_score,
+            "deadline": self.deadline,
+        }
+
+    def record(self, question_id: int, option_id: str) -> bool:
+        """Record an answer, updating the running score. Returns correctness."""
+        correct_option = self.answer_key.get(question_id)
+        if correct_option is None:
+            raise QuestionNotInSession(question_id)
+
+        previous = self.answers.get(question_id)
+        if previous == correct_option:
+            self.correct -= 1
+        is_correct = option_id == correct_option
+        if is_correct:
+            self.correct += 1
+
+        self.answers[question_id] = option_id
+        self.pending[question_id] = option_id
+        return is_correct
+
+    @property
+    def total_answered(self) -> int:
+        return len(self.answers)
+
+    @property
+    def score(self) -> float:
+        total = len(self.question_ids)
+        return round(self.correct / total * 100, 2) if total else 0.0
+
+    @property
+    def passed(self) -> bool:
+        return self.score >= self.passing_score
+
+    def time_remaining(self, now: float | None = None) -> int:
+        return max(int(self.deadline - (now or time.time())), 0)
+
+    def is_overdue(self, now: float | None = None) -> bool:
+        """Whether the deadline, plus the grace period, has passed."""
+        return (now or time.time()) > self.deadline + settings.EXAM_DEADLINE_GRACE_SECONDS
+
+    def take_pending(self) -> list[dict[str, Any]]:
+        """Drain buffered answers as ``exam_answers`` rows."""
+        rows = self._rows(self.pending)
+        self.pending = {}
+        return rows
+
+    def take_answers(self) -> list[dict[str, Any]]:
+        """Drain buffered answers, returning rows for all answers of the session."""
+        self.pending = {}
+        return self._rows(self.answers)
+
+    def _rows(self, answers: dict[int, str]) -> list[dict[str, Any]]:
+        return [
+            {
+                "session_id": self.session_id,
+                "question_id": question_id,
+                "selected_option_id": option_id,
+                "is_correct": option_id == self.answer_key[question_id],
+            }
+            for question_id, option_id in answers.items()
+        ]
+
+    def restore_pending(self, rows: list[dict[str, Any]]) -> None:
+        """Put back rows whose flush failed, keeping any newer answers."""
+        for row in rows:
+            self.pending.setdefault(row["question_id"], row["selected_option_id"])
+
+
+async def upsert_answers(db: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    """Write answer rows with multi-row ``INSERT ... ON CONFLICT DO UPDATE`` statements."""
+    batch_size = settings.EXAM_ANSWER_FLUSH_BATCH_SIZE
+    for offset in range(0, len(rows), batch_size):
+        stmt = pg_insert(ExamAnswer).values(rows[offset : offset + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_exam_answers_session_question",
+            set_={
+                "selected_option_id": stmt.excluded.selected_option_id,
+                "is_correct": stmt.excluded.is_correct,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+
+def _notify_result(
+    db: AsyncSession, student_id: int, score: float, passed: bool, correct: int, total: int
+) -> None:
+    notify_after_commit(
+        db,
+        student_id,
+        "exam_passed" if passed else "exam_failed",
+        score=score,
+        correct=correct,
+        total=total,
+    )
+
+
+_RESULT_COLUMNS = (
+    ExamSession.id,
+    ExamSession.student_id,
+    ExamSession.score,
+    ExamSession.passed,
+    ExamSession.correct_answers,
+    func.json_array_length(ExamSession.selected_question_ids).label("total"),
+)
+
+
+async def write_progress(db: AsyncSession, states: list[SessionState]) -> None:
+    """Store the progress of in-progress sessions on their rows, in one UPDATE."""
+    progress = values(
+        column("id", Integer),
+        column("correct", Integer),
+        column("answered", Integer),
+        column("remaining", Integer),
+        column("position", Integer),
+        name="progress",
+    ).data(
+        [
+            (
+                state.session_id,
+                state.correct,
+                state.total_answered,
+                state.time_remaining(),
+                state.current_index,
+            )
+            for state in states
+        ]
+    )
+    await db.execute(
+        update(ExamSession)
+        .where(ExamSession.id == progress.c.id, ExamSession.status == ExamStatus.IN_PROGRESS)
+        .values(
+            correct_answers=progress.c.correct,
+            total_answered=progress.c.answered,
+            time_remaining_seconds=progress.c.remaining,
+            current_question_index=progress.c.position,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+class ExamEngine:
+    """Registry of in-progress exam sessions for this worker."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        checkpoints: ExamCheckpointStore,
+    ) -> None:
+        self.session_factory = session_factory
+        self.checkpoints = checkpoints
+        self._checkpoints_down_until = 0.0
+        self._sessions: dict[int, SessionState] = {}
+        self._dirty: set[int] = set()
+        self._flusher: asyncio.Task[None] | None = None
+        self._flush_lock = asyncio.Lock()
+        self._deadlines: list[tuple[float, int]] = []  # Heap of (deadline, session ID)
+        self._deadline_added = asyncio.Event()
+        self._sweeper: asyncio.Task[None] | None = None
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._closed: TTLCache[int, bool] = TTLCache(
+            maxsize=settings.EXAM_CLOSED_SESSION_CACHE_SIZE,
+            ttl=settings.EXAM_CLOSED_SESSION_CACHE_TTL_SECONDS,
+        )
+
+        self.answers_recorded = 0
+        self.rows_flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.late_answers = 0
+        self.expired = 0
+        self.orphans_expired = 0
+        self.checkpoint_errors = 0
+        self.recovered = 0
+
+    async def _checkpoint(self, write: Awaitable[Any]) -> Any:
+        """
+        Run a checkpoint store call; returns None if it failed.
+
+        Answers are still flushed from memory without checkpoints, so the
+        store is skipped for ``EXAM_CHECKPOINT_RETRY_SECONDS`` after an error
+        instead of slowing down every answer.
+        """
+        if time.monotonic() < self._checkpoints_down_until:
+            if inspect.iscoroutine(write):
+                write.close()
+            return None
+        try:
+            return await write
+        except Exception:
+            self.checkpoint_errors += 1
+            self._checkpoints_down_until = time.monotonic() + settings.EXAM_CHECKPOINT_RETRY_SECONDS
+            logger.warning("Exam checkpoint store unavailable", exc_info=True)
+            return None
+
+    def _register(self, state: SessionState) -> SessionState:
+        # Another request may have hydrated the session while we awaited
+        current = self._sessions.setdefault(state.session_id, state)
+        if current is state:
+            self._schedule(state)
+        return current
+
+    def _schedule(self, state: SessionState) -> None:
+        """Add a session's deadline to the sweeper's heap."""
+        heapq.heappush(self._deadlines, (state.deadline, state.session_id))
+        if self._deadlines[0][1] == state.session_id:
+            self._deadline_added.set()
+
+    async def _recently_seen(self, db: AsyncSession, student_id: int) -> set[int]:
+        """Question IDs from the student's most recent sessions."""
+        limit = settings.EXAM_EXCLUDE_RECENT_SESSIONS
+        if limit <= 0:
+            return set()
+
+        result = await db.execute(
+            select(ExamSession.selected_question_ids)
+            .where(ExamSession.student_id == student_id)
+            .order_by(ExamSession.started_at.desc())
+            .limit(limit)
+        )
+        return {question_id for ids in result.scalars() for question_id in ids}
+
+    async def _select_questions(
+        self, db: AsyncSession, exam: Exam, student_id: int
+    ) -> dict[int, str]:
+        snapshot = await question_bank.get()
+        selected = question_sampler.sample(
+            snapshot,
+            exam.total_questions,
+            category_quotas={int(k): v for k, v in (exam.category_quotas or {}).items()},
+            difficulty_mix=exam.difficulty_mix,
+            exclude=await self._recently_seen(db, student_id),
+        )
+        return {question_id: snapshot.answer_key[question_id] for question_id in selected}
+
+    async def _answer_key(self, db: AsyncSession, question_ids: list[int]) -> dict[int, str]:
+        snapshot = await question_bank.get()
+        answer_key = {
+            question_id: snapshot.answer_key[question_id]
+            for question_id in question_ids
+            if question_id in snapshot.answer_key
+        }
+        if len(answer_key) == len(question_ids):
+            return answer_key
+
+        # Snapshot not yet reloaded after a question was added
+        result = await db.execute(
+            select(Question.id, Question.correct_option_id).where(Question.id.in_(question_ids))
+        )
+        return dict(result.tuples().all())
+
+    async def start(self, db: AsyncSession, exam: Exam, student_id: int) -> ExamSession:
+        """Create a session row and register its in-memory state."""
+        answer_key = await self._select_questions(db, exam, student_id)
+        if not answer_key:
+            raise ExamEngineError("Question bank is empty")
+
+        question_ids = list(answer_key)
+        started_at = datetime.now(timezone.utc)
+        duration = exam.duration_minutes * 60
+
+        session = ExamSession(
+            exam_id=exam.id,
+            student_id=student_id,
+            selected_question_ids=question_ids,
+            status=ExamStatus.IN_PROGRESS,
+            started_at=started_at,
+            time_remaining_seconds=duration,
+            correct_answers=0,
+            total_answered=0,
+        )
+        db.add(session)
+        await db.flush()
+
+        state = SessionState(
+            session_id=session.id,
+            exam_id=exam.id,
+            student_id=student_id,
+            question_ids=question_ids,
+            answer_key=answer_key,
+            passing_score=exam.passing_score,
+            deadline=(started_at + timedelta(seconds=duration)).timestamp(),
+        )
+        self._register(state)
+        await self._checkpoint(self.checkpoints.create(session.id, state.checkpoint_meta()))
+        return session
+
+    async def _sync(self, state: SessionState, version: int | None) -> None:
+        """
+        Bring a state up to ``version`` of its checkpoint, merging answers
+        given through other workers. A missing checkpoint is recreated from
+        the state, unless another worker closed the session.
+        """
+        if version is None or version == state.version:
+            return
+        if version != MISSING:
+            checkpoints = await self._checkpoint(self.checkpoints.load([state.session_id]))
+            if checkpoints is None:
+                return
+            if checkpoints:
+                if state.merge(checkpoints[state.session_id]):
+                    self._dirty.add(state.session_id)
+                return
+            # Deleted since its version was read
+        async with self.session_factory() as db:
+            status = await db.scalar(
+                select(ExamSession.status).where(ExamSession.id == state.session_id)
+            )
+        if status != ExamStatus.IN_PROGRESS:
+            self._sessions.pop(state.session_id, None)
+            state.finished = True
+            self._dirty.discard(state.session_id)
+            self._closed.set(state.session_id, True)
+            raise SessionNotActive(state.session_id)
+        # Lost (e.g. Redis restarted) rather than deleted
+        await self._checkpoint(
+            self.checkpoints.create(
+                state.session_id, state.checkpoint_meta(), state.current_index, state.answers
+            )
+        )
+        state.version = 0
+
+    async def get_state(
+        self, db: AsyncSession, session_id: int, student_id: int | None = None
+    ) -> SessionState | None:
+        """
+        Return the in-memory state, rehydrating it from its checkpoint or the
+        database if needed, or bringing it up to date with its checkpoint.
+
+        With ``student_id``, another student's session is reported as missing
+        before it is loaded into memory.
+        """
+        state = self._sessions.get(session_id)
+        if state is not None:
+            if student_id is not None and state.student_id != student_id:
+                return None
+            if not state.finished:
+                await self._sync(
+                    state, await self._checkpoint(self.checkpoints.version(session_id))
+                )
+            return state
+        if self._closed.get(session_id):
+            raise SessionNotActive(session_id)
+
+        checkpoints = await self._checkpoint(self.checkpoints.load([session_id]))
+        if checkpoints:
+            state = SessionState.from_checkpoint(checkpoints[session_id])
+            if student_id is not None and state.student_id != student_id:
+                return None
+            if state.is_overdue():
+                raise SessionExpired(session_id)
+            # Answers may not have been flushed before the previous worker
+            # stopped; they are written again, as upserts, by the next flush
+            self._dirty.add(session_id)
+            return self._register(state)
+
+        result = await db.execute(
+            select(ExamSession, Exam.passing_score, Exam.duration_minutes)
+            .join(Exam, Exam.id == ExamSession.exam_id)
+            .where(ExamSession.id == session_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        session, passing_score, duration_minutes = row
+        if student_id is not None and session.student_id != student_id:
+            return None
+        if session.status != ExamStatus.IN_PROGRESS:
+            self._closed.set(session_id, True)
+            raise SessionNotActive(session_id)
+        deadline = session.started_at.timestamp() + duration_minutes * 60
+        if time.time() > deadline + settings.EXAM_DEADLINE_GRACE_SECONDS:
+            raise SessionExpired(session_id)  # Left to the orphan sweep
+
+        question_ids = list(session.selected_question_ids)
+        answer_key = await self._answer_key(db, question_ids)
+        answers_result = await db.execute(
+            select(ExamAnswer.question_id, ExamAnswer.selected_option_id).where(
+                ExamAnswer.session_id == session_id
+            )
+        )
+
+        state = SessionState(
+            session_id=session.id,
+            exam_id=session.exam_id,
+            student_id=session.student_id,
+            question_ids=question_ids,
+            answer_key=answer_key,
+            passing_score=passing_score,
+            deadline=deadline,
+        )
+        for question_id, option_id in answers_result.tuples():
+            state.record(question_id, option_id)
+        state.pending = {}
+        state.current_index = session.current_question_index
+
+        current = self._register(state)
+        if current is state:
+            await self._checkpoint(
+                self.checkpoints.create(
+                    session_id, state.checkpoint_meta(), state.current_index, state.answers
+                )
+            )
+        return current
+
+    def _check_active(self, state: SessionState, current_index: int | None) -> None:
+        if state.finished:
+            raise SessionNotActive(state.session_id)
+        if state.is_overdue():
+            self.late_answers += 1
+            raise SessionExpired(state.session_id)
+        if current_index is not None and not 0 <= current_index < len(state.question_ids):
+            raise QuestionNotInSession(current_index)
+
+    async def record_answer(
+        self,
+        state: SessionState,
+        question_id: int,
+        option_id: str,
+        current_index: int | None = None,
+    ) -> bool:
+        """
+        Record an answer, and optionally the question the student is on.
+
+        The answer is scored in memory and checkpointed; it reaches the
+        database with the next flush.
+        """
+        self._check_active(state, current_index)
+        is_correct = state.record(question_id, option_id)
+        if current_index is not None:
+            state.current_index = current_index
+        self._dirty.add(state.session_id)
+        self.answers_recorded += 1
+        version = await self._checkpoint(
+            self.checkpoints.record(
+                state.session_id, state.deadline, question_id, option_id, current_index
+            )
+        )
+        await self._written(state, version)
+        return is_correct
+
+    async def set_position(self, state: SessionState, current_index: int) -> None:
+        """Record the question the student is on, without answering it."""
+        self._check_active(state, current_index)
+        state.current_index = current_index
+        self._dirty.add(state.session_id)
+        version = await self._checkpoint(
+            self.checkpoints.record(state.session_id, state.deadline, current_index=current_index)
+        )
+        await self._written(state, version)
+
+    async def _written(self, state: SessionState, version: int | None) -> None:
+        """Advance the state's version past its own checkpoint write."""
+        if version is not None and version == state.version + 1:
+            state.version = version
+        else:
+            await self._sync(state, version)
+
+    async def finish(self, db: AsyncSession, state: SessionState) -> ExamSession:
+        """
+        Flush remaining answers and store the final result on the session row.
+
+        A session finished after its deadline is stored as expired. The
+        session stays in memory until ``db`` commits.
+        """
+        if state.finished:
+            raise SessionNotActive(state.session_id)
+        await self._sync(state, await self._checkpoint(self.checkpoints.version(state.session_id)))
+        state.finished = True
+        self._dirty.discard(state.session_id)
+
+        # A flush in progress may still hold older answers of this session;
+        # let it commit first so it cannot overwrite the final answers
+        async with self._flush_lock:
+            pass
+
+        rows: list[dict[str, Any]] = []
+        try:
+            await self._merge_stored(db, [state])
+            rows = state.take_answers()
+            if rows:
+                await upsert_answers(db, rows)
+
+            result = await db.execute(
+                update(ExamSession)
+                .where(
+                    ExamSession.id == state.session_id,
+                    ExamSession.status == ExamStatus.IN_PROGRESS,
+                )
+                .values(
+                    status=ExamStatus.EXPIRED if state.is_overdue() else ExamStatus.COMPLETED,
+                    completed_at=datetime.now(timezone.utc),
+                    time_remaining_seconds=state.time_remaining(),
+                    correct_answers=state.correct,
+                    total_answered=state.total_answered,
+                    score=state.score,
+                    passed=state.passed,
+                )
+                .returning(ExamSession)
+                .execution_options(populate_existing=True)
+            )
+            session = result.scalar_one_or_none()
+            if session is not None:
+                await record_sessions(db, [session.id])
+        except Exception:
+            state.finished = False
+            state.restore_pending(rows)
+            self._dirty.add(state.session_id)
+            raise
+
+        if session is None:
+            self._sessions.pop(state.session_id, None)
+            self._closed.set(state.session_id, True)
+            await self._checkpoint(self.checkpoints.delete([state.session_id]))
+            raise SessionNotActive(state.session_id)
+
+        # Dropped once the result is committed; reopened if it is rolled back
+        db.sync_session.info.setdefault(_SESSION_INFO_KEY, []).append((self, state, rows))
+        _notify_result(
+            db,
+            session.student_id,
+            session.score,
+            session.passed,
+            session.correct_answers,
+            len(session.selected_question_ids),
+        )
+        return session
+
+    async def _merge_stored(self, db: AsyncSession, states: list[SessionState]) -> None:
+        """
+        Add the answers in ``exam_answers`` that the states lack: flushed by
+        other workers after the states last synced with a checkpoint that was
+        then lost.
+        """
+        by_id = {state.session_id: state for state in states}
+        result = await db.execute(
+            select(
+                ExamAnswer.session_id, ExamAnswer.question_id, ExamAnswer.selected_option_id
+            ).where(ExamAnswer.session_id.in_(by_id))
+        )
+        for session_id, question_id, option_id in result.tuples():
+            state = by_id[session_id]
+            if question_id not in state.answers and question_id in state.answer_key:
+                state.record(question_id, option_id)
+
+    def _close_finished(self, states: list[SessionState]) -> None:
+        """Drop sessions whose result was committed and delete their checkpoints."""
+        for state in states:
+            self._sessions.pop(state.session_id, None)
+            self._closed.set(state.session_id, True)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # The checkpoints expire after the deadline
+        task = loop.create_task(
+            self._checkpoint(self.checkpoints.delete([state.session_id for state in states]))
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _reopen_finished(self, state: SessionState, rows: list[dict[str, Any]]) -> None:
+        """Reopen a session whose result was rolled back, with its final answers pending."""
+        state.finished = False
+        state.restore_pending(rows)
+        self._dirty.add(state.session_id)
+        self._schedule(state)
+
+    async def flush(self) -> int:
+        """Write buffered answers of all sessions; returns the number of rows written."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+
+            dirty, self._dirty = self._dirty, set()
+            flushed_at = time.time()
+            batches: list[tuple[SessionState, list[dict[str, Any]]]] = []
+            for session_id in dirty:
+                state = self._sessions.get(session_id)
+                if state is not None and not state.finished:
+                    batches.append((state, state.take_pending()))
+            if not batches:
+                return 0
+
+            rows = [row for _, state_rows in batches for row in state_rows]
+            try:
+                async with self.session_factory() as db:
+                    if rows:
+                        await upsert_answers(db, rows)
+                    await write_progress(db, [state for state, _ in batches])
+                    await db.commit()
+            except Exception:
+                self.flush_errors += 1
+                for state, state_rows in batches:
+                    state.restore_pending(state_rows)
+                    self._dirty.add(state.session_id)
+                raise
+
+            await self._checkpoint(
+                self.checkpoints.mark_flushed(
+                    [(state.session_id, flushed_at) for state, state_rows in batches if state_rows]
+                )
+            )
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+            return len(rows)
+
+    async def recover(self) -> int:
+        """
+        Write checkpointed answers and progress that no worker flushed within
+        ``EXAM_CHECKPOINT_RECOVERY_DELAY_SECONDS`` (their worker stopped);
+        returns the number of sessions replayed.
+        """
+        dirty_before = time.time() - settings.EXAM_CHECKPOINT_RECOVERY_DELAY_SECONDS
+        stale = await self._checkpoint(
+            self.checkpoints.stale(dirty_before, settings.EXAM_EXPIRY_BATCH_SIZE)
+        )
+        # Sessions held here are left to this worker's flush
+        stale = [entry for entry in stale or () if entry[0] not in self._sessions]
+        if not stale:
+            return 0
+
+        checkpoints = await self.checkpoints.load([session_id for session_id, _ in stale])
+        states = [SessionState.from_checkpoint(checkpoint) for checkpoint in checkpoints.values()]
+        if states:
+            rows = [row for state in states for row in state.take_pending()]
+            async with self.session_factory() as db:
+                if rows:
+                    await upsert_answers(db, rows)
+                await write_progress(db, states)
+                await db.commit()
+        # Marks of expired checkpoints are dropped too
+        await self.checkpoints.mark_flushed(stale)
+        self.recovered += len(states)
+        return len(states)
+
+    async def _run_flusher(self) -> None:
+        while True:
+            await asyncio.sleep(settings.EXAM_ANSWER_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush exam answers")
+            try:
+                await self.recover()
+            except Exception:
+                logger.exception("Failed to recover exam checkpoints")
+
+    def start_flusher(self) -> None:
+        """Start the periodic background flush (called on application startup)."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def stop_flusher(self) -> None:
+        """Stop the background flush and write out remaining answers."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def expire_due(self, now: float | None = None) -> int:
+        """Expire this worker's overdue sessions; returns the number expired."""
+        now = now or time.time()
+        grace = settings.EXAM_DEADLINE_GRACE_SECONDS
+        due: list[SessionState] = []
+        while self._deadlines and self._deadlines[0][0] + grace < now:
+            _, session_id = heapq.heappop(self._deadlines)
+            state = self._sessions.get(session_id)
+            if state is not None and not state.finished and state.is_overdue(now):
+                due.append(state)
+
+        expired = 0
+        batch_size = settings.EXAM_EXPIRY_BATCH_SIZE
+        for offset in range(0, len(due), batch_size):
+            try:
+                expired += await self._expire(due[offset : offset + batch_size])
+            except Exception:
+                for state in due[offset + batch_size :]:
+                    self._schedule(state)
+                raise
+        return expired
+
+    async def _expire(self, states: list[SessionState]) -> int:
+        """Write the sessions' answers and store their results as expired."""
+        for state in states:
+            state.finished = True
+            self._dirty.discard(state.session_id)
+
+        # As in finish: let a flush holding older answers commit first
+        async with self._flush_lock:
+            pass
+
+        batches: list[tuple[SessionState, list[dict[str, Any]]]] = []
+        try:
+            checkpoints = await self._checkpoint(
+                self.checkpoints.load([state.session_id for state in states])
+            )
+            for state in states:
+                if checkpoints and state.session_id in checkpoints:
+                    state.merge(checkpoints[state.session_id])
+            async with self.session_factory() as db:
+                await self._merge_stored(db, states)
+                batches = [(state, state.take_answers()) for state in states]
+                rows = [row for _, state_rows in batches for row in state_rows]
+                if rows:
+                    await upsert_answers(db, rows)
+                scored = values(
+                    column("id", Integer),
+                    column("correct", Integer),
+                    column("answered", Integer),
+                    column("score", Float),
+                    column("passed", Boolean),
+                    name="scored",
+                ).data(
+                    [
+                        (
+                            state.session_id,
+                            state.correct,
+                            state.total_answered,
+                            state.score,
+                            state.passed,
+                        )
+                        for state in states
+                    ]
+                )
+                result = await db.execute(
+                    update(ExamSession)
+                    .where(
+                        ExamSession.id == scored.c.id,
+                        ExamSession.status == ExamStatus.IN_PROGRESS,
+                    )
+                    .values(
+                        status=ExamStatus.EXPIRED,
+                        completed_at=func.now(),
+                        time_remaining_seconds=0,
+                        correct_answers=scored.c.correct,
+                        total_answered=scored.c.answered,
+                        score=scored.c.score,
+                        passed=scored.c.passed,
+                    )
+                    .returning(*_RESULT_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                )
+                expired = result.all()
+                await record_sessions(db, [row.id for row in expired])
+                for row in expired:
+                    _notify_result(db, *row[1:])
+                await db.commit()
+        except Exception:
+            for state in states:
+                state.finished = False
+                self._dirty.add(state.session_id)
+                self._schedule(state)
+            for state, state_rows in batches:
+                state.restore_pending(state_rows)
+            raise
+
+        # Sessions not updated were closed by another worker
+        for state in states:
+            self._sessions.pop(state.session_id, None)
+            self._closed.set(state.session_id, True)
+        await self._checkpoint(self.checkpoints.delete([state.session_id for state in states]))
+        self.expired += len(expired)
+        return len(expired)
+
+    async def expire_orphans(self) -> int:
+        """
+        Expire sessions overdue by ``EXAM_ORPHAN_EXPIRY_DELAY_SECONDS``, scoring
+        them from ``exam_answers``; returns the number expired.
+
+        Catches sessions whose worker stopped before their deadline. Their
+        checkpointed answers have been replayed by ``recover`` by then, as
+        the recovery delay is shorter than the orphan delay.
+        """
+        delay = settings.EXAM_DEADLINE_GRACE_SECONDS + settings.EXAM_ORPHAN_EXPIRY_DELAY_SECONDS
+        batch_size = settings.EXAM_EXPIRY_BATCH_SIZE
+        overdue = (
+            select(ExamSession.id)
+            .join(Exam, Exam.id == ExamSession.exam_id)
+            .where(
+                ExamSession.status == ExamStatus.IN_PROGRESS,
+                ExamSession.started_at
+                < func.now() - func.make_interval(0, 0, 0, 0, 0, Exam.duration_minutes, delay),
+            )
+            .order_by(ExamSession.id)
+            .limit(batch_size)
+            .with_for_update(of=ExamSession, skip_locked=True)
+            .scalar_subquery()
+        )
+        answers = select(func.count()).where(ExamAnswer.session_id == ExamSession.id)
+        answered = answers.scalar_subquery()
+        correct = answers.where(ExamAnswer.is_correct.is_(True)).scalar_subquery()
+        total = func.greatest(func.json_array_length(ExamSession.selected_question_ids), 1)
+        score = cast(func.round(cast(correct * 100.0 / total, Numeric), 2), Float)
+
+        expired_total = 0
+        while True:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    update(ExamSession)
+                    .where(ExamSession.id.in_(overdue), Exam.id == ExamSession.exam_id)
+                    .values(
+                        status=ExamStatus.EXPIRED,
+                        completed_at=func.now(),
+                        time_remaining_seconds=0,
+                        correct_answers=correct,
+                        total_answered=answered,
+                        score=score,
+                        passed=score >= Exam.passing_score,
+                    )
+                    .returning(*_RESULT_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                )
+                expired = result.all()
+                await record_sessions(db, [row.id for row in expired])
+                for row in expired:
+                    _notify_result(db, *row[1:])
+                await db.commit()
+
+            for row in expired:
+                state = self._sessions.pop(row.id, None)
+                if state is not None:
+                    state.finished = True
+                    self._dirty.discard(row.id)
+                self._closed.set(row.id, True)
+            await self._checkpoint(self.checkpoints.delete([row.id for row in expired]))
+            expired_total += len(expired)
+            if len(expired) < batch_size:
+                break
+
+        self.orphans_expired += expired_total
+        return expired_total
+
+    async def _run_sweeper(self) -> None:
+        grace = settings.EXAM_DEADLINE_GRACE_SECONDS
+        next_orphan_sweep = time.monotonic()
+        while True:
+            timeout = max(next_orphan_sweep - time.monotonic(), 0)
+            if self._deadlines:
+                timeout = min(timeout, max(self._deadlines[0][0] + grace - time.time(), 0))
+            self._deadline_added.clear()
+            try:
+                # Woken early when a session with an earlier deadline is added
+                await asyncio.wait_for(self._deadline_added.wait(), timeout + 0.01)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.expire_due()
+                if time.monotonic() >= next_orphan_sweep:
+                    next_orphan_sweep = (
+                        time.monotonic() + settings.EXAM_ORPHAN_SWEEP_INTERVAL_SECONDS
+                    )
+                    await self.expire_orphans()
+            except Exception:
+                logger.exception("Failed to expire exam sessions")
+                await asyncio.sleep(settings.EXAM_ANSWER_FLUSH_INTERVAL_SECONDS)
+
+    def start_sweeper(self) -> None:
+        """Start the deadline sweeper (called on application startup)."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._run_sweeper())
+
+    async def stop_sweeper(self) -> None:
+        """Stop the deadline sweeper."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def clear(self) -> None:
+        """Forget all in-memory sessions, deadlines and closed sessions."""
+        self._sessions.clear()
+        self._dirty.clear()
+        self._deadlines.clear()
+        self._closed.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return engine counters."""
+        return {
+            "active_sessions": len(self._sessions),
+            "dirty_sessions": len(self._dirty),
+            "scheduled_deadlines": len(self._deadlines),
+            "answers_recorded": self.answers_recorded,
+            "late_answers": self.late_answers,
+            "rows_flushed": self.rows_flushed,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "expired": self.expired,
+            "orphans_expired": self.orphans_expired,
+            "checkpoint_errors": self.checkpoint_errors,
+            "recovered": self.recovered,
+            "closed_sessions": self._closed.stats(),
+        }
+
+
+exam_engine = ExamEngine(AsyncSessionLocal, exam_checkpoints)
+
+
+@event.listens_for(Session, "after_commit")
+def _close_committed_sessions(session: Session) -> None:
+    finished = session.info.pop(_SESSION_INFO_KEY, None)
+    if finished:
+        for engine in {engine for engine, _, _ in finished}:
+            engine._close_finished([state for owner, state, _ in finished if owner is engine])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _reopen_rolled_back_sessions(session: Session, previous_transaction: Any) -> None:
+    for engine, state, rows in session.info.pop(_SESSION_INFO_KEY, None) or ():
+        engine._reopen_finished(state, rows)
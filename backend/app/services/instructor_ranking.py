@@ -0,0 +1,509 @@
+"""
+Ranked instructor search.
+
+Answering "best available practical instructor this week" from Postgres
+joins ``users`` with ``bookings`` (completion rate) and ``booking_slots``
+(free slots) on every request. Instead, ``InstructorRanking`` keeps an
+in-memory table of every active instructor, teacher and mentor with:
+- profile and ranking inputs (rating, level, organization, work mode);
+- completed and closed booking counts, for the completion rate;
+- the start times of their free slots over the next
+  ``INSTRUCTOR_RANKING_HORIZON_DAYS``, sorted, so the free slots in any
+  window within the horizon are counted with two bisections;
+- a precomputed score, with instructors kept sorted by it per role.
+
+A search walks the role's list in score order, applies the filters and
+stops at the K-th match, so it never sorts or queries.
+
+The table is loaded on first use. Changes committed through the ORM
+(instructor profiles, bookings made, cancelled or closed, slots added) are
+applied to it after commit. Bulk changes (generated availability, rating
+aggregation) schedule a reload of the instructors concerned with
+``reload_after_commit``. A periodic full reload rolls the horizon forward
+and picks up changes made by other processes.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.booking import Booking, BookingSlot, BookingStatus, BookingType
+from app.models.user import User, UserLevel, UserRole
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "instructor_ranking_changes"
+_RELOAD_INFO_KEY = "instructor_ranking_reload"
+
+# Who can be booked for each kind of session
+BOOKING_TYPE_ROLES = {
+    BookingType.PRACTICAL: (UserRole.INSTRUCTOR,),
+    BookingType.THEORY: (UserRole.TEACHER, UserRole.MENTOR),
+    BookingType.MOCK_EXAM: (UserRole.TEACHER, UserRole.MENTOR),
+}
+RANKED_ROLES = (UserRole.INSTRUCTOR, UserRole.TEACHER, UserRole.MENTOR)
+
+# Score weights; the score is between 0 and 1
+RATING_WEIGHT = 0.6
+COMPLETION_WEIGHT = 0.25
+LEVEL_BONUS = {None: 0.0, UserLevel.BASIC: 0.0, UserLevel.PRO: 0.1, UserLevel.ELITE: 0.15}
+
+# Bookings that ended; completed ones count toward the completion rate
+_CLOSED_STATUSES = (BookingStatus.COMPLETED, BookingStatus.CANCELLED, BookingStatus.NO_SHOW)
+_OPEN_STATUSES = (BookingStatus.PENDING, BookingStatus.CONFIRMED)
+
+_PROFILE_FIELDS = (
+    "id",
+    "full_name",
+    "avatar_url",
+    "role",
+    "organization_id",
+    "work_privately",
+    "level",
+    "rating",
+    "total_sessions",
+)
+
+
+def completion_rate(completed: int, closed: int) -> float:
+    """Share of closed bookings that were completed, smoothed toward 1/2 for newcomers."""
+    return (completed + 1) / (closed + 2)
+
+
+class RankedInstructor:
+    """One row of the ranking table."""
+
+    __slots__ = (*_PROFILE_FIELDS, "completed", "closed", "free", "score")
+
+    def __init__(self, completed: int = 0, closed: int = 0, **profile: Any) -> None:
+        for name in _PROFILE_FIELDS:
+            setattr(self, name, profile[name])
+        self.completed = completed
+        self.closed = closed
+        self.free: list[float] = []  # Free slot start times (POSIX), sorted
+        self.score = 0.0
+        self.rescore()
+
+    @property
+    def completion_rate(self) -> float:
+        return completion_rate(self.completed, self.closed)
+
+    def rescore(self) -> None:
+        self.score = (
+            RATING_WEIGHT * min(max(self.rating or 0.0, 0.0), 5.0) / 5
+            + COMPLETION_WEIGHT * self.completion_rate
+            + LEVEL_BONUS.get(self.level, 0.0)
+        )
+
+    def add_free(self, start: float) -> None:
+        i = bisect_left(self.free, start)
+        if i == len(self.free) or self.free[i] != start:
+            self.free.insert(i, start)
+
+    def remove_free(self, start: float) -> None:
+        i = bisect_left(self.free, start)
+        if i < len(self.free) and self.free[i] == start:
+            del self.free[i]
+
+
+class InstructorMatch:
+    """A search result: an instructor and their free slots in the window."""
+
+    __slots__ = ("instructor", "free_slots", "next_free")
+
+    def __init__(self, instructor: RankedInstructor, free_slots: int, next_free: float) -> None:
+        self.instructor = instructor
+        self.free_slots = free_slots
+        self.next_free = next_free
+
+
+def _is_ranked(user: Any) -> bool:
+    return user.role in RANKED_ROLES and bool(user.is_active) and user.deleted_at is None
+
+
+def _profile_statement() -> Any:
+    completed = Booking.status == BookingStatus.COMPLETED
+    return (
+        select(
+            *(getattr(User, name) for name in _PROFILE_FIELDS),
+            func.count(Booking.id).filter(completed).label("completed"),
+            func.count(Booking.id).filter(Booking.status.in_(_CLOSED_STATUSES)).label("closed"),
+        )
+        .outerjoin(Booking, Booking.instructor_id == User.id)
+        .where(
+            User.role.in_(RANKED_ROLES),
+            User.is_active.is_(True),
+            User.deleted_at.is_(None),
+        )
+        .group_by(User.id)
+    )
+
+
+def _free_slots_statement(start: datetime, end: datetime) -> Any:
+    return (
+        select(BookingSlot.instructor_id, BookingSlot.start_time)
+        .where(
+            BookingSlot.start_time >= start,
+            BookingSlot.start_time < end,
+            BookingSlot.is_available.is_(True),
+        )
+        .order_by(BookingSlot.instructor_id, BookingSlot.start_time)
+    )
+
+
+class InstructorRanking:
+    """In-memory ranking table with filtered top-K search."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self.session_factory = session_factory
+        self._by_id: dict[int, RankedInstructor] = {}
+        self._by_role: dict[UserRole, list[RankedInstructor]] = {}
+        self._unsorted: set[UserRole] = set()
+        self._loaded_at: float | None = None
+        self._load_lock = asyncio.Lock()
+        self._pending: set[int] = set()
+        self._reload_task: asyncio.Task[None] | None = None
+        self._refresher: asyncio.Task[None] | None = None
+        self.reloads = 0
+        self.partial_reloads = 0
+        self.updates = 0
+        self.searches = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def get(self, instructor_id: int) -> RankedInstructor | None:
+        return self._by_id.get(instructor_id)
+
+    async def _fetch(self, instructor_ids: Iterable[int] | None = None) -> list[RankedInstructor]:
+        now = datetime.now(timezone.utc)
+        horizon = now + timedelta(days=settings.INSTRUCTOR_RANKING_HORIZON_DAYS)
+        profiles = _profile_statement()
+        slots = _free_slots_statement(now, horizon)
+        if instructor_ids is not None:
+            ids = list(instructor_ids)
+            profiles = profiles.where(User.id.in_(ids))
+            slots = slots.where(BookingSlot.instructor_id.in_(ids))
+
+        async with self.session_factory() as db:
+            rows = (await db.execute(profiles)).mappings().all()
+            entries = {row["id"]: RankedInstructor(**row) for row in rows}
+            for instructor_id, start in (await db.execute(slots)).all():
+                entry = entries.get(instructor_id)
+                if entry is not None:
+                    entry.free.append(start.timestamp())  # Already sorted
+        return list(entries.values())
+
+    async def load(self) -> None:
+        """Rebuild the table from the database and swap it in."""
+        async with self._load_lock:
+            entries = await self._fetch()
+            self.replace(entries)
+            self.reloads += 1
+            logger.info("Loaded instructor ranking (%d instructors)", len(entries))
+
+    def replace(self, entries: list[RankedInstructor]) -> None:
+        """Swap in a new table."""
+        by_role: dict[UserRole, list[RankedInstructor]] = {}
+        for entry in entries:
+            by_role.setdefault(entry.role, []).append(entry)
+        self._by_id = {entry.id: entry for entry in entries}
+        self._by_role = by_role
+        self._unsorted = set(by_role)
+        self._loaded_at = time.time()
+
+    async def reload_instructors(self, instructor_ids: Iterable[int]) -> None:
+        """Reload some instructors' rows."""
+        ids = set(instructor_ids)
+        if not ids or not self.loaded:
+            return
+        async with self._load_lock:
+            entries = {entry.id: entry for entry in await self._fetch(ids)}
+            for instructor_id in ids:
+                self._put(instructor_id, entries.get(instructor_id))
+            self.partial_reloads += 1
+
+    def request_reload(self, instructor_ids: Iterable[int]) -> None:
+        """
+        Schedule a background reload of some instructors, coalescing bursts.
+
+        Safe to call from synchronous code (e.g. ORM events).
+        """
+        if not self.loaded:
+            return
+        self._pending.update(instructor_ids)
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.clear()
+            return
+        self._reload_task = loop.create_task(self._reload_pending())
+
+    async def _reload_pending(self) -> None:
+        await asyncio.sleep(0)
+        while self._pending:
+            ids, self._pending = self._pending, set()
+            try:
+                await self.reload_instructors(ids)
+            except Exception:
+                logger.exception("Failed to reload instructor rankings")
+
+    def _put(self, instructor_id: int, entry: RankedInstructor | None) -> None:
+        """Replace (or remove, when ``entry`` is None) one instructor's row."""
+        previous = self._by_id.pop(instructor_id, None)
+        if previous is not None:
+            self._by_role[previous.role].remove(previous)
+        if entry is None:
+            return
+        self._by_id[instructor_id] = entry
+        self._by_role.setdefault(entry.role, []).append(entry)
+        self._unsorted.add(entry.role)
+
+    def apply(self, changes: list[tuple[Any, ...]]) -> None:
+        """Apply changes recorded by the ORM events, in commit order."""
+        for kind, instructor_id, *values in changes:
+            if kind == "profile":
+                (profile,) = values
+                entry = self._by_id.get(instructor_id)
+                if profile is None:
+                    self._put(instructor_id, None)
+                elif entry is None or entry.role != profile["role"]:
+                    replacement = RankedInstructor(**profile)
+                    if entry is not None:
+                        replacement.completed, replacement.closed = entry.completed, entry.closed
+                        replacement.free = entry.free
+                        replacement.rescore()
+                    self._put(instructor_id, replacement)
+                else:
+                    for name, value in profile.items():
+                        setattr(entry, name, value)
+                    entry.rescore()
+                    self._unsorted.add(entry.role)
+                continue
+
+            entry = self._by_id.get(instructor_id)
+            if entry is None:
+                continue
+            if kind == "slot_taken":
+                entry.remove_free(values[0])
+            elif kind == "slot_freed":
+                entry.add_free(values[0])
+            elif kind == "closed":
+                (completed,) = values
+                entry.closed += 1
+                entry.completed += completed
+                entry.rescore()
+                self._unsorted.add(entry.role)
+        self.updates += len(changes)
+
+    def _ranked(self, role: UserRole) -> list[RankedInstructor]:
+        entries = self._by_role.get(role, [])
+        if role in self._unsorted:
+            entries.sort(key=lambda entry: (-entry.score, entry.id))
+            self._unsorted.discard(role)
+        return entries
+
+    async def search(
+        self,
+        booking_type: BookingType = BookingType.PRACTICAL,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        organization_id: int | None = None,
+        works_privately: bool | None = None,
+        levels: Iterable[UserLevel] | None = None,
+        min_rating: float | None = None,
+        min_free_slots: int = 1,
+        limit: int = 10,
+    ) -> list[InstructorMatch]:
+        """
+        Return the best ranked instructors with free slots in ``[start, end)``.
+
+        The window defaults to the whole horizon and is cut to it. With
+        ``min_free_slots=0`` instructors without free slots are included.
+        """
+        if not self.loaded:
+            await self.load()
+        self.searches += 1
+
+        now = time.time()
+        horizon = now + settings.INSTRUCTOR_RANKING_HORIZON_DAYS * 86400
+        window_start = max(start.timestamp() if start else now, now)
+        window_end = min(end.timestamp() if end else horizon, horizon)
+        level_set = frozenset(levels) if levels is not None else None
+
+        roles = BOOKING_TYPE_ROLES[booking_type]
+        candidates: Iterable[RankedInstructor]
+        if len(roles) == 1:
+            candidates = self._ranked(roles[0])
+        else:
+            candidates = heapq.merge(
+                *(self._ranked(role) for role in roles),
+                key=lambda entry: (-entry.score, entry.id),
+            )
+
+        matches: list[InstructorMatch] = []
+        for entry in candidates:
+            if organization_id is not None and entry.organization_id != organization_id:
+                continue
+            if works_privately is not None and entry.work_privately != works_privately:
+                continue
+            if level_set is not None and entry.level not in level_set:
+                continue
+            if min_rating is not None and entry.rating < min_rating:
+                continue
+            first = bisect_left(entry.free, window_start)
+            free_slots = bisect_left(entry.free, window_end, first) - first
+            if free_slots < min_free_slots:
+                continue
+            matches.append(
+                InstructorMatch(entry, free_slots, entry.free[first] if free_slots else 0.0)
+            )
+            if len(matches) == limit:
+                break
+        return matches
+
+    async def _run_refresher(self) -> None:
+        while True:
+            await asyncio.sleep(settings.INSTRUCTOR_RANKING_REFRESH_SECONDS)
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Failed to refresh instructor ranking")
+
+    def start_refresher(self) -> None:
+        """Start the periodic full reload (called on application startup)."""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._run_refresher())
+
+    async def stop_refresher(self) -> None:
+        """Stop background reload tasks."""
+        for task in (self._refresher, self._reload_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresher = None
+        self._reload_task = None
+
+    def clear(self) -> None:
+        """Drop the table; the next ``search`` reloads it."""
+        self._by_id = {}
+        self._by_role = {}
+        self._unsorted = set()
+        self._pending = set()
+        self._loaded_at = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return table size and counters."""
+        return {
+            "loaded": self.loaded,
+            "age_seconds": round(time.time() - self._loaded_at, 1) if self.loaded else None,
+            "instructors": len(self._by_id),
+            "free_slots": sum(len(entry.free) for entry in self._by_id.values()),
+            "reloads": self.reloads,
+            "partial_reloads": self.partial_reloads,
+            "updates": self.updates,
+            "searches": self.searches,
+        }
+
+
+instructor_ranking = InstructorRanking(AsyncSessionLocal)
+
+
+def reload_after_commit(db: AsyncSession, instructor_ids: Iterable[int]) -> None:
+    """
+    Reload the instructors' rankings once the current transaction commits.
+
+    For changes the ORM events cannot see, such as bulk INSERTs and UPDATEs.
+    """
+    db.sync_session.info.setdefault(_RELOAD_INFO_KEY, set()).update(instructor_ids)
+
+
+def _history_value(instance: Any, name: str) -> Any:
+    """The value of an attribute before the flush."""
+    history = inspect(instance).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(instance, name)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_ranking_changes(session: Session, flush_context: Any) -> None:
+    changes: list[tuple[Any, ...]] | None = None
+
+    def record(*change: Any) -> None:
+        nonlocal changes
+        if changes is None:
+            changes = session.info.setdefault(_SESSION_INFO_KEY, [])
+        changes.append(change)
+
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, User):
+            ranked = instance not in session.deleted and _is_ranked(instance)
+            if ranked or _history_value(instance, "role") in RANKED_ROLES:
+                profile = (
+                    {name: getattr(instance, name) for name in _PROFILE_FIELDS}
+                    if ranked
+                    else None
+                )
+                record("profile", instance.id, profile)
+
+        elif isinstance(instance, BookingSlot):
+            start = instance.start_time.timestamp()
+            was_free = instance not in session.new and _history_value(instance, "is_available")
+            is_free = instance not in session.deleted and instance.is_available
+            if is_free and not was_free:
+                record("slot_freed", instance.instructor_id, start)
+            elif was_free and not is_free:
+                record("slot_taken", instance.instructor_id, start)
+
+        elif isinstance(instance, Booking) and instance not in session.deleted:
+            start = instance.scheduled_start.timestamp()
+            if instance in session.new:
+                if instance.slot_id is not None and instance.status in _OPEN_STATUSES:
+                    record("slot_taken", instance.instructor_id, start)
+                continue
+            previous = _history_value(instance, "status")
+            if previous == instance.status or previous in _CLOSED_STATUSES:
+                continue
+            if instance.status in _CLOSED_STATUSES:
+                completed = int(instance.status == BookingStatus.COMPLETED)
+                record("closed", instance.instructor_id, completed)
+            if (
+                instance.status == BookingStatus.CANCELLED
+                and instance.slot_id is not None
+                and start > time.time()
+            ):
+                # cancel_booking frees future slots
+                record("slot_freed", instance.instructor_id, start)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_rankings(session: Session) -> None:
+    changes = session.info.pop(_SESSION_INFO_KEY, None)
+    reload = session.info.pop(_RELOAD_INFO_KEY, None)
+    if not instructor_ranking.loaded:
+        return
+    if changes:
+        instructor_ranking.apply(changes)
+    if reload:
+        instructor_ranking.request_reload(reload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_ranking_changes(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+    session.info.pop(_RELOAD_INFO_KEY, None)
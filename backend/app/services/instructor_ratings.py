@@ -0,0 +1,202 @@
+"""
+Instructor rating and session aggregates, and level promotion.
+
+``User.rating`` is the mean of the stars students gave the instructor's
+bookings (``Booking.student_rating``); ``User.total_sessions`` counts their
+completed bookings. Both are maintained incrementally: rating or completing
+a booking runs one ``UPDATE users`` that adds to the running
+``rating_sum`` / ``rating_count`` (or ``total_sessions``) and recomputes
+``rating`` from them in the same statement. The increment is applied to the
+row's current values under its row lock, so concurrent ratings never lose
+updates, and no bookings are scanned.
+
+A periodic job (``python -m app.services.instructor_ratings``,
+``make ratings``):
+- reconciles the aggregates with ``bookings`` in bulk, one ID range of
+  users per transaction, fixing rows that drifted (manual edits, bulk
+  imports);
+- promotes instructors whose aggregates meet ``LEVEL_REQUIREMENTS``, with
+  one UPDATE per level instead of a check on every rating.
+Levels are never lowered by the job.
+"""
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import Float, case, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.booking import Booking, BookingStatus
+from app.models.user import User, UserLevel
+from app.services.instructor_ranking import RANKED_ROLES, reload_after_commit
+
+logger = logging.getLogger(__name__)
+
+# Minimum completed sessions, number of ratings and mean rating per level, best first
+LEVEL_REQUIREMENTS = (
+    (UserLevel.ELITE, 300, 50, 4.8),
+    (UserLevel.PRO, 100, 20, 4.5),
+)
+
+
+def _mean(rating_sum: Any, rating_count: Any) -> Any:
+    return case((rating_count > 0, cast(rating_sum, Float) / rating_count), else_=0.0)
+
+
+async def record_rating(
+    db: AsyncSession, instructor_id: int, stars: int, previous: int | None = None
+) -> None:
+    """
+    Add a booking's rating to the instructor's aggregates in the current
+    transaction; ``previous`` is the booking's earlier rating, if re-rated.
+    """
+    rating_sum = User.rating_sum + (stars - (previous or 0))
+    rating_count = User.rating_count + (0 if previous is not None else 1)
+    await db.execute(
+        update(User)
+        .where(User.id == instructor_id)
+        .values(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating=_mean(rating_sum, rating_count),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    reload_after_commit(db, [instructor_id])
+
+
+async def record_completed_session(db: AsyncSession, instructor_id: int) -> None:
+    """Count a completed booking in the instructor's aggregates in the current transaction."""
+    await db.execute(
+        update(User)
+        .where(User.id == instructor_id)
+        .values(total_sessions=User.total_sessions + 1)
+        .execution_options(synchronize_session=False)
+    )
+    reload_after_commit(db, [instructor_id])
+
+
+async def reconcile_ratings(db: AsyncSession, first_id: int, last_id: int) -> list[int]:
+    """
+    Recompute the aggregates of users with IDs in ``[first_id, last_id]``
+    from ``bookings`` and fix the rows that differ; returns their IDs.
+
+    The users are locked before bookings are read, so a rating committed
+    concurrently is either counted here or applied on top afterwards.
+    """
+    in_range = User.id.between(first_id, last_id)
+    await db.execute(select(User.id).where(in_range).with_for_update())
+
+    totals = (
+        select(
+            User.id,
+            func.coalesce(func.sum(Booking.student_rating), 0).label("rating_sum"),
+            func.count(Booking.student_rating).label("rating_count"),
+            func.count(Booking.id)
+            .filter(Booking.status == BookingStatus.COMPLETED)
+            .label("total_sessions"),
+        )
+        .outerjoin(Booking, Booking.instructor_id == User.id)
+        .where(in_range)
+        .group_by(User.id)
+        .subquery()
+    )
+    result = await db.execute(
+        update(User)
+        .where(
+            User.id == totals.c.id,
+            (User.rating_sum != totals.c.rating_sum)
+            | (User.rating_count != totals.c.rating_count)
+            | (User.total_sessions != totals.c.total_sessions),
+        )
+        .values(
+            rating_sum=totals.c.rating_sum,
+            rating_count=totals.c.rating_count,
+            total_sessions=totals.c.total_sessions,
+            rating=_mean(totals.c.rating_sum, totals.c.rating_count),
+        )
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    fixed = list(result.scalars().all())
+    if fixed:
+        reload_after_commit(db, fixed)
+    return fixed
+
+
+async def promote_levels(db: AsyncSession) -> dict[UserLevel, list[int]]:
+    """
+    Raise the level of instructors meeting ``LEVEL_REQUIREMENTS``, and give
+    unleveled instructors ``BASIC``; returns the IDs changed per level.
+    """
+    eligible = (
+        User.role.in_(RANKED_ROLES),
+        User.is_active.is_(True),
+        User.deleted_at.is_(None),
+    )
+    changed: dict[UserLevel, list[int]] = {}
+    ordered = [level for level, *_ in LEVEL_REQUIREMENTS]
+    for position, (level, sessions, ratings, rating) in enumerate(LEVEL_REQUIREMENTS):
+        lower = [UserLevel.BASIC, *ordered[position + 1 :]]
+        result = await db.execute(
+            update(User)
+            .where(
+                *eligible,
+                User.level.is_(None) | User.level.in_(lower),
+                User.total_sessions >= sessions,
+                User.rating_count >= ratings,
+                User.rating >= rating,
+            )
+            .values(level=level)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        changed[level] = list(result.scalars().all())
+
+    result = await db.execute(
+        update(User)
+        .where(*eligible, User.level.is_(None))
+        .values(level=UserLevel.BASIC)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed[UserLevel.BASIC] = list(result.scalars().all())
+    reload_after_commit(db, [user_id for ids in changed.values() for user_id in ids])
+    return changed
+
+
+async def run_rating_job(
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    chunk_size: int = settings.RATING_RECONCILE_CHUNK_SIZE,
+) -> dict[str, int]:
+    """Reconcile every user's aggregates, then promote levels."""
+    started = time.perf_counter()
+    async with session_factory() as db:
+        last_id = await db.scalar(select(func.max(User.id))) or 0
+
+    fixed: list[int] = []
+    for first_id in range(1, last_id + 1, chunk_size):
+        async with session_factory() as db:
+            fixed += await reconcile_ratings(db, first_id, first_id + chunk_size - 1)
+            await db.commit()
+
+    async with session_factory() as db:
+        promoted = await promote_levels(db)
+        await db.commit()
+
+    summary = {
+        "reconciled": len(fixed),
+        **{level.value: len(ids) for level, ids in promoted.items()},
+    }
+    logger.info("Instructor ratings job ran in %.1fs: %s", time.perf_counter() - started, summary)
+    return summary
+
+
+if __name__ == "__main__":
+    """Run the instructor ratings job."""
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_rating_job()))
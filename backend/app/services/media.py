@@ -0,0 +1,250 @@
+"""
+Content-addressed image storage.
+
+Uploads are streamed: chunks are hashed (SHA-256) and written to a
+temporary file as they arrive, and the upload is aborted once it exceeds
+``MAX_UPLOAD_SIZE``, so the body is never held in memory. The digest names
+the image. An image already stored under that digest is not processed
+again, so re-uploading the same bytes (a shared question image, a retried
+upload) only costs the transfer.
+
+New images are decoded and re-encoded as WebP renditions, one per
+``IMAGE_VARIANT_SIZES`` (the longest edge, never upscaled), in a process
+pool so Pillow's CPU work runs outside the event loop and the GIL. The
+original is not kept. Only re-encoded renditions are served, so metadata
+is stripped and hostile uploads are never served back as they were sent.
+
+Layout: ``UPLOAD_DIR/images/<digest[:2]>/<digest>/<size>.webp``, plus
+``meta.json`` written last, which marks the image complete. Files are
+never modified once written, so they are served with immutable cache
+headers.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+IMAGE_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes of the accepted formats, by file extension
+_SIGNATURES = {
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+    ".webp": (b"RIFF",),
+}
+_WRITE_BUFFER_SIZE = 1024 * 1024
+_META_FILE = "meta.json"
+
+
+class MediaError(Exception):
+    """An upload was rejected."""
+
+
+class UploadTooLarge(MediaError):
+    """The upload exceeds ``MAX_UPLOAD_SIZE``."""
+
+
+class UnsupportedImage(MediaError):
+    """The upload is not an image in an allowed format."""
+
+
+def _is_allowed_format(head: bytes) -> bool:
+    for extension in settings.ALLOWED_IMAGE_EXTENSIONS:
+        for signature in _SIGNATURES.get(extension.lower(), ()):
+            if head.startswith(signature) and (extension != ".webp" or head[8:12] == b"WEBP"):
+                return True
+    return False
+
+
+def _render_variants(
+    source: str, target: str, sizes: list[int], quality: int, max_pixels: int
+) -> dict[str, Any]:
+    """
+    Decode ``source`` and write one WebP per size into ``target``.
+
+    Runs in a worker process; returns the image metadata.
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise UnsupportedImage(str(exc)) from None
+
+    width, height = image.size
+    os.makedirs(target, exist_ok=True)
+    variants = {}
+    for size in sorted(sizes):
+        rendition = image.copy()
+        rendition.thumbnail((size, size), Image.Resampling.LANCZOS)
+        path = os.path.join(target, f"{size}.webp")
+        temporary = f"{path}.{os.getpid()}.tmp"
+        rendition.save(temporary, "WEBP", quality=quality, method=4)
+        os.replace(temporary, path)
+        variants[str(size)] = os.path.getsize(path)
+
+    meta = {"width": width, "height": height, "variants": variants}
+    temporary = os.path.join(target, f"{_META_FILE}.{os.getpid()}.tmp")
+    with open(temporary, "w") as file:
+        json.dump(meta, file)
+    os.replace(temporary, os.path.join(target, _META_FILE))
+    return meta
+
+
+class StoredImage:
+    """An image in storage and its renditions."""
+
+    __slots__ = ("digest", "width", "height", "variants", "created")
+
+    def __init__(
+        self, digest: str, width: int, height: int, variants: dict[str, int], created: bool
+    ) -> None:
+        self.digest = digest
+        self.width = width
+        self.height = height
+        self.variants = variants  # Size -> bytes
+        self.created = created
+
+    @property
+    def stored_bytes(self) -> int:
+        return sum(self.variants.values())
+
+
+class ImageStore:
+    """Stores uploads by content hash and renders them in a process pool."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self._executor: ProcessPoolExecutor | None = None
+        self.uploads = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+        return self._executor
+
+    def image_dir(self, digest: str) -> Path:
+        return self.root / "images" / digest[:2] / digest
+
+    def variant_path(self, digest: str, size: int) -> Path | None:
+        """Path of a rendition, or None if the digest or size is not valid."""
+        if not IMAGE_DIGEST_PATTERN.match(digest) or size not in settings.IMAGE_VARIANT_SIZES:
+            return None
+        return self.image_dir(digest) / f"{size}.webp"
+
+    def _load(self, digest: str) -> StoredImage | None:
+        try:
+            with open(self.image_dir(digest) / _META_FILE) as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            return None
+        if set(meta["variants"]) != {str(size) for size in settings.IMAGE_VARIANT_SIZES}:
+            return None  # Stored with other sizes; render again
+        return StoredImage(digest, meta["width"], meta["height"], meta["variants"], False)
+
+    async def _receive(self, chunks: AsyncIterator[bytes], file: Any) -> str:
+        """Hash and spool the upload to ``file``; returns the digest."""
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        size = 0
+        checked = False
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > settings.MAX_UPLOAD_SIZE:
+                raise UploadTooLarge(f"Upload exceeds {settings.MAX_UPLOAD_SIZE} bytes")
+            digest.update(chunk)
+            buffer += chunk
+            if not checked and len(buffer) >= 16:
+                if not _is_allowed_format(bytes(buffer[:16])):
+                    raise UnsupportedImage("Unsupported image format")
+                checked = True
+            if len(buffer) >= _WRITE_BUFFER_SIZE:
+                await asyncio.to_thread(file.write, bytes(buffer))
+                buffer.clear()
+        if not checked:
+            raise UnsupportedImage("Unsupported image format")
+        await asyncio.to_thread(file.write, bytes(buffer))
+        await asyncio.to_thread(file.flush)
+        return digest.hexdigest()
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> StoredImage:
+        """
+        Store a streamed upload.
+
+        Raises:
+            UploadTooLarge: The upload exceeds ``MAX_UPLOAD_SIZE``
+            UnsupportedImage: The upload is not a decodable image in an allowed format
+        """
+        spool = self.root / "tmp"
+        spool.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=spool, suffix=".upload") as file:
+            try:
+                digest = await self._receive(chunks, file)
+            except MediaError:
+                self.rejected += 1
+                raise
+
+            stored = self._load(digest)
+            if stored is not None:
+                self.deduplicated += 1
+                return stored
+
+            loop = asyncio.get_running_loop()
+            try:
+                meta = await loop.run_in_executor(
+                    self._get_executor(),
+                    _render_variants,
+                    file.name,
+                    str(self.image_dir(digest)),
+                    settings.IMAGE_VARIANT_SIZES,
+                    settings.IMAGE_WEBP_QUALITY,
+                    settings.IMAGE_MAX_PIXELS,
+                )
+            except UnsupportedImage:
+                self.rejected += 1
+                raise
+        self.uploads += 1
+        return StoredImage(digest, meta["width"], meta["height"], meta["variants"], True)
+
+    async def discard(self, digest: str) -> None:
+        """Remove a newly stored image whose upload was refused."""
+        directory = self.image_dir(digest)
+        try:
+            # Without meta.json the image is incomplete, so it is not deduplicated
+            await asyncio.to_thread(os.remove, directory / _META_FILE)
+        except FileNotFoundError:
+            return
+        await asyncio.to_thread(shutil.rmtree, directory, True)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes (called on application shutdown)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return upload counters."""
+        return {
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+        }
+
+
+image_store = ImageStore(settings.UPLOAD_DIR)
@@ -0,0 +1,660 @@
+"""
+Notification dispatcher: SMS, WhatsApp and email.
+
+Request handlers never wait on providers. ``send`` puts a message on the
+channel's in-memory queue and returns. ``notify_after_commit`` goes
+further: it only records the notification on the session, and once the
+transaction commits a background task resolves the user's contacts and
+queues one message per channel in ``NOTIFICATION_CHANNELS``.
+
+One worker per channel drains its queue in batches: it waits up to
+``NOTIFICATION_BATCH_WINDOW_SECONDS`` for a batch to fill, paces batches
+with a token bucket (``*_RATE_PER_SECOND``) and hands them to the
+provider:
+- SMS: one HTTP request per batch;
+- WhatsApp (Cloud API): one request per message, sent concurrently;
+- email: one SMTP session for the whole batch.
+
+HTTP providers keep one pooled ``httpx.AsyncClient``, so connections are
+kept alive between batches. Email keeps one SMTP connection open on a
+dedicated thread and reconnects when the server drops it.
+
+Failed messages are retried with exponential backoff and jitter, or after
+the provider's ``Retry-After``, up to ``NOTIFICATION_MAX_ATTEMPTS`` times.
+Failures that retrying cannot fix (e.g. HTTP 400, SMTP 5xx) are dropped at
+once. Queues live in process memory: messages still queued when the process
+stops are lost after ``NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS``.
+
+Hooks: booking confirmations (``booking_engine``), exam results
+(``exam_engine``) and payment receipts (``payment_events.on_processed``).
+"""
+import abc
+import asyncio
+import logging
+import random
+import smtplib
+import ssl
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Any
+from zoneinfo import ZoneInfo
+
+import httpx
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.payment import Payment, PaymentEvent, PaymentEventType
+from app.models.user import User
+from app.services.payment_events import payment_events
+
+logger = logging.getLogger(__name__)
+
+SMS = "sms"
+WHATSAPP = "whatsapp"
+EMAIL = "email"
+
+# Message templates (subject, text) by name
+TEMPLATES: dict[str, tuple[str, str]] = {
+    "booking_confirmed": (
+        "Mashg'ulot band qilindi",
+        "Onless: mashg'ulot band qilindi, {start:%d.%m.%Y %H:%M}. Buyurtma #{booking_id}.",
+    ),
+    "exam_passed": (
+        "Imtihon natijasi",
+        "Onless: imtihondan o'tdingiz! Natija: {score:.0f}% ({correct}/{total}).",
+    ),
+    "exam_failed": (
+        "Imtihon natijasi",
+        "Onless: imtihondan o'ta olmadingiz. Natija: {score:.0f}% ({correct}/{total}).",
+    ),
+    "payment_received": (
+        "To'lov qabul qilindi",
+        "Onless: {amount} so'm to'lov qabul qilindi. To'lov #{payment_id}.",
+    ),
+    "payment_refunded": (
+        "To'lov qaytarildi",
+        "Onless: {amount} so'm to'lov qaytarildi. To'lov #{payment_id}.",
+    ),
+}
+
+_SESSION_INFO_KEY = "pending_notifications"
+
+
+def render(template: str, **params: Any) -> tuple[str, str]:
+    """Render a template to ``(subject, text)``; datetimes are shown in local time."""
+    subject, text = TEMPLATES[template]
+    tz = ZoneInfo(settings.BOOKING_TIMEZONE)
+    params = {
+        name: value.astimezone(tz) if isinstance(value, datetime) else value
+        for name, value in params.items()
+    }
+    return subject, text.format(**params)
+
+
+class DeliveryError(Exception):
+    """A message was not delivered."""
+
+    def __init__(self, reason: str, retryable: bool, retry_after: float | None = None) -> None:
+        super().__init__(reason)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class Message:
+    """One message to one recipient."""
+
+    __slots__ = ("channel", "recipient", "subject", "text", "attempts")
+
+    def __init__(self, channel: str, recipient: str, text: str, subject: str | None = None) -> None:
+        self.channel = channel
+        self.recipient = recipient
+        self.text = text
+        self.subject = subject
+        self.attempts = 0
+
+    def __repr__(self) -> str:
+        return f"<Message(channel={self.channel}, recipient={self.recipient})>"
+
+
+class Provider(abc.ABC):
+    """Sends batches of messages over one channel."""
+
+    channel: str
+
+    def __init__(self, batch_size: int, rate: float) -> None:
+        self.batch_size = batch_size
+        self.rate = rate
+
+    @abc.abstractmethod
+    async def send_batch(self, messages: Sequence[Message]) -> list[DeliveryError | None]:
+        """Send messages; returns None or the error for each message, in order."""
+
+    async def close(self) -> None:
+        """Release pooled connections."""
+
+
+def _http_error(response: httpx.Response) -> DeliveryError | None:
+    if response.is_success:
+        return None
+    retry_after = None
+    try:
+        retry_after = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        pass
+    retryable = response.status_code in (408, 429) or response.status_code >= 500
+    return DeliveryError(f"HTTP {response.status_code}", retryable, retry_after)
+
+
+class HTTPProvider(Provider):
+    """Provider calling an HTTP API through one pooled client."""
+
+    def __init__(self, url: str, token: str, batch_size: int, rate: float) -> None:
+        super().__init__(batch_size, rate)
+        self.url = url
+        self.token = token
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            connections = settings.NOTIFICATION_HTTP_MAX_CONNECTIONS
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.token}"},
+                timeout=settings.NOTIFICATION_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=connections, max_keepalive_connections=connections
+                ),
+            )
+        return self._client
+
+    async def _post(self, payload: dict[str, Any]) -> DeliveryError | None:
+        try:
+            response = await self.client.post(self.url, json=payload)
+        except httpx.HTTPError as exc:
+            return DeliveryError(repr(exc), retryable=True)
+        return _http_error(response)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SMSProvider(HTTPProvider):
+    """SMS gateway accepting a batch of messages per request."""
+
+    channel = SMS
+
+    async def send_batch(self, messages: Sequence[Message]) -> list[DeliveryError | None]:
+        payload = {"messages": [{"to": m.recipient, "text": m.text} for m in messages]}
+        error = await self._post(payload)
+        return [error] * len(messages)
+
+
+class WhatsAppProvider(HTTPProvider):
+    """WhatsApp Business Cloud API: one request per message, sent concurrently."""
+
+    channel = WHATSAPP
+
+    async def send_batch(self, messages: Sequence[Message]) -> list[DeliveryError | None]:
+        return list(
+            await asyncio.gather(
+                *(
+                    self._post(
+                        {
+                            "messaging_product": "whatsapp",
+                            "to": "".join(filter(str.isdigit, m.recipient)),
+                            "type": "text",
+                            "text": {"body": m.text},
+                        }
+                    )
+                    for m in messages
+                )
+            )
+        )
+
+
+class EmailProvider(Provider):
+    """
+    SMTP provider keeping one connection open.
+
+    ``smtplib`` is blocking, so the connection lives on a dedicated thread
+    and each batch is sent there in one go.
+    """
+
+    channel = EMAIL
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        batch_size: int,
+        rate: float,
+        user: str | None = None,
+        password: str | None = None,
+        use_tls: bool = True,
+    ) -> None:
+        super().__init__(batch_size, rate)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self._smtp: smtplib.SMTP | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self.connections = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(
+            self.host, self.port, timeout=settings.NOTIFICATION_HTTP_TIMEOUT_SECONDS
+        )
+        if self.use_tls:
+            smtp.starttls(context=ssl.create_default_context())
+        if self.user:
+            smtp.login(self.user, self.password or "")
+        self.connections += 1
+        return smtp
+
+    def _message(self, message: Message) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.recipient
+        email["Subject"] = message.subject or ""
+        email.set_content(message.text)
+        return email
+
+    def _send_one(self, message: Message) -> None:
+        for attempt in range(2):
+            if self._smtp is None:
+                self._smtp = self._connect()
+            try:
+                self._smtp.send_message(self._message(message))
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Dropped while idle; reconnect once
+                self._smtp = None
+                if attempt:
+                    raise
+
+    def _send_all(self, messages: Sequence[Message]) -> list[DeliveryError | None]:
+        results: list[DeliveryError | None] = []
+        for message in messages:
+            try:
+                self._send_one(message)
+                results.append(None)
+            except smtplib.SMTPRecipientsRefused as exc:
+                codes = [code for code, _ in exc.recipients.values()]
+                results.append(DeliveryError(repr(exc), retryable=any(c < 500 for c in codes)))
+            except smtplib.SMTPResponseException as exc:
+                results.append(DeliveryError(repr(exc), retryable=exc.smtp_code < 500))
+            except (smtplib.SMTPException, OSError) as exc:
+                self._smtp = None
+                results.append(DeliveryError(repr(exc), retryable=True))
+        return results
+
+    async def send_batch(self, messages: Sequence[Message]) -> list[DeliveryError | None]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._send_all, messages)
+
+    def _quit(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._quit)
+
+
+class Throttle:
+    """Token bucket pacing sends to ``rate`` messages per second (0 = unlimited)."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self, count: int) -> None:
+        """Wait until ``count`` (at most the bucket capacity) messages may be sent."""
+        if self.rate <= 0:
+            return
+        count = min(count, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= count:
+                self.tokens -= count
+                return
+            await asyncio.sleep((count - self.tokens) / self.rate)
+
+
+def build_providers() -> dict[str, Provider]:
+    """Providers for the channels configured in settings."""
+    providers: dict[str, Provider] = {}
+    if settings.SMS_PROVIDER_URL and settings.SMS_PROVIDER_API_KEY:
+        providers[SMS] = SMSProvider(
+            settings.SMS_PROVIDER_URL,
+            settings.SMS_PROVIDER_API_KEY,
+            settings.SMS_BATCH_SIZE,
+            settings.SMS_RATE_PER_SECOND,
+        )
+    if settings.WHATSAPP_API_URL and settings.WHATSAPP_API_TOKEN:
+        providers[WHATSAPP] = WhatsAppProvider(
+            settings.WHATSAPP_API_URL,
+            settings.WHATSAPP_API_TOKEN,
+            settings.WHATSAPP_BATCH_SIZE,
+            settings.WHATSAPP_RATE_PER_SECOND,
+        )
+    if settings.SMTP_HOST and settings.EMAILS_FROM_EMAIL:
+        providers[EMAIL] = EmailProvider(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            formataddr((settings.EMAILS_FROM_NAME or "", settings.EMAILS_FROM_EMAIL)),
+            settings.EMAIL_BATCH_SIZE,
+            settings.EMAIL_RATE_PER_SECOND,
+            user=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_TLS,
+        )
+    return providers
+
+
+class _Channel:
+    """Queue, worker and counters of one provider."""
+
+    __slots__ = ("provider", "queue", "throttle", "worker", "sent", "failed", "retried", "dropped")
+
+    def __init__(self, provider: Provider) -> None:
+        self.provider = provider
+        self.queue: asyncio.Queue[Message] = asyncio.Queue(settings.NOTIFICATION_QUEUE_SIZE)
+        self.throttle = Throttle(provider.rate, provider.batch_size)
+        self.worker: asyncio.Task[None] | None = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+
+    async def next_batch(self) -> list[Message]:
+        """Wait for a message, then collect more until the batch is full or the window ends."""
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.NOTIFICATION_BATCH_WINDOW_SECONDS
+        while len(batch) < self.provider.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except TimeoutError:
+                break
+        return batch
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
+
+
+class NotificationDispatcher:
+    """Queues messages per channel and sends them in the background."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        providers: dict[str, Provider] | None = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self._channels: dict[str, _Channel] = {}
+        self._retries: set[asyncio.TimerHandle] = set()
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.unconfigured = 0
+        self.configure(build_providers() if providers is None else providers)
+
+    def configure(self, providers: dict[str, Provider]) -> None:
+        """Replace the providers (before ``start``)."""
+        self._channels = {channel: _Channel(provider) for channel, provider in providers.items()}
+
+    @property
+    def channels(self) -> list[str]:
+        """Channels with a configured provider."""
+        return list(self._channels)
+
+    def _done(self, count: int = 1) -> None:
+        self._pending -= count
+        if self._pending <= 0:
+            self._pending = 0
+            self._idle.set()
+
+    def send(self, channel: str, recipient: str, text: str, subject: str | None = None) -> bool:
+        """
+        Queue a message without waiting.
+
+        Returns False if the channel is not configured or its queue is full.
+        """
+        state = self._channels.get(channel)
+        if state is None:
+            self.unconfigured += 1
+            return False
+        try:
+            state.queue.put_nowait(Message(channel, recipient, text, subject))
+        except asyncio.QueueFull:
+            state.dropped += 1
+            logger.warning("Notification queue for %s is full; message dropped", channel)
+            return False
+        self._pending += 1
+        self._idle.clear()
+        return True
+
+    def notify_users(self, notifications: Sequence[tuple[int, str, dict[str, Any]]]) -> None:
+        """
+        Render and queue ``(user_id, template, params)`` notifications in the background.
+
+        Safe to call from synchronous code (e.g. ORM events).
+        """
+        if not notifications or not self._channels:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pending += 1
+        self._idle.clear()
+        task = loop.create_task(self._notify_users(list(notifications)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _notify_users(self, notifications: list[tuple[int, str, dict[str, Any]]]) -> None:
+        try:
+            user_ids = {user_id for user_id, _, _ in notifications}
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(User.id, User.phone, User.email).where(
+                        User.id.in_(user_ids), User.is_active.is_(True)
+                    )
+                )
+                contacts = {row.id: row for row in result}
+
+            for user_id, template, params in notifications:
+                contact = contacts.get(user_id)
+                if contact is None:
+                    continue
+                subject, text = render(template, **params)
+                for channel in settings.NOTIFICATION_CHANNELS:
+                    address = contact.email if channel == EMAIL else contact.phone
+                    if address and channel in self._channels:
+                        self.send(channel, address, text, subject)
+        except Exception:
+            logger.exception("Failed to queue user notifications")
+        finally:
+            self._done()
+
+    def _schedule_retry(self, state: _Channel, message: Message, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+
+        def requeue() -> None:
+            self._retries.discard(handle)
+            try:
+                state.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                state.dropped += 1
+                self._done()
+
+        handle = loop.call_later(delay, requeue)
+        self._retries.add(handle)
+
+    @staticmethod
+    def _backoff(message: Message, error: DeliveryError) -> float:
+        if error.retry_after is not None:
+            return error.retry_after
+        delay = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (message.attempts - 1)
+        return min(delay, settings.NOTIFICATION_RETRY_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+    async def _deliver(self, state: _Channel, batch: list[Message]) -> None:
+        await state.throttle.acquire(len(batch))
+        try:
+            results = await state.provider.send_batch(batch)
+        except Exception as exc:
+            logger.exception("Notification provider %s failed", state.provider.channel)
+            results = [DeliveryError(repr(exc), retryable=True)] * len(batch)
+
+        for message, error in zip(batch, results):
+            message.attempts += 1
+            if error is None:
+                state.sent += 1
+            elif error.retryable and message.attempts < settings.NOTIFICATION_MAX_ATTEMPTS:
+                state.retried += 1
+                self._schedule_retry(state, message, self._backoff(message, error))
+                continue
+            else:
+                state.failed += 1
+                logger.warning(
+                    "Notification over %s to %s failed after %d attempts: %s",
+                    message.channel,
+                    message.recipient,
+                    message.attempts,
+                    error,
+                )
+            self._done()
+
+    async def _run(self, state: _Channel) -> None:
+        while True:
+            batch = await state.next_batch()
+            try:
+                await self._deliver(state, batch)
+            except Exception:
+                logger.exception("Failed to deliver notifications")
+
+    async def drain(self) -> None:
+        """Wait until every queued message has been sent or given up on."""
+        await self._idle.wait()
+
+    def start(self) -> None:
+        """Start the channel workers (called on application startup)."""
+        for state in self._channels.values():
+            if state.worker is None:
+                state.worker = asyncio.create_task(self._run(state))
+
+    async def stop(self) -> None:
+        """Send what is queued within the shutdown timeout, then stop and close providers."""
+        if any(state.worker is not None for state in self._channels.values()):
+            try:
+                await asyncio.wait_for(
+                    self.drain(), settings.NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS
+                )
+            except TimeoutError:
+                logger.warning("Dropping %d unsent notifications", self._pending)
+
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        tasks = [*self._tasks]
+        for state in self._channels.values():
+            if state.worker is not None:
+                tasks.append(state.worker)
+                state.worker = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for state in self._channels.values():
+            while not state.queue.empty():
+                state.queue.get_nowait()
+            await state.provider.close()
+        self._pending = 0
+        self._idle.set()
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue and delivery counters per channel."""
+        return {
+            "channels": {channel: state.stats() for channel, state in self._channels.items()},
+            "pending": self._pending,
+            "unconfigured": self.unconfigured,
+        }
+
+
+notifications = NotificationDispatcher(AsyncSessionLocal)
+
+
+def notify_after_commit(db: AsyncSession, user_id: int, template: str, **params: Any) -> None:
+    """
+    Notify a user with a template once the session's transaction commits.
+
+    Nothing is sent if it rolls back.
+    """
+    db.sync_session.info.setdefault(_SESSION_INFO_KEY, []).append((user_id, template, params))
+
+
+def format_amount(amount: int) -> str:
+    """Format an amount in som with space-separated thousands (``1 250 000``)."""
+    return f"{amount:,}".replace(",", " ")
+
+
+async def _send_payment_receipt(event: PaymentEvent, payment: Payment) -> None:
+    template = (
+        "payment_received" if event.event_type == PaymentEventType.PAID else "payment_refunded"
+    )
+    params = {"amount": format_amount(payment.amount), "payment_id": payment.id}
+    notifications.notify_users([(payment.user_id, template, params)])
+
+
+payment_events.on_processed(_send_payment_receipt)
+
+
+@event.listens_for(Session, "after_commit")
+def _send_committed_notifications(session: Session) -> None:
+    pending = session.info.pop(_SESSION_INFO_KEY, None)
+    if pending:
+        notifications.notify_users(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_notifications(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
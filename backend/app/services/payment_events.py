@@ -0,0 +1,175 @@
+"""
+Payment event worker: applies completed and refunded payments.
+
+Gateway callbacks only record a ``PaymentEvent`` next to the payment (an
+outbox in the same transaction) and answer. This worker claims pending
+events with ``FOR UPDATE SKIP LOCKED``, so every API process can run one side
+by side. It extends or shortens the paid subscription and marks the event
+processed in one transaction. Processed events are then passed to registered
+hooks (receipts and other notifications).
+
+The worker is woken as soon as a callback commits and also polls, so events
+written before a crash or restart are still applied. Failing events are
+retried on each poll up to ``PAYMENT_EVENTS_MAX_ATTEMPTS`` times.
+"""
+import asyncio
+import calendar
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.payment import (
+    Payment,
+    PaymentEvent,
+    PaymentEventType,
+    Subscription,
+    SubscriptionStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+# Key of the number of paid months in ``Payment.external_data``
+MONTHS_KEY = "months"
+
+PaymentEventHook = Callable[[PaymentEvent, Payment], Awaitable[Any]]
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """Shift by calendar months, clamping the day (Jan 31 + 1 month = Feb 28/29)."""
+    month = moment.month - 1 + months
+    year = moment.year + month // 12
+    month = month % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+async def _apply(db: AsyncSession, event: PaymentEvent, payment: Payment) -> None:
+    """Extend the subscription by a payment, or take a refunded period back."""
+    months = int((payment.external_data or {}).get(MONTHS_KEY, 0))
+    if payment.subscription_id is None or not months:
+        return
+
+    subscription = await db.get(Subscription, payment.subscription_id, with_for_update=True)
+    if subscription is None:
+        return
+
+    now = datetime.now(timezone.utc)
+    if event.event_type == PaymentEventType.PAID:
+        if subscription.status != SubscriptionStatus.ACTIVE or subscription.expires_at <= now:
+            subscription.started_at = now
+        subscription.expires_at = add_months(max(now, subscription.expires_at), months)
+        subscription.status = SubscriptionStatus.ACTIVE
+    else:
+        subscription.expires_at = add_months(subscription.expires_at, -months)
+        if subscription.expires_at <= now:
+            subscription.status = SubscriptionStatus.EXPIRED
+    await db.flush()
+
+
+class PaymentEventWorker:
+    """Drains the payment event outbox in the background."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self.session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._hooks: list[PaymentEventHook] = []
+        self.processed = 0
+        self.failures = 0
+
+    def on_processed(self, hook: PaymentEventHook) -> None:
+        """Register a coroutine run with each event after it has been applied."""
+        self._hooks.append(hook)
+
+    def wake(self) -> None:
+        """Process pending events now rather than at the next poll."""
+        self._wakeup.set()
+
+    async def process(self, limit: int | None = None) -> int:
+        """Apply up to ``limit`` pending events; returns the number claimed."""
+        limit = limit or settings.PAYMENT_EVENTS_BATCH_SIZE
+        done: list[tuple[PaymentEvent, Payment]] = []
+        async with self.session_factory() as db:
+            rows = (
+                await db.execute(
+                    select(PaymentEvent, Payment)
+                    .join(PaymentEvent.payment)
+                    .where(
+                        PaymentEvent.processed_at.is_(None),
+                        PaymentEvent.attempts < settings.PAYMENT_EVENTS_MAX_ATTEMPTS,
+                    )
+                    .order_by(PaymentEvent.id)
+                    .limit(limit)
+                    .with_for_update(of=PaymentEvent, skip_locked=True)
+                )
+            ).all()
+
+            for event, payment in rows:
+                event.attempts += 1
+                try:
+                    async with db.begin_nested():
+                        await _apply(db, event, payment)
+                except Exception as exc:
+                    logger.exception("Failed to apply payment event %d", event.id)
+                    event.last_error = repr(exc)[:1000]
+                    self.failures += 1
+                    continue
+                event.processed_at = datetime.now(timezone.utc)
+                done.append((event, payment))
+            await db.commit()
+
+        self.processed += len(done)
+        for event, payment in done:
+            for hook in self._hooks:
+                try:
+                    await hook(event, payment)
+                except Exception:
+                    logger.exception("Payment event hook failed for event %d", event.id)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), settings.PAYMENT_EVENTS_POLL_SECONDS
+                )
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.process() >= settings.PAYMENT_EVENTS_BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception("Failed to process payment events")
+
+    def start_worker(self) -> None:
+        """Start processing in the background (called on application startup)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop_worker(self) -> None:
+        """Stop background processing; pending events stay for the next start."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return worker counters."""
+        return {
+            "running": self._task is not None,
+            "processed": self.processed,
+            "failures": self.failures,
+        }
+
+
+payment_events = PaymentEventWorker(AsyncSessionLocal)
@@ -0,0 +1,581 @@
+"""
+Payme and Click merchant callbacks.
+
+Gateways retry a callback until they get an answer, so every handler is
+idempotent. A payment is created with ``INSERT ... ON CONFLICT DO NOTHING`` on
+``external_transaction_id`` (``payme:<id>`` / ``click:<id>``). A repeated call
+finds the existing row and reports its current state.
+
+Completing a payment is one statement: a conditional ``UPDATE`` that also
+inserts the ``PaymentEvent`` in a CTE. The subscription is extended later by
+the payment event worker, so a callback costs a few indexed statements and
+one commit.
+
+The order being paid for is a subscription: Payme's ``account.subscription_id``
+or Click's ``merchant_trans_id``. The amount must equal the tariff's monthly or
+yearly price, which decides the period bought.
+
+Handlers take the raw request payload, because Click signs the values exactly
+as sent and both gateways expect errors in their own format, not HTTP errors.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.organization import Organization
+from app.models.payment import (
+    Payment,
+    PaymentEvent,
+    PaymentEventType,
+    PaymentMethod,
+    PaymentStatus,
+    Subscription,
+    Tariff,
+)
+from app.services.payment_events import MONTHS_KEY
+
+PAYME_ACCOUNT_FIELD = "subscription_id"
+# Payme cancels transactions not performed within 12 hours
+PAYME_TRANSACTION_TIMEOUT = timedelta(hours=12)
+PAYME_CANCEL_REASON_TIMEOUT = 4
+
+PAYME_STATES = {
+    PaymentStatus.PENDING: 1,
+    PaymentStatus.COMPLETED: 2,
+    PaymentStatus.CANCELLED: -1,
+    PaymentStatus.REFUNDED: -2,
+}
+
+PAYME_SYSTEM_ERROR = -32400
+PAYME_INSUFFICIENT_PRIVILEGE = -32504
+PAYME_PARSE_ERROR = -32700
+PAYME_INVALID_REQUEST = -32600
+PAYME_METHOD_NOT_FOUND = -32601
+PAYME_INVALID_AMOUNT = -31001
+PAYME_TRANSACTION_NOT_FOUND = -31003
+PAYME_CANNOT_PERFORM = -31008
+PAYME_ACCOUNT_NOT_FOUND = -31050
+
+_PAYME_MESSAGES = {
+    PAYME_SYSTEM_ERROR: ("Tizim xatosi", "Системная ошибка", "System error"),
+    PAYME_INSUFFICIENT_PRIVILEGE: (
+        "Ruxsat yo'q",
+        "Недостаточно привилегий",
+        "Insufficient privilege",
+    ),
+    PAYME_PARSE_ERROR: ("JSON xato", "Ошибка разбора JSON", "Parse error"),
+    PAYME_INVALID_REQUEST: ("Noto'g'ri so'rov", "Неверный запрос", "Invalid request"),
+    PAYME_METHOD_NOT_FOUND: ("Metod topilmadi", "Метод не найден", "Method not found"),
+    PAYME_INVALID_AMOUNT: ("Noto'g'ri summa", "Неверная сумма", "Invalid amount"),
+    PAYME_TRANSACTION_NOT_FOUND: (
+        "Tranzaksiya topilmadi",
+        "Транзакция не найдена",
+        "Transaction not found",
+    ),
+    PAYME_CANNOT_PERFORM: (
+        "Operatsiyani bajarib bo'lmaydi",
+        "Невозможно выполнить операцию",
+        "Unable to perform operation",
+    ),
+    PAYME_ACCOUNT_NOT_FOUND: ("Obuna topilmadi", "Подписка не найдена", "Subscription not found"),
+}
+
+CLICK_SUCCESS = 0
+CLICK_SIGN_FAILED = -1
+CLICK_INVALID_AMOUNT = -2
+CLICK_ACTION_NOT_FOUND = -3
+CLICK_ALREADY_PAID = -4
+CLICK_ORDER_NOT_FOUND = -5
+CLICK_TRANSACTION_NOT_FOUND = -6
+CLICK_UPDATE_FAILED = -7
+CLICK_BAD_REQUEST = -8
+CLICK_TRANSACTION_CANCELLED = -9
+
+_CLICK_NOTES = {
+    CLICK_SUCCESS: "Success",
+    CLICK_SIGN_FAILED: "SIGN CHECK FAILED!",
+    CLICK_INVALID_AMOUNT: "Incorrect parameter amount",
+    CLICK_ACTION_NOT_FOUND: "Action not found",
+    CLICK_ALREADY_PAID: "Already paid",
+    CLICK_ORDER_NOT_FOUND: "User does not exist",
+    CLICK_TRANSACTION_NOT_FOUND: "Transaction does not exist",
+    CLICK_UPDATE_FAILED: "Failed to update user",
+    CLICK_BAD_REQUEST: "Error in request from click",
+    CLICK_TRANSACTION_CANCELLED: "Transaction cancelled",
+}
+CLICK_PREPARE = 0
+CLICK_COMPLETE = 1
+
+
+class PaymeError(Exception):
+    """A JSON-RPC error reported to Payme."""
+
+    def __init__(self, code: int, data: str | None = None) -> None:
+        super().__init__(code)
+        self.code = code
+        self.data = data
+
+
+class ClickError(Exception):
+    """An error code reported to Click."""
+
+    def __init__(self, code: int) -> None:
+        super().__init__(code)
+        self.code = code
+
+
+def _ms(moment: datetime | None) -> int:
+    """Payme timestamps: milliseconds since the epoch, 0 for none."""
+    return int(moment.timestamp() * 1000) if moment is not None else 0
+
+
+def _parse_id(value: Any) -> int | None:
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed > 0 else None
+
+
+async def _order(db: AsyncSession, subscription_id: int | None) -> Row[Any] | None:
+    """Owner and tariff prices of the subscription being paid for, if it exists."""
+    if subscription_id is None:
+        return None
+    result = await db.execute(
+        select(Organization.owner_id, Tariff.price_monthly, Tariff.price_yearly)
+        .select_from(Subscription)
+        .join(Subscription.organization)
+        .join(Subscription.tariff)
+        .where(Subscription.id == subscription_id, Organization.deleted_at.is_(None))
+    )
+    return result.one_or_none()
+
+
+def _months_for(order: Row[Any], amount: Decimal) -> int | None:
+    """Months bought by ``amount`` som: a monthly or a yearly payment, else None."""
+    if amount <= 0:
+        return None
+    if amount == order.price_monthly:
+        return 1
+    if amount == order.price_yearly:
+        return 12
+    return None
+
+
+async def _insert_payment(
+    db: AsyncSession,
+    external_id: str,
+    method: PaymentMethod,
+    subscription_id: int,
+    user_id: int,
+    amount: int,
+    external_data: dict[str, Any],
+) -> Row[Any] | None:
+    """Create a pending payment; None if one with this external ID exists."""
+    result = await db.execute(
+        pg_insert(Payment)
+        .values(
+            user_id=user_id,
+            subscription_id=subscription_id,
+            amount=amount,
+            payment_method=method,
+            status=PaymentStatus.PENDING,
+            external_transaction_id=external_id,
+            external_data=external_data,
+            description=f"Subscription #{subscription_id}, {external_data[MONTHS_KEY]} month(s)",
+        )
+        .on_conflict_do_nothing(index_elements=[Payment.external_transaction_id])
+        .returning(Payment.id, Payment.created_at)
+    )
+    return result.one_or_none()
+
+
+async def _payment(db: AsyncSession, external_id: str, lock: bool = False) -> Payment | None:
+    statement = select(Payment).where(Payment.external_transaction_id == external_id)
+    if lock:
+        statement = statement.with_for_update()
+    return (await db.execute(statement)).scalar_one_or_none()
+
+
+async def _complete(db: AsyncSession, external_id: str, *conditions: Any) -> Row[Any] | None:
+    """
+    Mark a pending payment completed and queue its PAID event in one round
+    trip; None if it is not pending (or fails ``conditions``).
+    """
+    # Timestamps are set in SQL: Python-side defaults cannot be rendered in CTEs
+    paid = (
+        update(Payment)
+        .where(
+            Payment.external_transaction_id == external_id,
+            Payment.status == PaymentStatus.PENDING,
+            *conditions,
+        )
+        .values(status=PaymentStatus.COMPLETED, paid_at=func.now(), updated_at=func.now())
+        .returning(Payment.id, Payment.paid_at)
+        .cte("paid")
+    )
+    events = PaymentEvent.__table__
+    event = (
+        pg_insert(events)
+        .from_select(
+            ["payment_id", "event_type", "attempts", "created_at", "updated_at"],
+            select(
+                paid.c.id,
+                literal(PaymentEventType.PAID, events.c.event_type.type),
+                literal(0),
+                func.now(),
+                func.now(),
+            ),
+        )
+        .returning(events.c.id)
+        .cte("event")
+    )
+    result = await db.execute(select(paid.c.id, paid.c.paid_at).add_cte(event))
+    return result.one_or_none()
+
+
+async def _cancel(db: AsyncSession, payment: Payment, reason: int | None = None) -> None:
+    """Cancel a pending payment, or refund a completed one and queue its REFUNDED event."""
+    if payment.status == PaymentStatus.COMPLETED:
+        payment.status = PaymentStatus.REFUNDED
+        db.add(PaymentEvent(payment_id=payment.id, event_type=PaymentEventType.REFUNDED))
+    else:
+        payment.status = PaymentStatus.CANCELLED
+    payment.external_data = {
+        **(payment.external_data or {}),
+        "cancel_time": _ms(datetime.now(timezone.utc)),
+        "reason": reason,
+    }
+    await db.flush()
+
+
+# Payme (JSON-RPC, amounts in tiyin)
+
+
+def verify_payme_authorization(authorization: str | None) -> bool:
+    """Check the ``Basic base64("Paycom:<key>")`` header against the merchant key."""
+    key = settings.PAYMENT_PAYME_SECRET_KEY
+    if not key or not authorization or not authorization.startswith("Basic "):
+        return False
+    try:
+        decoded = base64.b64decode(authorization[6:], validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    _, _, password = decoded.partition(":")
+    return hmac.compare_digest(password.encode(), key.encode())
+
+
+def payme_error(request_id: Any, code: int, data: str | None = None) -> dict[str, Any]:
+    """A JSON-RPC error response (Payme expects HTTP 200 for these too)."""
+    uz, ru, en = _PAYME_MESSAGES[code]
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": {"uz": uz, "ru": ru, "en": en}, "data": data},
+    }
+
+
+def _param(params: dict[str, Any], name: str, kind: type) -> Any:
+    value = params.get(name)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise PaymeError(PAYME_INVALID_REQUEST, name)
+    return value
+
+
+def _payme_expired(payment: Payment) -> bool:
+    return datetime.now(timezone.utc) - payment.created_at > PAYME_TRANSACTION_TIMEOUT
+
+
+def _payme_transaction(payment: Payment) -> dict[str, Any]:
+    data = payment.external_data or {}
+    return {
+        "create_time": _ms(payment.created_at),
+        "perform_time": _ms(payment.paid_at),
+        "cancel_time": data.get("cancel_time", 0),
+        "transaction": str(payment.id),
+        "state": PAYME_STATES[payment.status],
+        "reason": data.get("reason"),
+    }
+
+
+async def _payme_order(db: AsyncSession, params: dict[str, Any]) -> tuple[int, Row[Any], int]:
+    """Subscription ID, order row and months paid for; raises on a bad account or amount."""
+    amount = _param(params, "amount", int)
+    account = _param(params, "account", dict)
+    subscription_id = _parse_id(account.get(PAYME_ACCOUNT_FIELD))
+    order = await _order(db, subscription_id)
+    if subscription_id is None or order is None:
+        raise PaymeError(PAYME_ACCOUNT_NOT_FOUND, PAYME_ACCOUNT_FIELD)
+    months = _months_for(order, Decimal(amount) / 100)
+    if months is None:
+        raise PaymeError(PAYME_INVALID_AMOUNT, "amount")
+    return subscription_id, order, months
+
+
+async def _payme_check_perform(db: AsyncSession, params: dict[str, Any]) -> dict[str, Any]:
+    await _payme_order(db, params)
+    return {"allow": True}
+
+
+async def _payme_create(db: AsyncSession, params: dict[str, Any]) -> dict[str, Any]:
+    external_id = f"payme:{_param(params, 'id', str)}"
+    time = _param(params, "time", int)
+    subscription_id, order, months = await _payme_order(db, params)
+    created = await _insert_payment(
+        db,
+        external_id,
+        PaymentMethod.PAYME,
+        subscription_id,
+        order.owner_id,
+        params["amount"] // 100,
+        {"time": time, "account": params["account"], MONTHS_KEY: months},
+    )
+    if created is not None:
+        return {"create_time": _ms(created.created_at), "transaction": str(created.id), "state": 1}
+
+    # Retried call
+    payment = await _payment(db, external_id, lock=True)
+    if payment is None:
+        raise PaymeError(PAYME_SYSTEM_ERROR)
+    if payment.status == PaymentStatus.PENDING and _payme_expired(payment):
+        await _cancel(db, payment, PAYME_CANCEL_REASON_TIMEOUT)
+    if payment.status != PaymentStatus.PENDING:
+        raise PaymeError(PAYME_CANNOT_PERFORM)
+    return {"create_time": _ms(payment.created_at), "transaction": str(payment.id), "state": 1}
+
+
+async def _payme_perform(db: AsyncSession, params: dict[str, Any]) -> dict[str, Any]:
+    external_id = f"payme:{_param(params, 'id', str)}"
+    paid = await _complete(
+        db, external_id, Payment.created_at > func.now() - PAYME_TRANSACTION_TIMEOUT
+    )
+    if paid is not None:
+        return {"transaction": str(paid.id), "perform_time": _ms(paid.paid_at), "state": 2}
+
+    payment = await _payment(db, external_id, lock=True)
+    if payment is None:
+        raise PaymeError(PAYME_TRANSACTION_NOT_FOUND)
+    if payment.status == PaymentStatus.PENDING:
+        if not _payme_expired(payment):
+            # A concurrent perform rolled back; let Payme retry
+            raise PaymeError(PAYME_SYSTEM_ERROR)
+        await _cancel(db, payment, PAYME_CANCEL_REASON_TIMEOUT)
+    if payment.status != PaymentStatus.COMPLETED:
+        raise PaymeError(PAYME_CANNOT_PERFORM)
+    return {"transaction": str(payment.id), "perform_time": _ms(payment.paid_at), "state": 2}
+
+
+async def _payme_cancel(db: AsyncSession, params: dict[str, Any]) -> dict[str, Any]:
+    external_id = f"payme:{_param(params, 'id', str)}"
+    reason = _param(params, "reason", int)
+    payment = await _payment(db, external_id, lock=True)
+    if payment is None:
+        raise PaymeError(PAYME_TRANSACTION_NOT_FOUND)
+    if payment.status in (PaymentStatus.PENDING, PaymentStatus.COMPLETED):
+        await _cancel(db, payment, reason)
+    transaction = _payme_transaction(payment)
+    return {key: transaction[key] for key in ("transaction", "cancel_time", "state")}
+
+
+async def _payme_check(db: AsyncSession, params: dict[str, Any]) -> dict[str, Any]:
+    payment = await _payment(db, f"payme:{_param(params, 'id', str)}")
+    if payment is None:
+        raise PaymeError(PAYME_TRANSACTION_NOT_FOUND)
+    return _payme_transaction(payment)
+
+
+async def _payme_statement(db: AsyncSession, params: dict[str, Any]) -> dict[str, Any]:
+    start, end = (
+        datetime.fromtimestamp(_param(params, name, int) / 1000, timezone.utc)
+        for name in ("from", "to")
+    )
+    payments = await db.scalars(
+        select(Payment)
+        .where(
+            Payment.payment_method == PaymentMethod.PAYME,
+            Payment.created_at.between(start, end),
+        )
+        .order_by(Payment.created_at)
+    )
+    return {
+        "transactions": [
+            {
+                "id": payment.external_transaction_id.removeprefix("payme:"),
+                "time": (payment.external_data or {}).get("time"),
+                "amount": payment.amount * 100,
+                "account": (payment.external_data or {}).get("account"),
+                **_payme_transaction(payment),
+            }
+            for payment in payments
+            if payment.external_transaction_id is not None
+        ]
+    }
+
+
+_PAYME_METHODS = {
+    "CheckPerformTransaction": _payme_check_perform,
+    "CreateTransaction": _payme_create,
+    "PerformTransaction": _payme_perform,
+    "CancelTransaction": _payme_cancel,
+    "CheckTransaction": _payme_check,
+    "GetStatement": _payme_statement,
+}
+
+
+async def handle_payme(
+    db: AsyncSession, payload: Any, authorization: str | None
+) -> dict[str, Any]:
+    """Answer a Payme JSON-RPC call; changes are left uncommitted."""
+    request_id = payload.get("id") if isinstance(payload, dict) else None
+    try:
+        if not verify_payme_authorization(authorization):
+            raise PaymeError(PAYME_INSUFFICIENT_PRIVILEGE)
+        if not isinstance(payload, dict) or not isinstance(payload.get("params"), dict):
+            raise PaymeError(PAYME_INVALID_REQUEST)
+        method = _PAYME_METHODS.get(payload.get("method"))  # type: ignore[arg-type]
+        if method is None:
+            raise PaymeError(PAYME_METHOD_NOT_FOUND)
+        result = await method(db, payload["params"])
+    except PaymeError as exc:
+        return payme_error(request_id, exc.code, exc.data)
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+# Click (SHOP API, form-encoded, amounts in som)
+
+
+def click_signature(*parts: Any) -> str:
+    """``md5`` of the concatenated fields, as Click signs its requests."""
+    return hashlib.md5("".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def click_response(form: Mapping[str, str], code: int, **ids: int) -> dict[str, Any]:
+    """A Click answer with ``code``, echoing the request's transaction IDs."""
+    return {
+        "click_trans_id": _parse_id(form.get("click_trans_id")),
+        "merchant_trans_id": form.get("merchant_trans_id"),
+        **ids,
+        "error": code,
+        "error_note": _CLICK_NOTES[code],
+    }
+
+
+def _click_verify(form: Mapping[str, str], action: int, *signed: str) -> tuple[int, Decimal]:
+    """Check a Click request's fields and signature; returns its transaction ID and amount."""
+    fields = ("service_id", "merchant_trans_id", "amount", "action", "sign_time", "sign_string")
+    click_trans_id = _parse_id(form.get("click_trans_id"))
+    if click_trans_id is None or any(not form.get(name) for name in (*fields, *signed)):
+        raise ClickError(CLICK_BAD_REQUEST)
+
+    key = settings.PAYMENT_CLICK_SECRET_KEY
+    expected = click_signature(
+        form["click_trans_id"],
+        form["service_id"],
+        key,
+        form["merchant_trans_id"],
+        *(form[name] for name in signed),
+        form["amount"],
+        form["action"],
+        form["sign_time"],
+    )
+    if not key or not hmac.compare_digest(expected, form["sign_string"]):
+        raise ClickError(CLICK_SIGN_FAILED)
+    if form["action"] != str(action):
+        raise ClickError(CLICK_ACTION_NOT_FOUND)
+    try:
+        amount = Decimal(form["amount"])
+    except InvalidOperation:
+        raise ClickError(CLICK_BAD_REQUEST)
+    return click_trans_id, amount
+
+
+async def _click_prepare(db: AsyncSession, form: Mapping[str, str]) -> int:
+    click_trans_id, amount = _click_verify(form, CLICK_PREPARE)
+    subscription_id = _parse_id(form["merchant_trans_id"])
+    order = await _order(db, subscription_id)
+    if subscription_id is None or order is None:
+        raise ClickError(CLICK_ORDER_NOT_FOUND)
+    months = _months_for(order, amount)
+    if months is None:
+        raise ClickError(CLICK_INVALID_AMOUNT)
+
+    external_id = f"click:{click_trans_id}"
+    created = await _insert_payment(
+        db,
+        external_id,
+        PaymentMethod.CLICK,
+        subscription_id,
+        order.owner_id,
+        int(amount),
+        {"click_paydoc_id": form.get("click_paydoc_id"), MONTHS_KEY: months},
+    )
+    if created is not None:
+        return int(created.id)
+
+    # Retried call
+    payment = await _payment(db, external_id)
+    if payment is None:
+        raise ClickError(CLICK_UPDATE_FAILED)
+    if payment.status == PaymentStatus.COMPLETED:
+        raise ClickError(CLICK_ALREADY_PAID)
+    if payment.status != PaymentStatus.PENDING:
+        raise ClickError(CLICK_TRANSACTION_CANCELLED)
+    return payment.id
+
+
+async def _click_complete(db: AsyncSession, form: Mapping[str, str]) -> int:
+    click_trans_id, amount = _click_verify(form, CLICK_COMPLETE, "merchant_prepare_id")
+    payment_id = _parse_id(form["merchant_prepare_id"])
+    try:
+        click_error = int(form.get("error") or 0)
+    except ValueError:
+        raise ClickError(CLICK_BAD_REQUEST)
+
+    external_id = f"click:{click_trans_id}"
+    if click_error >= 0 and amount == int(amount):
+        paid = await _complete(
+            db, external_id, Payment.id == payment_id, Payment.amount == int(amount)
+        )
+        if paid is not None:
+            return int(paid.id)
+
+    payment = await _payment(db, external_id, lock=True)
+    if payment is None or payment.id != payment_id:
+        raise ClickError(CLICK_TRANSACTION_NOT_FOUND)
+    if click_error < 0 and payment.status == PaymentStatus.PENDING:
+        # The payment failed on Click's side
+        await _cancel(db, payment)
+    if payment.status == PaymentStatus.COMPLETED:
+        raise ClickError(CLICK_ALREADY_PAID)
+    if payment.status != PaymentStatus.PENDING:
+        raise ClickError(CLICK_TRANSACTION_CANCELLED)
+    raise ClickError(CLICK_INVALID_AMOUNT)
+
+
+async def click_prepare(db: AsyncSession, form: Mapping[str, str]) -> dict[str, Any]:
+    """Answer Click's Prepare call: record a pending payment; changes are left uncommitted."""
+    try:
+        payment_id = await _click_prepare(db, form)
+    except ClickError as exc:
+        return click_response(form, exc.code)
+    return click_response(form, CLICK_SUCCESS, merchant_prepare_id=payment_id)
+
+
+async def click_complete(db: AsyncSession, form: Mapping[str, str]) -> dict[str, Any]:
+    """Answer Click's Complete call: mark the payment paid; changes are left uncommitted."""
+    try:
+        payment_id = await _click_complete(db, form)
+    except ClickError as exc:
+        return click_response(form, exc.code)
+    return click_response(form, CLICK_SUCCESS, merchant_confirm_id=payment_id)
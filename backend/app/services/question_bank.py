@@ -0,0 +1,312 @@
+"""
+In-memory question bank snapshot.
+
+The bank is small and read-mostly, so it is loaded once into compact
+``__slots__`` records with precomputed index arrays and swapped atomically
+(a single reference assignment) when questions change. Exam generation and
+grading read the snapshot and never query Postgres on the hot path.
+
+Reloads are triggered:
+- at application startup (``lifespan``)
+- after a transaction that inserted, updated or deleted a Question commits
+- periodically, when the table fingerprint (row count + latest update) no
+  longer matches the snapshot, which picks up edits made by other workers
+"""
+import asyncio
+import logging
+import time
+from array import array
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.question import Question
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "question_bank_changed"
+
+
+def difficulty_band(difficulty: int | None) -> str:
+    """Map the 1-5 difficulty scale to a sampling band."""
+    if difficulty is None or difficulty <= 2:
+        return "easy"
+    if difficulty == 3:
+        return "medium"
+    return "hard"
+
+
+DIFFICULTY_BANDS = ("easy", "medium", "hard")
+
+
+class QuestionRecord:
+    """Immutable-by-convention copy of one Question row."""
+
+    __slots__ = (
+        "id",
+        "category_id",
+        "difficulty",
+        "is_active",
+        "is_deleted",
+        "correct_option_id",
+        "text_uz",
+        "text_ru",
+        "text_kaa",
+        "image_url",
+        "options",
+        "explanation_uz",
+        "explanation_ru",
+        "explanation_kaa",
+    )
+
+    def __init__(self, **values: Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+    @property
+    def is_eligible(self) -> bool:
+        """Whether the question may be selected for new exam sessions."""
+        return self.is_active and not self.is_deleted
+
+
+class QuestionBankSnapshot:
+    """
+    A consistent, read-only view of the question bank.
+
+    ``records`` and ``answer_key`` cover every question that still exists, so
+    sessions started before a question was deactivated can still be graded.
+    The index arrays only contain questions eligible for new sessions.
+    """
+
+    __slots__ = (
+        "version",
+        "loaded_at",
+        "records",
+        "answer_key",
+        "ids",
+        "by_category",
+        "by_difficulty",
+        "by_stratum",
+    )
+
+    def __init__(self, version: str, records: list[QuestionRecord]) -> None:
+        self.version = version
+        self.loaded_at = time.time()
+        self.records: dict[int, QuestionRecord] = {record.id: record for record in records}
+        self.answer_key: dict[int, str] = {
+            record.id: record.correct_option_id for record in records
+        }
+
+        ids = array("i")
+        by_category: defaultdict[int | None, array[int]] = defaultdict(lambda: array("i"))
+        by_difficulty: defaultdict[int, array[int]] = defaultdict(lambda: array("i"))
+        by_stratum: defaultdict[tuple[int | None, str], array[int]] = defaultdict(
+            lambda: array("i")
+        )
+        for record in sorted(records, key=lambda r: r.id):
+            if not record.is_eligible:
+                continue
+            ids.append(record.id)
+            by_category[record.category_id].append(record.id)
+            by_difficulty[record.difficulty].append(record.id)
+            by_stratum[(record.category_id, difficulty_band(record.difficulty))].append(record.id)
+
+        self.ids = ids
+        self.by_category = dict(by_category)
+        self.by_difficulty = dict(by_difficulty)
+        # (category_id, difficulty band) -> question IDs, used for stratified sampling
+        self.by_stratum = dict(by_stratum)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def stats(self) -> dict[str, Any]:
+        """Return size and index information."""
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "total_records": len(self.records),
+            "eligible": len(self.ids),
+            "categories": {str(k): len(v) for k, v in self.by_category.items()},
+            "difficulties": {str(k): len(v) for k, v in self.by_difficulty.items()},
+        }
+
+
+def _fingerprint_statement() -> Any:
+    return select(func.count(Question.id), func.max(Question.updated_at))
+
+
+def _version(count: int, last_updated: Any) -> str:
+    stamp = int(last_updated.timestamp() * 1000) if last_updated is not None else 0
+    return f"{count}-{stamp}"
+
+
+class QuestionBank:
+    """Holder of the current snapshot with versioned hot reload."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self.session_factory = session_factory
+        self._snapshot: QuestionBankSnapshot | None = None
+        self._load_lock = asyncio.Lock()
+        self._reload_task: asyncio.Task[None] | None = None
+        self._refresher: asyncio.Task[None] | None = None
+        self._load_hooks: list[Callable[[QuestionBankSnapshot], Awaitable[Any]]] = []
+        self.reloads = 0
+
+    @property
+    def snapshot(self) -> QuestionBankSnapshot | None:
+        """The current snapshot, or None before the first load."""
+        return self._snapshot
+
+    def on_load(self, hook: Callable[[QuestionBankSnapshot], Awaitable[Any]]) -> None:
+        """
+        Register a coroutine run with each new snapshot before it is swapped in,
+        so derived data (e.g. rendered payloads) is ready when readers see it.
+        """
+        self._load_hooks.append(hook)
+
+    async def get(self) -> QuestionBankSnapshot:
+        """Return the current snapshot, loading it on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = await self.load()
+        return snapshot
+
+    async def load(self) -> QuestionBankSnapshot:
+        """Load a fresh snapshot from the database and swap it in."""
+        async with self._load_lock:
+            async with self.session_factory() as db:
+                count, last_updated = (await db.execute(_fingerprint_statement())).one()
+                result = await db.execute(
+                    select(
+                        Question.id,
+                        Question.category_id,
+                        Question.difficulty,
+                        Question.is_active,
+                        Question.deleted_at.is_not(None).label("is_deleted"),
+                        Question.correct_option_id,
+                        Question.text_uz,
+                        Question.text_ru,
+                        Question.text_kaa,
+                        Question.image_url,
+                        Question.options,
+                        Question.explanation_uz,
+                        Question.explanation_ru,
+                        Question.explanation_kaa,
+                    )
+                )
+                records = [QuestionRecord(**row) for row in result.mappings()]
+
+            snapshot = QuestionBankSnapshot(_version(count, last_updated), records)
+            for hook in self._load_hooks:
+                try:
+                    await hook(snapshot)
+                except Exception:
+                    logger.exception("Question bank load hook failed")
+            self._snapshot = snapshot
+            self.reloads += 1
+            logger.info(
+                "Loaded question bank %s (%d eligible questions)", snapshot.version, len(snapshot)
+            )
+            return snapshot
+
+    async def refresh_if_changed(self) -> bool:
+        """Reload if the table fingerprint differs from the snapshot version."""
+        async with self.session_factory() as db:
+            count, last_updated = (await db.execute(_fingerprint_statement())).one()
+
+        current = self._snapshot
+        if current is not None and current.version == _version(count, last_updated):
+            return False
+
+        await self.load()
+        return True
+
+    def request_reload(self) -> None:
+        """
+        Schedule a background reload, coalescing bursts of edits.
+
+        Safe to call from synchronous code (e.g. ORM events).
+        """
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._snapshot = None
+            return
+        self._reload_task = loop.create_task(self._delayed_reload())
+
+    async def _delayed_reload(self) -> None:
+        await asyncio.sleep(settings.QUESTION_BANK_RELOAD_DELAY_SECONDS)
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Failed to reload question bank")
+
+    async def _run_refresher(self) -> None:
+        while True:
+            await asyncio.sleep(settings.QUESTION_BANK_REFRESH_SECONDS)
+            try:
+                await self.refresh_if_changed()
+            except Exception:
+                logger.exception("Failed to refresh question bank")
+
+    def start_refresher(self) -> None:
+        """Start the periodic fingerprint check (called on application startup)."""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._run_refresher())
+
+    async def stop_refresher(self) -> None:
+        """Stop background reload tasks."""
+        for task in (self._refresher, self._reload_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresher = None
+        self._reload_task = None
+
+    def clear(self) -> None:
+        """Drop the snapshot; the next ``get`` reloads it."""
+        self._snapshot = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return snapshot information."""
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "reloads": self.reloads,
+            **(snapshot.stats() if snapshot is not None else {}),
+        }
+
+
+question_bank = QuestionBank(AsyncSessionLocal)
+
+
+@event.listens_for(Session, "after_flush")
+def _detect_question_changes(session: Session, flush_context: Any) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Question):
+            session.info[_SESSION_INFO_KEY] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_after_question_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_INFO_KEY, False):
+        question_bank.request_reload()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_question_changes(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
@@ -0,0 +1,180 @@
+"""
+Pre-rendered question payloads.
+
+Questions are stored once (Uzbek Latin plus optional Russian and Karakalpak
+translations) but students read them in four locales. Every snapshot version
+is rendered into each locale once, off the event loop, and kept as
+serialized JSON fragments per question. A response body is then a byte join
+of fragments, and its strong ETag depends only on the bank version, locale
+and question IDs, so conditional requests are answered with
+``304 Not Modified`` before any body is built.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Literal
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.question_bank import QuestionBankSnapshot, QuestionRecord, question_bank
+from app.utils.cyrillic import latin_to_cyrillic
+
+logger = logging.getLogger(__name__)
+
+Locale = Literal["uz-Latn", "uz-Cyrl", "ru", "kaa"]
+LOCALES: tuple[Locale, ...] = ("uz-Latn", "uz-Cyrl", "ru", "kaa")
+DEFAULT_LOCALE: Locale = "uz-Latn"
+
+# Locale -> suffix of the stored text fields; missing translations fall back to Uzbek
+_TEXT_SUFFIX = {"uz-Latn": "uz", "uz-Cyrl": "uz", "ru": "ru", "kaa": "kaa"}
+
+# Bump when the payload format changes so clients drop cached bodies
+_FORMAT_VERSION = b"1"
+
+_PAYLOAD_CACHE_TTL_SECONDS = 3600
+
+
+def _localized(values: Mapping[str, Any], locale: str) -> str:
+    text = values.get(f"text_{_TEXT_SUFFIX[locale]}") or values.get("text_uz") or ""
+    return latin_to_cyrillic(text) if locale == "uz-Cyrl" else text
+
+
+def render_question(record: QuestionRecord, locale: str) -> dict[str, Any]:
+    """Build the student-facing payload of a question (without the answer key)."""
+    texts = {"text_uz": record.text_uz, "text_ru": record.text_ru, "text_kaa": record.text_kaa}
+    return {
+        "id": record.id,
+        "category_id": record.category_id,
+        "image_url": record.image_url,
+        "text": _localized(texts, locale),
+        "options": [
+            {"id": option["id"], "text": _localized(option, locale)}
+            for option in record.options or []
+        ],
+    }
+
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip-encoded representation (strong ETags differ per encoding)."""
+    return f'{etag[:-1]}-gz"'
+
+
+class RenderedBank:
+    """Serialized question payloads of one snapshot version, per locale."""
+
+    __slots__ = ("version", "fragments", "size")
+
+    def __init__(self, snapshot: QuestionBankSnapshot) -> None:
+        self.version = snapshot.version
+        self.fragments: dict[str, dict[int, bytes]] = {}
+        self.size = 0
+        for locale in LOCALES:
+            rendered = {
+                question_id: json.dumps(
+                    render_question(record, locale), ensure_ascii=False, separators=(",", ":")
+                ).encode()
+                for question_id, record in snapshot.records.items()
+            }
+            self.fragments[locale] = rendered
+            self.size += sum(len(fragment) for fragment in rendered.values())
+
+
+class RenderedPayload:
+    """A response body with its ETag; the gzip encoding is produced once, on demand."""
+
+    __slots__ = ("body", "etag", "_gzipped")
+
+    def __init__(self, body: bytes, etag: str) -> None:
+        self.body = body
+        self.etag = etag
+        self._gzipped: bytes | None = None
+
+    def gzipped(self) -> bytes:
+        """Return the gzip-encoded body."""
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+class QuestionRenderer:
+    """Renders question bank snapshots and composes per-session payloads."""
+
+    def __init__(self, cache_size: int) -> None:
+        self._bank: RenderedBank | None = None
+        self._lock = asyncio.Lock()
+        # (version, locale, question IDs) -> composed payload, for repeated fetches
+        self._payloads: TTLCache[tuple[str, str, tuple[int, ...]], RenderedPayload] = TTLCache(
+            maxsize=cache_size, ttl=_PAYLOAD_CACHE_TTL_SECONDS
+        )
+        self.renders = 0
+
+    async def prepare(self, snapshot: QuestionBankSnapshot) -> RenderedBank:
+        """Render ``snapshot`` into every locale unless already done."""
+        bank = self._bank
+        if bank is not None and bank.version == snapshot.version:
+            return bank
+
+        async with self._lock:
+            bank = self._bank
+            if bank is None or bank.version != snapshot.version:
+                bank = await asyncio.to_thread(RenderedBank, snapshot)
+                self._bank = bank
+                self._payloads.clear()
+                self.renders += 1
+                logger.info(
+                    "Rendered question bank %s (%d bytes)", bank.version, bank.size
+                )
+        return bank
+
+    @staticmethod
+    def etag(version: str, locale: str, question_ids: Sequence[int]) -> str:
+        """Strong ETag of the payload, computed without rendering it."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(_FORMAT_VERSION)
+        digest.update(f":{version}:{locale}:".encode())
+        digest.update(array("i", question_ids).tobytes())
+        return f'"{digest.hexdigest()}"'
+
+    async def render(
+        self, snapshot: QuestionBankSnapshot, locale: str, question_ids: Sequence[int]
+    ) -> RenderedPayload:
+        """
+        Return the JSON array of the given questions, in order.
+
+        Questions missing from the snapshot (hard-deleted) are skipped.
+        """
+        key = (snapshot.version, locale, tuple(question_ids))
+        payload = self._payloads.get(key)
+        if payload is not None:
+            return payload
+
+        fragments = (await self.prepare(snapshot)).fragments[locale]
+        body = b"[" + b",".join(fragments[qid] for qid in question_ids if qid in fragments) + b"]"
+        payload = RenderedPayload(body, self.etag(snapshot.version, locale, question_ids))
+        self._payloads.set(key, payload)
+        return payload
+
+    def clear(self) -> None:
+        """Drop rendered payloads; the next request renders again."""
+        self._bank = None
+        self._payloads.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return render counters and payload cache statistics."""
+        bank = self._bank
+        return {
+            "version": bank.version if bank is not None else None,
+            "renders": self.renders,
+            "rendered_bytes": bank.size if bank is not None else 0,
+            "payload_cache": self._payloads.stats(),
+        }
+
+
+question_renderer = QuestionRenderer(settings.RENDERED_PAYLOAD_CACHE_SIZE)
+
+# Render each new snapshot before it becomes visible to requests
+question_bank.on_load(question_renderer.prepare)
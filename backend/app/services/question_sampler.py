@@ -0,0 +1,238 @@
+"""
+Stratified random question selection.
+
+Questions are drawn from the snapshot's precomputed
+``(category_id, difficulty band)`` index arrays:
+
+1. ``count`` is apportioned across categories, using the exam's
+   ``category_quotas`` where given and the bank's category sizes otherwise.
+2. Each category's share is apportioned across difficulty bands, weighted by
+   the exam's ``difficulty_mix`` times the band's size in that category.
+3. Each stratum is sampled by random index probing, which costs O(picks)
+   rather than O(stratum size), skipping recently seen questions.
+
+Steps 1-2 depend only on the snapshot and exam configuration, so the
+resulting plan is cached per snapshot version; each session then costs O(k).
+The bank size only matters when a stratum is almost entirely excluded and
+the sampler falls back to a linear scan.
+"""
+import math
+import random
+from array import array
+from collections.abc import Collection, Hashable, Mapping, Sequence
+from typing import TypeVar
+
+from app.services.question_bank import DIFFICULTY_BANDS, QuestionBankSnapshot
+
+K = TypeVar("K", bound=Hashable)
+
+# Random probes per requested question before scanning the stratum linearly
+_PROBE_FACTOR = 4
+
+
+def apportion(total: int, weights: Mapping[K, float], capacity: Mapping[K, int]) -> dict[K, int]:
+    """
+    Split ``total`` across keys proportionally to ``weights`` (largest remainder),
+    never exceeding a key's capacity. Returns fewer than ``total`` only when
+    all capacity is exhausted.
+    """
+    allocation = {key: 0 for key in weights}
+    remaining = total
+    open_keys = [key for key, weight in weights.items() if weight > 0 and capacity.get(key, 0) > 0]
+
+    while remaining > 0 and open_keys:
+        weight_sum = sum(weights[key] for key in open_keys)
+        shares = {key: remaining * weights[key] / weight_sum for key in open_keys}
+
+        granted = 0
+        for key in open_keys:
+            room = capacity[key] - allocation[key]
+            take = min(math.floor(shares[key]), room)
+            allocation[key] += take
+            granted += take
+
+        # Hand out the leftover one by one, largest fractional share first
+        if granted == 0:
+            by_remainder = sorted(
+                open_keys, key=lambda k: shares[k] - math.floor(shares[k]), reverse=True
+            )
+            for key in by_remainder:
+                if granted == remaining:
+                    break
+                if allocation[key] < capacity[key]:
+                    allocation[key] += 1
+                    granted += 1
+
+        remaining -= granted
+        open_keys = [key for key in open_keys if allocation[key] < capacity[key]]
+
+    return allocation
+
+
+Plan = list[tuple[Sequence[int], int]]
+
+# Distinct (count, quotas, mix) plans kept per snapshot
+_MAX_PLANS = 256
+
+
+class QuestionSampler:
+    """Draws exam question sets from a question bank snapshot."""
+
+    def __init__(self, rng: random.Random | None = None) -> None:
+        self._rng = rng or random.Random()
+        self._plans: dict[tuple[object, ...], Plan] = {}
+        self._plans_version: str | None = None
+
+    def _draw(
+        self,
+        pool: Sequence[int],
+        count: int,
+        exclude: Collection[int],
+        chosen: set[int],
+        out: list[int],
+    ) -> int:
+        """Append up to ``count`` random IDs from ``pool``; return how many were drawn."""
+        size = len(pool)
+        if count <= 0 or size == 0:
+            return 0
+
+        drawn = 0
+        randbelow = self._rng.randrange
+        for _ in range(count * _PROBE_FACTOR + 8):
+            question_id = pool[randbelow(size)]
+            if question_id in chosen or question_id in exclude:
+                continue
+            chosen.add(question_id)
+            out.append(question_id)
+            drawn += 1
+            if drawn == count:
+                return drawn
+
+        # The stratum is mostly excluded or exhausted: scan it once
+        candidates = [qid for qid in pool if qid not in chosen and qid not in exclude]
+        for question_id in self._rng.sample(candidates, min(count - drawn, len(candidates))):
+            chosen.add(question_id)
+            out.append(question_id)
+            drawn += 1
+        return drawn
+
+    def plan(
+        self,
+        snapshot: QuestionBankSnapshot,
+        count: int,
+        category_quotas: Mapping[int, int] | None = None,
+        difficulty_mix: Mapping[str, float] | None = None,
+    ) -> Plan:
+        """
+        Return the ``(stratum, picks)`` allocation for an exam configuration.
+
+        Plans are deterministic, so they are computed once per snapshot
+        version and configuration and reused for every session.
+        """
+        if self._plans_version != snapshot.version:
+            self._plans = {}
+            self._plans_version = snapshot.version
+
+        key = (
+            count,
+            tuple(sorted((category_quotas or {}).items())),
+            tuple(sorted((difficulty_mix or {}).items())),
+        )
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._build_plan(snapshot, count, category_quotas, difficulty_mix)
+            if len(self._plans) >= _MAX_PLANS:
+                self._plans.clear()
+            self._plans[key] = plan
+        return plan
+
+    def _build_plan(
+        self,
+        snapshot: QuestionBankSnapshot,
+        count: int,
+        category_quotas: Mapping[int, int] | None,
+        difficulty_mix: Mapping[str, float] | None,
+    ) -> Plan:
+        count = min(count, len(snapshot.ids))
+        category_sizes = {category: len(ids) for category, ids in snapshot.by_category.items()}
+
+        # 1. Questions per category
+        per_category: dict[int | None, int] = dict.fromkeys(category_sizes, 0)
+        if category_quotas:
+            fixed = {
+                category: min(quota, category_sizes[category])
+                for category, quota in category_quotas.items()
+                if category in category_sizes
+            }
+            fixed_total = min(sum(fixed.values()), count)
+            per_category.update(apportion(fixed_total, fixed, fixed))
+        left = count - sum(per_category.values())
+        if left > 0:
+            spare = {c: category_sizes[c] - per_category[c] for c in category_sizes}
+            for category, extra in apportion(left, spare, spare).items():
+                per_category[category] += extra
+
+        # 2. Questions per (category, band) stratum
+        mix = difficulty_mix or {}
+        plan: Plan = []
+        for category, category_count in per_category.items():
+            if category_count == 0:
+                continue
+            strata = {
+                band: snapshot.by_stratum.get((category, band), array("i"))
+                for band in DIFFICULTY_BANDS
+            }
+            sizes = {band: len(ids) for band, ids in strata.items()}
+            weights = {band: sizes[band] * mix.get(band, 1.0) for band in DIFFICULTY_BANDS}
+            # Fall back to plain proportions when the mix rules out every band present
+            if not any(weights.values()):
+                weights = dict(sizes)
+            for band, band_count in apportion(category_count, weights, sizes).items():
+                if band_count:
+                    plan.append((strata[band], band_count))
+        return plan
+
+    def sample(
+        self,
+        snapshot: QuestionBankSnapshot,
+        count: int,
+        category_quotas: Mapping[int, int] | None = None,
+        difficulty_mix: Mapping[str, float] | None = None,
+        exclude: Collection[int] = frozenset(),
+    ) -> list[int]:
+        """
+        Select ``count`` distinct eligible question IDs.
+
+        Args:
+            snapshot: Question bank snapshot to sample from
+            count: Number of questions to select
+            category_quotas: Questions per category ID; unassigned slots are
+                filled proportionally to category size
+            difficulty_mix: Relative weight per difficulty band
+            exclude: Question IDs to avoid (e.g. recently seen); used only if
+                the bank cannot fill the exam otherwise
+
+        Returns:
+            Question IDs in random order (fewer than ``count`` only if the
+            bank has fewer eligible questions)
+        """
+        count = min(count, len(snapshot.ids))
+        chosen: set[int] = set()
+        selected: list[int] = []
+
+        # 3. Draw each stratum's share
+        for pool, picks in self.plan(snapshot, count, category_quotas, difficulty_mix):
+            self._draw(pool, picks, exclude, chosen, selected)
+
+        # Exclusions can leave strata short: top up from the whole bank,
+        # first avoiding excluded questions, then allowing them
+        if len(selected) < count:
+            self._draw(snapshot.ids, count - len(selected), exclude, chosen, selected)
+        if len(selected) < count:
+            self._draw(snapshot.ids, count - len(selected), (), chosen, selected)
+
+        self._rng.shuffle(selected)
+        return selected
+
+
+question_sampler = QuestionSampler()
@@ -0,0 +1,231 @@
+"""
+Per-student exam progress: finished sessions, best score, accuracy per
+question category and most-missed questions.
+
+The aggregates are maintained incrementally. When sessions are finished or
+expired, ``record_sessions`` adds their results with three
+``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` statements in the
+transaction that changes their status, so each session is counted once and
+reading a student's progress never scans ``exam_sessions`` or
+``exam_answers``.
+
+``python -m app.services.student_progress`` (``make progress``) rebuilds
+the aggregates from history in bulk, one range of student IDs per
+transaction. Each range holds an exclusive advisory lock which
+``record_sessions`` takes in shared mode, so sessions finished during the
+rebuild are counted exactly once.
+"""
+import logging
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import Integer, and_, case, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.exam import ExamAnswer, ExamSession, ExamStatus
+from app.models.progress import StudentCategoryProgress, StudentProgress, StudentQuestionMiss
+from app.models.question import Question
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (ExamStatus.COMPLETED, ExamStatus.EXPIRED)
+# Advisory lock serializing rebuilds with incremental updates ("progress" in ASCII)
+PROGRESS_LOCK_ID = 0x70726F6772657373
+
+
+async def _add_results(db: AsyncSession, *criteria: Any) -> None:
+    """Add the results of the sessions matching ``criteria`` to the aggregates."""
+    score = func.coalesce(ExamSession.score, 0.0)
+    totals = (
+        select(
+            ExamSession.student_id,
+            func.count(),
+            func.count().filter(ExamSession.passed.is_(True)),
+            func.max(score),
+            array_agg(aggregate_order_by(score, ExamSession.completed_at.desc()))[1],
+            func.max(ExamSession.completed_at),
+        )
+        .where(*criteria)
+        .group_by(ExamSession.student_id)
+    )
+    stmt = pg_insert(StudentProgress).from_select(
+        [
+            "student_id",
+            "sessions",
+            "passed_sessions",
+            "best_score",
+            "last_score",
+            "last_finished_at",
+        ],
+        totals,
+    )
+    newer = stmt.excluded.last_finished_at >= StudentProgress.last_finished_at
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["student_id"],
+            set_={
+                "sessions": StudentProgress.sessions + stmt.excluded.sessions,
+                "passed_sessions": StudentProgress.passed_sessions
+                + stmt.excluded.passed_sessions,
+                "best_score": func.greatest(StudentProgress.best_score, stmt.excluded.best_score),
+                "last_score": case(
+                    (newer, stmt.excluded.last_score), else_=StudentProgress.last_score
+                ),
+                "last_finished_at": func.greatest(
+                    StudentProgress.last_finished_at, stmt.excluded.last_finished_at
+                ),
+            },
+        )
+    )
+
+    # One row per presented question, with the answer given, if any
+    presented = (
+        select(
+            ExamSession.id.label("session_id"),
+            ExamSession.student_id,
+            ExamSession.completed_at,
+            cast(func.json_array_elements_text(ExamSession.selected_question_ids), Integer).label(
+                "question_id"
+            ),
+        )
+        .where(*criteria)
+        .subquery()
+    )
+    results = (
+        select(
+            presented.c.session_id,
+            presented.c.student_id,
+            presented.c.completed_at,
+            presented.c.question_id,
+            Question.category_id,
+            ExamAnswer.id.label("answer_id"),
+            ExamAnswer.is_correct,
+        )
+        .select_from(presented)
+        .join(Question, Question.id == presented.c.question_id)
+        .outerjoin(
+            ExamAnswer,
+            and_(
+                ExamAnswer.session_id == presented.c.session_id,
+                ExamAnswer.question_id == presented.c.question_id,
+            ),
+        )
+        .subquery()
+    )
+
+    by_category = (
+        select(
+            results.c.student_id,
+            results.c.category_id,
+            func.count(results.c.session_id.distinct()),
+            func.count(),
+            func.count(results.c.answer_id),
+            func.count().filter(results.c.is_correct.is_(True)),
+        )
+        .where(results.c.category_id.is_not(None))
+        .group_by(results.c.student_id, results.c.category_id)
+    )
+    stmt = pg_insert(StudentCategoryProgress).from_select(
+        ["student_id", "category_id", "sessions", "questions", "answered", "correct"],
+        by_category,
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["student_id", "category_id"],
+            set_={
+                column: getattr(StudentCategoryProgress, column) + getattr(stmt.excluded, column)
+                for column in ("sessions", "questions", "answered", "correct")
+            }
+            | {"updated_at": func.now()},
+        )
+    )
+
+    misses = (
+        select(
+            results.c.student_id,
+            results.c.question_id,
+            func.max(results.c.category_id),
+            func.count(),
+            func.max(results.c.completed_at),
+        )
+        .where(results.c.is_correct.is_(False))
+        .group_by(results.c.student_id, results.c.question_id)
+    )
+    stmt = pg_insert(StudentQuestionMiss).from_select(
+        ["student_id", "question_id", "category_id", "misses", "last_missed_at"], misses
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["student_id", "question_id"],
+            set_={
+                "category_id": stmt.excluded.category_id,
+                "misses": StudentQuestionMiss.misses + stmt.excluded.misses,
+                "last_missed_at": func.greatest(
+                    StudentQuestionMiss.last_missed_at, stmt.excluded.last_missed_at
+                ),
+            },
+        )
+    )
+
+
+async def record_sessions(db: AsyncSession, session_ids: Sequence[int]) -> None:
+    """
+    Add finished sessions to their students' progress in the current
+    transaction; call it in the transaction that finishes them.
+    """
+    if not session_ids:
+        return
+    await db.execute(select(func.pg_advisory_xact_lock_shared(PROGRESS_LOCK_ID)))
+    await _add_results(db, ExamSession.id.in_(session_ids))
+
+
+async def rebuild_progress(db: AsyncSession, first_id: int, last_id: int) -> None:
+    """Recompute the progress of students with IDs in ``[first_id, last_id]``."""
+    await db.execute(select(func.pg_advisory_xact_lock(PROGRESS_LOCK_ID)))
+    for model in (StudentProgress, StudentCategoryProgress, StudentQuestionMiss):
+        await db.execute(delete(model).where(model.student_id.between(first_id, last_id)))
+    await _add_results(
+        db,
+        ExamSession.student_id.between(first_id, last_id),
+        ExamSession.status.in_(FINISHED_STATUSES),
+    )
+
+
+async def run_progress_backfill(
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    chunk_size: int = settings.STUDENT_PROGRESS_BACKFILL_CHUNK_SIZE,
+) -> dict[str, int]:
+    """Rebuild every student's progress from finished sessions."""
+    started = time.perf_counter()
+    async with session_factory() as db:
+        last_id = await db.scalar(select(func.max(User.id))) or 0
+
+    for first_id in range(1, last_id + 1, chunk_size):
+        async with session_factory() as db:
+            await rebuild_progress(db, first_id, first_id + chunk_size - 1)
+            await db.commit()
+
+    async with session_factory() as db:
+        students, sessions = (
+            await db.execute(
+                select(func.count(), func.coalesce(func.sum(StudentProgress.sessions), 0))
+            )
+        ).one()
+
+    summary = {"students": students, "sessions": sessions}
+    logger.info("Student progress rebuilt in %.1fs: %s", time.perf_counter() - started, summary)
+    return summary
+
+
+if __name__ == "__main__":
+    """Rebuild student progress from history."""
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_progress_backfill()))
@@ -0,0 +1,195 @@
+"""
+User listings with keyset pagination.
+
+Pages are ordered by ``(organization_id, role, id)`` and continue after the
+last row of the previous page, so every page is one range scan of the
+partial index ``ix_users_org_role_id`` however deep the client pages.
+OFFSET pagination would read and discard every earlier row instead. The
+cursor is an opaque token encoding that last row's key.
+
+Rows are fetched as column projections (``LIST_COLUMNS``), not ORM
+entities, so listing does not populate the identity map.
+
+Totals are counted once and cached for ``USER_COUNT_CACHE_TTL_SECONDS``
+per filter combination, so they may lag recent changes. For the unfiltered
+listing of a large table (above ``USER_COUNT_ESTIMATE_THRESHOLD`` rows),
+the planner's row estimate is used instead of a full count.
+"""
+import base64
+import json
+from typing import Any
+
+from sqlalchemy import Select, and_, func, or_, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+LIST_COLUMNS = (
+    User.id,
+    User.full_name,
+    User.email,
+    User.phone,
+    User.role,
+    User.is_active,
+    User.organization_id,
+    User.level,
+    User.rating,
+    User.avatar_url,
+)
+
+_ESTIMATE_STATEMENT = text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+
+CountKey = tuple[int | None, UserRole | None, bool | None]
+
+
+def encode_cursor(organization_id: int | None, role: UserRole, user_id: int) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    raw = json.dumps([organization_id, role.value, user_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int | None, UserRole, int]:
+    """
+    Decode a cursor made by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        organization_id, role, user_id = json.loads(raw)
+        key = (organization_id, UserRole(role), user_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(user_id, int) or not isinstance(organization_id, (int, type(None))):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def _filters(
+    organization_id: int | None, role: UserRole | None, is_active: bool | None
+) -> list[Any]:
+    conditions: list[Any] = [User.deleted_at.is_(None)]
+    if organization_id is not None:
+        conditions.append(User.organization_id == organization_id)
+    if role is not None:
+        conditions.append(User.role == role)
+    if is_active is not None:
+        conditions.append(User.is_active.is_(is_active))
+    return conditions
+
+
+def _after(cursor: tuple[int | None, UserRole, int]) -> Any:
+    """Rows after ``cursor`` in ``(organization_id, role, id)`` order, NULL organizations last."""
+    organization_id, role, user_id = cursor
+    if organization_id is None:
+        return and_(
+            User.organization_id.is_(None),
+            tuple_(User.role, User.id) > (role, user_id),
+        )
+    return or_(
+        tuple_(User.organization_id, User.role, User.id) > (organization_id, role, user_id),
+        User.organization_id.is_(None),
+    )
+
+
+def page_statement(
+    organization_id: int | None,
+    role: UserRole | None,
+    is_active: bool | None,
+    cursor: str | None,
+    limit: int,
+) -> Select[Any]:
+    """
+    Select one page of users, plus one extra row to tell whether more follow.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    conditions = _filters(organization_id, role, is_active)
+    if cursor is not None:
+        conditions.append(_after(decode_cursor(cursor)))
+    return (
+        select(*LIST_COLUMNS)
+        .where(*conditions)
+        .order_by(User.organization_id, User.role, User.id)
+        .limit(limit + 1)
+    )
+
+
+async def list_users(
+    db: AsyncSession,
+    organization_id: int | None = None,
+    role: UserRole | None = None,
+    is_active: bool | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Return one page of user projections and the cursor of the next page.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    result = await db.execute(page_statement(organization_id, role, is_active, cursor, limit))
+    rows = [dict(row) for row in result.mappings()]
+    if len(rows) <= limit:
+        return rows, None
+    del rows[limit:]
+    last = rows[-1]
+    return rows, encode_cursor(last["organization_id"], last["role"], last["id"])
+
+
+class UserCounts:
+    """TTL cache of listing totals by ``(organization_id, role, is_active)``."""
+
+    def __init__(self, maxsize: int, ttl: float, estimate_threshold: int) -> None:
+        self._cache: TTLCache[CountKey, tuple[int, bool]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.estimate_threshold = estimate_threshold
+        self.counts = 0
+        self.estimates = 0
+
+    async def get(
+        self,
+        db: AsyncSession,
+        organization_id: int | None = None,
+        role: UserRole | None = None,
+        is_active: bool | None = None,
+    ) -> tuple[int, bool]:
+        """Return ``(total, is_estimate)`` for a listing's filters."""
+        key = (organization_id, role, is_active)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        total: int | None = None
+        if key == (None, None, None):
+            estimate = await db.scalar(_ESTIMATE_STATEMENT)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                self.estimates += 1
+                total = estimate
+        entry = (total, True) if total is not None else (await self._count(db, key), False)
+        self._cache.set(key, entry)
+        return entry
+
+    async def _count(self, db: AsyncSession, key: CountKey) -> int:
+        self.counts += 1
+        statement = select(func.count()).select_from(User).where(*_filters(*key))
+        return await db.scalar(statement) or 0
+
+    def clear(self) -> None:
+        """Drop all cached totals."""
+        self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache and query counters."""
+        return {"cache": self._cache.stats(), "counts": self.counts, "estimates": self.estimates}
+
+
+user_counts = UserCounts(
+    maxsize=settings.USER_COUNT_CACHE_MAX_SIZE,
+    ttl=settings.USER_COUNT_CACHE_TTL_SECONDS,
+    estimate_threshold=settings.USER_COUNT_ESTIMATE_THRESHOLD,
+)
@@ -0,0 +1,111 @@
+"""
+Latin to Cyrillic transliteration for Uzbek and Karakalpak text.
+
+Port of ``shared/src/utils/cyrillic-converter.ts`` so the backend can
+pre-render Cyrillic payloads; keep the two in sync. Unlike the original it
+maps U/u, accepts every common apostrophe in O'/G' and reads "yo'l" as
+Y + O' rather than Yo + apostrophe.
+"""
+
+LATIN_TO_CYRILLIC: dict[str, str] = {
+    # Uppercase
+    "A": "А",
+    "B": "Б",
+    "D": "Д",
+    "F": "Ф",
+    "G": "Г",
+    "H": "Ҳ",
+    "I": "И",
+    "J": "Ж",
+    "K": "К",
+    "L": "Л",
+    "M": "М",
+    "N": "Н",
+    "O": "О",
+    "P": "П",
+    "Q": "Қ",
+    "R": "Р",
+    "S": "С",
+    "T": "Т",
+    "U": "У",
+    "V": "В",
+    "X": "Х",
+    "Y": "Й",
+    "Z": "З",
+    # Lowercase
+    "a": "а",
+    "b": "б",
+    "d": "д",
+    "f": "ф",
+    "g": "г",
+    "h": "ҳ",
+    "i": "и",
+    "j": "ж",
+    "k": "к",
+    "l": "л",
+    "m": "м",
+    "n": "н",
+    "o": "о",
+    "p": "п",
+    "q": "қ",
+    "r": "р",
+    "s": "с",
+    "t": "т",
+    "u": "у",
+    "v": "в",
+    "x": "х",
+    "y": "й",
+    "z": "з",
+}
+
+# Two-letter combinations, checked before single letters
+DIGRAPHS: dict[str, str] = {
+    "Sh": "Ш",
+    "sh": "ш",
+    "Ch": "Ч",
+    "ch": "ч",
+    "Ya": "Я",
+    "ya": "я",
+    "Yo": "Ё",
+    "yo": "ё",
+    "Yu": "Ю",
+    "yu": "ю",
+    "Ts": "Ц",
+    "ts": "ц",
+}
+
+# O' and G' may be typed with any of these apostrophes
+APOSTROPHES = frozenset("'ʻ‘’`")
+APOSTROPHE_LETTERS: dict[str, str] = {"O": "Ў", "o": "ў", "G": "Ғ", "g": "ғ"}
+
+
+def latin_to_cyrillic(text: str) -> str:
+    """Convert Uzbek Latin text to Cyrillic script."""
+    result: list[str] = []
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i]
+        next_char = text[i + 1] if i + 1 < length else ""
+
+        if char in APOSTROPHE_LETTERS and next_char in APOSTROPHES:
+            result.append(APOSTROPHE_LETTERS[char])
+            i += 2
+        elif char + next_char in DIGRAPHS and text[i + 2 : i + 3] not in APOSTROPHES:
+            result.append(DIGRAPHS[char + next_char])
+            i += 2
+        # E: Э at word start, Е in the middle
+        elif char in ("E", "e"):
+            word_start = i == 0 or text[i - 1].isspace()
+            if char == "E":
+                result.append("Э" if word_start else "Е")
+            else:
+                result.append("э" if word_start else "е")
+            i += 1
+        else:
+            # Keep character as-is (numbers, punctuation, etc.)
+            result.append(LATIN_TO_CYRILLIC.get(char, char))
+            i += 1
+
+    return "".join(result)
@@ -0,0 +1,78 @@
+"""
+Benchmark generating a quarter of slots for a 100-instructor school.
+
+Rules: Mon-Fri 09:00-18:00 and Sat 09:00-13:30, 90-minute slots. Measures
+rule expansion alone, then expansion plus the batched insert into the
+database from the environment (``.env``, migrated). Everything written is
+rolled back.
+
+Usage:
+    poetry run python -m benchmarks.bench_availability
+"""
+import asyncio
+import time
+from collections.abc import Iterator
+from datetime import date, datetime, time as clock, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import insert, select
+
+from app.db.session import AsyncSessionLocal, engine
+from app.models.user import User, UserRole
+from app.services.availability import WeeklyRule, create_recurring_slots, expand_rules
+
+INSTRUCTORS = 100
+DAYS = 91
+
+RULES = [
+    WeeklyRule(range(5), clock(9), clock(18), slot_minutes=90, price_amount=150_000),
+    WeeklyRule([5], clock(9), clock(13, 30), slot_minutes=90, price_amount=150_000),
+]
+
+
+def slots() -> Iterator[tuple[datetime, datetime, int]]:
+    start = date.today() + timedelta(days=1)
+    return expand_rules(RULES, start, start + timedelta(days=DAYS - 1), ZoneInfo("Asia/Tashkent"))
+
+
+async def main() -> None:
+    started = time.perf_counter()
+    per_instructor = sum(1 for _ in slots())
+    print(f"expand {per_instructor} slots/instructor: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(User),
+            [
+                {
+                    "email": f"bench-instructor-{i}@example.com",
+                    "password_hash": "-",
+                    "full_name": f"Instructor {i}",
+                    "role": UserRole.INSTRUCTOR,
+                }
+                for i in range(INSTRUCTORS)
+            ],
+        )
+        instructor_ids = list(
+            (
+                await db.execute(
+                    select(User.id).where(User.email.like("bench-instructor-%@example.com"))
+                )
+            ).scalars()
+        )
+
+        started = time.perf_counter()
+        requested, created = await create_recurring_slots(db, instructor_ids, slots())
+        elapsed = time.perf_counter() - started
+        print(f"insert {created}/{requested} slots for {INSTRUCTORS} instructors: {elapsed * 1000:.0f}ms")
+
+        started = time.perf_counter()
+        requested, created = await create_recurring_slots(db, instructor_ids, slots())
+        elapsed = time.perf_counter() - started
+        print(f"rerun, {requested - created} duplicates skipped: {elapsed * 1000:.0f}ms")
+        await db.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
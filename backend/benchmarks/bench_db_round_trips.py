@@ -0,0 +1,127 @@
+"""
+Benchmark database round trips per request for each session dependency.
+
+Compares the previous ``get_db`` (always commits, reads in a transaction)
+with the current dependencies on the same handlers. Round trips are counted
+on the wire: statements plus the BEGIN/COMMIT/ROLLBACK and pre-ping queries
+the driver sends. Three of them per checkout are the pre-ping
+(``DB_POOL_PRE_PING``). Needs the database from the environment (``.env``);
+no tables are touched.
+
+Usage:
+    poetry run python -m benchmarks.bench_db_round_trips
+"""
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import (
+    AsyncSessionLocal,
+    engine,
+    get_db,
+    get_primary_read_db,
+    get_read_db,
+    get_snapshot_db,
+    read_engine,
+)
+
+ITERATIONS = 500
+
+Dependency = Callable[[Request], AsyncGenerator[AsyncSession, None]]
+Handler = Callable[[AsyncSession], Awaitable[Any]]
+
+round_trips = 0
+
+
+def _count_round_trips(sync_engine: Any) -> None:
+    def on_query(record: Any) -> None:
+        global round_trips
+        round_trips += 1
+
+    @event.listens_for(sync_engine, "connect")
+    def log_queries(dbapi_connection: Any, connection_record: Any) -> None:
+        # Simple-protocol queries: BEGIN, COMMIT, ROLLBACK and pings
+        dbapi_connection._connection.add_query_logger(on_query)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def count_statement(*args: Any) -> None:
+        # Prepared statements, which the query logger does not see
+        global round_trips
+        round_trips += 1
+
+
+async def legacy_get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """``get_db`` before lazy commits and read sessions."""
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+
+async def no_query(db: AsyncSession) -> None:
+    """E.g. ``/auth/me`` with the principal cached."""
+
+
+async def one_select(db: AsyncSession) -> None:
+    await db.execute(text("SELECT 1"))
+
+
+async def two_selects(db: AsyncSession) -> None:
+    await db.execute(text("SELECT 1"))
+    await db.execute(text("SELECT 2"))
+
+
+async def measure(dependency: Dependency, handler: Handler) -> tuple[float, float]:
+    """Return round trips and milliseconds per request."""
+    global round_trips
+    request = Request({"type": "http", "method": "GET", "path": "/bench", "headers": []})
+    session_dependency = asynccontextmanager(dependency)
+
+    async def serve() -> None:
+        async with session_dependency(request) as db:
+            await handler(db)
+
+    await serve()  # Warm up the pool and the prepared statement cache
+    round_trips = 0
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await serve()
+    elapsed = time.perf_counter() - started
+    return round_trips / ITERATIONS, elapsed / ITERATIONS * 1000
+
+
+async def main() -> None:
+    _count_round_trips(engine.sync_engine)
+    if read_engine is not engine:
+        _count_round_trips(read_engine.sync_engine)
+
+    cases: list[tuple[str, Handler, Dependency]] = [
+        ("no query", no_query, get_db),
+        ("one SELECT", one_select, get_read_db),
+        ("one SELECT, primary", one_select, get_primary_read_db),
+        ("two SELECTs, one snapshot", two_selects, get_snapshot_db),
+    ]
+    print(f"{'handler':<28}{'dependency':<20}{'before':>16}{'after':>16}")
+    for label, handler, dependency in cases:
+        before_trips, before_ms = await measure(legacy_get_db, handler)
+        after_trips, after_ms = await measure(dependency, handler)
+        print(
+            f"{label:<28}{dependency.__name__:<20}"
+            f"{before_trips:>5.1f} ({before_ms:5.2f}ms){after_trips:>5.1f} ({after_ms:5.2f}ms)"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark ranked instructor search over 20k instructors.
+
+Each instructor has up to 60 free slots over the next 14 days. Measures
+filtered top-10 searches against the in-memory ranking table.
+
+Usage:
+    poetry run python -m benchmarks.bench_instructor_ranking
+"""
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.db.session import AsyncSessionLocal
+from app.models.booking import BookingType
+from app.models.user import UserLevel, UserRole
+from app.services.instructor_ranking import InstructorRanking, RankedInstructor
+
+INSTRUCTORS = 20_000
+ORGANIZATIONS = 200
+ITERATIONS = 2_000
+
+
+def build_entries() -> list[RankedInstructor]:
+    rng = random.Random(0)
+    now = time.time()
+    entries = []
+    for instructor_id in range(1, INSTRUCTORS + 1):
+        closed = rng.randrange(200)
+        entry = RankedInstructor(
+            id=instructor_id,
+            full_name=f"Instructor {instructor_id}",
+            avatar_url=None,
+            role=UserRole.INSTRUCTOR if rng.random() < 0.7 else UserRole.TEACHER,
+            organization_id=rng.randrange(ORGANIZATIONS) or None,
+            work_privately=rng.random() < 0.3,
+            level=rng.choice([None, *UserLevel]),
+            rating=round(rng.uniform(2.5, 5.0), 2),
+            total_sessions=closed,
+            completed=int(closed * rng.uniform(0.6, 1.0)),
+            closed=closed,
+        )
+        entry.free = sorted(now + rng.uniform(0, 14 * 86400) for _ in range(rng.randrange(60)))
+        entries.append(entry)
+    return entries
+
+
+async def run(label: str, ranking: InstructorRanking, **kwargs) -> None:
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        await ranking.search(**kwargs)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    print(
+        f"{label:<32} mean {statistics.mean(timings) * 1e6:8.1f} us   "
+        f"p99 {p99 * 1e6:8.1f} us"
+    )
+
+
+async def main() -> None:
+    ranking = InstructorRanking(AsyncSessionLocal)
+    ranking.replace(build_entries())
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    print(f"table: {ranking.stats()['instructors']} instructors, "
+          f"{ranking.stats()['free_slots']} free slots\n")
+
+    await run("practical, whole horizon", ranking)
+    await run("practical, tomorrow", ranking, start=tomorrow, end=tomorrow + timedelta(days=1))
+    await run("one school", ranking, organization_id=7)
+    await run("elite, rating >= 4.9", ranking, levels=[UserLevel.ELITE], min_rating=4.9)
+    await run("theory, private, 5 free slots", ranking, booking_type=BookingType.THEORY,
+              works_privately=True, min_free_slots=5)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
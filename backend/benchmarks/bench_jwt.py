@@ -0,0 +1,54 @@
+"""
+Benchmark JWT creation and verification throughput.
+
+Compares python-jose and PyJWT (when installed), with and without the
+verified-token cache.
+
+Usage:
+    poetry run python -m benchmarks.bench_jwt
+"""
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from app.core.security import JoseBackend, JWTBackend, PyJWTBackend, TokenVerifier
+
+ITERATIONS = 20_000
+
+
+def rate(fn: Callable[[int], object]) -> float:
+    started = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(i)
+    return ITERATIONS / (time.perf_counter() - started)
+
+
+def run(backend: JWTBackend) -> None:
+    expire = datetime.now(timezone.utc) + timedelta(minutes=30)
+    tokens = [
+        backend.encode({"exp": expire, "sub": str(i), "type": "access"})
+        for i in range(ITERATIONS)
+    ]
+    hot = tokens[:100]
+    verifier = TokenVerifier(backend, maxsize=ITERATIONS)
+
+    results = {
+        "create": rate(lambda i: backend.encode({"exp": expire, "sub": str(i)})),
+        "decode": rate(lambda i: backend.decode(tokens[i])),
+        "decode, cache miss": rate(lambda i: verifier.decode(tokens[i])),
+        "decode, cache hit": rate(lambda i: verifier.decode(hot[i % 100])),
+    }
+    for label, tokens_per_second in results.items():
+        print(f"{backend.name:<6} {label:<20} {tokens_per_second:>12,.0f} tokens/s")
+
+
+def main() -> None:
+    run(JoseBackend())
+    try:
+        run(PyJWTBackend())
+    except ImportError:
+        print("\nPyJWT not installed (poetry install -E fast-jwt), skipping")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark stratified question selection on a 10k-question bank.
+
+Usage:
+    poetry run python -m benchmarks.bench_question_sampler
+"""
+import random
+import statistics
+import time
+
+from app.services.question_bank import QuestionBankSnapshot, QuestionRecord
+from app.services.question_sampler import QuestionSampler
+
+BANK_SIZE = 10_000
+CATEGORIES = 12
+QUESTIONS_PER_EXAM = 20
+ITERATIONS = 20_000
+
+
+def build_snapshot() -> QuestionBankSnapshot:
+    rng = random.Random(0)
+    records = [
+        QuestionRecord(
+            id=question_id,
+            category_id=rng.randrange(CATEGORIES),
+            difficulty=rng.randint(1, 5),
+            is_active=rng.random() > 0.05,
+            is_deleted=rng.random() < 0.02,
+            correct_option_id="F1",
+            text_uz="",
+            text_ru=None,
+            text_kaa=None,
+            image_url=None,
+            options=[],
+            explanation_uz=None,
+            explanation_ru=None,
+            explanation_kaa=None,
+        )
+        for question_id in range(1, BANK_SIZE + 1)
+    ]
+    return QuestionBankSnapshot(f"{BANK_SIZE}-0", records)
+
+
+def run(label: str, snapshot: QuestionBankSnapshot, **kwargs) -> None:
+    sampler = QuestionSampler(random.Random(1))
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        sampler.sample(snapshot, QUESTIONS_PER_EXAM, **kwargs)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    print(
+        f"{label:<32} mean {statistics.mean(timings) * 1e6:8.1f} us   "
+        f"p99 {p99 * 1e6:8.1f} us"
+    )
+
+
+def main() -> None:
+    snapshot = build_snapshot()
+    recent = set(random.Random(2).sample(list(snapshot.ids), 60))
+    print(f"bank: {len(snapshot)} eligible questions, {len(snapshot.by_stratum)} strata\n")
+
+    run("proportional", snapshot)
+    run("category quotas", snapshot, category_quotas={0: 5, 1: 5, 2: 3})
+    run("difficulty mix", snapshot, difficulty_mix={"easy": 0.5, "medium": 0.3, "hard": 0.2})
+    run("quotas + mix + 60 recent", snapshot, category_quotas={0: 5}, exclude=recent,
+        difficulty_mix={"easy": 0.5, "medium": 0.3, "hard": 0.2})
+
+
+if __name__ == "__main__":
+    main()
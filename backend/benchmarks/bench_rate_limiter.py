@@ -0,0 +1,80 @@
+"""
+Benchmark the rate limiter's per-request overhead.
+
+Measures route resolution, identity extraction and the counter update for
+anonymous and authenticated requests, against local buckets and (when
+reachable) Redis.
+
+Usage:
+    poetry run python -m benchmarks.bench_rate_limiter
+"""
+import asyncio
+import statistics
+import time
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware, _identities
+from app.core.redis import get_redis
+from app.core.security import create_access_token
+from app.main import app
+
+ITERATIONS = 20_000
+
+
+def make_scope(method: str, path: str, token: str | None = None) -> dict:
+    headers = [(b"host", b"localhost")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {
+        "type": "http",
+        "app": app,
+        "method": method,
+        "path": path,
+        "root_path": "",
+        "headers": headers,
+        "client": ("10.0.0.1", 50000),
+    }
+
+
+async def run(label: str, limiter: RateLimiter, scope: dict) -> None:
+    middleware = RateLimitMiddleware(app, limiter)
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        route = middleware._route(scope)
+        await limiter.hit(limiter.limits_for(route, *_identities(scope)))
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    print(
+        f"{label:<32} mean {statistics.mean(timings) * 1e6:8.1f} us   "
+        f"p99 {p99 * 1e6:8.1f} us"
+    )
+
+
+async def main() -> None:
+    anonymous = make_scope("POST", f"{settings.API_V1_STR}/auth/login")
+    user = make_scope(
+        "POST", f"{settings.API_V1_STR}/exams/sessions/42/answers", create_access_token(1)
+    )
+
+    local = RateLimiter(1_000_000_000, {}, use_redis=False)
+    await run("local, anonymous", local, anonymous)
+    await run("local, bearer token", local, user)
+
+    try:
+        await get_redis().ping()
+    except (RedisError, OSError):
+        print("\nRedis not reachable, skipping Redis runs")
+        return
+
+    shared = RateLimiter(1_000_000_000, {}, use_redis=True)
+    await run("redis, anonymous", shared, anonymous)
+    await run("redis, bearer token", shared, user)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
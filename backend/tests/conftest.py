@@ -11,9 +11,21 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.core.rate_limit import rate_limiter
+from app.core.tenancy import tenant_directory
+from app.core.token_store import refresh_token_store
 from app.db.base import Base
 from app.main import app
-from app.db.session import get_db
+from app.services.entitlements import entitlements
+from app.services.exam_checkpoints import exam_checkpoints
+from app.services.exam_engine import exam_engine
+from app.services.instructor_ranking import instructor_ranking
+from app.services.payment_events import payment_events
+from app.services.question_bank import question_bank
+from app.services.question_renderer import question_renderer
+from app.services.user_listing import user_counts
+from app.db.session import get_db, get_primary_read_db, get_read_db, get_snapshot_db
 
 # Test database URL (use a separate test database)
 TEST_DATABASE_URL = str(settings.SQLALCHEMY_DATABASE_URI).replace(
@@ -73,6 +85,33 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_primary_read_db] = override_get_db
+    app.dependency_overrides[get_snapshot_db] = override_get_db
+    # User IDs are reused across tests since tables are recreated
+    principal_cache.clear()
+    entitlements.clear()
+    user_counts.clear()
+    # Keep Redis-backed state in process so tests do not depend on (or share) Redis
+    rate_limiter.use_redis = False
+    rate_limiter.reset()
+    refresh_token_store.use_redis = False
+    refresh_token_store.clear()
+    question_bank.session_factory = TestSessionLocal
+    payment_events.session_factory = TestSessionLocal
+    exam_engine.session_factory = TestSessionLocal
+    exam_engine.clear()
+    exam_checkpoints.use_redis = False
+    exam_checkpoints.clear()
+    tenant_directory.session_factory = TestSessionLocal
+    tenant_directory.clear()
+    instructor_ranking.session_factory = TestSessionLocal
+    await instructor_ranking.stop_refresher()
+    instructor_ranking.clear()
+    # Drop reloads scheduled by earlier tests' commits
+    await question_bank.stop_refresher()
+    question_bank.clear()
+    question_renderer.clear()
 
     async with AsyncClient(app=app, base_url="http://test") as test_client:
         yield test_client
@@ -89,3 +128,17 @@ def test_user_data():
         "full_name": "Test User",
         "phone": "+998901234567",
     }
+
+
+@pytest.fixture
+async def auth_headers(client: AsyncClient, test_user_data) -> dict[str, str]:
+    """Register and log in the test user; return the Authorization header."""
+    await client.post("/api/v1/auth/register", json=test_user_data)
+    response = await client.post(
+        "/api/v1/auth/login",
+        json={
+            "email": test_user_data["email"],
+            "password": test_user_data["password"],
+        },
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
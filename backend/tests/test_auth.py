@@ -105,3 +105,86 @@ async def test_get_current_user_unauthorized(client: AsyncClient):
     response = await client.get("/api/v1/auth/me")
 
     assert response.status_code == 403  # No credentials provided
+
+
+async def _login(client: AsyncClient, test_user_data) -> dict:
+    await client.post("/api/v1/auth/register", json=test_user_data)
+    response = await client.post(
+        "/api/v1/auth/login",
+        json={"email": test_user_data["email"], "password": test_user_data["password"]},
+    )
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_token(client: AsyncClient, test_user_data):
+    """Test that refreshing returns a new refresh token and the old one stops working."""
+    tokens = await _login(client, test_user_data)
+
+    response = await client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+
+    response = await client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": rotated["refresh_token"]}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_revokes_family(client: AsyncClient, test_user_data):
+    """Test that replaying a used refresh token revokes the whole session."""
+    tokens = await _login(client, test_user_data)
+    first = tokens["refresh_token"]
+
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    rotated = response.json()["refresh_token"]
+
+    # Replay of the used token: rejected, and the legitimate successor dies too
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 401
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": rotated})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_all_revokes_every_session(client: AsyncClient, test_user_data):
+    """Test that logout-all revokes the refresh tokens of all logins."""
+    phone = await _login(client, test_user_data)
+    laptop = await _login(client, test_user_data)
+
+    response = await client.post(
+        "/api/v1/auth/logout-all",
+        headers={"Authorization": f"Bearer {phone['access_token']}"},
+    )
+    assert response.status_code == 204
+
+    for session in (phone, laptop):
+        response = await client.post(
+            "/api/v1/auth/refresh", json={"refresh_token": session["refresh_token"]}
+        )
+        assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_one_session(client: AsyncClient, test_user_data):
+    """Test that logout only ends the session of the given refresh token."""
+    phone = await _login(client, test_user_data)
+    laptop = await _login(client, test_user_data)
+
+    response = await client.post(
+        "/api/v1/auth/logout", json={"refresh_token": phone["refresh_token"]}
+    )
+    assert response.status_code == 204
+
+    response = await client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": phone["refresh_token"]}
+    )
+    assert response.status_code == 401
+    response = await client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": laptop["refresh_token"]}
+    )
+    assert response.status_code == 200
@@ -0,0 +1,237 @@
+"""
+Test slot search, reservation races and booking endpoints.
+"""
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.booking import Booking, BookingSlot, BookingType
+from app.models.user import User, UserRole
+from app.services.availability import WeeklyRule, create_recurring_slots, expand_rules
+from app.services.booking_engine import (
+    SlotUnavailable,
+    find_free_slots,
+    reserve_first_available,
+    reserve_slot,
+)
+from tests.conftest import TestSessionLocal
+
+EVENING = datetime.now(timezone.utc).replace(hour=18, minute=0, second=0, microsecond=0) + timedelta(
+    days=1
+)
+
+
+async def _user(db: AsyncSession, email: str, role: UserRole = UserRole.STUDENT) -> User:
+    user = User(email=email, password_hash="x", full_name=email, role=role)
+    db.add(user)
+    await db.flush()
+    return user
+
+
+async def _slots(db: AsyncSession, instructor: User, count: int) -> list[BookingSlot]:
+    slots = [
+        BookingSlot(
+            instructor_id=instructor.id,
+            start_time=EVENING + timedelta(minutes=90 * i),
+            end_time=EVENING + timedelta(minutes=90 * i + 90),
+            price_amount=150_000,
+        )
+        for i in range(count)
+    ]
+    db.add_all(slots)
+    await db.flush()
+    return slots
+
+
+async def test_find_free_slots_for_many_instructors(db_session: AsyncSession):
+    """Test one query over several instructors with a per-instructor cap."""
+    first = await _user(db_session, "i1@example.com", UserRole.INSTRUCTOR)
+    second = await _user(db_session, "i2@example.com", UserRole.INSTRUCTOR)
+    first_slots = await _slots(db_session, first, 3)
+    await _slots(db_session, second, 2)
+    first_slots[0].is_available = False
+    await db_session.commit()
+
+    window = (EVENING - timedelta(hours=1), EVENING + timedelta(days=1))
+    slots = await find_free_slots(db_session, [first.id, second.id], *window)
+    assert [(s.instructor_id, s.start_time) for s in slots] == sorted(
+        (s.instructor_id, s.start_time) for s in slots
+    )
+    assert len(slots) == 4
+
+    earliest = await find_free_slots(db_session, [first.id, second.id], *window, per_instructor=1)
+    assert [s.id for s in earliest] == [first_slots[1].id, slots[2].id]
+
+
+async def test_concurrent_reservations_never_double_book(db_session: AsyncSession):
+    """Test that racing students get exactly one booking per slot."""
+    instructor = await _user(db_session, "i@example.com", UserRole.INSTRUCTOR)
+    students = [await _user(db_session, f"s{i}@example.com") for i in range(20)]
+    slots = await _slots(db_session, instructor, 3)
+    await db_session.commit()
+    window = (EVENING, EVENING + timedelta(days=1))
+
+    async def book(student: User, first_available: bool) -> int | None:
+        async with TestSessionLocal() as db:
+            try:
+                if first_available:
+                    booking = await reserve_first_available(
+                        db, [instructor.id], *window, student.id, BookingType.PRACTICAL
+                    )
+                else:
+                    booking = await reserve_slot(
+                        db, slots[0].id, student.id, BookingType.PRACTICAL
+                    )
+            except SlotUnavailable:
+                await db.rollback()
+                return None
+            await db.commit()
+            return booking.slot_id
+
+    winners = await asyncio.gather(*(book(s, False) for s in students[:10]))
+    assert [w for w in winners if w is not None] == [slots[0].id]
+
+    # Remaining slots go to different students
+    winners = await asyncio.gather(*(book(s, True) for s in students[10:]))
+    assert sorted(w for w in winners if w is not None) == [slots[1].id, slots[2].id]
+
+    count = await db_session.scalar(select(func.count(Booking.id)))
+    assert count == 3
+
+
+@pytest.fixture
+async def slot(db_session: AsyncSession) -> BookingSlot:
+    instructor = await _user(db_session, "instructor@example.com", UserRole.INSTRUCTOR)
+    (slot,) = await _slots(db_session, instructor, 1)
+    await db_session.commit()
+    return slot
+
+
+async def test_book_and_cancel(
+    client: AsyncClient, auth_headers: dict[str, str], slot: BookingSlot
+):
+    """Test booking a slot, the conflict on rebooking, and freeing it by cancelling."""
+    params = {
+        "instructor_ids": [slot.instructor_id],
+        "start": EVENING.isoformat(),
+        "end": (EVENING + timedelta(hours=2)).isoformat(),
+    }
+    response = await client.get("/api/v1/bookings/slots", params=params, headers=auth_headers)
+    assert [s["id"] for s in response.json()] == [slot.id]
+
+    body = {"slot_id": slot.id, "booking_type": "practical"}
+    response = await client.post("/api/v1/bookings", json=body, headers=auth_headers)
+    assert response.status_code == 201
+    booking = response.json()
+    assert booking["status"] == "pending"
+    assert booking["price_amount"] == 150_000
+
+    response = await client.post("/api/v1/bookings", json=body, headers=auth_headers)
+    assert response.status_code == 409
+
+    response = await client.get("/api/v1/bookings/slots", params=params, headers=auth_headers)
+    assert response.json() == []
+
+    response = await client.post(
+        f"/api/v1/bookings/{booking['id']}/cancel", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+
+    response = await client.get("/api/v1/bookings/slots", params=params, headers=auth_headers)
+    assert [s["id"] for s in response.json()] == [slot.id]
+
+    response = await client.get("/api/v1/bookings", headers=auth_headers)
+    assert [b["id"] for b in response.json()] == [booking["id"]]
+
+
+WEEKDAYS_9_TO_6 = WeeklyRule(range(5), time(9), time(18), slot_minutes=90, price_amount=100)
+
+
+def test_expand_rules():
+    """Test weekly rule expansion with holidays, exclusions and the timezone."""
+    tashkent = ZoneInfo("Asia/Tashkent")
+    # Mon 2027-03-08 (public holiday) to Sun 2027-03-14
+    slots = list(
+        expand_rules(
+            [WEEKDAYS_9_TO_6], date(2027, 3, 8), date(2027, 3, 14), tashkent, [date(2027, 3, 10)]
+        )
+    )
+    days = sorted({start.astimezone(tashkent).date() for start, _, _ in slots})
+    assert days == [date(2027, 3, 9), date(2027, 3, 11), date(2027, 3, 12)]
+    assert len(slots) == 3 * 6
+    first_start, first_end, price = slots[0]
+    assert first_start == datetime(2027, 3, 9, 4, 0, tzinfo=timezone.utc)
+    assert first_end - first_start == timedelta(minutes=90)
+    assert price == 100
+
+    with_breaks = WeeklyRule([1], time(9), time(12), slot_minutes=50, break_minutes=10)
+    starts = [
+        s for s, _, _ in expand_rules([with_breaks], date(2027, 3, 9), date(2027, 3, 9), tashkent)
+    ]
+    assert [s.astimezone(tashkent).time() for s in starts] == [time(9), time(10), time(11)]
+
+
+async def test_recurring_slots_skip_clashes(db_session: AsyncSession):
+    """Test that generated slots skip existing and overlapping ones."""
+    tashkent = ZoneInfo("Asia/Tashkent")
+    instructors = [
+        await _user(db_session, f"i{i}@example.com", UserRole.INSTRUCTOR) for i in range(3)
+    ]
+    # Overlaps the generated 09:00-10:30 and 10:30-12:00 slots of the first instructor
+    db_session.add(
+        BookingSlot(
+            instructor_id=instructors[0].id,
+            start_time=datetime(2027, 3, 9, 10, 0, tzinfo=tashkent),
+            end_time=datetime(2027, 3, 9, 11, 0, tzinfo=tashkent),
+        )
+    )
+    await db_session.commit()
+
+    def slots():
+        return expand_rules([WEEKDAYS_9_TO_6], date(2027, 3, 9), date(2027, 3, 12), tashkent)
+
+    ids = [i.id for i in instructors]
+    assert await create_recurring_slots(db_session, ids, slots(), batch_size=7) == (72, 70)
+    assert await create_recurring_slots(db_session, ids, slots()) == (72, 0)
+    await db_session.commit()
+
+    count = await db_session.scalar(select(func.count(BookingSlot.id)))
+    assert count == 71
+
+
+async def test_generate_availability_endpoint(
+    client: AsyncClient, auth_headers: dict[str, str], db_session: AsyncSession
+):
+    """Test that instructors generate their own availability and students cannot."""
+    body = {
+        "date_from": "2027-03-09",
+        "date_to": "2027-03-10",
+        "rules": [
+            {"weekdays": [0, 1, 2, 3, 4], "start": "09:00", "end": "12:00", "slot_minutes": 90}
+        ],
+    }
+    response = await client.post("/api/v1/bookings/availability", json=body, headers=auth_headers)
+    assert response.status_code == 404
+
+    await db_session.execute(update(User).values(role=UserRole.INSTRUCTOR))
+    await db_session.commit()
+    response = await client.post("/api/v1/bookings/availability", json=body, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json() == {"requested": 4, "created": 4, "skipped": 0}
+
+    rule = {**body["rules"][0], "start": "10:00", "end": "11:00", "slot_minutes": 60}
+    overlapping = {**body, "rules": [rule]}
+    response = await client.post(
+        "/api/v1/bookings/availability", json=overlapping, headers=auth_headers
+    )
+    assert response.json() == {"requested": 2, "created": 0, "skipped": 2}
+
+    bad = {**body, "rules": body["rules"] * 2}
+    response = await client.post("/api/v1/bookings/availability", json=bad, headers=auth_headers)
+    assert response.status_code == 422
@@ -0,0 +1,125 @@
+"""
+Test in-process caches.
+"""
+import time
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.principal_cache import PrincipalCache
+from app.models.user import User, UserRole
+
+
+def test_ttl_cache_hit_and_miss():
+    """Test hit/miss counting."""
+    cache: TTLCache[int, str] = TTLCache(maxsize=10, ttl=60)
+    cache.set(1, "a")
+
+    assert cache.get(1) == "a"
+    assert cache.get(2) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_expiry():
+    """Test that entries expire after their TTL."""
+    cache: TTLCache[int, str] = TTLCache(maxsize=10, ttl=60)
+    cache.set(1, "a", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_lru_eviction():
+    """Test that the least recently used entry is evicted first."""
+    cache: TTLCache[int, str] = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+
+    assert 1 in cache
+    assert 2 not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def _make_user() -> User:
+    return User(
+        id=42,
+        email="student@example.com",
+        password_hash="secret",
+        full_name="Test Student",
+        role=UserRole.STUDENT,
+        is_active=True,
+        is_verified=False,
+        rating=0.0,
+        total_sessions=0,
+        work_privately=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_roundtrip():
+    """Test that snapshots rebuild an equivalent detached user."""
+    cache = PrincipalCache(maxsize=10, ttl=60, redis_enabled=False, redis_ttl=60)
+    await cache.set(_make_user())
+
+    snapshot = await cache.get(42)
+    assert snapshot is not None
+    assert "password_hash" not in snapshot
+
+    user = cache.to_user(snapshot)
+    assert user.id == 42
+    assert user.role == UserRole.STUDENT
+
+    # Redis encoding preserves enum types
+    assert cache._decode(cache._encode(snapshot))["role"] is UserRole.STUDENT
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_invalidated_on_role_change(monkeypatch):
+    """Test that changing a permission column drops the cached principal."""
+    cache = PrincipalCache(maxsize=10, ttl=60, redis_enabled=False, redis_ttl=60)
+    monkeypatch.setattr("app.core.principal_cache.principal_cache", cache)
+    await cache.set(_make_user())
+
+    user = cache.to_user(await cache.get(42))
+    user.full_name = "Renamed"
+    assert await cache.get(42) is not None
+
+    user.role = UserRole.ADMIN
+    assert await cache.get(42) is None
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_invalidated_by_bulk_update(
+    db_session: AsyncSession, monkeypatch
+):
+    """Test that bulk UPDATEs of permission columns drop the affected principals."""
+    cache = PrincipalCache(maxsize=10, ttl=60, redis_enabled=False, redis_ttl=60)
+    monkeypatch.setattr("app.core.principal_cache.principal_cache", cache)
+    users = [
+        User(email=f"u{i}@example.com", password_hash="x", full_name=f"U{i}") for i in range(3)
+    ]
+    db_session.add_all(users)
+    await db_session.commit()
+    ids = [user.id for user in users]
+    for user in users:
+        await cache.set(user)
+
+    await db_session.execute(update(User).where(User.id == ids[0]).values(full_name="Renamed"))
+    assert await cache.get(ids[0]) is not None
+
+    await db_session.execute(
+        update(User).where(User.id.in_(ids[:2])).values(role=UserRole.INSTRUCTOR)
+    )
+    assert await cache.get(ids[0]) is None
+    assert await cache.get(ids[1]) is None
+    assert await cache.get(ids[2]) is not None
+
+    await db_session.execute(update(User), [{"id": ids[2], "is_active": False}])
+    assert await cache.get(ids[2]) is None
+    await db_session.commit()
@@ -0,0 +1,112 @@
+"""
+Test connection pool instrumentation, read sessions and replica routing.
+"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db import session as db_session_module
+from app.db.pool import CheckoutStats, InstrumentedPool, db_route
+from app.db.session import READ_ONLY_SNAPSHOT
+from app.models.question import QuestionCategory
+from tests.conftest import TEST_DATABASE_URL, test_engine
+
+
+def test_checkout_stats_quantile():
+    """Test the histogram quantile upper bound."""
+    stats = CheckoutStats()
+    for wait in [0.0005] * 98 + [0.03, 10.0]:
+        stats.record(wait, timed_out=False)
+    stats.record(1.0, timed_out=True)
+
+    assert stats.checkouts == 100
+    assert stats.timeouts == 1
+    assert stats.quantile(0.5) == 0.001
+    assert stats.quantile(0.99) == 0.05
+    assert stats.quantile(1.0) is None  # Beyond the last bucket
+    assert stats.as_dict()["wait_max_ms"] == 10_000
+
+
+async def test_pool_records_checkouts_per_route():
+    """Test that checkouts and timeouts are counted overall and per route."""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=InstrumentedPool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    try:
+        token = db_route.set("GET /api/v1/exams")
+        try:
+            async with engine.connect() as held:
+                await held.execute(text("SELECT 1"))
+                assert engine.pool.stats()["in_use"] == 1
+                with pytest.raises(exc.TimeoutError):
+                    async with engine.connect():
+                        pass
+        finally:
+            db_route.reset(token)
+
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+        stats = engine.pool.stats()
+        assert stats["size"] == 1
+        assert stats["in_use"] == 0
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["routes"]["GET /api/v1/exams"]["checkouts"] == 1
+        assert stats["routes"]["GET /api/v1/exams"]["timeouts"] == 1
+        assert stats["routes"]["background"]["checkouts"] == 1
+    finally:
+        await engine.dispose()
+
+
+async def test_read_session_falls_back_to_primary(monkeypatch: pytest.MonkeyPatch):
+    """Test that an unreachable replica routes reads to the primary for a while."""
+    replica = create_async_engine(
+        "postgresql+asyncpg://nobody@127.0.0.1:1/none", poolclass=InstrumentedPool
+    )
+    monkeypatch.setattr(db_session_module, "read_engine", replica)
+    monkeypatch.setattr(db_session_module, "_replica_down_until", 0.0)
+    try:
+        replica_factory = async_sessionmaker(replica)
+        session = await db_session_module._open_read_session(replica_factory)
+        assert session.bind.pool is db_session_module.engine.pool
+        await session.close()
+        assert db_session_module.db_pool_stats()["replica"]["down"] is True
+
+        # Within the retry window the replica is not tried again
+        session = await db_session_module._open_read_session(replica_factory)
+        assert session.bind.pool is db_session_module.engine.pool
+        await session.close()
+    finally:
+        await replica.dispose()
+
+
+async def test_list_exams_on_read_session(client: AsyncClient, auth_headers: dict[str, str]):
+    """Test that read-only endpoints work through get_read_db."""
+    response = await client.get("/api/v1/exams", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+async def test_read_only_session_rejects_flush(db_session: AsyncSession):
+    """Test that read sessions refuse to write."""
+    async with async_sessionmaker(test_engine, info={"read_only": True})() as session:
+        session.add(QuestionCategory(name_uz="Yo'l belgilari", slug="signs"))
+        with pytest.raises(exc.InvalidRequestError):
+            await session.flush()
+
+
+async def test_snapshot_transaction_is_read_only(db_session: AsyncSession):
+    """Test that the declared read-only transaction is enforced by the database."""
+    snapshot = test_engine.execution_options(**READ_ONLY_SNAPSHOT)
+    async with AsyncSession(snapshot) as session:
+        assert (await session.execute(text("SELECT 1"))).scalar() == 1
+        with pytest.raises(exc.DBAPIError, match="read-only transaction"):
+            await session.execute(
+                text("INSERT INTO question_categories (name_uz, slug) VALUES ('x', 'x')")
+            )
@@ -0,0 +1,148 @@
+"""
+Test tariff entitlements, usage counters and limit enforcement.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.organization import Organization, OrganizationUsage
+from app.models.payment import Subscription, SubscriptionStatus, Tariff
+from app.models.user import User, UserRole
+from app.services.entitlements import (
+    LimitExceeded,
+    entitlements,
+    record_usage,
+    recount_usage,
+)
+
+
+@pytest.fixture
+async def organization(db_session: AsyncSession) -> Organization:
+    entitlements.clear()
+    owner = User(email="owner@example.com", password_hash="x", full_name="Owner")
+    db_session.add(owner)
+    await db_session.flush()
+    organization = Organization(name="School", slug="school", owner_id=owner.id)
+    tariff = Tariff(
+        name_uz="Basic",
+        slug="basic",
+        features=["analytics"],
+        limits={"max_teachers": 1, "max_students": 2, "max_storage_mb": 1},
+    )
+    db_session.add_all([organization, tariff])
+    await db_session.flush()
+    now = datetime.now(timezone.utc)
+    db_session.add(
+        Subscription(
+            organization_id=organization.id,
+            tariff_id=tariff.id,
+            started_at=now,
+            expires_at=now + timedelta(days=30),
+        )
+    )
+    await db_session.commit()
+    return organization
+
+
+def _member(organization_id: int, email: str, role: UserRole = UserRole.STUDENT) -> User:
+    return User(
+        email=email,
+        password_hash="x",
+        full_name=email,
+        role=role,
+        organization_id=organization_id,
+    )
+
+
+async def test_usage_follows_membership_changes(
+    db_session: AsyncSession, organization: Organization
+):
+    """Test incremental counters on join, role change, deactivation and delete."""
+    first = _member(organization.id, "s1@example.com")
+    second = _member(organization.id, "s2@example.com")
+    db_session.add_all([first, second])
+    await db_session.commit()
+
+    cached = await entitlements.get(db_session, organization.id)
+    assert cached.usage["students"] == 2
+    assert not cached.allows("max_students")
+    assert cached.allows("max_teachers")
+
+    first.role = UserRole.INSTRUCTOR
+    await db_session.commit()
+    # Updated in place after commit, without reloading
+    assert cached.usage == {"teachers": 1, "students": 1, "storage_bytes": 0}
+    assert entitlements.stats()["loads"] == 1
+
+    second.is_active = False
+    await db_session.commit()
+    await db_session.delete(first)
+    await db_session.commit()
+
+    usage = await db_session.get(OrganizationUsage, organization.id, populate_existing=True)
+    assert (usage.teachers, usage.students) == (0, 0)
+    assert cached.usage["students"] == 0
+
+
+async def test_limits_are_enforced_on_flush(db_session: AsyncSession, organization: Organization):
+    """Test that additions over a limit fail even with a cold cache."""
+    organization_id = organization.id
+    db_session.add_all([_member(organization_id, f"s{i}@example.com") for i in range(2)])
+    await db_session.commit()
+
+    db_session.add(_member(organization_id, "s3@example.com"))
+    with pytest.raises(LimitExceeded) as excinfo:
+        await db_session.flush()
+    assert excinfo.value.limit == "max_students"
+    await db_session.rollback()
+
+    # Leaving the organization frees a place
+    await db_session.execute(update(User).where(User.email == "s0@example.com").values(is_active=False))
+    await recount_usage(db_session)
+    await db_session.commit()
+    db_session.add(_member(organization_id, "s3@example.com"))
+    await db_session.commit()
+
+    await record_usage(db_session, organization_id, storage_bytes=600_000)
+    with pytest.raises(LimitExceeded):
+        await record_usage(db_session, organization_id, storage_bytes=600_000)
+
+
+async def test_subscription_changes_refresh_features(
+    db_session: AsyncSession, organization: Organization
+):
+    """Test that features follow the subscription state."""
+    assert (await entitlements.get(db_session, organization.id)).has("analytics")
+    assert not (await entitlements.get(db_session, organization.id)).has("white_label")
+
+    subscription = await db_session.scalar(select(Subscription))
+    subscription.status = SubscriptionStatus.EXPIRED
+    await db_session.commit()
+    assert not (await entitlements.get(db_session, organization.id)).has("analytics")
+
+
+async def test_feature_gate_on_organization_analytics(
+    client: AsyncClient,
+    auth_headers: dict[str, str],
+    db_session: AsyncSession,
+    organization: Organization,
+):
+    """Test that organization analytics need the analytics feature."""
+    await db_session.execute(update(User).values(role=UserRole.BUSINESS_OWNER))
+    user = await db_session.scalar(select(User).where(User.email == "test@example.com"))
+    organization.owner_id = user.id
+    await db_session.commit()
+
+    url = f"/api/v1/analytics/organizations/{organization.id}"
+    response = await client.get(url, headers=auth_headers)
+    assert response.status_code == 404  # Allowed; no statistics computed yet
+
+    await db_session.execute(update(Tariff).values(features=[]))
+    await db_session.commit()
+    entitlements.clear()
+    response = await client.get(url, headers=auth_headers)
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Your plan does not include analytics"
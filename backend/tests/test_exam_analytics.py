@@ -0,0 +1,152 @@
+"""
+Test the vectorized exam analytics job.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analytics import (
+    CategoryStatistics,
+    OrganizationExamStatistics,
+    QuestionStatistics,
+)
+from app.models.exam import Exam, ExamAnswer, ExamSession, ExamStatus
+from app.models.organization import Organization
+from app.models.question import Question, QuestionCategory
+from app.models.user import User
+from app.services.exam_analytics import (
+    AnswerStatistics,
+    SessionTable,
+    group_quantile,
+    run_exam_analytics,
+)
+from tests.conftest import TestSessionLocal
+
+
+def test_group_quantile():
+    """Test interpolated quantiles of contiguous groups."""
+    values = np.array([0.0, 50.0, 50.0, 100.0, 10.0, 20.0])
+    starts = np.array([0, 4])
+    counts = np.array([4, 2])
+
+    assert group_quantile(values, starts, counts, 0.5).tolist() == [50.0, 15.0]
+    assert group_quantile(values, starts, counts, 0.25).tolist() == [37.5, 12.5]
+
+
+def test_chunking_does_not_change_results():
+    """Test that sessions split across chunks are counted once."""
+    sessions = SessionTable(
+        np.array([1, 2, 3]),
+        np.array([100.0, 50.0, 0.0]),
+        np.array([50.0, 50.0, 50.0]),
+        np.array([0, 0, 0]),
+    )
+    session_ids = np.array([1, 1, 2, 2, 3, 3])
+    question_ids = np.array([10, 11, 10, 11, 10, 11])
+    correct = np.array([True, True, True, False, False, False])
+
+    def run(chunk: int) -> AnswerStatistics:
+        statistics = AnswerStatistics(sessions, np.array([10, 11]), np.array([1, 2]))
+        for start in range(0, len(session_ids), chunk):
+            end = start + chunk
+            statistics.add(session_ids[start:end], question_ids[start:end], correct[start:end])
+        statistics.finish()
+        return statistics
+
+    whole, chunked = run(6), run(1)
+    assert whole.question_rows() == chunked.question_rows()
+    assert whole.category_rows() == chunked.category_rows()
+    assert [row["passed_sessions"] for row in chunked.category_rows()] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_run_exam_analytics(db_session: AsyncSession):
+    """Test p-values, discrimination, category pass rates and score distribution."""
+    owner = User(email="owner@example.com", password_hash="x", full_name="Owner")
+    db_session.add(owner)
+    await db_session.flush()
+    organization = Organization(name="Avto maktab", slug="avto", owner_id=owner.id)
+    category = QuestionCategory(name_uz="Yo'l belgilari", slug="signs")
+    exam = Exam(name_uz="Test imtihon", total_questions=2, passing_score=50.0)
+    db_session.add_all([organization, category, exam])
+    await db_session.flush()
+
+    categorized = Question(text_uz="Savol 1", options=[], correct_option_id="F1", category=category)
+    uncategorized = Question(text_uz="Savol 2", options=[], correct_option_id="F1")
+    db_session.add_all([categorized, uncategorized])
+    await db_session.flush()
+
+    # (answers to the two questions, score); in-progress sessions are ignored
+    outcomes = [
+        ((True, True), 100.0, ExamStatus.COMPLETED),
+        ((True, False), 50.0, ExamStatus.COMPLETED),
+        ((False, False), 0.0, ExamStatus.COMPLETED),
+        ((False, True), 50.0, ExamStatus.COMPLETED),
+        ((True, True), None, ExamStatus.IN_PROGRESS),
+    ]
+    for i, (answers, score, exam_status) in enumerate(outcomes):
+        student = User(
+            email=f"student{i}@example.com",
+            password_hash="x",
+            full_name="Student",
+            organization_id=organization.id,
+        )
+        db_session.add(student)
+        await db_session.flush()
+        session = ExamSession(
+            exam_id=exam.id,
+            student_id=student.id,
+            selected_question_ids=[categorized.id, uncategorized.id],
+            status=exam_status,
+            started_at=datetime.now(timezone.utc),
+            time_remaining_seconds=0,
+            score=score,
+        )
+        db_session.add(session)
+        await db_session.flush()
+        for question, is_correct in zip((categorized, uncategorized), answers):
+            db_session.add(
+                ExamAnswer(
+                    session_id=session.id,
+                    question_id=question.id,
+                    selected_option_id="F1",
+                    is_correct=is_correct,
+                )
+            )
+    await db_session.commit()
+
+    summary = await run_exam_analytics(
+        TestSessionLocal, chunk_size=3, read_session_factory=TestSessionLocal
+    )
+    assert summary == {
+        "sessions": 4,
+        "answers": 8,
+        "questions": 2,
+        "categories": 1,
+        "organizations": 1,
+    }
+
+    questions = {
+        row.question_id: row
+        for row in (await db_session.execute(select(QuestionStatistics))).scalars()
+    }
+    assert questions[categorized.id].p_value == 0.5
+    assert questions[categorized.id].discrimination == 0.0
+    assert questions[uncategorized.id].discrimination == 1.0
+    assert questions[uncategorized.id].suggested_difficulty == 3
+
+    category_stats = (await db_session.execute(select(CategoryStatistics))).scalar_one()
+    assert category_stats.accuracy == 0.5
+    assert category_stats.sessions == 4
+    assert category_stats.pass_rate == 0.5
+
+    distribution = (await db_session.execute(select(OrganizationExamStatistics))).scalar_one()
+    assert distribution.sessions == 4
+    assert distribution.mean_score == 50.0
+    assert distribution.median_score == 50.0
+    assert distribution.p25_score == 37.5
+    assert distribution.pass_rate == 0.75
+    assert distribution.histogram == [1, 0, 0, 0, 0, 2, 0, 0, 0, 1]
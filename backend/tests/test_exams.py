@@ -0,0 +1,435 @@
+"""
+Test exam session endpoints and scoring.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.exam import Exam, ExamAnswer, ExamSession, ExamStatus
+from app.models.question import Question
+from app.models.user import User
+from app.services.exam_checkpoints import exam_checkpoints
+from app.services.exam_engine import (
+    ExamEngine,
+    QuestionNotInSession,
+    SessionNotActive,
+    SessionState,
+    exam_engine,
+)
+from tests.conftest import TestSessionLocal
+
+
+def _make_state() -> SessionState:
+    return SessionState(
+        session_id=1,
+        exam_id=1,
+        student_id=1,
+        question_ids=[10, 11],
+        answer_key={10: "F1", 11: "F2"},
+        passing_score=70.0,
+        deadline=0.0,
+    )
+
+
+def test_incremental_scoring():
+    """Test that changing an answer adjusts the running score."""
+    state = _make_state()
+
+    assert state.record(10, "F1") is True
+    assert state.correct == 1
+
+    assert state.record(10, "F3") is False
+    assert state.correct == 0
+
+    state.record(10, "F1")
+    state.record(11, "F2")
+    assert state.correct == 2
+    assert state.score == 100.0
+    assert state.passed
+
+
+def test_pending_answers_are_drained_once():
+    """Test that buffered answers are handed out once as insert rows."""
+    state = _make_state()
+    state.record(10, "F2")
+    state.record(10, "F1")
+
+    rows = state.take_pending()
+    assert rows == [
+        {"session_id": 1, "question_id": 10, "selected_option_id": "F1", "is_correct": True}
+    ]
+    assert state.take_pending() == []
+
+
+def test_answer_outside_session_rejected():
+    """Test that unknown questions are rejected."""
+    with pytest.raises(QuestionNotInSession):
+        _make_state().record(99, "F1")
+
+
+@pytest.fixture
+async def exam(db_session: AsyncSession) -> Exam:
+    """Create an exam with a small question bank."""
+    exam = Exam(name_uz="Test imtihon", total_questions=2, duration_minutes=40, passing_score=50.0)
+    db_session.add(exam)
+    for i in range(3):
+        db_session.add(
+            Question(
+                text_uz=f"Savol {i}",
+                options=[{"id": "F1", "text_uz": "Ha"}, {"id": "F2", "text_uz": "Yo'q"}],
+                correct_option_id="F1",
+            )
+        )
+    await db_session.commit()
+    return exam
+
+
+@pytest.mark.asyncio
+async def test_exam_session_flow(client: AsyncClient, auth_headers, exam: Exam):
+    """Test starting, answering and finishing an exam session."""
+    response = await client.post(
+        "/api/v1/exams/sessions", json={"exam_id": exam.id}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    session = response.json()
+    assert len(session["selected_question_ids"]) == 2
+
+    first, second = session["selected_question_ids"]
+    url = f"/api/v1/exams/sessions/{session['id']}"
+
+    response = await client.post(
+        f"{url}/answers",
+        json={"question_id": first, "selected_option_id": "F1"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["is_correct"] is True
+
+    await client.post(
+        f"{url}/answers",
+        json={"question_id": second, "selected_option_id": "F2"},
+        headers=auth_headers,
+    )
+
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "completed"
+    assert result["correct_answers"] == 1
+    assert result["total_answered"] == 2
+    assert result["score"] == 50.0
+    assert result["passed"] is True
+
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    assert response.status_code == 409
+
+
+async def _start(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+) -> tuple[str, list[int]]:
+    response = await client.post(
+        "/api/v1/exams/sessions", json={"exam_id": exam.id}, headers=auth_headers
+    )
+    await db_session.commit()  # The overridden dependency does not commit
+    session = response.json()
+    return f"/api/v1/exams/sessions/{session['id']}", session["selected_question_ids"]
+
+
+async def test_overdue_sessions_are_expired_by_the_sweeper(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that late answers are rejected and the heap sweep scores overdue sessions."""
+    url, (first, second) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    answer = {"question_id": first, "selected_option_id": "F1"}
+    await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    late_answers = exam_engine.stats()["late_answers"]
+
+    exam_engine._sessions[session_id].deadline = time.time() - 60
+    answer = {"question_id": second, "selected_option_id": "F1"}
+    response = await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Exam time is over"
+    assert exam_engine.stats()["late_answers"] == late_answers + 1
+
+    assert await exam_engine.expire_due(now=time.time() + exam.duration_minutes * 60 + 60) == 1
+    session = await db_session.get(ExamSession, session_id, populate_existing=True)
+    assert session.status == ExamStatus.EXPIRED
+    assert (session.correct_answers, session.total_answered, session.score) == (1, 1, 50.0)
+    assert session.time_remaining_seconds == 0
+
+    # Closed sessions are rejected without a database read
+    response = await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    assert response.status_code == 409
+    assert await exam_engine.expire_due(now=time.time() + 7200) == 0
+
+
+async def test_finishing_after_the_deadline_expires(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that a session finished after its deadline is stored as expired."""
+    url, _ = await _start(client, auth_headers, exam, db_session)
+    state = exam_engine._sessions[int(url.rsplit("/", 1)[1])]
+    state.deadline = time.time() - 60
+
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "expired"
+
+
+async def test_finish_is_reopened_when_its_commit_fails(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that a session whose final result fails to commit can be resumed and finished."""
+    url, (first, second) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    answer = {"question_id": first, "selected_option_id": "F1"}
+    await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+
+    # Fail the next commit that touches exam_sessions
+    await db_session.execute(
+        text(
+            "CREATE OR REPLACE FUNCTION fail_commit() RETURNS trigger AS $$ "
+            "BEGIN RAISE EXCEPTION 'commit failed'; END $$ LANGUAGE plpgsql"
+        )
+    )
+    await db_session.execute(
+        text(
+            "CREATE CONSTRAINT TRIGGER fail_commit AFTER UPDATE ON exam_sessions "
+            "DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION fail_commit()"
+        )
+    )
+    await db_session.commit()
+
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    assert response.status_code == 200
+    with pytest.raises(DBAPIError):
+        await db_session.commit()
+    await db_session.rollback()  # As get_db does
+
+    await db_session.execute(text("DROP TRIGGER fail_commit ON exam_sessions"))
+    await db_session.commit()
+
+    response = await client.get(f"{url}/progress", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["answers"] == {str(first): "F1"}
+    answer = {"question_id": second, "selected_option_id": "F1"}
+    response = await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    assert response.status_code == 200
+
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["correct_answers"] == 2
+    await db_session.commit()
+    session = await db_session.get(ExamSession, session_id, populate_existing=True)
+    assert session.status == ExamStatus.COMPLETED
+    answers = await db_session.scalar(
+        select(func.count()).where(ExamAnswer.session_id == session_id)
+    )
+    assert answers == 2
+
+    response = await client.get(f"{url}/progress", headers=auth_headers)
+    assert response.status_code == 409
+
+
+async def test_orphaned_sessions_are_expired_from_stored_answers(
+    db_session: AsyncSession, exam: Exam
+):
+    """Test that sessions no worker holds are expired and scored in the database."""
+    student = await db_session.scalar(select(User).limit(1))
+    if student is None:
+        student = User(email="s@example.com", password_hash="x", full_name="S")
+        db_session.add(student)
+        await db_session.flush()
+    question_ids = list((await db_session.scalars(select(Question.id).limit(2))).all())
+    started = datetime.now(timezone.utc) - timedelta(minutes=exam.duration_minutes + 5)
+    orphan, current = (
+        ExamSession(
+            exam_id=exam.id,
+            student_id=student.id,
+            selected_question_ids=question_ids,
+            started_at=started_at,
+            time_remaining_seconds=600,
+        )
+        for started_at in (started, datetime.now(timezone.utc))
+    )
+    db_session.add_all([orphan, current])
+    await db_session.flush()
+    db_session.add(
+        ExamAnswer(
+            session_id=orphan.id,
+            question_id=question_ids[0],
+            selected_option_id="F1",
+            is_correct=True,
+        )
+    )
+    await db_session.commit()
+    orphan_id, current_id = orphan.id, current.id
+
+    assert await exam_engine.expire_orphans() == 1
+    orphan = await db_session.get(ExamSession, orphan_id, populate_existing=True)
+    assert orphan.status == ExamStatus.EXPIRED
+    assert (orphan.correct_answers, orphan.total_answered, orphan.score) == (1, 1, 50.0)
+    assert orphan.passed is True
+    current = await db_session.get(ExamSession, current_id, populate_existing=True)
+    assert current.status == ExamStatus.IN_PROGRESS
+
+
+async def test_progress_resumes_from_checkpoint(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that another worker resumes unflushed progress, then writes it behind."""
+    url, (first, _) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    answer = {"question_id": first, "selected_option_id": "F1", "current_question_index": 1}
+    await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+
+    response = await client.put(
+        f"{url}/position", json={"current_question_index": 2}, headers=auth_headers
+    )
+    assert response.status_code == 400
+    response = await client.put(
+        f"{url}/position", json={"current_question_index": 0}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    exam_engine.clear()  # As seen by a worker that never held the session
+    response = await client.get(f"{url}/progress", headers=auth_headers)
+    assert response.status_code == 200
+    progress = response.json()
+    assert progress["answers"] == {str(first): "F1"}
+    assert progress["current_question_index"] == 0
+    assert progress["time_remaining_seconds"] > 0
+
+    assert await exam_engine.flush() == 1
+    session = await db_session.get(ExamSession, session_id, populate_existing=True)
+    assert (session.correct_answers, session.total_answered) == (1, 1)
+    assert session.current_question_index == 0
+
+
+async def test_crashed_worker_progress_is_recovered(
+    client: AsyncClient,
+    auth_headers,
+    exam: Exam,
+    db_session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that checkpoints left unflushed by a stopped worker are replayed."""
+    url, (first, second) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    for question_id, option_id in ((first, "F1"), (second, "F2")):
+        answer = {"question_id": question_id, "selected_option_id": option_id}
+        await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    exam_engine.clear()  # The worker stops before its flush
+
+    assert await exam_engine.recover() == 0  # Not yet overdue for recovery
+    monkeypatch.setattr(settings, "EXAM_CHECKPOINT_RECOVERY_DELAY_SECONDS", 0)
+    assert await exam_engine.recover() == 1
+    assert await exam_engine.recover() == 0
+
+    answers = await db_session.execute(
+        select(ExamAnswer.question_id, ExamAnswer.is_correct).where(
+            ExamAnswer.session_id == session_id
+        )
+    )
+    assert dict(answers.tuples().all()) == {first: True, second: False}
+    session = await db_session.get(ExamSession, session_id, populate_existing=True)
+    assert (session.correct_answers, session.total_answered) == (1, 2)
+
+
+async def test_workers_share_session_progress(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that answers given through two workers are all scored, and closing is seen by both."""
+    url, (first, second) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    other_worker = ExamEngine(TestSessionLocal, exam_checkpoints)
+
+    async with TestSessionLocal() as db:
+        state = await other_worker.get_state(db, session_id)
+        await other_worker.record_answer(state, first, "F1")
+
+    answer = {"question_id": second, "selected_option_id": "F1"}
+    response = await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    assert response.status_code == 200
+    response = await client.get(f"{url}/progress", headers=auth_headers)
+    assert response.json()["answers"] == {str(first): "F1", str(second): "F1"}
+
+    async with TestSessionLocal() as db:
+        state = await other_worker.get_state(db, session_id)
+        session = await other_worker.finish(db, state)
+        await db.commit()
+    assert (session.correct_answers, session.total_answered, session.score) == (2, 2, 100.0)
+    await asyncio.gather(*other_worker._tasks)
+
+    response = await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    assert response.status_code == 409
+    assert session_id not in exam_engine._sessions
+    with pytest.raises(SessionNotActive):
+        async with TestSessionLocal() as db:
+            await other_worker.get_state(db, session_id)
+
+
+async def test_finish_scores_answers_flushed_by_other_workers(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that the final score counts stored answers missing from a lost checkpoint."""
+    url, (first, second) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    other_worker = ExamEngine(TestSessionLocal, exam_checkpoints)
+    async with TestSessionLocal() as db:
+        state = await other_worker.get_state(db, session_id)
+    await other_worker.record_answer(state, first, "F1")
+    assert await other_worker.flush() == 1
+
+    exam_checkpoints.clear()  # Redis restarted
+    answer = {"question_id": second, "selected_option_id": "F1"}
+    response = await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    assert response.status_code == 200
+
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["correct_answers"], result["total_answered"], result["score"]) == (2, 2, 100.0)
+    await db_session.commit()
+    answers = await db_session.scalar(
+        select(func.count()).where(ExamAnswer.session_id == session_id)
+    )
+    assert answers == 2
+
+
+async def test_other_students_sessions_are_not_loaded(
+    client: AsyncClient, auth_headers, exam: Exam, db_session: AsyncSession
+):
+    """Test that probing another student's session neither exposes nor loads it."""
+    url, (first, _) = await _start(client, auth_headers, exam, db_session)
+    session_id = int(url.rsplit("/", 1)[1])
+    other = {"email": "other@example.com", "password": "otherpassword123", "full_name": "O"}
+    await client.post("/api/v1/auth/register", json=other)
+    response = await client.post(
+        "/api/v1/auth/login", json={"email": other["email"], "password": other["password"]}
+    )
+    other_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    answer = {"question_id": first, "selected_option_id": "F1"}
+
+    response = await client.post(f"{url}/answers", json=answer, headers=other_headers)
+    assert response.status_code == 404  # Held in memory
+
+    for clear in (exam_engine.clear, exam_checkpoints.clear):
+        clear()  # From the checkpoint, then from the database
+        response = await client.get(f"{url}/progress", headers=other_headers)
+        assert response.status_code == 404
+        response = await client.post(f"{url}/answers", json=answer, headers=other_headers)
+        assert response.status_code == 404
+        assert exam_engine.stats()["active_sessions"] == 0
+        assert exam_engine.stats()["dirty_sessions"] == 0
+
+    response = await client.get(f"{url}/progress", headers=auth_headers)
+    assert response.status_code == 200
@@ -0,0 +1,205 @@
+"""
+Test the instructor ranking table and ranked instructor search.
+"""
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.booking import Booking, BookingSlot, BookingStatus, BookingType
+from app.models.organization import Organization
+from app.models.user import User, UserLevel, UserRole
+from app.services.availability import WeeklyRule, create_recurring_slots, expand_rules
+from app.services.booking_engine import cancel_booking, reserve_slot
+from app.services.instructor_ranking import instructor_ranking
+from tests.conftest import TestSessionLocal
+
+TOMORROW = datetime.now(timezone.utc).replace(
+    hour=6, minute=0, second=0, microsecond=0
+) + timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+async def ranking() -> None:
+    instructor_ranking.session_factory = TestSessionLocal
+    await instructor_ranking.stop_refresher()
+    instructor_ranking.clear()
+
+
+def _instructor(email: str, rating: float, **values) -> User:
+    return User(
+        email=email,
+        password_hash="x",
+        full_name=email,
+        role=UserRole.INSTRUCTOR,
+        rating=rating,
+        **values,
+    )
+
+
+def _slots(instructor: User, days: list[int]) -> list[BookingSlot]:
+    return [
+        BookingSlot(
+            instructor_id=instructor.id,
+            start_time=TOMORROW + timedelta(days=day),
+            end_time=TOMORROW + timedelta(days=day, minutes=90),
+        )
+        for day in days
+    ]
+
+
+async def test_search_ranks_and_filters(db_session: AsyncSession):
+    """Test score order, filters, the window and completion rates."""
+    owner = User(email="owner@example.com", password_hash="x", full_name="Owner")
+    db_session.add(owner)
+    await db_session.flush()
+    school = Organization(name="School", slug="school", owner_id=owner.id)
+    db_session.add(school)
+    await db_session.flush()
+    top = _instructor("top@example.com", 4.9, level=UserLevel.ELITE, organization_id=school.id)
+    good = _instructor("good@example.com", 4.5, work_privately=True)
+    busy = _instructor("busy@example.com", 5.0)
+    teacher = User(email="t@example.com", password_hash="x", full_name="T", role=UserRole.TEACHER)
+    student = User(email="s@example.com", password_hash="x", full_name="S")
+    db_session.add_all([top, good, busy, teacher, student])
+    await db_session.flush()
+    db_session.add_all(
+        [*_slots(top, [0, 1, 9]), *_slots(good, [2]), *_slots(teacher, [0]), *_slots(busy, [-2])]
+    )
+    # Good has missed most of their lessons
+    db_session.add_all(
+        Booking(
+            student_id=student.id,
+            instructor_id=good.id,
+            booking_type=BookingType.PRACTICAL,
+            status=status,
+            scheduled_start=TOMORROW - timedelta(days=3),
+            scheduled_end=TOMORROW - timedelta(days=3),
+            price_amount=0,
+        )
+        for status in (BookingStatus.COMPLETED, BookingStatus.NO_SHOW, BookingStatus.CANCELLED)
+    )
+    await db_session.commit()
+    ids = {user.email: user.id for user in (top, good, busy, teacher)}
+
+    matches = await instructor_ranking.search(BookingType.PRACTICAL)
+    assert [m.instructor.id for m in matches] == [ids["top@example.com"], ids["good@example.com"]]
+    assert [m.free_slots for m in matches] == [3, 1]
+    assert matches[1].instructor.completion_rate == pytest.approx(2 / 5)
+
+    # Busy has no free slot ahead, but can be listed
+    everyone = await instructor_ranking.search(min_free_slots=0, limit=2)
+    assert [m.instructor.id for m in everyone] == [ids["top@example.com"], ids["busy@example.com"]]
+
+    this_week = await instructor_ranking.search(end=TOMORROW + timedelta(days=7))
+    assert this_week[0].free_slots == 2
+    assert this_week[0].next_free == TOMORROW.timestamp()
+    assert [m.instructor.id for m in await instructor_ranking.search(works_privately=True)] == [
+        ids["good@example.com"]
+    ]
+    assert await instructor_ranking.search(organization_id=school.id, levels=[UserLevel.PRO]) == []
+    assert await instructor_ranking.search(min_rating=4.95) == []
+    theory = await instructor_ranking.search(BookingType.THEORY)
+    assert [m.instructor.id for m in theory] == [ids["t@example.com"]]
+
+
+async def test_committed_changes_are_applied_in_place(db_session: AsyncSession):
+    """Test reservations, cancellations, closed bookings and profile edits without reloads."""
+    first = _instructor("first@example.com", 4.0)
+    second = _instructor("second@example.com", 3.0)
+    student = User(email="s@example.com", password_hash="x", full_name="S")
+    db_session.add_all([first, second, student])
+    await db_session.flush()
+    slots = _slots(first, [0, 1])
+    db_session.add_all([*slots, *_slots(second, [0])])
+    await db_session.commit()
+    first_id, second_id, student_id = first.id, second.id, student.id
+    slot_id = slots[0].id
+    starts = [slot.start_time.timestamp() for slot in slots]
+
+    await instructor_ranking.search()
+    reloads = instructor_ranking.stats()["reloads"]
+
+    await reserve_slot(db_session, slot_id, student_id, BookingType.PRACTICAL)
+    await db_session.rollback()
+    assert instructor_ranking.get(first_id).free == starts
+
+    booking_id = (await reserve_slot(db_session, slot_id, student_id, BookingType.PRACTICAL)).id
+    await db_session.commit()
+    assert instructor_ranking.get(first_id).free == starts[1:]
+
+    await cancel_booking(db_session, await db_session.get(Booking, booking_id))
+    await db_session.commit()
+    assert instructor_ranking.get(first_id).free == starts
+
+    second.rating = 5.0
+    await db_session.commit()
+    matches = await instructor_ranking.search()
+    assert [m.instructor.id for m in matches] == [second_id, first_id]
+
+    booking = await db_session.get(Booking, booking_id)
+    booking.status = BookingStatus.COMPLETED  # Closing an already closed booking is ignored
+    await db_session.commit()
+    entry = instructor_ranking.get(first_id)
+    assert (entry.completed, entry.closed) == (0, 1)
+
+    second.role = UserRole.STUDENT
+    await db_session.commit()
+    assert instructor_ranking.get(second_id) is None
+    assert instructor_ranking.stats()["reloads"] == reloads
+
+
+async def test_generated_availability_reloads_instructors(db_session: AsyncSession):
+    """Test that bulk-inserted slots reach the table after commit."""
+    instructor = _instructor("i@example.com", 4.0)
+    db_session.add(instructor)
+    await db_session.commit()
+    instructor_id = instructor.id
+    await instructor_ranking.search(min_free_slots=0)
+
+    day = (TOMORROW + timedelta(days=1)).date()
+    slots = expand_rules(
+        [WeeklyRule(range(7), time(9), time(12), slot_minutes=60)],
+        day,
+        day + timedelta(days=1),
+        ZoneInfo("Asia/Tashkent"),
+        skip_public_holidays=False,
+    )
+    await create_recurring_slots(db_session, [instructor_id], slots)
+    await db_session.commit()
+    await instructor_ranking._reload_task
+
+    assert len(instructor_ranking.get(instructor_id).free) == 6
+    assert instructor_ranking.stats()["partial_reloads"] >= 1
+
+
+async def test_search_endpoint(
+    client: AsyncClient, auth_headers: dict[str, str], db_session: AsyncSession
+):
+    """Test the instructor search endpoint."""
+    instructor = _instructor("i@example.com", 4.0, level=UserLevel.PRO)
+    db_session.add(instructor)
+    await db_session.flush()
+    db_session.add_all(_slots(instructor, [0, 3]))
+    await db_session.commit()
+
+    response = await client.get(
+        "/api/v1/bookings/instructors",
+        params={"levels": ["pro", "elite"], "end": (TOMORROW + timedelta(days=2)).isoformat()},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    (result,) = response.json()
+    assert result["full_name"] == "i@example.com"
+    assert result["free_slots"] == 1
+    assert datetime.fromisoformat(result["next_free_slot"]) == TOMORROW
+    assert result["completion_rate"] == 0.5
+
+    response = await client.get(
+        "/api/v1/bookings/instructors",
+        params={"start": TOMORROW.isoformat(), "end": TOMORROW.isoformat()},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
@@ -0,0 +1,183 @@
+"""
+Test incremental instructor rating aggregates, reconciliation and level promotion.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.booking import Booking, BookingStatus, BookingType
+from app.models.user import User, UserLevel, UserRole
+from app.services.booking_engine import complete_booking, rate_booking
+from app.services.instructor_ratings import (
+    LEVEL_REQUIREMENTS,
+    promote_levels,
+    reconcile_ratings,
+    run_rating_job,
+)
+from tests.conftest import TestSessionLocal
+
+PAST = datetime.now(timezone.utc) - timedelta(days=1)
+
+
+def _booking(student_id: int, instructor_id: int, **values) -> Booking:
+    return Booking(
+        student_id=student_id,
+        instructor_id=instructor_id,
+        booking_type=BookingType.PRACTICAL,
+        scheduled_start=PAST,
+        scheduled_end=PAST + timedelta(minutes=90),
+        price_amount=0,
+        **values,
+    )
+
+
+async def _instructor(db: AsyncSession, email: str = "i@example.com", **values) -> User:
+    instructor = User(
+        email=email, password_hash="x", full_name=email, role=UserRole.INSTRUCTOR, **values
+    )
+    db.add(instructor)
+    await db.flush()
+    return instructor
+
+
+async def test_complete_and_rate_endpoints(
+    client: AsyncClient, auth_headers: dict[str, str], db_session: AsyncSession
+):
+    """Test that completing and rating update the aggregates, and who may do what."""
+    student = await db_session.scalar(select(User).where(User.email == "test@example.com"))
+    instructor = await _instructor(db_session)
+    booking = _booking(student.id, instructor.id, status=BookingStatus.CONFIRMED)
+    db_session.add(booking)
+    await db_session.commit()
+    instructor_id, url = instructor.id, f"/api/v1/bookings/{booking.id}"
+
+    response = await client.post(f"{url}/rate", json={"stars": 5}, headers=auth_headers)
+    assert response.status_code == 409  # Not completed yet
+    response = await client.post(f"{url}/complete", headers=auth_headers)
+    assert response.status_code == 404  # Only the instructor completes
+
+    await db_session.execute(update(Booking).values(status=BookingStatus.COMPLETED))
+    await db_session.commit()
+    response = await client.post(f"{url}/rate", json={"stars": 4}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["student_rating"] == 4
+    response = await client.post(f"{url}/rate", json={"stars": 2}, headers=auth_headers)
+    assert response.status_code == 200
+    response = await client.post(f"{url}/rate", json={"stars": 6}, headers=auth_headers)
+    assert response.status_code == 422
+
+    instructor = await db_session.get(User, instructor_id, populate_existing=True)
+    assert (instructor.rating_sum, instructor.rating_count, instructor.rating) == (2, 1, 2.0)
+
+
+async def test_concurrent_ratings_are_not_lost(db_session: AsyncSession):
+    """Test that racing ratings and completions of one instructor all count."""
+    student = User(email="s@example.com", password_hash="x", full_name="S")
+    db_session.add(student)
+    instructor = await _instructor(db_session)
+    bookings = [
+        _booking(student.id, instructor.id, status=BookingStatus.CONFIRMED) for _ in range(12)
+    ]
+    db_session.add_all(bookings)
+    await db_session.commit()
+    instructor_id, booking_ids = instructor.id, [booking.id for booking in bookings]
+
+    async def finish(booking_id: int, stars: int) -> None:
+        async with TestSessionLocal() as db:
+            booking = await db.get(Booking, booking_id, with_for_update=True)
+            await complete_booking(db, booking)
+            await rate_booking(db, booking, stars)
+            await db.commit()
+
+    stars = [1 + i % 5 for i in range(len(booking_ids))]
+    await asyncio.gather(*(finish(booking_id, s) for booking_id, s in zip(booking_ids, stars)))
+
+    instructor = await db_session.get(User, instructor_id, populate_existing=True)
+    assert instructor.total_sessions == 12
+    assert (instructor.rating_sum, instructor.rating_count) == (sum(stars), 12)
+    assert instructor.rating == sum(stars) / 12
+
+
+async def test_reconciliation_fixes_drift(db_session: AsyncSession):
+    """Test that the bulk pass recomputes drifted aggregates only."""
+    student = User(email="s@example.com", password_hash="x", full_name="S")
+    db_session.add(student)
+    drifted = await _instructor(db_session, "drifted@example.com", rating_sum=99, rating_count=1)
+    correct = await _instructor(
+        db_session,
+        "correct@example.com",
+        rating_sum=3,
+        rating_count=1,
+        rating=3.0,
+        total_sessions=1,
+    )
+    db_session.add_all(
+        [
+            _booking(student.id, drifted.id, status=BookingStatus.COMPLETED, student_rating=5),
+            _booking(student.id, drifted.id, status=BookingStatus.COMPLETED, student_rating=4),
+            _booking(student.id, drifted.id, status=BookingStatus.CANCELLED),
+            _booking(student.id, correct.id, status=BookingStatus.COMPLETED, student_rating=3),
+        ]
+    )
+    await db_session.commit()
+    drifted_id = drifted.id
+
+    assert await reconcile_ratings(db_session, 1, 1000) == [drifted_id]
+    await db_session.commit()
+    drifted = await db_session.get(User, drifted_id, populate_existing=True)
+    assert (drifted.rating_sum, drifted.rating_count, drifted.total_sessions) == (9, 2, 2)
+    assert drifted.rating == 4.5
+
+    summary = await run_rating_job(TestSessionLocal, chunk_size=2)
+    assert summary["reconciled"] == 0
+
+
+async def test_levels_are_promoted_in_batches(db_session: AsyncSession):
+    """Test the promotion pass, which never lowers a level."""
+    (_, elite_sessions, elite_ratings, elite_rating), (_, pro_sessions, pro_ratings, _) = (
+        LEVEL_REQUIREMENTS
+    )
+    star = await _instructor(
+        db_session,
+        "star@example.com",
+        total_sessions=elite_sessions,
+        rating_count=elite_ratings,
+        rating=elite_rating,
+    )
+    # Rated like an elite instructor, but with too few sessions
+    good = await _instructor(
+        db_session,
+        "good@example.com",
+        total_sessions=pro_sessions + 10,
+        rating_count=elite_ratings,
+        rating=4.9,
+        level=UserLevel.BASIC,
+    )
+    fallen = await _instructor(db_session, "fallen@example.com", level=UserLevel.ELITE)
+    new = await _instructor(db_session, "new@example.com")
+    student = User(email="s@example.com", password_hash="x", full_name="S")
+    db_session.add(student)
+    await db_session.commit()
+    ids = [star.id, good.id, fallen.id, new.id]
+
+    changed = await promote_levels(db_session)
+    await db_session.commit()
+    assert changed == {
+        UserLevel.ELITE: [ids[0]],
+        UserLevel.PRO: [ids[1]],
+        UserLevel.BASIC: [ids[3]],
+    }
+
+    levels = (
+        await db_session.execute(select(User.id, User.level).where(User.id.in_(ids)))
+    ).all()
+    assert dict(levels) == {
+        ids[0]: UserLevel.ELITE,
+        ids[1]: UserLevel.PRO,
+        ids[2]: UserLevel.ELITE,
+        ids[3]: UserLevel.BASIC,
+    }
+    assert not any((await promote_levels(db_session)).values())
@@ -0,0 +1,159 @@
+"""
+Test streamed image uploads, content-addressed storage and serving.
+"""
+import io
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.organization import Organization, OrganizationUsage
+from app.models.payment import Subscription, Tariff
+from app.models.user import User
+from app.services.entitlements import entitlements
+from app.services.media import image_store
+
+URL = "/api/v1/media/images"
+
+
+@pytest.fixture(autouse=True)
+def store_root(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(image_store, "root", tmp_path)
+    monkeypatch.setattr(settings, "IMAGE_VARIANT_SIZES", [64, 256])
+    return tmp_path
+
+
+def _image(format: str = "PNG", size: tuple[int, int] = (400, 200)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, format)
+    return buffer.getvalue()
+
+
+async def test_upload_renders_webp_variants(
+    client: AsyncClient, auth_headers: dict[str, str], store_root: Path
+):
+    """Test that an upload is stored by hash with one WebP per size."""
+    response = await client.post(URL, content=_image("JPEG"), headers=auth_headers)
+    assert response.status_code == 201
+    data = response.json()
+    assert (data["width"], data["height"], data["created"]) == (400, 200, True)
+    assert set(data["urls"]) == {"64", "256"}
+
+    with Image.open(store_root / "images" / data["id"][:2] / data["id"] / "256.webp") as image:
+        assert (image.format, image.size) == ("WEBP", (256, 128))
+    assert not any((store_root / "tmp").iterdir())  # Spooled upload removed
+
+
+async def test_same_bytes_are_deduplicated(client: AsyncClient, auth_headers: dict[str, str]):
+    """Test that re-uploading an image returns the stored one without rendering."""
+    content = _image()
+    first = (await client.post(URL, content=content, headers=auth_headers)).json()
+    before = image_store.stats()
+
+    response = await client.post(URL, content=content, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {**first, "created": False}
+    after = image_store.stats()
+    assert after["deduplicated"] - before["deduplicated"] == 1
+    assert after["uploads"] == before["uploads"]
+
+
+async def test_rejected_uploads(
+    client: AsyncClient, auth_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+):
+    """Test size limit, format sniffing and undecodable images."""
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1000)
+    response = await client.post(URL, content=b"\x89PNG" + b"0" * 2000, headers=auth_headers)
+    assert response.status_code == 413
+
+    async def chunks():
+        for _ in range(3):
+            yield b"\xff\xd8\xff" + b"0" * 500
+
+    response = await client.post(URL, content=chunks(), headers=auth_headers)
+    assert response.status_code == 413
+
+    response = await client.post(URL, content=b"GIF89a" + b"0" * 100, headers=auth_headers)
+    assert response.status_code == 415
+    response = await client.post(URL, content=b"\x89PNG\r\n\x1a\n" + b"0" * 100, headers=auth_headers)
+    assert response.status_code == 415
+
+
+async def test_serving_is_immutable(client: AsyncClient, auth_headers: dict[str, str]):
+    """Test rendition responses and their cache headers."""
+    data = (await client.post(URL, content=_image(), headers=auth_headers)).json()
+
+    response = await client.get(data["urls"]["64"])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.content.startswith(b"RIFF")
+
+    assert (await client.get(f"{URL}/{data['id']}/100.webp")).status_code == 404
+    assert (await client.get(f"{URL}/{'0' * 64}/64.webp")).status_code == 404
+    assert (await client.get(f"{URL}/not-a-digest/64.webp")).status_code == 404
+
+
+async def test_new_images_count_toward_storage(
+    client: AsyncClient, auth_headers: dict[str, str], db_session: AsyncSession
+):
+    """Test that organization members' uploads are recorded as storage usage."""
+    user = await db_session.scalar(select(User).where(User.email == "test@example.com"))
+    organization = Organization(name="School", slug="school", owner_id=user.id)
+    db_session.add(organization)
+    await db_session.flush()
+    organization_id = organization.id
+    user.organization_id = organization_id
+    await db_session.commit()
+
+    data = (await client.post(URL, content=_image(), headers=auth_headers)).json()
+    await client.post(URL, content=_image(), headers=auth_headers)
+
+    usage = await db_session.get(OrganizationUsage, organization_id, populate_existing=True)
+    stored = sum(
+        image_store.variant_path(data["id"], size).stat().st_size
+        for size in settings.IMAGE_VARIANT_SIZES
+    )
+    assert usage.storage_bytes == stored
+
+
+async def test_chunked_uploads_are_held_to_the_storage_limit(
+    client: AsyncClient, auth_headers: dict[str, str], db_session: AsyncSession
+):
+    """Test that uploads without Content-Length are checked on their stored size."""
+    entitlements.clear()
+    user = await db_session.scalar(select(User).where(User.email == "test@example.com"))
+    organization = Organization(name="School", slug="school", owner_id=user.id)
+    tariff = Tariff(name_uz="Basic", slug="basic", limits={"max_storage_mb": 1})
+    db_session.add_all([organization, tariff])
+    await db_session.flush()
+    now = datetime.now(timezone.utc)
+    db_session.add_all(
+        [
+            Subscription(
+                organization_id=organization.id,
+                tariff_id=tariff.id,
+                started_at=now,
+                expires_at=now + timedelta(days=30),
+            ),
+            # A few bytes short of the limit
+            OrganizationUsage(organization_id=organization.id, storage_bytes=1024 * 1024 - 10),
+        ]
+    )
+    user.organization_id = organization.id
+    await db_session.commit()
+
+    async def chunks():
+        yield _image()
+
+    for _ in range(2):
+        response = await client.post(URL, content=chunks(), headers=auth_headers)
+        assert "content-length" not in response.request.headers
+        assert response.status_code == 403
+        await db_session.rollback()  # As get_db does
+    assert not any((Path(image_store.root) / "images").rglob("*.webp"))
@@ -0,0 +1,263 @@
+"""
+Test the notification dispatcher against local stub SMS/WhatsApp and SMTP servers.
+"""
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, Callable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.booking import BookingSlot, BookingType
+from app.models.payment import Payment, PaymentEvent, PaymentEventType
+from app.models.user import User, UserRole
+from app.services.booking_engine import reserve_slot
+from app.services.notifications import (
+    EMAIL,
+    SMS,
+    WHATSAPP,
+    EmailProvider,
+    NotificationDispatcher,
+    SMSProvider,
+    Throttle,
+    WhatsAppProvider,
+    notifications,
+    render,
+)
+from app.services.payment_events import payment_events
+from tests.conftest import TestSessionLocal
+
+
+class StubHTTPServer:
+    """Keep-alive HTTP/1.1 server recording JSON bodies; ``respond`` picks each status."""
+
+    def __init__(self, respond: Callable[[Any], int] = lambda body: 200) -> None:
+        self.respond = respond
+        self.bodies: list[Any] = []
+        self.connections = 0
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/send"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode("latin-1").split("\r\n"):
+                    name, _, value = line.partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                body = json.loads(await reader.readexactly(length))
+                self.bodies.append(body)
+                status = self.respond(body)
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Length: 2\r\n"
+                    "Content-Type: application/json\r\n\r\n{}".encode()
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+class StubSMTPServer:
+    """Minimal SMTP server recording delivered messages; refuses ``bad@`` recipients."""
+
+    def __init__(self) -> None:
+        self.messages: list[str] = []
+        self.connections = 0
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 stub")
+        try:
+            while True:
+                command = (await reader.readline()).decode().strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "RCPT" and "bad@" in command:
+                    await reply("550 No such user")
+                elif verb == "DATA":
+                    await reply("354 Go ahead")
+                    data = await reader.readuntil(b"\r\n.\r\n")
+                    self.messages.append(data.decode())
+                    await reply("250 Queued")
+                elif verb == "QUIT" or not command:
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("250 OK")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "NOTIFICATION_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "NOTIFICATION_BATCH_WINDOW_SECONDS", 0.05)
+
+
+@pytest.fixture
+async def stub_http() -> AsyncGenerator[StubHTTPServer, None]:
+    server = StubHTTPServer()
+    yield server
+    server.server.close()
+
+
+async def _run(dispatcher: NotificationDispatcher) -> None:
+    dispatcher.start()
+    try:
+        await asyncio.wait_for(dispatcher.drain(), 5)
+    finally:
+        await dispatcher.stop()
+
+
+def test_render_templates():
+    """Test templates, with booking times in local time."""
+    start = datetime(2027, 3, 9, 5, 30, tzinfo=timezone.utc)
+    _, text = render("booking_confirmed", start=start, booking_id=12)
+    assert "09.03.2027 10:30" in text and "#12" in text
+    subject, text = render("exam_passed", score=90.0, correct=18, total=20)
+    assert subject == "Imtihon natijasi" and "90% (18/20)" in text
+
+
+async def test_throttle_paces_batches():
+    """Test that the token bucket delays batches beyond the rate."""
+    throttle = Throttle(rate=100, capacity=5)
+    started = time.monotonic()
+    await throttle.acquire(5)
+    assert time.monotonic() - started < 0.02
+    await throttle.acquire(5)
+    assert time.monotonic() - started >= 0.04
+
+
+async def test_sms_batches_retry_on_one_connection(stub_http: StubHTTPServer):
+    """Test that queued SMS go out as one batch, retried after a 503."""
+    statuses = iter([503])
+    stub_http.respond = lambda body: next(statuses, 200)
+    url = await stub_http.start()
+    dispatcher = NotificationDispatcher(
+        TestSessionLocal, {SMS: SMSProvider(url, "key", batch_size=10, rate=0)}
+    )
+    for i in range(5):
+        assert dispatcher.send(SMS, f"+99890000000{i}", f"Hello {i}")
+    assert not dispatcher.send(WHATSAPP, "+998900000000", "Not configured")
+
+    await _run(dispatcher)
+    first, *retries = stub_http.bodies
+    assert len(first["messages"]) == 5
+    retried = sorted(m["text"] for body in retries for m in body["messages"])
+    assert retried == [f"Hello {i}" for i in range(5)]
+    assert stub_http.connections == 1
+    stats = dispatcher.stats()
+    assert stats["channels"][SMS] == {
+        "queued": 0,
+        "sent": 5,
+        "failed": 0,
+        "retried": 5,
+        "dropped": 0,
+    }
+    assert stats["unconfigured"] == 1
+
+
+async def test_whatsapp_permanent_failures_are_not_retried(stub_http: StubHTTPServer):
+    """Test per-message results of a concurrent batch."""
+    stub_http.respond = lambda body: 400 if body["to"] == "998900000000" else 200
+    url = await stub_http.start()
+    dispatcher = NotificationDispatcher(
+        TestSessionLocal, {WHATSAPP: WhatsAppProvider(url, "token", batch_size=20, rate=0)}
+    )
+    for phone in ("+998 90 000 00 00", "+998901111111", "+998902222222"):
+        dispatcher.send(WHATSAPP, phone, "Salom")
+
+    await _run(dispatcher)
+    assert len(stub_http.bodies) == 3
+    assert stub_http.bodies[1]["text"] == {"body": "Salom"}
+    channel = dispatcher.stats()["channels"][WHATSAPP]
+    assert (channel["sent"], channel["failed"], channel["retried"]) == (2, 1, 0)
+
+
+async def test_email_batch_over_one_smtp_connection():
+    """Test that a batch of emails shares one SMTP session."""
+    server = StubSMTPServer()
+    port = await server.start()
+    provider = EmailProvider(
+        "127.0.0.1", port, "Onless <noreply@onless.uz>", batch_size=10, rate=0, use_tls=False
+    )
+    dispatcher = NotificationDispatcher(TestSessionLocal, {EMAIL: provider})
+    for address in ("a@example.com", "bad@example.com", "c@example.com"):
+        dispatcher.send(EMAIL, address, "Matn", subject="Mavzu")
+
+    await _run(dispatcher)
+    server.server.close()
+    assert len(server.messages) == 2
+    assert "Subject: Mavzu" in server.messages[0]
+    assert server.connections == provider.connections == 1
+    channel = dispatcher.stats()["channels"][EMAIL]
+    assert (channel["sent"], channel["failed"]) == (2, 1)
+
+
+async def test_hooks_notify_after_commit(db_session: AsyncSession, stub_http: StubHTTPServer):
+    """Test booking and payment notifications, and that rollbacks send nothing."""
+    url = await stub_http.start()
+    notifications.configure({SMS: SMSProvider(url, "key", batch_size=10, rate=0)})
+    notifications.session_factory = TestSessionLocal
+    try:
+        student = User(
+            email="s@example.com", password_hash="x", full_name="S", phone="+998901234567"
+        )
+        instructor = User(
+            email="i@example.com", password_hash="x", full_name="I", role=UserRole.INSTRUCTOR
+        )
+        db_session.add_all([student, instructor])
+        await db_session.flush()
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        slots = [
+            BookingSlot(
+                instructor_id=instructor.id,
+                start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i + 1),
+            )
+            for i in range(2)
+        ]
+        db_session.add_all(slots)
+        await db_session.commit()
+
+        student_id, slot_ids = student.id, [slot.id for slot in slots]
+
+        await reserve_slot(db_session, slot_ids[0], student_id, BookingType.PRACTICAL)
+        await db_session.rollback()
+        booking = await reserve_slot(db_session, slot_ids[1], student_id, BookingType.PRACTICAL)
+        await db_session.commit()
+
+        payment = Payment(id=77, user_id=student_id, amount=1_250_000)
+        for hook in payment_events._hooks:
+            await hook(PaymentEvent(event_type=PaymentEventType.PAID), payment)
+
+        await _run(notifications)
+        receipt_text, booking_text = sorted(
+            m["text"] for body in stub_http.bodies for m in body["messages"]
+        )
+        assert f"Buyurtma #{booking.id}" in booking_text
+        assert "1 250 000 so'm to'lov qabul qilindi. To'lov #77." in receipt_text
+        assert {m["to"] for body in stub_http.bodies for m in body["messages"]} == {
+            "+998901234567"
+        }
+    finally:
+        notifications.configure({})
@@ -0,0 +1,231 @@
+"""
+Test Payme and Click callbacks and the payment event worker.
+"""
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.organization import Organization
+from app.models.payment import (
+    Payment,
+    PaymentEvent,
+    PaymentStatus,
+    Subscription,
+    SubscriptionStatus,
+    Tariff,
+)
+from app.models.user import User, UserRole
+from app.services.payment_events import add_months, payment_events
+from app.services.payment_gateways import click_signature, handle_payme
+from tests.conftest import TestSessionLocal
+
+PAYME_KEY = "payme-test-key"
+CLICK_KEY = "click-test-key"
+PAYME_AUTH = "Basic " + base64.b64encode(f"Paycom:{PAYME_KEY}".encode()).decode()
+
+
+@pytest.fixture(autouse=True)
+def gateway_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "PAYMENT_PAYME_SECRET_KEY", PAYME_KEY)
+    monkeypatch.setattr(settings, "PAYMENT_CLICK_SECRET_KEY", CLICK_KEY)
+
+
+@pytest.fixture
+async def subscription(db_session: AsyncSession) -> Subscription:
+    owner = User(
+        email="owner@example.com",
+        password_hash="x",
+        full_name="Owner",
+        role=UserRole.BUSINESS_OWNER,
+    )
+    db_session.add(owner)
+    await db_session.flush()
+    organization = Organization(name="School", slug="school", owner_id=owner.id)
+    tariff = Tariff(name_uz="Pro", slug="pro", price_monthly=100_000, price_yearly=1_000_000)
+    db_session.add_all([organization, tariff])
+    await db_session.flush()
+    expired = datetime.now(timezone.utc) - timedelta(days=1)
+    subscription = Subscription(
+        organization_id=organization.id,
+        tariff_id=tariff.id,
+        started_at=expired - timedelta(days=30),
+        expires_at=expired,
+        status=SubscriptionStatus.EXPIRED,
+    )
+    db_session.add(subscription)
+    await db_session.commit()
+    return subscription
+
+
+async def _payme(client: AsyncClient, method: str, auth: str = PAYME_AUTH, **params: Any) -> Any:
+    response = await client.post(
+        "/api/v1/payments/payme",
+        json={"jsonrpc": "2.0", "id": 7, "method": method, "params": params},
+        headers={"Authorization": auth},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == 7
+    return body["result"] if "result" in body else body["error"]["code"]
+
+
+def test_add_months():
+    """Test calendar month arithmetic with day clamping."""
+    moment = datetime(2027, 1, 31, 12, tzinfo=timezone.utc)
+    assert add_months(moment, 1) == datetime(2027, 2, 28, 12, tzinfo=timezone.utc)
+    assert add_months(moment, 12) == datetime(2028, 1, 31, 12, tzinfo=timezone.utc)
+    assert add_months(moment, -2) == datetime(2026, 11, 30, 12, tzinfo=timezone.utc)
+
+
+async def test_payme_transaction_lifecycle(
+    client: AsyncClient, db_session: AsyncSession, subscription: Subscription
+):
+    """Test a Payme payment from check to refund, with retried calls."""
+    account = {"subscription_id": str(subscription.id)}
+    order = {"amount": 100_000_00, "account": account}
+
+    assert await _payme(client, "CheckPerformTransaction", auth="Basic eDp5", **order) == -32504
+    assert await _payme(client, "CheckPerformTransaction", **order) == {"allow": True}
+    wrong_amount = {**order, "amount": 99_000_00}
+    assert await _payme(client, "CheckPerformTransaction", **wrong_amount) == -31001
+    unknown = {**order, "account": {"subscription_id": "999"}}
+    assert await _payme(client, "CheckPerformTransaction", **unknown) == -31050
+    assert await _payme(client, "Unknown") == -32601
+
+    params = {"id": "p-1", "time": 1_700_000_000_000, **order}
+    created = await _payme(client, "CreateTransaction", **params)
+    assert created["state"] == 1
+    assert await _payme(client, "CreateTransaction", **params) == created
+
+    performed = await _payme(client, "PerformTransaction", id="p-1")
+    assert performed["state"] == 2
+    assert performed["transaction"] == created["transaction"]
+    assert await _payme(client, "PerformTransaction", id="p-1") == performed
+    assert await _payme(client, "PerformTransaction", id="missing") == -31003
+    assert await db_session.scalar(select(func.count(PaymentEvent.id))) == 1
+
+    assert await payment_events.process() == 1
+    await db_session.refresh(subscription)
+    assert subscription.status == SubscriptionStatus.ACTIVE
+    now = datetime.now(timezone.utc)
+    assert add_months(now, 1) - subscription.expires_at < timedelta(minutes=1)
+    assert await payment_events.process() == 0
+
+    checked = await _payme(client, "CheckTransaction", id="p-1")
+    assert checked["state"] == 2
+    assert checked["perform_time"] == performed["perform_time"]
+
+    cancelled = await _payme(client, "CancelTransaction", id="p-1", reason=5)
+    assert cancelled["state"] == -2
+    assert await _payme(client, "CancelTransaction", id="p-1", reason=5) == cancelled
+    assert await payment_events.process() == 1
+    await db_session.refresh(subscription)
+    assert subscription.status == SubscriptionStatus.EXPIRED
+
+    hour = timedelta(hours=1)
+    window = {
+        "from": int((now - hour).timestamp() * 1000),
+        "to": int((now + hour).timestamp() * 1000),
+    }
+    statement = await _payme(client, "GetStatement", **window)
+    (transaction,) = statement["transactions"]
+    assert transaction["id"] == "p-1"
+    assert transaction["amount"] == 100_000_00
+    assert transaction["account"] == account
+    assert transaction["state"] == -2
+    assert transaction["reason"] == 5
+
+
+async def test_duplicate_payme_deliveries_create_one_payment(subscription: Subscription):
+    """Test that concurrent retries of one transaction insert a single payment."""
+    payload = {
+        "id": 1,
+        "method": "CreateTransaction",
+        "params": {
+            "id": "p-dup",
+            "time": 1_700_000_000_000,
+            "amount": 1_000_000_00,
+            "account": {"subscription_id": subscription.id},
+        },
+    }
+
+    async def deliver() -> Any:
+        async with TestSessionLocal() as db:
+            response = await handle_payme(db, payload, PAYME_AUTH)
+            await db.commit()
+            return response["result"]["transaction"]
+
+    transactions = await asyncio.gather(*(deliver() for _ in range(10)))
+    assert len(set(transactions)) == 1
+
+    async with TestSessionLocal() as db:
+        assert await db.scalar(select(func.count(Payment.id))) == 1
+
+
+def _click_form(subscription: Subscription, action: int, **extra: str) -> dict[str, str]:
+    form = {
+        "click_trans_id": "5001",
+        "service_id": "42",
+        "click_paydoc_id": "9001",
+        "merchant_trans_id": str(subscription.id),
+        "amount": "1000000.00",
+        "action": str(action),
+        "error": "0",
+        "error_note": "Success",
+        "sign_time": "2027-03-09 10:00:00",
+        **extra,
+    }
+    form["sign_string"] = click_signature(
+        form["click_trans_id"],
+        form["service_id"],
+        CLICK_KEY,
+        form["merchant_trans_id"],
+        form.get("merchant_prepare_id", ""),
+        form["amount"],
+        form["action"],
+        form["sign_time"],
+    )
+    return form
+
+
+async def test_click_prepare_and_complete(
+    client: AsyncClient, db_session: AsyncSession, subscription: Subscription
+):
+    """Test Click's two-step payment, signature checks and retries."""
+    prepare = _click_form(subscription, 0)
+    response = await client.post(
+        "/api/v1/payments/click/prepare", data={**prepare, "sign_string": "0" * 32}
+    )
+    assert response.json()["error"] == -1
+
+    response = await client.post("/api/v1/payments/click/prepare", data=prepare)
+    prepared = response.json()
+    assert prepared["error"] == 0
+    response = await client.post("/api/v1/payments/click/prepare", data=prepare)
+    assert response.json() == prepared
+
+    complete = _click_form(
+        subscription, 1, merchant_prepare_id=str(prepared["merchant_prepare_id"])
+    )
+    response = await client.post("/api/v1/payments/click/complete", data=complete)
+    completed = response.json()
+    assert completed["error"] == 0
+    assert completed["merchant_confirm_id"] == prepared["merchant_prepare_id"]
+    response = await client.post("/api/v1/payments/click/complete", data=complete)
+    assert response.json()["error"] == -4
+
+    payment = await db_session.scalar(select(Payment))
+    assert payment.status == PaymentStatus.COMPLETED
+    assert payment.amount == 1_000_000
+
+    assert await payment_events.process() == 1
+    await db_session.refresh(subscription)
+    assert subscription.status == SubscriptionStatus.ACTIVE
+    assert subscription.expires_at - datetime.now(timezone.utc) > timedelta(days=360)
@@ -0,0 +1,66 @@
+"""
+Test the in-memory question bank snapshot.
+"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.question import Question
+from app.services.question_bank import QuestionBankSnapshot, QuestionRecord, question_bank
+
+
+def make_record(question_id: int, category_id: int | None = 1, difficulty: int = 1, **overrides):
+    """Build a QuestionRecord with sensible defaults."""
+    values = {
+        "id": question_id,
+        "category_id": category_id,
+        "difficulty": difficulty,
+        "is_active": True,
+        "is_deleted": False,
+        "correct_option_id": "F1",
+        "text_uz": f"Savol {question_id}",
+        "text_ru": None,
+        "text_kaa": None,
+        "image_url": None,
+        "options": [{"id": "F1", "text_uz": "Ha"}, {"id": "F2", "text_uz": "Yo'q"}],
+        "explanation_uz": None,
+        "explanation_ru": None,
+        "explanation_kaa": None,
+    }
+    values.update(overrides)
+    return QuestionRecord(**values)
+
+
+def test_snapshot_indexes_only_eligible_questions():
+    """Test that inactive and deleted questions are graded but never selected."""
+    snapshot = QuestionBankSnapshot(
+        "3-0",
+        [
+            make_record(1, category_id=1, difficulty=1),
+            make_record(2, category_id=2, difficulty=3),
+            make_record(3, category_id=1, difficulty=1, is_active=False),
+            make_record(4, category_id=2, difficulty=3, is_deleted=True),
+        ],
+    )
+
+    assert list(snapshot.ids) == [1, 2]
+    assert list(snapshot.by_category[1]) == [1]
+    assert list(snapshot.by_difficulty[3]) == [2]
+    assert snapshot.answer_key == {1: "F1", 2: "F1", 3: "F1", 4: "F1"}
+
+
+@pytest.mark.asyncio
+async def test_reload_picks_up_new_questions(client: AsyncClient, db_session: AsyncSession):
+    """Test that a reload swaps in a snapshot with a new version."""
+    db_session.add(Question(text_uz="Savol", options=[], correct_option_id="F1"))
+    await db_session.commit()
+    first = await question_bank.load()
+
+    db_session.add(Question(text_uz="Yangi savol", options=[], correct_option_id="F2"))
+    await db_session.commit()
+    second = await question_bank.load()
+
+    assert len(first) == 1
+    assert len(second) == 2
+    assert second.version != first.version
+    assert question_bank.snapshot is second
@@ -0,0 +1,92 @@
+"""
+Test pre-rendered question payloads and conditional requests.
+"""
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.services.question_bank import QuestionBankSnapshot
+from app.services.question_renderer import QuestionRenderer, render_question
+from app.utils.cyrillic import latin_to_cyrillic
+from app.utils.http import accepts_gzip, etag_matches
+from tests.test_exams import exam  # noqa: F401
+from tests.test_question_bank import make_record
+
+
+def test_latin_to_cyrillic():
+    """Test digraphs, apostrophe letters and word-initial E."""
+    assert latin_to_cyrillic("Shahar") == "Шаҳар"
+    assert latin_to_cyrillic("yo'l") == "йўл"
+    assert latin_to_cyrillic("G‘alaba") == "Ғалаба"
+    assert latin_to_cyrillic("Ertaga esa mumkin") == "Эртага эса мумкин"
+    assert latin_to_cyrillic("Yangi 60 km/soat") == "Янги 60 км/соат"
+
+
+def test_render_falls_back_to_uzbek():
+    """Test that missing translations use the Uzbek text, transliterated for uz-Cyrl."""
+    record = make_record(1, text_uz="Savol", text_ru="Вопрос")
+
+    assert render_question(record, "ru")["text"] == "Вопрос"
+    assert render_question(record, "kaa")["text"] == "Savol"
+    assert render_question(record, "uz-Cyrl")["text"] == "Савол"
+    assert render_question(record, "uz-Cyrl")["options"] == [
+        {"id": "F1", "text": "Ҳа"},
+        {"id": "F2", "text": "Йўқ"},
+    ]
+    assert "correct_option_id" not in render_question(record, "uz-Latn")
+
+
+@pytest.mark.asyncio
+async def test_payloads_are_rendered_once_per_version():
+    """Test that payloads are composed from fragments and keyed by version."""
+    renderer = QuestionRenderer(cache_size=16)
+    snapshot = QuestionBankSnapshot("2-0", [make_record(1), make_record(2)])
+
+    payload = await renderer.render(snapshot, "uz-Latn", [2, 1])
+    assert [q["id"] for q in json.loads(payload.body)] == [2, 1]
+    assert await renderer.render(snapshot, "uz-Latn", [2, 1]) is payload
+    assert renderer.renders == 1
+
+    newer = QuestionBankSnapshot("2-1", [make_record(1), make_record(2)])
+    assert renderer.etag(newer.version, "uz-Latn", [2, 1]) != payload.etag
+    assert renderer.etag(snapshot.version, "ru", [2, 1]) != payload.etag
+
+
+def test_conditional_request_helpers():
+    """Test If-None-Match and Accept-Encoding parsing."""
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
+    assert accepts_gzip("gzip, deflate")
+    assert not accepts_gzip("gzip;q=0, br")
+    assert not accepts_gzip(None)
+
+
+@pytest.mark.asyncio
+async def test_session_questions_not_modified(client: AsyncClient, auth_headers, exam):
+    """Test that session questions carry a strong ETag and honour If-None-Match."""
+    response = await client.post(
+        "/api/v1/exams/sessions", json={"exam_id": exam.id}, headers=auth_headers
+    )
+    session = response.json()
+    url = f"/api/v1/exams/sessions/{session['id']}/questions"
+
+    response = await client.get(url, params={"lang": "uz-Cyrl"}, headers=auth_headers)
+    assert response.status_code == 200
+    questions = response.json()
+    assert [q["id"] for q in questions] == session["selected_question_ids"]
+    assert questions[0]["text"].startswith("Савол")
+    etag = response.headers["etag"]
+    assert not etag.startswith("W/")
+
+    response = await client.get(
+        url, params={"lang": "uz-Cyrl"}, headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.get(
+        url, params={"lang": "ru"}, headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
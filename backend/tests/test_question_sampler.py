@@ -0,0 +1,73 @@
+"""
+Test stratified question selection.
+"""
+import random
+
+from app.services.question_bank import QuestionBankSnapshot
+from app.services.question_sampler import QuestionSampler, apportion
+from tests.test_question_bank import make_record
+
+
+def make_snapshot() -> QuestionBankSnapshot:
+    """Two categories of 30 questions each, spread over difficulties 1-5."""
+    records = [
+        make_record(question_id, category_id=1 + question_id % 2, difficulty=1 + question_id % 5)
+        for question_id in range(1, 61)
+    ]
+    records.append(make_record(100, category_id=1, is_active=False))
+    return QuestionBankSnapshot("61-0", records)
+
+
+def test_apportion_respects_capacity():
+    """Test largest-remainder apportionment with caps."""
+    assert apportion(10, {"a": 1, "b": 1}, {"a": 2, "b": 20}) == {"a": 2, "b": 8}
+    assert apportion(3, {"a": 1, "b": 1, "c": 1}, {"a": 5, "b": 5, "c": 5}) == {
+        "a": 1,
+        "b": 1,
+        "c": 1,
+    }
+    assert sum(apportion(50, {"a": 1}, {"a": 4}).values()) == 4
+
+
+def test_sample_distinct_and_eligible():
+    """Test that a sample has no duplicates and skips inactive questions."""
+    snapshot = make_snapshot()
+    sampler = QuestionSampler(random.Random(1))
+
+    for _ in range(50):
+        selected = sampler.sample(snapshot, 20)
+        assert len(selected) == len(set(selected)) == 20
+        assert 100 not in selected
+
+
+def test_sample_category_quotas():
+    """Test that explicit category quotas are honored."""
+    snapshot = make_snapshot()
+    selected = QuestionSampler(random.Random(2)).sample(snapshot, 10, category_quotas={1: 8})
+
+    in_category_1 = [qid for qid in selected if snapshot.records[qid].category_id == 1]
+    assert len(in_category_1) == 8
+    assert len(selected) == 10
+
+
+def test_sample_difficulty_mix():
+    """Test that a zero-weight band is never drawn while others can fill the exam."""
+    snapshot = make_snapshot()
+    selected = QuestionSampler(random.Random(3)).sample(
+        snapshot, 20, difficulty_mix={"easy": 1.0, "medium": 1.0, "hard": 0.0}
+    )
+
+    assert all(snapshot.records[qid].difficulty <= 3 for qid in selected)
+
+
+def test_sample_avoids_recent_questions():
+    """Test exclusion of recently seen questions, with fallback when the bank is short."""
+    snapshot = make_snapshot()
+    sampler = QuestionSampler(random.Random(4))
+    recent = set(range(1, 41))
+
+    selected = sampler.sample(snapshot, 20, exclude=recent)
+    assert not recent & set(selected)
+
+    selected = sampler.sample(snapshot, 30, exclude=recent)
+    assert len(selected) == 30
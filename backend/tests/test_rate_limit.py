@@ -0,0 +1,102 @@
+"""
+Test request rate limiting.
+"""
+import pytest
+from httpx import AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware, rate_limiter
+from app.core.security import create_access_token
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_limits_and_refills(monkeypatch):
+    """Test the in-process token bucket."""
+    limiter = RateLimiter(default_limit=3, route_limits={}, use_redis=False)
+
+    results = [await limiter.hit({"key": 3}) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] == pytest.approx(20.0, rel=0.01)
+
+    # Other keys have their own budget
+    assert (await limiter.hit({"other": 3}))[0] is True
+
+
+@pytest.mark.asyncio
+async def test_request_counts_only_if_every_key_allows_it():
+    """Test that a request limited on one key is not counted on the others."""
+    limiter = RateLimiter(default_limit=3, route_limits={}, use_redis=False)
+
+    assert (await limiter.hit({"ip": 2, "user:1": 1}))[0] is True
+    assert (await limiter.hit({"ip": 2, "user:1": 1}))[0] is False  # User exhausted
+    assert (await limiter.hit({"ip": 2, "user:2": 1}))[0] is True  # IP still had one
+    assert (await limiter.hit({"ip": 2, "user:3": 1}))[0] is False  # IP exhausted
+
+
+@pytest.mark.asyncio
+async def test_falls_back_when_redis_is_down(monkeypatch):
+    """Test that Redis errors switch to local buckets instead of failing requests."""
+    limiter = RateLimiter(default_limit=1, route_limits={}, use_redis=True)
+
+    async def unavailable(limits: dict[str, int]):
+        raise RedisConnectionError("Connection refused")
+
+    monkeypatch.setattr(limiter, "_hit_redis", unavailable)
+
+    assert (await limiter.hit({"key": 1}))[0] is True
+    assert (await limiter.hit({"key": 1}))[0] is False
+    assert limiter.redis_errors == 1
+    assert limiter.stats()["backend"] == "local"
+
+
+@pytest.mark.asyncio
+async def test_login_route_override(client: AsyncClient, monkeypatch, test_user_data):
+    """Test that a per-route limit applies to anonymous clients by IP."""
+    monkeypatch.setitem(rate_limiter.route_limits, "POST /api/v1/auth/login", 2)
+    credentials = {"email": test_user_data["email"], "password": "wrong"}
+
+    for _ in range(2):
+        response = await client.post("/api/v1/auth/login", json=credentials)
+        assert response.status_code == 401
+
+    response = await client.post("/api/v1/auth/login", json=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_requests_are_limited_per_user_and_per_ip(
+    client: AsyncClient, auth_headers, monkeypatch
+):
+    """Test that authenticated requests count against both their user and their IP."""
+    monkeypatch.setitem(rate_limiter.route_limits, "GET /api/v1/auth/me", 1)
+    monkeypatch.setattr(rate_limiter, "ip_multiplier", 3)
+
+    assert (await client.get("/api/v1/auth/me", headers=auth_headers)).status_code == 200
+    assert (await client.get("/api/v1/auth/me", headers=auth_headers)).status_code == 429
+    # The anonymous bucket for this IP is untouched
+    assert (await client.get("/api/v1/auth/me")).status_code == 403
+
+    # Users behind the IP share a larger budget; rotating tokens does not escape it
+    tokens = [create_access_token(subject=user_id) for user_id in (1001, 1002, 1003)]
+    statuses = [
+        (await client.get("/api/v1/auth/me", headers=_bearer(token))).status_code
+        for token in tokens
+    ]
+    assert 429 not in statuses[:2]
+    assert statuses[2] == 429
+
+
+def _bearer(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_route_templates_are_memoised():
+    """Test that routing is resolved once per method and path."""
+    middleware = RateLimitMiddleware(app)
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/auth/me", "app": app}
+
+    assert middleware._route(scope) == "GET /api/v1/auth/me"
+    assert middleware._route(scope) == "GET /api/v1/auth/me"
+    assert middleware._routes.stats()["hits"] == 1
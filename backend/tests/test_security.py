@@ -0,0 +1,123 @@
+"""
+Test the async password hashing service.
+"""
+import asyncio
+import statistics
+import time
+
+import pytest
+from httpx import AsyncClient
+from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.rate_limit import rate_limiter
+from app.core.security import PasswordHasher, PasswordHasherBusy
+from app.db.session import get_db
+from app.main import app
+from app.models.user import User
+from tests.conftest import TEST_DATABASE_URL
+
+# Low cost factor keeps the suite fast while still doing real bcrypt work
+test_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=8)
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify():
+    """Test hashing and verification on the worker pool."""
+    hasher = PasswordHasher(test_context, max_workers=2, max_pending=10)
+    try:
+        hashed = await hasher.hash("testpassword123")
+
+        assert await hasher.verify("testpassword123", hashed)
+        assert not await hasher.verify("wrongpassword", hashed)
+        assert hasher.stats()["completed"] == 3
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_full():
+    """Test that calls beyond max_pending are rejected instead of queued."""
+    hasher = PasswordHasher(test_context, max_workers=1, max_pending=2)
+    hashed = test_context.hash("testpassword123")
+    try:
+        results = await asyncio.gather(
+            *(hasher.verify("testpassword123", hashed) for _ in range(4)),
+            return_exceptions=True,
+        )
+
+        assert sum(isinstance(r, PasswordHasherBusy) for r in results) == 2
+        assert hasher.stats()["rejected"] == 2
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_health_latency_flat_during_login_burst(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+):
+    """
+    Load test: /health p95 latency stays flat while 200 concurrent logins
+    go through the app.
+    """
+    hasher = PasswordHasher(test_context, max_workers=4, max_pending=500)
+    monkeypatch.setattr("app.core.security.password_hasher", hasher)
+    monkeypatch.setitem(rate_limiter.route_limits, "POST /api/v1/auth/login", 0)
+    db_session.add(
+        User(
+            email="burst@example.com",
+            password_hash=test_context.hash("testpassword123"),
+            full_name="Burst",
+        )
+    )
+    await db_session.commit()
+
+    # Concurrent requests need their own sessions, from a bounded pool
+    engine = create_async_engine(TEST_DATABASE_URL, pool_size=10, max_overflow=0)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_request_db():
+        async with session_factory() as session:
+            yield session
+            await session.commit()
+
+    app.dependency_overrides[get_db] = get_request_db
+
+    async def sample_health() -> float:
+        # Scheduled as its own task, the request waits for the event loop as
+        # a served request would
+        started = time.perf_counter()
+        response = await asyncio.create_task(client.get("/health"))
+        assert response.status_code == 200
+        return time.perf_counter() - started
+
+    async def login() -> int:
+        response = await client.post(
+            "/api/v1/auth/login",
+            json={"email": "burst@example.com", "password": "testpassword123"},
+        )
+        return response.status_code
+
+    def p95(latencies: list[float]) -> float:
+        return statistics.quantiles(latencies, n=20)[-1]
+
+    try:
+        baseline = []
+        for _ in range(40):
+            baseline.append(await sample_health())
+            await asyncio.sleep(0.005)
+
+        logins = asyncio.gather(*(login() for _ in range(200)))
+        under_load = []
+        while not logins.done():
+            under_load.append(await sample_health())
+            await asyncio.sleep(0.005)
+        statuses = await logins
+    finally:
+        hasher.shutdown()
+        await engine.dispose()
+
+    assert statuses == [200] * 200
+    assert hasher.stats()["completed"] == 200
+    assert len(under_load) >= 20, "logins finished before /health was sampled"
+    assert p95(under_load) < p95(baseline) + 0.05
@@ -0,0 +1,154 @@
+"""
+Test student progress aggregates, their endpoint and the backfill.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.exam import Exam, ExamAnswer, ExamSession, ExamStatus
+from app.models.progress import StudentCategoryProgress, StudentProgress, StudentQuestionMiss
+from app.models.question import Question, QuestionCategory
+from app.models.user import User
+from app.services.student_progress import run_progress_backfill
+from tests.conftest import TestSessionLocal
+
+
+@pytest.fixture
+async def questions(db_session: AsyncSession) -> dict[str, list[Question]]:
+    """Create two categories with two and one questions."""
+    signs = QuestionCategory(name_uz="Yo'l belgilari", slug="signs")
+    rules = QuestionCategory(name_uz="Qoidalar", slug="rules")
+    by_category = {
+        "signs": [_question(signs, 1), _question(signs, 2)],
+        "rules": [_question(rules, 3)],
+    }
+    db_session.add_all([signs, rules, *by_category["signs"], *by_category["rules"]])
+    await db_session.commit()
+    return by_category
+
+
+def _question(category: QuestionCategory, number: int) -> Question:
+    return Question(
+        text_uz=f"Savol {number}",
+        options=[{"id": "F1", "text_uz": "Ha"}, {"id": "F2", "text_uz": "Yo'q"}],
+        correct_option_id="F1",
+        category=category,
+    )
+
+
+async def _take_exam(
+    client: AsyncClient, auth_headers, db_session: AsyncSession, answers: dict[int, str]
+) -> dict:
+    exam = Exam(name_uz="Test imtihon", total_questions=3, passing_score=50.0)
+    db_session.add(exam)
+    await db_session.commit()
+    response = await client.post(
+        "/api/v1/exams/sessions", json={"exam_id": exam.id}, headers=auth_headers
+    )
+    url = f"/api/v1/exams/sessions/{response.json()['id']}"
+    for question_id, option_id in answers.items():
+        answer = {"question_id": question_id, "selected_option_id": option_id}
+        await client.post(f"{url}/answers", json=answer, headers=auth_headers)
+    response = await client.post(f"{url}/finish", headers=auth_headers)
+    await db_session.commit()  # The overridden dependency does not commit
+    return response.json()
+
+
+async def _aggregates(db_session: AsyncSession) -> list[list[tuple]]:
+    return [
+        [
+            tuple(getattr(row, column) for column in columns)
+            for row in await db_session.scalars(
+                select(model).order_by(*order).execution_options(populate_existing=True)
+            )
+        ]
+        for model, order, columns in (
+            (
+                StudentProgress,
+                [StudentProgress.student_id],
+                ("student_id", "sessions", "passed_sessions", "best_score", "last_score"),
+            ),
+            (
+                StudentCategoryProgress,
+                [StudentCategoryProgress.student_id, StudentCategoryProgress.category_id],
+                ("category_id", "sessions", "questions", "answered", "correct"),
+            ),
+            (
+                StudentQuestionMiss,
+                [StudentQuestionMiss.student_id, StudentQuestionMiss.question_id],
+                ("question_id", "category_id", "misses"),
+            ),
+        )
+    ]
+
+
+async def test_finished_sessions_update_progress(
+    client: AsyncClient, auth_headers, db_session: AsyncSession, questions
+):
+    """Test that finishing sessions maintains the aggregates served by the endpoint."""
+    response = await client.get("/api/v1/exams/progress", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["sessions"] == 0
+
+    (first_sign, second_sign), (rule,) = questions["signs"], questions["rules"]
+    # One sign right, the rule wrong, the other sign unanswered
+    await _take_exam(client, auth_headers, db_session, {first_sign.id: "F1", rule.id: "F2"})
+    answers = {first_sign.id: "F1", second_sign.id: "F1", rule.id: "F2"}
+    await _take_exam(client, auth_headers, db_session, answers)
+
+    response = await client.get("/api/v1/exams/progress", headers=auth_headers)
+    progress = response.json()
+    assert (progress["sessions"], progress["passed_sessions"]) == (2, 1)
+    assert (progress["best_score"], progress["last_score"]) == (66.67, 66.67)
+    rules, signs = progress["categories"]  # Weakest first
+    assert (rules["category_id"], rules["accuracy"]) == (rule.category_id, 0.0)
+    assert (signs["questions"], signs["answered"], signs["correct"]) == (4, 3, 3)
+    assert signs["accuracy"] == 75.0
+    assert [(q["question_id"], q["misses"]) for q in progress["most_missed"]] == [(rule.id, 2)]
+
+
+async def test_backfill_rebuilds_from_history(
+    client: AsyncClient, auth_headers, db_session: AsyncSession, questions
+):
+    """Test that the bulk rebuild gives the same aggregates and counts imported history."""
+    (first_sign, _), (rule,) = questions["signs"], questions["rules"]
+    await _take_exam(client, auth_headers, db_session, {first_sign.id: "F2", rule.id: "F1"})
+    incremental = await _aggregates(db_session)
+
+    assert await run_progress_backfill(TestSessionLocal, chunk_size=1) == {
+        "students": 1,
+        "sessions": 1,
+    }
+    assert await _aggregates(db_session) == incremental
+
+    # A session written without the engine, e.g. imported
+    student = await db_session.scalar(select(User).where(User.email == "test@example.com"))
+    exam_id = await db_session.scalar(select(Exam.id))
+    session = ExamSession(
+        exam_id=exam_id,
+        student_id=student.id,
+        selected_question_ids=[rule.id],
+        status=ExamStatus.EXPIRED,
+        started_at=datetime.now(timezone.utc),
+        completed_at=datetime.now(timezone.utc),
+        time_remaining_seconds=0,
+        score=0.0,
+        passed=False,
+    )
+    db_session.add(session)
+    await db_session.flush()
+    db_session.add(
+        ExamAnswer(
+            session_id=session.id, question_id=rule.id, selected_option_id="F2", is_correct=False
+        )
+    )
+    await db_session.commit()
+
+    await run_progress_backfill(TestSessionLocal, chunk_size=1000)
+    progress, categories, misses = await _aggregates(db_session)
+    assert progress == [(student.id, 2, 0, 33.33, 0.0)]
+    assert (rule.category_id, 2, 2, 2, 1) in categories
+    assert (rule.id, rule.category_id, 1) in misses
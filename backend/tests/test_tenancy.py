@@ -0,0 +1,123 @@
+"""
+Test tenant resolution and branding served from the tenant directory.
+"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.tenancy import normalize_host, tenant_directory
+from app.models.organization import Organization
+from app.models.user import User
+
+URL = "/api/v1/organizations/current"
+
+
+@pytest.fixture
+async def organization(db_session: AsyncSession) -> Organization:
+    owner = User(email="owner@example.com", password_hash="x", full_name="Owner")
+    db_session.add(owner)
+    await db_session.flush()
+    organization = Organization(
+        name="Alpha School",
+        slug="alpha",
+        owner_id=owner.id,
+        custom_domain="Drive.Alpha.uz",
+        theme_color="#112233",
+        logo_url="https://cdn.example.com/alpha.png",
+    )
+    db_session.add(organization)
+    await db_session.commit()
+    return organization
+
+
+def test_normalize_host():
+    """Test host normalization."""
+    assert normalize_host("Drive.Alpha.UZ:443") == "drive.alpha.uz"
+    assert normalize_host("drive.alpha.uz.") == "drive.alpha.uz"
+    assert normalize_host("[::1]:8000") == "[::1]"
+
+
+async def test_resolve_by_domain_slug_and_subdomain(
+    client: AsyncClient, organization: Organization, monkeypatch: pytest.MonkeyPatch
+):
+    """Test the three ways of naming a tenant."""
+    misses = tenant_directory.misses
+    response = await client.get(URL, headers={"Host": "drive.alpha.uz:443"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": organization.id,
+        "slug": "alpha",
+        "name": "Alpha School",
+        "logo_url": "https://cdn.example.com/alpha.png",
+        "theme_color": "#112233",
+    }
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+
+    response = await client.get(URL, headers={settings.TENANT_HEADER: "Alpha"})
+    assert response.json()["id"] == organization.id
+
+    monkeypatch.setattr(settings, "TENANT_BASE_DOMAIN", "onless.uz")
+    response = await client.get(URL, headers={"Host": "alpha.onless.uz"})
+    assert response.json()["id"] == organization.id
+    assert (await client.get(URL, headers={"Host": "onless.uz"})).status_code == 404
+    assert tenant_directory.misses == misses
+
+
+async def test_unknown_names_do_not_query(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    organization: Organization,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that misses on the loaded table are answered without a query."""
+    assert (await client.get(URL, headers={"Host": "drive.alpha.uz"})).status_code == 200
+    session_factory = tenant_directory.session_factory
+
+    def no_queries():
+        raise AssertionError("unexpected query")
+
+    monkeypatch.setattr(tenant_directory, "session_factory", no_queries)
+    misses = tenant_directory.misses
+    for name in ("unknown.example.com", "other.example.com"):
+        response = await client.get(URL, headers={"Host": name})
+        assert response.status_code == 404
+    response = await client.get(URL, headers={settings.TENANT_HEADER: "beta"})
+    assert response.status_code == 404
+    assert tenant_directory.misses == misses + 3
+
+    # Inserted behind the ORM's back, as another process would: found after a refresh
+    await db_session.execute(
+        insert(Organization).values(
+            name="Beta", slug="beta", owner_id=organization.owner_id, is_active=True
+        )
+    )
+    await db_session.commit()
+    monkeypatch.setattr(tenant_directory, "session_factory", session_factory)
+    assert await tenant_directory.refresh_if_changed()
+    response = await client.get(URL, headers={settings.TENANT_HEADER: "beta"})
+    assert response.json()["name"] == "Beta"
+
+
+async def test_committed_changes_apply_in_place(
+    client: AsyncClient, db_session: AsyncSession, organization: Organization
+):
+    """Test that ORM changes reach the table after commit, without a reload."""
+    headers = {"Host": "drive.alpha.uz"}
+    assert (await client.get(URL, headers=headers)).status_code == 200
+    reloads = tenant_directory.reloads
+
+    organization.theme_color = "#abcdef"
+    organization.custom_domain = "alpha.school"
+    await db_session.commit()
+    assert (await client.get(URL, headers=headers)).status_code == 404
+    response = await client.get(URL, headers={"Host": "alpha.school"})
+    assert response.json()["theme_color"] == "#abcdef"
+
+    organization.theme_color = "#000000"
+    await db_session.rollback()
+    organization.is_active = False
+    await db_session.commit()
+    assert (await client.get(URL, headers={"Host": "alpha.school"})).status_code == 404
+    assert tenant_directory.reloads == reloads
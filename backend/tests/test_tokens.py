@@ -0,0 +1,54 @@
+"""
+Test JWT creation, verification and the verified-token cache.
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.core.security import (
+    JoseBackend,
+    PyJWTBackend,
+    TokenVerifier,
+    create_access_token,
+    create_refresh_token,
+    get_token_subject,
+)
+
+
+def test_verified_tokens_are_cached():
+    """Test that a token is verified once and then served from the cache."""
+    verifier = TokenVerifier(JoseBackend(), maxsize=10)
+    token = verifier.encode({"sub": "7", "exp": 4_102_444_800})
+
+    assert verifier.decode(token)["sub"] == "7"
+    assert verifier.decode(token)["sub"] == "7"
+    assert verifier.stats()["hits"] == 1
+
+
+def test_invalid_and_expired_tokens_rejected():
+    """Test that tampered and expired tokens are not accepted or cached."""
+    verifier = TokenVerifier(JoseBackend(), maxsize=10)
+    token = verifier.encode({"sub": "7", "exp": 4_102_444_800})
+
+    assert verifier.decode(token[:-2] + "xx") is None
+    assert verifier.decode(create_access_token(7, timedelta(seconds=-1))) is None
+    assert len(verifier._cache) == 0
+
+
+def test_token_subject_checks_type():
+    """Test that refresh tokens are not accepted as access tokens."""
+    assert get_token_subject(create_access_token(7)) == 7
+    assert get_token_subject(create_refresh_token(7)) is None
+    assert get_token_subject(create_refresh_token(7), token_type="refresh") == 7
+    assert get_token_subject("not-a-token") is None
+
+
+def test_backends_are_interchangeable():
+    """Test that tokens signed by one backend verify with the other."""
+    pytest.importorskip("jwt")
+    jose, pyjwt = JoseBackend(), PyJWTBackend()
+    claims = {"sub": "7", "exp": 4_102_444_800, "type": "access"}
+
+    assert pyjwt.decode(jose.encode(claims)) == claims
+    assert jose.decode(pyjwt.encode(claims)) == claims
+    assert pyjwt.decode("not-a-token") is None
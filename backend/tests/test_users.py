@@ -0,0 +1,136 @@
+"""
+Test user listings with keyset pagination.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.organization import Organization
+from app.models.user import User, UserRole
+from app.services.user_listing import decode_cursor, encode_cursor, user_counts
+
+URL = "/api/v1/users"
+
+
+@pytest.fixture
+async def organization(db_session: AsyncSession, auth_headers: dict[str, str]) -> Organization:
+    await db_session.execute(update(User).values(role=UserRole.BUSINESS_OWNER))
+    owner = await db_session.scalar(select(User))
+    organization = Organization(name="School", slug="school", owner_id=owner.id)
+    other = Organization(
+        name="Other", slug="other", owner_id=owner.id, deleted_at=datetime.now(timezone.utc)
+    )
+    db_session.add_all([organization, other])
+    await db_session.flush()
+    roles = [UserRole.STUDENT] * 5 + [UserRole.INSTRUCTOR, UserRole.TEACHER]
+    db_session.add_all(
+        User(
+            email=f"u{i}@example.com",
+            password_hash="x",
+            full_name=f"User {i}",
+            role=role,
+            organization_id=organization.id,
+        )
+        for i, role in enumerate(roles)
+    )
+    db_session.add_all(
+        [
+            User(
+                email="gone@example.com",
+                password_hash="x",
+                full_name="Gone",
+                organization_id=organization.id,
+                deleted_at=datetime.now(timezone.utc),
+            ),
+            User(
+                email="else@example.com",
+                password_hash="x",
+                full_name="Else",
+                organization_id=other.id,
+            ),
+        ]
+    )
+    await db_session.commit()
+    return organization
+
+
+async def _pages(client: AsyncClient, headers: dict[str, str], **params: object) -> list[dict]:
+    pages = []
+    cursor = None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(URL, params=query, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    """Test cursor encoding and rejection of tampered cursors."""
+    assert decode_cursor(encode_cursor(None, UserRole.MENTOR, 7)) == (None, UserRole.MENTOR, 7)
+    for cursor in ("", "not-a-cursor", encode_cursor(1, UserRole.ADMIN, 2)[:-2]):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+async def test_owner_pages_through_own_organization(
+    client: AsyncClient, auth_headers: dict[str, str], organization: Organization
+):
+    """Test keyset pages: complete, ordered, without duplicates."""
+    counts = user_counts.counts
+    pages = await _pages(client, auth_headers, limit=3)
+    assert [len(page["items"]) for page in pages] == [3, 3, 1]
+    assert pages[0]["total"] == 7 and not pages[0]["total_is_estimate"]
+    assert all(page["total"] is None for page in pages[1:])
+
+    items = [item for page in pages for item in page["items"]]
+    keys = [(item["role"], item["id"]) for item in items]
+    assert keys == sorted(keys, key=lambda key: (UserRole(key[0]).name, key[1]))
+    assert {item["organization_id"] for item in items} == {organization.id}
+    assert set(items[0]) == {
+        "id", "full_name", "email", "phone", "role", "is_active",
+        "organization_id", "level", "rating", "avatar_url",
+    }
+
+    pages = await _pages(client, auth_headers, role="student", limit=2)
+    assert sum(len(page["items"]) for page in pages) == 5
+    assert pages[0]["total"] == 5
+
+    await _pages(client, auth_headers, limit=3)
+    assert user_counts.counts == counts + 2  # Totals are cached per filter
+
+
+async def test_admin_lists_all_users(
+    client: AsyncClient,
+    auth_headers: dict[str, str],
+    db_session: AsyncSession,
+    organization: Organization,
+):
+    """Test paging across organizations, including users without one."""
+    await db_session.execute(
+        update(User).values(role=UserRole.ADMIN).where(User.email == "test@example.com")
+    )
+    await db_session.commit()
+
+    pages = await _pages(client, auth_headers, limit=4)
+    emails = [item["email"] for page in pages for item in page["items"]]
+    assert len(emails) == len(set(emails)) == 9
+    assert emails[-1] == "test@example.com"  # No organization: listed last
+
+
+async def test_listing_permissions(
+    client: AsyncClient, auth_headers: dict[str, str], organization: Organization
+):
+    """Test that owners cannot list other organizations, and bad cursors."""
+    response = await client.get(
+        URL, params={"organization_id": organization.id + 1}, headers=auth_headers
+    )
+    assert response.status_code == 403
+    response = await client.get(URL, params={"cursor": "bogus"}, headers=auth_headers)
+    assert response.status_code == 400